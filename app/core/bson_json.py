@@ -0,0 +1,50 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _decimal(value: Decimal):
+    # same as fastapi's jsonable_encoder: whole numbers stay ints
+    return int(value) if value.is_finite() and value.as_tuple().exponent >= 0 else float(value)
+
+
+def bson_default(value: Any):
+    """`default` hook of json.dumps for the BSON types Mongo documents come back with."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return _decimal(value.to_decimal())
+    if isinstance(value, Decimal):
+        return _decimal(value)
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def bson_dumps(content: Any) -> bytes:
+    # the C encoder walks the content once and only calls bson_default for the values it cannot encode itself
+    return json.dumps(content, default=bson_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class BsonJSONResponse(JSONResponse):
+    """
+    JSON response that encodes ObjectId, datetime and Decimal128 while rendering, so a handler can
+    return raw Mongo documents without a serializer copy or fastapi's jsonable_encoder pass. Handlers
+    return it directly: `return BsonJSONResponse({"items": docs})`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return bson_dumps(content)
@@ -0,0 +1,381 @@
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.core import security
+from app.database import get_collection
+from app.widgets.job_card_dates import job_card_date_field_to_filter
+
+job_cards_collection = get_collection("job_cards")
+job_cards_invoice_items_collection = get_collection("job_cards_invoice_items")
+receipts_collection = get_collection("all_receipts")
+receipts_invoices_collection = get_collection("all_receipts_invoices")
+ap_payment_collection = get_collection("all_payments")
+ap_payment_invoices_collection = get_collection("all_payments_invoices")
+account_transfers_collection = get_collection("account_transfers")
+
+job_cards_daily_stats_collection = get_collection("job_cards_daily_stats")
+cashflow_daily_stats_collection = get_collection("cashflow_daily_stats")
+# what each source document currently adds to the stats, so a change only moves its own delta
+dashboard_rollup_entries_collection = get_collection("dashboard_rollup_entries")
+
+JOB_CARDS = "job_cards"
+CASHFLOW = "cashflow"
+
+JOB_CARDS_KEY_FIELDS = ("company_id", "branch", "day", "salesman", "status")
+JOB_CARDS_VALUE_FIELDS = ("jobs", "items_total", "items_net", "items_paid")
+CASHFLOW_KEY_FIELDS = ("company_id", "account", "day")
+CASHFLOW_VALUE_FIELDS = ("received", "paid", "trans_in", "trans_out")
+
+DASHBOARD_REBUILD_BATCH_SIZE = int(os.getenv("DASHBOARD_REBUILD_BATCH_SIZE", "500"))
+# times a bucket correction is recomputed when route writes keep moving the bucket
+DASHBOARD_CORRECTION_RETRIES = 5
+
+_rollups = {
+    JOB_CARDS: (job_cards_daily_stats_collection, JOB_CARDS_KEY_FIELDS, JOB_CARDS_VALUE_FIELDS),
+    CASHFLOW: (cashflow_daily_stats_collection, CASHFLOW_KEY_FIELDS, CASHFLOW_VALUE_FIELDS),
+}
+
+ProgressCallback = Optional[Callable[[int], Awaitable[Any]]]
+
+
+def _unique_ids(ids: Iterable[Any]) -> list[ObjectId]:
+    return list(dict.fromkeys(ObjectId(i) for i in ids if i))
+
+
+def day_of(value: Any) -> Optional[datetime]:
+    # dates are stored as UTC+4 wall clock, so the stored day is the local day
+    if not isinstance(value, datetime):
+        return None
+    return datetime(value.year, value.month, value.day)
+
+
+async def _posted_settlements(collection, parent_field: str, ids: list[ObjectId], settlements_from: str,
+                              settlement_field: str, session=None) -> dict[ObjectId, float]:
+    cursor = await collection.aggregate([
+        {"$match": {parent_field: {"$in": ids}}},
+        {
+            "$lookup": {
+                "from": settlements_from,
+                "let": {"settlement_id": f"${settlement_field}"},
+                "pipeline": [
+                    {
+                        "$match": {
+                            "$expr": {
+                                "$and": [
+                                    {"$eq": ["$_id", "$$settlement_id"]},
+                                    {"$eq": ["$status", "Posted"]},
+                                ]
+                            }
+                        }
+                    },
+                    {"$project": {"_id": 1}},
+                ],
+                "as": "settlement",
+            }
+        },
+        {"$match": {"settlement": {"$ne": []}}},
+        {"$group": {"_id": f"${parent_field}", "amount": {"$sum": {"$ifNull": ["$amount", 0]}}}},
+    ], session=session)
+    return {doc["_id"]: doc["amount"] for doc in await cursor.to_list(None)}
+
+
+async def _amounts_by(collection, parent_field: str, ids: list[ObjectId], session=None) -> dict[ObjectId, float]:
+    cursor = await collection.aggregate([
+        {"$match": {parent_field: {"$in": ids}}},
+        {"$group": {"_id": f"${parent_field}", "amount": {"$sum": {"$ifNull": ["$amount", 0]}}}},
+    ], session=session)
+    return {doc["_id"]: doc["amount"] for doc in await cursor.to_list(None)}
+
+
+async def _job_rows(job_ids: list[ObjectId], session=None) -> dict[ObjectId, list[dict]]:
+    jobs = await job_cards_collection.find(
+        {"_id": {"$in": job_ids}},
+        {"company_id": 1, "branch": 1, "salesman": 1, "job_status_1": 1, "job_date": 1, "invoice_date": 1,
+         "job_cancellation_date": 1},
+        session=session,
+    ).to_list(None)
+    cursor = await job_cards_invoice_items_collection.aggregate([
+        {"$match": {"job_card_id": {"$in": job_ids}}},
+        {
+            "$group": {
+                "_id": "$job_card_id",
+                "total": {"$sum": {"$ifNull": ["$total", 0]}},
+                "vat": {"$sum": {"$ifNull": ["$vat", 0]}},
+            }
+        },
+    ], session=session)
+    items = {doc["_id"]: doc for doc in await cursor.to_list(None)}
+    paid = await _posted_settlements(receipts_invoices_collection, "job_id", job_ids, "all_receipts", "receipt_id",
+                                     session)
+
+    rows: dict[ObjectId, list[dict]] = {job_id: [] for job_id in job_ids}
+    for job in jobs:
+        day = day_of(job_card_date_field_to_filter(job))
+        if not day:
+            continue
+        posted = job.get("job_status_1") == "Posted"
+        job_items = items.get(job["_id"]) or {"total": 0, "vat": 0}
+        rows[job["_id"]] = [{
+            "company_id": job.get("company_id"),
+            "branch": job.get("branch"),
+            "day": day,
+            "salesman": job.get("salesman"),
+            "status": job.get("job_status_1"),
+            "jobs": 1,
+            "items_total": job_items["total"] if posted else 0,
+            "items_net": job_items["total"] + job_items["vat"] if posted else 0,
+            "items_paid": paid.get(job["_id"], 0),
+        }]
+    return rows
+
+
+async def _settlement_rows(collection, lines_collection, parent_field: str, date_field: str, sign: int,
+                           value_field: str, ids: list[ObjectId], session=None) -> dict[ObjectId, list[dict]]:
+    documents = await collection.find(
+        {"_id": {"$in": ids}, "status": "Posted"},
+        {"company_id": 1, "account": 1, "rate": 1, date_field: 1},
+        session=session,
+    ).to_list(None)
+    amounts = await _amounts_by(lines_collection, parent_field, [doc["_id"] for doc in documents], session)
+
+    rows: dict[ObjectId, list[dict]] = {doc_id: [] for doc_id in ids}
+    for doc in documents:
+        day = day_of(doc.get(date_field))
+        if not day:
+            continue
+        row = {"company_id": doc.get("company_id"), "account": doc.get("account"), "day": day,
+               **{field: 0 for field in CASHFLOW_VALUE_FIELDS}}
+        row[value_field] = sign * amounts.get(doc["_id"], 0) * (doc.get("rate") or 1)
+        rows[doc["_id"]] = [row]
+    return rows
+
+
+async def _transfer_rows(transfer_ids: list[ObjectId], session=None) -> dict[ObjectId, list[dict]]:
+    transfers = await account_transfers_collection.find(
+        {"_id": {"$in": transfer_ids}, "status": "Posted"},
+        {"company_id": 1, "from_account": 1, "to_account": 1, "amount": 1, "date": 1},
+        session=session,
+    ).to_list(None)
+
+    rows: dict[ObjectId, list[dict]] = {transfer_id: [] for transfer_id in transfer_ids}
+    for transfer in transfers:
+        day = day_of(transfer.get("date"))
+        if not day:
+            continue
+        amount = transfer.get("amount") or 0
+        for account, field, value in ((transfer.get("from_account"), "trans_out", -amount),
+                                      (transfer.get("to_account"), "trans_in", amount)):
+            if account:
+                row = {"company_id": transfer.get("company_id"), "account": account, "day": day,
+                       **{value_field: 0 for value_field in CASHFLOW_VALUE_FIELDS}}
+                row[field] = value
+                rows[transfer["_id"]].append(row)
+    return rows
+
+
+async def _swap_entries(rollup: str, rows_by_source: dict[ObjectId, list[dict]], session=None):
+    """Replaces each source's rows and moves the old -> new difference onto the daily buckets."""
+    stats_collection, key_fields, value_fields = _rollups[rollup]
+    deltas: dict[tuple, dict] = {}
+
+    def add(rows: list[dict], sign: int):
+        for row in rows:
+            delta = deltas.setdefault(tuple(row.get(field) for field in key_fields),
+                                      {field: 0 for field in value_fields})
+            for field in value_fields:
+                delta[field] += sign * (row.get(field) or 0)
+
+    for source_id, rows in rows_by_source.items():
+        if rows:
+            old = await dashboard_rollup_entries_collection.find_one_and_update(
+                {"_id": source_id},
+                {"$set": {"rollup": rollup, "company_id": rows[0]["company_id"], "rows": rows,
+                          "updatedAt": security.now_utc()}},
+                upsert=True,
+                session=session,
+            )
+        else:
+            old = await dashboard_rollup_entries_collection.find_one_and_delete({"_id": source_id}, session=session)
+        add((old or {}).get("rows") or [], -1)
+        add(rows, 1)
+
+    for key, delta in deltas.items():
+        if all(abs(value) < 1e-9 for value in delta.values()):
+            continue
+        await stats_collection.update_one(
+            dict(zip(key_fields, key)),
+            {"$inc": delta, "$set": {"updatedAt": security.now_utc()}},
+            upsert=True,
+            session=session,
+        )
+
+
+async def refresh_job_daily_stats(job_ids: Iterable[Any], session=None):
+    """Call after any write to a job card, its invoice items or the receipts paying it (same session)."""
+    job_ids = _unique_ids(job_ids)
+    if job_ids:
+        await _swap_entries(JOB_CARDS, await _job_rows(job_ids, session), session)
+
+
+async def refresh_receipt_cashflow(receipt_ids: Iterable[Any], session=None):
+    receipt_ids = _unique_ids(receipt_ids)
+    if receipt_ids:
+        await _swap_entries(CASHFLOW, await _settlement_rows(receipts_collection, receipts_invoices_collection,
+                                                             "receipt_id", "receipt_date", 1, "received",
+                                                             receipt_ids, session), session)
+
+
+async def refresh_payment_cashflow(payment_ids: Iterable[Any], session=None):
+    payment_ids = _unique_ids(payment_ids)
+    if payment_ids:
+        await _swap_entries(CASHFLOW, await _settlement_rows(ap_payment_collection, ap_payment_invoices_collection,
+                                                             "payment_id", "payment_date", -1, "paid",
+                                                             payment_ids, session), session)
+
+
+async def refresh_transfer_cashflow(transfer_ids: Iterable[Any], session=None):
+    transfer_ids = _unique_ids(transfer_ids)
+    if transfer_ids:
+        await _swap_entries(CASHFLOW, await _transfer_rows(transfer_ids, session), session)
+
+
+async def _rebuild_sources(rollup: str, source_collection, date_field: str, refresh, company_id: ObjectId,
+                           from_day: Optional[datetime], to_date: Optional[datetime]) -> int:
+    date_range: dict[str, Any] = {}
+    if from_day:
+        date_range["$gte"] = from_day
+    if to_date:
+        date_range["$lt"] = to_date
+    source_filter: dict[str, Any] = {"company_id": company_id}
+    entries_filter: dict[str, Any] = {"rollup": rollup, "company_id": company_id}
+    if date_range:
+        source_filter[date_field] = date_range
+        entries_filter["rows.day"] = date_range
+
+    # sources dated in the range, plus entries in the range whose source moved out of it or was deleted
+    source_ids = [doc["_id"] async for doc in source_collection.find(source_filter, {"_id": 1})]
+    known = set(source_ids)
+    source_ids += [
+        doc["_id"]
+        async for doc in dashboard_rollup_entries_collection.find(entries_filter, {"_id": 1})
+        if doc["_id"] not in known
+    ]
+    for start in range(0, len(source_ids), DASHBOARD_REBUILD_BATCH_SIZE):
+        await refresh(source_ids[start:start + DASHBOARD_REBUILD_BATCH_SIZE])
+    return len(source_ids)
+
+
+async def _expected_buckets(rollup: str, company_id: ObjectId, rows_match: dict) -> dict[tuple, dict]:
+    _, key_fields, value_fields = _rollups[rollup]
+    cursor = await dashboard_rollup_entries_collection.aggregate([
+        {"$match": {"rollup": rollup, "company_id": company_id}},
+        {"$unwind": "$rows"},
+        {"$match": rows_match},
+        {
+            "$group": {
+                "_id": {field: f"$rows.{field}" for field in key_fields},
+                **{field: {"$sum": f"$rows.{field}"} for field in value_fields},
+            }
+        },
+    ])
+    return {
+        tuple(doc["_id"].get(field) for field in key_fields): doc
+        for doc in await cursor.to_list(None)
+    }
+
+
+async def _correct_bucket(rollup: str, key: tuple, have: Optional[dict], want: dict) -> Optional[bool]:
+    """
+    Moves one bucket from `have` to `want` with $inc, only if it still holds `have`, so route writes
+    that $inc the same bucket are never overwritten. None when the bucket moved meanwhile.
+    """
+    stats_collection, key_fields, value_fields = _rollups[rollup]
+    if have and all(abs((have.get(field) or 0) - (want.get(field) or 0)) < 0.005 for field in value_fields):
+        return False
+    if not have:
+        try:
+            await stats_collection.insert_one({
+                **dict(zip(key_fields, key)), **{field: want.get(field) or 0 for field in value_fields},
+                "updatedAt": security.now_utc(),
+            })
+        except DuplicateKeyError:
+            return None
+        return True
+    result = await stats_collection.update_one(
+        {"_id": have["_id"], **{field: have.get(field) for field in value_fields}},
+        {
+            "$inc": {field: (want.get(field) or 0) - (have.get(field) or 0) for field in value_fields},
+            "$set": {"updatedAt": security.now_utc()},
+        },
+    )
+    return True if result.matched_count else None
+
+
+async def _correct_stats(rollup: str, company_id: ObjectId, from_day: Optional[datetime],
+                         to_date: Optional[datetime]) -> int:
+    """Brings every bucket of the range back to the sum of its entries, fixing drift in the buckets themselves."""
+    stats_collection, key_fields, _ = _rollups[rollup]
+    day_filter: dict[str, Any] = {}
+    if from_day:
+        day_filter["$gte"] = from_day
+    if to_date:
+        day_filter["$lt"] = to_date
+    rows_match: dict[str, Any] = {"rows.company_id": company_id}
+    stats_filter: dict[str, Any] = {"company_id": company_id}
+    if day_filter:
+        rows_match["rows.day"] = day_filter
+        stats_filter["day"] = day_filter
+
+    # buckets are read before the entries they are compared with, a write in between fails the guard
+    current = {
+        tuple(doc.get(field) for field in key_fields): doc
+        for doc in await stats_collection.find(stats_filter).to_list(None)
+    }
+    expected = await _expected_buckets(rollup, company_id, rows_match)
+
+    corrected = 0
+    for key in set(expected) | set(current):
+        have, want = current.get(key), expected.get(key) or {}
+        for _ in range(DASHBOARD_CORRECTION_RETRIES):
+            result = await _correct_bucket(rollup, key, have, want)
+            if result is not None:
+                corrected += result
+                break
+            key_filter = dict(zip(key_fields, key))
+            have = await stats_collection.find_one(key_filter)
+            want = (await _expected_buckets(
+                rollup, company_id, {f"rows.{field}": value for field, value in key_filter.items()}
+            )).get(key) or {}
+        else:
+            print(f"[dashboard rollups] {rollup} bucket {key} kept changing, left for the next rebuild")
+    return corrected
+
+
+async def rebuild_dashboard_rollups(company_id: ObjectId, from_date: Optional[datetime] = None,
+                                    to_date: Optional[datetime] = None, progress: ProgressCallback = None) -> dict:
+    """
+    Recomputes the job cards / cashflow daily stats of the company for [from_date, to_date)
+    (everything when no range is given) from the source collections.
+    """
+    from_day = day_of(from_date)
+    steps = [
+        (JOB_CARDS, job_cards_collection, "date_field_to_filter", refresh_job_daily_stats),
+        (CASHFLOW, receipts_collection, "receipt_date", refresh_receipt_cashflow),
+        (CASHFLOW, ap_payment_collection, "payment_date", refresh_payment_cashflow),
+        (CASHFLOW, account_transfers_collection, "date", refresh_transfer_cashflow),
+    ]
+    refreshed = {}
+    for index, (rollup, source_collection, date_field, refresh) in enumerate(steps):
+        refreshed[source_collection.name] = await _rebuild_sources(rollup, source_collection, date_field, refresh,
+                                                                   company_id, from_day, to_date)
+        if progress:
+            await progress(int((index + 1) * 80 / len(steps)))
+
+    corrected = {rollup: await _correct_stats(rollup, company_id, from_day, to_date) for rollup in _rollups}
+    if progress:
+        await progress(100)
+    return {"refreshed_documents": refreshed, "corrected_buckets": corrected}
@@ -0,0 +1,236 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+import bson
+from pymongo import monitoring
+
+# requests slower than this are printed with the commands they ran, 0 turns the log off
+DB_SLOW_REQUEST_MS = float(os.getenv("DB_SLOW_REQUEST_MS", "0"))
+# encoding each reply again to measure it costs CPU, set to 1 to also count reply bytes
+DB_METRICS_REPLY_BYTES = os.getenv("DB_METRICS_REPLY_BYTES", "0") == "1"
+DB_SLOW_LOG_COMMAND_CHARS = 1000
+DB_SLOW_LOG_MAX_COMMANDS = 50
+
+REQUEST_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COMMANDS_PER_REQUEST_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# commands sent outside a request (startup, job runner, tasks that outlived their request)
+BACKGROUND_ROUTE = "background"
+
+
+class RequestStats:
+    """Database work of one HTTP request, collected by the command listener through `current_request`."""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.commands = 0
+        self.db_seconds = 0.0
+        self.documents = 0
+        self.reply_bytes = 0
+        self.finished = False
+        self.slow_log: list[tuple[str, str, float, dict]] = []
+
+    @property
+    def route(self) -> str:
+        # set by the router once the path is matched; unmatched paths share one label
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class DbMetrics:
+    """Per route counters of requests and of the MongoDB commands they send, in Prometheus text format."""
+
+    def __init__(self):
+        self.requests: dict[tuple[str, str, str], int] = {}
+        self.request_seconds: dict[tuple[str, str], _Histogram] = {}
+        self.commands_per_request: dict[tuple[str, str], _Histogram] = {}
+        # (route, command, collection) -> [count, seconds, documents, reply bytes, errors]
+        self.commands: dict[tuple[str, str, str], list] = {}
+
+    def record_command(self, route: str, command: str, collection: str, seconds: float,
+                       documents: int, reply_bytes: int, failed: bool):
+        totals = self.commands.setdefault((route, command, collection), [0, 0.0, 0, 0, 0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += documents
+        totals[3] += reply_bytes
+        totals[4] += 1 if failed else 0
+
+    def record_request(self, method: str, route: str, status_code: int, seconds: float, commands: int):
+        key = (method, route, str(status_code))
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self.request_seconds.setdefault((method, route), _Histogram(REQUEST_SECONDS_BUCKETS)).observe(seconds)
+        self.commands_per_request.setdefault(
+            (method, route), _Histogram(COMMANDS_PER_REQUEST_BUCKETS)).observe(commands)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_total HTTP requests by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status_code), count in sorted(self.requests.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status_code)} {count}")
+        _render_histograms(lines, "http_request_duration_seconds", "HTTP request latency by route.",
+                           self.request_seconds)
+        _render_histograms(lines, "db_commands_per_request", "MongoDB commands sent per HTTP request.",
+                           self.commands_per_request)
+        series = (
+            ("db_commands_total", "counter", "MongoDB commands by route, command and collection.", 0),
+            ("db_command_duration_seconds_total", "counter", "Time spent waiting for MongoDB replies.", 1),
+            ("db_documents_returned_total", "counter", "Documents returned in cursor batches.", 2),
+            ("db_reply_bytes_total", "counter", "BSON size of MongoDB replies.", 3),
+            ("db_command_errors_total", "counter", "MongoDB commands that failed.", 4),
+        )
+        for name, kind, description, position in series:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (route, command, collection), totals in sorted(self.commands.items()):
+                value = round(totals[position], 6) if position == 1 else totals[position]
+                lines.append(f"{name}{_labels(route=route, command=command, collection=collection)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _render_histograms(lines: list[str], name: str, description: str, histograms: dict):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in sorted(histograms.items()):
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {count}")
+        lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {round(histogram.total, 6)}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+
+
+db_metrics = DbMetrics()
+
+
+def _collection_name(command_name: str, command: dict) -> str:
+    if command_name == "getMore":
+        return str(command.get("collection", ""))
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+def _returned_documents(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    return 0
+
+
+class DbCommandListener(monitoring.CommandListener):
+    """
+    Attributes every command the client sends to the request running it. The async client publishes
+    events from the task that awaits the command, so `current_request` is that request's stats.
+    """
+
+    def __init__(self, metrics: DbMetrics):
+        self.metrics = metrics
+        self._pending: dict[tuple, tuple[Optional[RequestStats], str, dict]] = {}
+
+    def started(self, event):
+        stats = current_request.get()
+        if stats is not None and stats.finished:
+            stats = None
+        self._pending[(event.connection_id, event.request_id)] = (
+            stats, _collection_name(event.command_name, event.command), event.command)
+
+    def _finish(self, event, reply: Optional[dict]):
+        stats, collection, command = self._pending.pop((event.connection_id, event.request_id), (None, "", {}))
+        seconds = event.duration_micros / 1_000_000
+        documents = _returned_documents(reply) if reply else 0
+        reply_bytes = len(bson.encode(reply)) if reply and DB_METRICS_REPLY_BYTES else 0
+        route = stats.route if stats is not None else BACKGROUND_ROUTE
+        self.metrics.record_command(route, event.command_name, collection, seconds, documents, reply_bytes,
+                                    reply is None)
+        if stats is None:
+            return
+        stats.commands += 1
+        stats.db_seconds += seconds
+        stats.documents += documents
+        stats.reply_bytes += reply_bytes
+        if DB_SLOW_REQUEST_MS and len(stats.slow_log) < DB_SLOW_LOG_MAX_COMMANDS:
+            stats.slow_log.append((event.command_name, collection, seconds, command))
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+
+command_listener = DbCommandListener(db_metrics)
+
+
+def _print_slow_request(method: str, stats: RequestStats, seconds: float):
+    print(f"[slow request] {method} {stats.route} {seconds * 1000:.0f} ms, {stats.commands} db commands, "
+          f"{stats.db_seconds * 1000:.0f} ms in db, {stats.documents} documents, {stats.reply_bytes} bytes")
+    for command_name, collection, command_seconds, command in stats.slow_log:
+        body = {key: value for key, value in command.items() if key not in ("lsid", "$db", "$clusterTime")}
+        print(f"    {command_name} {collection} {command_seconds * 1000:.1f} ms "
+              f"{str(body)[:DB_SLOW_LOG_COMMAND_CHARS]}")
+
+
+class DbMetricsMiddleware:
+    """ASGI middleware opening a RequestStats for each HTTP request and recording it when the response is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status_code = 500
+        responded_at: Optional[float] = None
+
+        async def send_wrapper(message):
+            nonlocal status_code, responded_at
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # background tasks run after this, their commands still count for the route
+                responded_at = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stats.finished = True
+            current_request.reset(token)
+            seconds = (responded_at or time.perf_counter()) - stats.started
+            db_metrics.record_request(scope["method"], stats.route, status_code, seconds, stats.commands)
+            if DB_SLOW_REQUEST_MS and seconds * 1000 >= DB_SLOW_REQUEST_MS:
+                _print_slow_request(scope["method"], stats, seconds)
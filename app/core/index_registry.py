@@ -0,0 +1,172 @@
+import asyncio
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from app.core.jobs import JOB_RETENTION_DAYS
+from app.core.search_index import SEARCH_FIELDS, SEARCH_KEYS
+from app.database import get_collection
+
+# 85 / 86: an index with the same name or keys but other options exists, 11000: legacy duplicates block a unique index
+_CONFLICTING_INDEX_ERRORS = (85, 86)
+_DUPLICATE_KEY_ERROR = 11000
+
+# unique indexes the app can work without, skipped with a warning when legacy duplicates block them;
+# any other unique index (sys-users.email, companies.company_name, ...) fails startup until the duplicates are fixed
+OPTIONAL_UNIQUE_INDEXES = {
+    ("counters", "company_id_1_code_1"),
+}
+
+
+def _company_indexes(*fields: str) -> list[IndexModel]:
+    return [IndexModel([("company_id", 1), (field, 1)]) for field in fields]
+
+
+# Every index the application relies on, per collection. `$lookup` foreign fields other than _id are listed
+# here too: without them each joined document scans the whole foreign collection.
+INDEXES: dict[str, list[IndexModel]] = {
+    "companies": [IndexModel("company_name", unique=True)],
+    "sys-users": [IndexModel("email", unique=True)],
+    "currencies": [IndexModel([("company_id", 1), ("country_id", 1)], unique=True)],
+    "company_mail_settings": [IndexModel([("company_id", 1), ("provider", 1)], unique=True)],
+    "company_mail_oauth_states": [IndexModel("expiresAt", expireAfterSeconds=0)],
+    "counters": [
+        # makes concurrent upserts of a new counter safe, the losing insert is retried as an update
+        IndexModel([("company_id", 1), ("code", 1)], unique=True),
+    ],
+    "jobs": [
+        IndexModel([("status", 1), ("type", 1), ("createdAt", 1)]),
+        IndexModel([("company_id", 1), ("createdAt", -1)]),
+        IndexModel("finishedAt", expireAfterSeconds=JOB_RETENTION_DAYS * 24 * 3600),
+    ],
+    "mail_messages": [
+        IndexModel([("company_id", 1), ("reference.id", 1), ("createdAt", -1)]),
+        IndexModel("dispatch_id"),
+    ],
+    "mail_send_windows": [IndexModel("expiresAt", expireAfterSeconds=0)],
+
+    # ledgers and rollups
+    "entity_balances": [
+        IndexModel([("company_id", 1), ("kind", 1), ("entity_id", 1)], unique=True),
+        IndexModel("entity_id"),
+    ],
+    "job_balances": [
+        IndexModel([("company_id", 1), ("posted", 1), ("outstanding", 1)]),
+        IndexModel([("company_id", 1), ("entity_id", 1)]),
+    ],
+    "ap_invoice_balances": [
+        IndexModel([("company_id", 1), ("posted", 1), ("outstanding", 1)]),
+        IndexModel([("company_id", 1), ("entity_id", 1)]),
+    ],
+    "stock_on_hand": [IndexModel([("company_id", 1), ("inventory_item_id", 1), ("branch", 1)], unique=True)],
+    "stock_movements": [
+        IndexModel([("company_id", 1), ("source", 1), ("lines.inventory_item_id", 1), ("branch", 1), ("date", -1)]),
+    ],
+    "job_cards_daily_stats": [
+        IndexModel([("company_id", 1), ("day", 1), ("branch", 1), ("salesman", 1), ("status", 1)], unique=True),
+    ],
+    "cashflow_daily_stats": [IndexModel([("company_id", 1), ("day", 1), ("account", 1)], unique=True)],
+    "dashboard_rollup_entries": [IndexModel([("rollup", 1), ("company_id", 1), ("rows.day", 1)])],
+
+    # job cards and their search screen
+    "job_cards": [
+        IndexModel([("company_id", 1), ("branch", 1), ("job_date", -1)]),
+        IndexModel([("company_id", 1), ("branch", 1), ("invoice_date", -1)]),
+        IndexModel([("company_id", 1), ("branch", 1), ("job_cancellation_date", -1)]),
+        IndexModel([("company_id", 1), ("branch", 1), ("date_field_to_filter", -1)]),
+        IndexModel([("company_id", 1), ("date_field_to_filter", -1)]),
+        IndexModel("job_number"),
+        IndexModel("invoice_number"),
+        IndexModel([("company_id", 1), ("customer", 1), ("job_status_1", 1)]),
+    ],
+    "job_cards_invoice_items": [IndexModel("job_card_id")],
+    "job_cards_inspection_reports": [IndexModel("job_card_id")],
+    "time_sheets": [IndexModel("job_id")],
+    "quotation_cards_invoice_items": [IndexModel("quotation_card_id")],
+    "all_receipts": [IndexModel("status"), IndexModel("account")],
+    "all_receipts_invoices": [IndexModel("job_id"), IndexModel("receipt_id")],
+    "all_payments": [IndexModel("account")],
+    "all_payments_invoices": [IndexModel("payment_id"), IndexModel("ap_invoices_id")],
+    "ap_invoices_items": [IndexModel("ap_invoice_id"), IndexModel("job_number_id"), IndexModel("received_number_id")],
+    "batch_payment_process_items": [IndexModel("batch_id")],
+
+    # inventory
+    "receiving": _company_indexes("date"),
+    "receiving_items": [IndexModel("receiving_id")],
+    "issuing": [IndexModel("converter_id")],
+    "issuing_items_details": [IndexModel("issue_id")],
+    "issuing_converters_details": [IndexModel("issue_id"), IndexModel("converter_id")],
+
+    # customers and vendors
+    "entity_information": [IndexModel([("company_id", 1), ("entity_code", 1), ("status", 1), ("entity_name", 1)])],
+    "all_lists_values": [IndexModel("list_id")],
+
+    # car trading
+    "all_trades": _company_indexes("status", "car_brand", "car_model", "specification", "engine_size",
+                                   "bought_from", "bought_by", "sold_by", "sold_to", "invested_by",
+                                   "consignment_for"),
+    "all_trades_items": [IndexModel([("trade_id", 1), ("company_id", 1)])],
+    "all_trades_purchase_agreement_items": [IndexModel([("trade_id", 1), ("company_id", 1)])],
+
+    # employees and payroll
+    "employees_address": [IndexModel("employee_id")],
+    "employees_bank_accounts": [IndexModel("employee_id")],
+    "employees_contacts_and_relatives": [IndexModel("employee_id")],
+    "employees_email": [IndexModel("employee_id")],
+    "employees_health_card": [IndexModel("employee_id")],
+    "employees_loan_and_advances": [IndexModel("employee_id")],
+    "employees_nationality": [IndexModel("employee_id")],
+    "employees_payrolls": [IndexModel("employee_id")],
+    "employees_phone": [IndexModel("employee_id")],
+    "balances": [IndexModel("company_id")],
+    "balances_based_elements": [IndexModel("balance_id")],
+    "payroll_elements_based_elements": [IndexModel("payroll_element_id")],
+    "payroll_period_details": [IndexModel("payroll_id")],
+    "payroll_runs_employees": [IndexModel("run_id")],
+    "payroll_runs_employees_elements": [
+        IndexModel("run_id"),
+        IndexModel("run_employee_id"),
+        IndexModel("payroll_element_id"),
+        IndexModel([("employee_id", 1), ("company_id", 1)]),
+        IndexModel([("element_id", 1), ("company_id", 1)]),
+    ],
+
+    "to_do_list_description": [IndexModel("to_do_list_id")],
+}
+
+# the search screens match on precomputed grams, see app.core.search_index
+for _collection_name, _fields in SEARCH_FIELDS.items():
+    INDEXES.setdefault(_collection_name, []).extend(
+        IndexModel([("company_id", 1), (f"{SEARCH_KEYS}.{field}", 1)]) for field in _fields)
+
+
+async def _ensure_collection_indexes(collection_name: str, models: list[IndexModel]) -> list[str]:
+    collection = get_collection(collection_name)
+    try:
+        # one createIndexes command per collection; existing identical indexes are a no-op
+        return await collection.create_indexes(models)
+    except OperationFailure as exc:
+        if exc.code not in (*_CONFLICTING_INDEX_ERRORS, _DUPLICATE_KEY_ERROR):
+            raise
+    created = []
+    for model in models:
+        try:
+            created.extend(await collection.create_indexes([model]))
+        except OperationFailure as exc:
+            if exc.code == _DUPLICATE_KEY_ERROR:
+                if (collection_name, model.document["name"]) not in OPTIONAL_UNIQUE_INDEXES:
+                    print(f"[indexes] {collection_name} {dict(model.document['key'])} has duplicate values, "
+                          f"remove them before starting: {exc}")
+                    raise
+            elif exc.code not in _CONFLICTING_INDEX_ERRORS:
+                raise
+            print(f"[indexes] {collection_name} {dict(model.document['key'])} skipped: {exc}")
+    return created
+
+
+async def ensure_indexes(indexes: dict[str, list[IndexModel]] = INDEXES) -> dict[str, list[str]]:
+    """Creates every registered index; safe to run on each startup. Returns the index names per collection."""
+    names = await asyncio.gather(*[
+        _ensure_collection_indexes(collection_name, models) for collection_name, models in indexes.items()
+    ])
+    return dict(zip(indexes, names))
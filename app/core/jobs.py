@@ -0,0 +1,379 @@
+import asyncio
+import os
+import shutil
+import socket
+import tempfile
+import uuid
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pymongo import ReturnDocument
+
+from app.core import security
+from app.database import get_collection
+from app.websocket_config import manager
+
+jobs_collection = get_collection("jobs")
+
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "5"))
+# a running job whose lease is not renewed (worker crashed / restarted) is requeued if its type can run again
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+# attempts of the job types registered as safe to re-run (rebuilds and reconciles)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+# uploaded inputs are spooled here, a job can only be recovered on a host that can read this directory
+JOB_FILES_DIR = os.getenv("JOB_FILES_DIR", os.path.join(tempfile.gettempdir(), "datahub_jobs"))
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+JobHandler = Callable[["JobContext"], Awaitable[Any]]
+
+_handlers: dict[str, JobHandler] = {}
+_concurrency: dict[str, int] = {}
+_max_attempts: dict[str, int] = {}
+_workers: dict[str, int] = {}
+_running: dict[ObjectId, asyncio.Task] = {}
+_tasks: set[asyncio.Task] = set()
+_poller: Optional[asyncio.Task] = None
+_shutting_down = False
+
+INTERRUPTED_ERROR = "The worker stopped while the job was running, please resubmit it"
+
+
+class JobContext:
+    """What a job handler gets: its payload, the submitting user's token data and progress reporting."""
+
+    def __init__(self, job: dict):
+        self.job_id: ObjectId = job["_id"]
+        self.job_type: str = job["type"]
+        self.payload: dict = job.get("payload") or {}
+        self.user_data: dict = job.get("user_data") or {}
+        self.files_dir: Optional[str] = job.get("files_dir")
+        self._last_progress = job.get("progress", 0)
+
+    def file_path(self, name: str) -> str:
+        if not self.files_dir:
+            raise FileNotFoundError(f"Job {self.job_id} has no input files")
+        return os.path.join(self.files_dir, name)
+
+    async def read_file(self, name: str) -> bytes:
+        return await asyncio.to_thread(_read_file, self.file_path(name))
+
+    async def report_progress(self, percent: int, message: Optional[str] = None):
+        percent = max(0, min(int(percent), 100))
+        if percent == self._last_progress and message is None:
+            return
+        self._last_progress = percent
+        update: dict[str, Any] = {"progress": percent, "updatedAt": security.now_utc()}
+        if message is not None:
+            update["message"] = message
+        await jobs_collection.update_one({"_id": self.job_id}, {"$set": update})
+        await _notify(self.user_data, {
+            "type": "job_progress",
+            "job_id": str(self.job_id),
+            "job_type": self.job_type,
+            "progress": percent,
+            "message": message,
+        })
+
+
+current_job: ContextVar[Optional[JobContext]] = ContextVar("current_job", default=None)
+
+
+async def report_job_progress(percent: int, message: Optional[str] = None):
+    """Progress hook for code that also runs outside a job (route handlers called directly)."""
+    context = current_job.get()
+    if context:
+        await context.report_progress(percent, message)
+
+
+def register_job_type(job_type: str, handler: JobHandler, concurrency: int = 1, max_attempts: int = 1):
+    """
+    Handlers are registered at import time by the route modules that own the work. An interrupted
+    job only runs again (from the start) while it has attempts left, so `max_attempts` above 1 is
+    for handlers that are safe to re-run, like rebuilds; the others fail and are resubmitted by the user.
+    """
+    _handlers[job_type] = handler
+    _concurrency[job_type] = max(concurrency, 1)
+    _max_attempts[job_type] = max(max_attempts, 1)
+    _workers.setdefault(job_type, 0)
+
+
+def _can_retry(job: dict) -> bool:
+    return job.get("attempts", 0) < _max_attempts.get(job.get("type"), 1)
+
+
+def serialize_job(job: dict) -> dict:
+    return jsonable_encoder({
+        "_id": job["_id"],
+        "type": job.get("type"),
+        "description": job.get("description", ""),
+        "status": job.get("status"),
+        "progress": job.get("progress", 0),
+        "message": job.get("message"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "attempts": job.get("attempts", 0),
+        "cancel_requested": job.get("cancel_requested", False),
+        "createdAt": job.get("createdAt"),
+        "startedAt": job.get("startedAt"),
+        "finishedAt": job.get("finishedAt"),
+    }, custom_encoder={ObjectId: str})
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _write_files(files_dir: str, files: dict[str, bytes]):
+    os.makedirs(files_dir, exist_ok=True)
+    for name, content in files.items():
+        with open(os.path.join(files_dir, name), "wb") as file:
+            file.write(content)
+
+
+def _remove_files(files_dir: Optional[str]):
+    if files_dir:
+        shutil.rmtree(files_dir, ignore_errors=True)
+
+
+async def _notify(user_data: dict, message: dict):
+    user_id = str(user_data.get("sub") or "")
+    if user_id:
+        await manager.send_to_user(user_id, message)
+
+
+def _spawn(coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coroutine)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+def _start_worker(job_type: str):
+    if _shutting_down or _workers.get(job_type, 0) >= _concurrency.get(job_type, 0):
+        return
+    _workers[job_type] += 1
+    _spawn(_work(job_type))
+
+
+async def submit_job(job_type: str, user_data: dict, payload: Optional[dict] = None,
+                     files: Optional[dict[str, bytes]] = None, description: str = "") -> dict:
+    if job_type not in _handlers:
+        raise HTTPException(status_code=400, detail=f"Unknown job type: {job_type}")
+
+    job_id = ObjectId()
+    files_dir = None
+    if files:
+        files_dir = os.path.join(JOB_FILES_DIR, str(job_id))
+        await asyncio.to_thread(_write_files, files_dir, files)
+
+    job = {
+        "_id": job_id,
+        "type": job_type,
+        "description": description,
+        "company_id": ObjectId(user_data.get("company_id")),
+        "user_id": ObjectId(user_data.get("sub")),
+        # only the identity fields of the token, the handlers call routes with it as `data`
+        "user_data": {key: user_data[key] for key in ("sub", "company_id", "role", "session_id") if key in user_data},
+        "payload": payload or {},
+        "files_dir": files_dir,
+        "status": "queued",
+        "progress": 0,
+        "attempts": 0,
+        "cancel_requested": False,
+        "createdAt": security.now_utc(),
+        "updatedAt": security.now_utc(),
+    }
+    await jobs_collection.insert_one(job)
+    _start_worker(job_type)
+    return serialize_job(job)
+
+
+async def _claim(job_type: str) -> Optional[dict]:
+    now = security.now_utc()
+    return await jobs_collection.find_one_and_update(
+        {"type": job_type, "status": "queued"},
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": WORKER_ID,
+                "startedAt": now,
+                "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                "updatedAt": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("createdAt", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _work(job_type: str):
+    try:
+        while not _shutting_down:
+            job = await _claim(job_type)
+            if not job:
+                return
+            await _run(job)
+    except Exception as error:
+        print(f"job worker {job_type} stopped: {error}")
+    finally:
+        _workers[job_type] -= 1
+
+
+async def _heartbeat(job_id: ObjectId, task: asyncio.Task):
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        job = await jobs_collection.find_one_and_update(
+            {"_id": job_id, "worker_id": WORKER_ID},
+            {"$set": {"lease_expires_at": security.now_utc() + timedelta(seconds=JOB_LEASE_SECONDS)}},
+            projection={"cancel_requested": 1},
+        )
+        if job and job.get("cancel_requested"):
+            task.cancel()
+            return
+
+
+async def _finish(job: dict, status: str, **fields):
+    now = security.now_utc()
+    await jobs_collection.update_one(
+        {"_id": job["_id"], "worker_id": WORKER_ID, "status": "running"},
+        {"$set": {"status": status, "finishedAt": now, "updatedAt": now, **fields}},
+    )
+    _remove_files(job.get("files_dir"))
+    await _notify(job.get("user_data") or {}, {
+        "type": "job_done",
+        "job_id": str(job["_id"]),
+        "job_type": job["type"],
+        "status": status,
+        "error": fields.get("error"),
+    })
+
+
+async def _run(job: dict):
+    # the handler runs in its own task so cancelling it never cancels the worker loop,
+    # the task copies the context so report_job_progress finds this job
+    context = JobContext(job)
+    token = current_job.set(context)
+    handler_task = asyncio.create_task(_handlers[job["type"]](context))
+    current_job.reset(token)
+    _running[job["_id"]] = handler_task
+    heartbeat = asyncio.create_task(_heartbeat(job["_id"], handler_task))
+    try:
+        result = await handler_task
+        await _finish(job, "succeeded", progress=100, result=result)
+    except asyncio.CancelledError:
+        if _shutting_down and _max_attempts.get(job["type"], 1) > 1:
+            # hand the job back instead of marking it cancelled, the next start runs it again
+            await jobs_collection.update_one(
+                {"_id": job["_id"], "worker_id": WORKER_ID},
+                {"$set": {"status": "queued", "worker_id": None, "updatedAt": security.now_utc()},
+                 "$inc": {"attempts": -1}},
+            )
+            raise
+        if _shutting_down:
+            await _finish(job, "failed", error=INTERRUPTED_ERROR)
+            raise
+        await _finish(job, "cancelled")
+    except HTTPException as error:
+        await _finish(job, "failed", error=str(error.detail))
+    except Exception as error:
+        await _finish(job, "failed", error=str(error))
+    finally:
+        heartbeat.cancel()
+        _running.pop(job["_id"], None)
+
+
+async def get_job(job_id: ObjectId, company_id: ObjectId) -> dict:
+    job = await jobs_collection.find_one({"_id": job_id, "company_id": company_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+async def cancel_job(job_id: ObjectId, company_id: ObjectId) -> dict:
+    now = security.now_utc()
+    job = await jobs_collection.find_one_and_update(
+        {"_id": job_id, "company_id": company_id, "status": "queued"},
+        {"$set": {"status": "cancelled", "cancel_requested": True, "finishedAt": now, "updatedAt": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if job:
+        _remove_files(job.get("files_dir"))
+        return job
+
+    job = await jobs_collection.find_one_and_update(
+        {"_id": job_id, "company_id": company_id, "status": "running"},
+        {"$set": {"cancel_requested": True, "updatedAt": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if job:
+        # other workers notice the flag on their next heartbeat
+        task = _running.get(job_id)
+        if task:
+            task.cancel()
+        return job
+
+    return await get_job(job_id, company_id)
+
+
+async def recover_jobs():
+    """Requeue running jobs whose worker stopped renewing the lease if their type can re-run, else fail them."""
+    now = security.now_utc()
+    expired_jobs = await jobs_collection.find(
+        {"status": "running", "lease_expires_at": {"$lt": now}},
+        {"type": 1, "attempts": 1, "files_dir": 1, "cancel_requested": 1},
+    ).to_list(None)
+    for job in expired_jobs:
+        expired_filter = {"_id": job["_id"], "status": "running", "lease_expires_at": {"$lt": now}}
+        if job.get("cancel_requested") or not _can_retry(job):
+            status = "cancelled" if job.get("cancel_requested") else "failed"
+            result = await jobs_collection.update_one(expired_filter, {"$set": {
+                "status": status,
+                "error": None if status == "cancelled" else INTERRUPTED_ERROR,
+                "finishedAt": now,
+                "updatedAt": now,
+            }})
+            if result.modified_count:
+                _remove_files(job.get("files_dir"))
+        else:
+            await jobs_collection.update_one(expired_filter, {"$set": {
+                "status": "queued",
+                "worker_id": None,
+                "updatedAt": now,
+            }})
+
+
+async def _poll_loop():
+    while not _shutting_down:
+        try:
+            await recover_jobs()
+            # picks up jobs submitted on a busy worker and jobs recovered from crashed ones
+            for job_type in _handlers:
+                for _ in range(_concurrency[job_type] - _workers.get(job_type, 0)):
+                    _start_worker(job_type)
+        except Exception as error:
+            print(f"job poller error: {error}")
+        await asyncio.sleep(JOBS_POLL_SECONDS)
+
+
+async def start_job_runner():
+    global _poller, _shutting_down
+    _shutting_down = False
+    _poller = asyncio.create_task(_poll_loop())
+
+
+async def stop_job_runner():
+    global _shutting_down
+    _shutting_down = True
+    if _poller:
+        _poller.cancel()
+    for task in list(_running.values()):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core import security, google_mail
+from app.database import get_collection
+
+# one document per outgoing message, so a batch can be inspected (and its failures resent) after the request
+mail_messages_collection = get_collection("mail_messages")
+# sends per mailbox and rate window, shared by every worker process
+mail_send_windows_collection = get_collection("mail_send_windows")
+
+QUEUED = "queued"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+MAIL_DISPATCH_WORKERS = int(os.getenv("MAIL_DISPATCH_WORKERS", "4"))
+# Gmail allows 250 quota units per user per second and messages.send costs 100 of them
+MAIL_SEND_RATE_PER_SECOND = float(os.getenv("MAIL_SEND_RATE_PER_SECOND", "2.5"))
+# sends are counted per window, so up to rate * window go out back to back
+MAIL_SEND_WINDOW_SECONDS = float(os.getenv("MAIL_SEND_WINDOW_SECONDS", "2"))
+MAIL_SEND_MAX_ATTEMPTS = int(os.getenv("MAIL_SEND_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "1"))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", "32"))
+# Google access tokens live one hour, they are renewed a little before that
+MAIL_ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("MAIL_ACCESS_TOKEN_TTL_SECONDS", "3000"))
+
+ProgressCallback = Optional[Callable[[int], Awaitable[Any]]]
+
+
+class MailboxRateLimiter:
+    """
+    Lets `rate` sends per second through for one mailbox, counted across every worker process.
+    Sends are counted per fixed window of `window_seconds` in mail_send_windows with $inc, a send past
+    the window's limit waits for the next one. Windows follow the wall clock so all hosts agree on them.
+    """
+
+    def __init__(self, sender: str, rate: float, window_seconds: float):
+        self.sender = sender.lower()
+        self.window_seconds = window_seconds
+        self.limit = max(int(rate * window_seconds), 1)
+
+    def _window(self, now: float) -> int:
+        return int(now // self.window_seconds)
+
+    async def _update_window(self, window: int, update: dict) -> dict:
+        # expired windows are removed by the TTL index on expiresAt
+        expires_at = datetime.fromtimestamp((window + 1) * self.window_seconds + 60, timezone.utc)
+        while True:
+            try:
+                return await mail_send_windows_collection.find_one_and_update(
+                    {"_id": f"{self.sender}:{window}"},
+                    {**update, "$setOnInsert": {"expiresAt": expires_at}},
+                    upsert=True, return_document=ReturnDocument.AFTER)
+            except DuplicateKeyError:
+                # another worker created the window first, the retry updates its document
+                continue
+
+    async def acquire(self):
+        while True:
+            now = time.time()
+            window = self._window(now)
+            counted = await self._update_window(window, {"$inc": {"count": 1}})
+            if counted["count"] <= self.limit:
+                return
+            await asyncio.sleep((window + 1) * self.window_seconds - now)
+
+    async def penalize(self, seconds: float):
+        """Fills the windows of the next `seconds` after Google reports the quota was exceeded."""
+        now = time.time()
+        for window in range(self._window(now), self._window(now + seconds) + 1):
+            await self._update_window(window, {"$max": {"count": self.limit}})
+
+
+_access_tokens: dict[str, tuple[str, float]] = {}
+_access_token_locks: dict[str, asyncio.Lock] = {}
+
+
+def _token_key(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+
+async def get_access_token(refresh_token: str, force_refresh: bool = False) -> str:
+    """Access token for the connected mailbox, refreshed only when missing, expired or rejected."""
+    key = _token_key(refresh_token)
+    lock = _access_token_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        cached = _access_tokens.get(key)
+        if cached and not force_refresh and cached[1] > time.monotonic():
+            return cached[0]
+        access_token = await asyncio.to_thread(google_mail.refresh_access_token, refresh_token)
+        _access_tokens[key] = (access_token, time.monotonic() + MAIL_ACCESS_TOKEN_TTL_SECONDS)
+        return access_token
+
+
+def forget_access_token(refresh_token: str):
+    _access_tokens.pop(_token_key(refresh_token), None)
+
+
+def is_transient_error(error: google_mail.GoogleMailError) -> bool:
+    if error.status_code == 429 or error.status_code >= 500:
+        return True
+    # Gmail answers 403 for "User-rate limit exceeded" and "Rate Limit Exceeded"
+    return error.status_code == 403 and "rate limit" in error.message.lower()
+
+
+def _retry_delay(attempt: int) -> float:
+    delay = min(MAIL_RETRY_MAX_SECONDS, MAIL_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+async def _mark(message_id: ObjectId, values: dict, inc: Optional[dict] = None) -> Optional[dict]:
+    update: dict[str, Any] = {"$set": {**values, "updatedAt": security.now_utc()}}
+    if inc:
+        update["$inc"] = inc
+    return await mail_messages_collection.find_one_and_update(
+        {"_id": message_id}, update, return_document=ReturnDocument.AFTER)
+
+
+async def _send_one(record: dict, build_raw: Callable[[dict], str], message: dict, refresh_token: str,
+                    limiter: MailboxRateLimiter) -> dict:
+    raw_message = await asyncio.to_thread(build_raw, message)
+    token_refreshed = False
+    attempt = 0
+    while True:
+        attempt += 1
+        await limiter.acquire()
+        await _mark(record["_id"], {"status": SENDING}, {"attempts": 1})
+        try:
+            access_token = await get_access_token(refresh_token)
+            response = await asyncio.to_thread(google_mail.send_raw_message, access_token, raw_message)
+            return await _mark(record["_id"], {
+                "status": SENT,
+                "provider_message_id": response.get("id"),
+                "sent_at": security.now_utc(),
+                "error": None,
+            })
+        except google_mail.GoogleMailError as error:
+            if error.status_code == 401 and not token_refreshed:
+                # the cached token was revoked or expired early, retry once with a new one
+                token_refreshed = True
+                forget_access_token(refresh_token)
+                attempt -= 1
+                continue
+            if is_transient_error(error) and attempt < MAIL_SEND_MAX_ATTEMPTS:
+                delay = _retry_delay(attempt)
+                if error.status_code in (403, 429):
+                    await limiter.penalize(delay)
+                await _mark(record["_id"], {"status": QUEUED, "error": error.message[:300]})
+                await asyncio.sleep(delay)
+                continue
+            return await _mark(record["_id"], {"status": FAILED, "error": error.message[:300]})
+
+
+async def dispatch_messages(
+        company_id: ObjectId,
+        sender: str,
+        refresh_token: str,
+        messages: list[dict],
+        build_raw: Callable[[dict], str],
+        reference: Optional[dict] = None,
+        progress: ProgressCallback = None,
+) -> list[dict]:
+    """
+    Sends `messages` from `sender` through a bounded pool of MAIL_DISPATCH_WORKERS workers, rate limited
+    per mailbox, retrying transient Google errors with backoff. `build_raw` turns a message into the
+    base64url MIME string and runs in a thread. Every message gets a mail_messages document whose status
+    follows the send; the documents are returned in the order of `messages`.
+    """
+    if not messages:
+        return []
+    # fails the whole batch up front if the mailbox connection itself is broken
+    await get_access_token(refresh_token)
+
+    dispatch_id = ObjectId()
+    now = security.now_utc()
+    records = [
+        {
+            "_id": ObjectId(),
+            "company_id": company_id,
+            "dispatch_id": dispatch_id,
+            "reference": reference or {},
+            "from": sender,
+            "to": message.get("email"),
+            "subject": message.get("subject"),
+            "metadata": message.get("metadata") or {},
+            "status": QUEUED,
+            "attempts": 0,
+            "error": None,
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        for message in messages
+    ]
+    await mail_messages_collection.insert_many(records)
+
+    # the quota is per sending mailbox, so every batch from the same mailbox counts against one limit
+    limiter = MailboxRateLimiter(sender, MAIL_SEND_RATE_PER_SECOND, MAIL_SEND_WINDOW_SECONDS)
+    queue: asyncio.Queue = asyncio.Queue()
+    for index in range(len(messages)):
+        queue.put_nowait(index)
+    results: list[Optional[dict]] = [None] * len(messages)
+    done = 0
+
+    async def worker():
+        nonlocal done
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results[index] = await _send_one(records[index], build_raw, messages[index], refresh_token, limiter)
+            except Exception as error:
+                results[index] = await _mark(records[index]["_id"], {"status": FAILED, "error": str(error)[:300]})
+            done += 1
+            if progress:
+                await progress(int(done * 100 / len(messages)))
+
+    await asyncio.gather(*[worker() for _ in range(min(MAIL_DISPATCH_WORKERS, len(messages)))])
+    return results
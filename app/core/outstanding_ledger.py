@@ -0,0 +1,386 @@
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core import security
+from app.database import get_collection
+
+job_cards_collection = get_collection("job_cards")
+job_cards_invoice_items_collection = get_collection("job_cards_invoice_items")
+receipts_invoices_collection = get_collection("all_receipts_invoices")
+ap_invoices_collection = get_collection("ap_invoices")
+ap_invoices_items_collection = get_collection("ap_invoices_items")
+ap_payment_invoices_collection = get_collection("all_payments_invoices")
+
+job_balances_collection = get_collection("job_balances")
+ap_invoice_balances_collection = get_collection("ap_invoice_balances")
+entity_balances_collection = get_collection("entity_balances")
+
+CUSTOMER = "customer"
+VENDOR = "vendor"
+
+# documents refreshed per batch by the reconciliation
+LEDGER_RECONCILE_BATCH_SIZE = int(os.getenv("LEDGER_RECONCILE_BATCH_SIZE", "500"))
+# times an entity correction is recomputed when route writes keep moving its totals
+LEDGER_RECONCILE_RETRIES = 5
+
+# summed per customer / vendor; paid_all_statuses also counts receipts / payments that are not Posted yet
+ENTITY_TOTALS = ("invoiced", "paid", "paid_all_statuses", "outstanding")
+
+_balances_by_kind = {
+    CUSTOMER: job_balances_collection,
+    VENDOR: ap_invoice_balances_collection,
+}
+
+
+def _unique_ids(ids: Iterable[Any]) -> list[ObjectId]:
+    return list(dict.fromkeys(ObjectId(i) for i in ids if i))
+
+
+async def _settlements(collection, parent_field: str, ids: list[ObjectId], settlements_from: str,
+                       settlement_field: str, date_field: str, session=None) -> dict[ObjectId, dict]:
+    # paid only counts settlements whose receipt / payment is Posted, like the aging report always did;
+    # paid_all_statuses counts every settlement line, like the customer / vendor outstanding endpoints
+    posted = {"$eq": ["$settlement.status", "Posted"]}
+    cursor = await collection.aggregate([
+        {"$match": {parent_field: {"$in": ids}}},
+        {
+            "$lookup": {
+                "from": settlements_from,
+                "let": {"settlement_id": f"${settlement_field}"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$settlement_id"]}}},
+                    {"$project": {"status": 1, date_field: 1}},
+                ],
+                "as": "settlement",
+            }
+        },
+        {"$unwind": {"path": "$settlement", "preserveNullAndEmptyArrays": True}},
+        {
+            "$group": {
+                "_id": f"${parent_field}",
+                "paid": {"$sum": {"$cond": [posted, {"$ifNull": ["$amount", 0]}, 0]}},
+                "paid_all_statuses": {"$sum": {"$ifNull": ["$amount", 0]}},
+                "last_payment_date": {"$max": {"$cond": [posted, f"$settlement.{date_field}", None]}},
+            }
+        },
+    ], session=session)
+    return {doc["_id"]: doc for doc in await cursor.to_list(None)}
+
+
+async def _line_totals(collection, parent_field: str, amount_field: str, ids: list[ObjectId],
+                       session=None) -> dict[ObjectId, float]:
+    cursor = await collection.aggregate([
+        {"$match": {parent_field: {"$in": ids}}},
+        {"$group": {"_id": f"${parent_field}", "total": {"$sum": {"$ifNull": [f"${amount_field}", 0]}}}},
+    ], session=session)
+    return {doc["_id"]: doc["total"] for doc in await cursor.to_list(None)}
+
+
+def _balance_doc(company_id, entity_id, status, document_date, invoiced, settled: Optional[dict]) -> dict:
+    paid = settled["paid"] if settled else 0
+    return {
+        "company_id": company_id,
+        "entity_id": entity_id,
+        "status": status,
+        "posted": status == "Posted",
+        "document_date": document_date,
+        "invoiced": invoiced,
+        "paid": paid,
+        "paid_all_statuses": settled["paid_all_statuses"] if settled else 0,
+        "outstanding": invoiced - paid,
+        "last_payment_date": settled["last_payment_date"] if settled else None,
+        "updatedAt": security.now_utc(),
+    }
+
+
+async def _job_balance_docs(job_ids: list[ObjectId], session=None) -> dict[ObjectId, Optional[dict]]:
+    jobs = await job_cards_collection.find(
+        {"_id": {"$in": job_ids}},
+        {"company_id": 1, "customer": 1, "job_status_1": 1, "invoice_date": 1},
+        session=session,
+    ).to_list(None)
+    invoiced = await _line_totals(job_cards_invoice_items_collection, "job_card_id", "net", job_ids, session)
+    settled = await _settlements(receipts_invoices_collection, "job_id", job_ids, "all_receipts", "receipt_id",
+                                 "receipt_date", session)
+
+    docs: dict[ObjectId, Optional[dict]] = {job_id: None for job_id in job_ids}
+    for job in jobs:
+        docs[job["_id"]] = _balance_doc(job.get("company_id"), job.get("customer"), job.get("job_status_1"),
+                                        job.get("invoice_date"), invoiced.get(job["_id"], 0),
+                                        settled.get(job["_id"]))
+    return docs
+
+
+async def _ap_invoice_balance_docs(invoice_ids: list[ObjectId], session=None) -> dict[ObjectId, Optional[dict]]:
+    invoices = await ap_invoices_collection.find(
+        {"_id": {"$in": invoice_ids}},
+        {"company_id": 1, "vendor": 1, "status": 1, "invoice_date": 1},
+        session=session,
+    ).to_list(None)
+    invoiced = await _line_totals(ap_invoices_items_collection, "ap_invoice_id", "amount", invoice_ids, session)
+    settled = await _settlements(ap_payment_invoices_collection, "ap_invoices_id", invoice_ids, "all_payments",
+                                 "payment_id", "payment_date", session)
+
+    docs: dict[ObjectId, Optional[dict]] = {invoice_id: None for invoice_id in invoice_ids}
+    for invoice in invoices:
+        docs[invoice["_id"]] = _balance_doc(invoice.get("company_id"), invoice.get("vendor"), invoice.get("status"),
+                                            invoice.get("invoice_date"), invoiced.get(invoice["_id"], 0),
+                                            settled.get(invoice["_id"]))
+    return docs
+
+
+def _contribution(doc: Optional[dict]) -> Optional[tuple[tuple, float, float, float]]:
+    # only posted documents count towards the customer / vendor balance
+    if not doc or not doc.get("posted") or not doc.get("entity_id"):
+        return None
+    return ((doc.get("company_id"), doc["entity_id"]), doc.get("invoiced") or 0, doc.get("paid") or 0,
+            doc.get("paid_all_statuses") or 0)
+
+
+async def _swap_balances(kind: str, docs: dict[ObjectId, Optional[dict]], session=None) -> int:
+    """
+    Replaces each document balance atomically and moves the difference between the old and the
+    new balance onto the entity balance, so entity totals never need a full recompute.
+    """
+    balances_collection = _balances_by_kind[kind]
+    deltas: dict[tuple, dict] = {}
+    changed = 0
+
+    def add(doc: Optional[dict], sign: int, old: Optional[dict] = None):
+        contribution = _contribution(doc)
+        if not contribution:
+            return
+        key, invoiced, paid, paid_all_statuses = contribution
+        delta = deltas.setdefault(key, {"invoiced": 0, "paid": 0, "paid_all_statuses": 0, "last_payment_date": None})
+        delta["invoiced"] += sign * invoiced
+        delta["paid"] += sign * paid
+        delta["paid_all_statuses"] += sign * paid_all_statuses
+        last_payment_date = doc.get("last_payment_date")
+        if sign > 0 and last_payment_date and last_payment_date != (old or {}).get("last_payment_date"):
+            delta["last_payment_date"] = max(filter(None, [delta["last_payment_date"], last_payment_date]))
+
+    for doc_id, doc in docs.items():
+        if doc is None:
+            old = await balances_collection.find_one_and_delete({"_id": doc_id}, session=session)
+        else:
+            old = await balances_collection.find_one_and_update(
+                {"_id": doc_id},
+                {"$set": doc},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+                session=session,
+            )
+        if _contribution(old) != _contribution(doc):
+            changed += 1
+        add(old, -1)
+        add(doc, 1, old)
+
+    for (company_id, entity_id), delta in deltas.items():
+        if (abs(delta["invoiced"]) < 1e-9 and abs(delta["paid"]) < 1e-9 and abs(delta["paid_all_statuses"]) < 1e-9
+                and not delta["last_payment_date"]):
+            continue
+        update: dict[str, Any] = {
+            "$inc": {
+                "invoiced": delta["invoiced"],
+                "paid": delta["paid"],
+                "paid_all_statuses": delta["paid_all_statuses"],
+                "outstanding": delta["invoiced"] - delta["paid"],
+            },
+            "$set": {"updatedAt": security.now_utc()},
+        }
+        if delta["last_payment_date"]:
+            update["$max"] = {"last_payment_date": delta["last_payment_date"]}
+        await entity_balances_collection.update_one(
+            {"company_id": company_id, "kind": kind, "entity_id": entity_id},
+            update,
+            upsert=True,
+            session=session,
+        )
+    return changed
+
+
+async def refresh_job_balances(job_ids: Iterable[Any], session=None) -> int:
+    """Call after any write to a job card, its invoice items or the receipts paying it (same session)."""
+    job_ids = _unique_ids(job_ids)
+    if not job_ids:
+        return 0
+    return await _swap_balances(CUSTOMER, await _job_balance_docs(job_ids, session), session)
+
+
+async def refresh_ap_invoice_balances(invoice_ids: Iterable[Any], session=None) -> int:
+    """Call after any write to an AP invoice, its items or the payments settling it (same session)."""
+    invoice_ids = _unique_ids(invoice_ids)
+    if not invoice_ids:
+        return 0
+    return await _swap_balances(VENDOR, await _ap_invoice_balance_docs(invoice_ids, session), session)
+
+
+async def receipt_job_ids(receipt_ids: Iterable[Any], session=None) -> list[ObjectId]:
+    return await receipts_invoices_collection.distinct(
+        "job_id", {"receipt_id": {"$in": _unique_ids(receipt_ids)}}, session=session)
+
+
+async def payment_invoice_ids(payment_ids: Iterable[Any], session=None) -> list[ObjectId]:
+    return await ap_payment_invoices_collection.distinct(
+        "ap_invoices_id", {"payment_id": {"$in": _unique_ids(payment_ids)}}, session=session)
+
+
+async def get_entity_outstanding(company_id: ObjectId, kind: str, entity_id: ObjectId) -> float:
+    """Posted invoices minus every receipt / payment line against them, Posted or not."""
+    balance = await entity_balances_collection.find_one(
+        {"company_id": company_id, "kind": kind, "entity_id": entity_id}, {"invoiced": 1, "paid_all_statuses": 1})
+    return (balance.get("invoiced") or 0) - (balance.get("paid_all_statuses") or 0) if balance else 0
+
+
+async def get_paid_by_job(job_ids: list[ObjectId]) -> dict[ObjectId, float]:
+    if not job_ids:
+        return {}
+    balances = await job_balances_collection.find({"_id": {"$in": job_ids}}, {"paid": 1}).to_list(None)
+    return {balance["_id"]: balance.get("paid") or 0 for balance in balances}
+
+
+ProgressCallback = Optional[Callable[[int], Awaitable[Any]]]
+
+
+async def _reconcile_documents(kind: str, source_collection, company_id: ObjectId, refresh,
+                               progress: ProgressCallback, progress_from: int, progress_to: int) -> dict:
+    balances_collection = _balances_by_kind[kind]
+    total = await source_collection.count_documents({"company_id": company_id})
+    seen: set[ObjectId] = set()
+    batch: list[ObjectId] = []
+    changed = 0
+
+    async def flush():
+        nonlocal changed, batch
+        changed += await refresh(batch)
+        seen.update(batch)
+        batch = []
+        if progress and total:
+            await progress(progress_from + (progress_to - progress_from) * len(seen) // total)
+
+    async for doc in source_collection.find({"company_id": company_id}, {"_id": 1}):
+        batch.append(doc["_id"])
+        if len(batch) >= LEDGER_RECONCILE_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    # balances whose job / invoice no longer exists are dropped by the refresh
+    orphans = [
+        doc["_id"]
+        async for doc in balances_collection.find({"company_id": company_id}, {"_id": 1})
+        if doc["_id"] not in seen
+    ]
+    for start in range(0, len(orphans), LEDGER_RECONCILE_BATCH_SIZE):
+        changed += await refresh(orphans[start:start + LEDGER_RECONCILE_BATCH_SIZE])
+
+    return {"documents": len(seen), "changed_documents": changed, "removed_documents": len(orphans)}
+
+
+async def _expected_entity_totals(kind: str, company_id: ObjectId,
+                                  entity_id: Optional[ObjectId] = None) -> dict[ObjectId, dict]:
+    cursor = await _balances_by_kind[kind].aggregate([
+        {"$match": {"company_id": company_id, "posted": True, "entity_id": entity_id or {"$ne": None}}},
+        {
+            "$group": {
+                "_id": "$entity_id",
+                "invoiced": {"$sum": "$invoiced"},
+                "paid": {"$sum": "$paid"},
+                "paid_all_statuses": {"$sum": "$paid_all_statuses"},
+                "last_payment_date": {"$max": "$last_payment_date"},
+            }
+        },
+    ])
+    expected = {}
+    for doc in await cursor.to_list(None):
+        doc["outstanding"] = doc["invoiced"] - doc["paid"]
+        expected[doc["_id"]] = doc
+    return expected
+
+
+async def _correct_entity(kind: str, company_id: ObjectId, entity_id: ObjectId, have: Optional[dict],
+                          want: dict) -> Optional[bool]:
+    """
+    Moves the entity totals from `have` to `want` with $inc, only if they still hold `have`, so route
+    writes that $inc the same document are never overwritten. None when the totals moved meanwhile.
+    """
+    if have and all(_same(have.get(field), want[field]) for field in (*ENTITY_TOTALS, "last_payment_date")):
+        return False
+    now = security.now_utc()
+    if not have:
+        try:
+            await entity_balances_collection.insert_one({
+                "company_id": company_id, "kind": kind, "entity_id": entity_id,
+                **{field: want[field] for field in (*ENTITY_TOTALS, "last_payment_date")}, "updatedAt": now,
+            })
+        except DuplicateKeyError:
+            return None
+        return True
+    result = await entity_balances_collection.update_one(
+        {"_id": have["_id"], **{field: have.get(field) for field in ENTITY_TOTALS}},
+        {
+            "$inc": {field: want[field] - (have.get(field) or 0) for field in ENTITY_TOTALS},
+            "$set": {"last_payment_date": want["last_payment_date"], "updatedAt": now},
+        },
+    )
+    return True if result.matched_count else None
+
+
+async def _reconcile_entities(kind: str, company_id: ObjectId) -> int:
+    """Brings the entity totals back to the sum of their document balances, fixing any drift."""
+    # totals are read before the balances they are compared with, a write in between fails the guard
+    current = {
+        doc["entity_id"]: doc
+        for doc in await entity_balances_collection.find({"company_id": company_id, "kind": kind}).to_list(None)
+    }
+    expected = await _expected_entity_totals(kind, company_id)
+    empty = {**{field: 0 for field in ENTITY_TOTALS}, "last_payment_date": None}
+
+    corrected = 0
+    for entity_id in set(expected) | set(current):
+        have, want = current.get(entity_id), expected.get(entity_id) or empty
+        for _ in range(LEDGER_RECONCILE_RETRIES):
+            result = await _correct_entity(kind, company_id, entity_id, have, want)
+            if result is not None:
+                corrected += result
+                break
+            have = await entity_balances_collection.find_one(
+                {"company_id": company_id, "kind": kind, "entity_id": entity_id})
+            want = (await _expected_entity_totals(kind, company_id, entity_id)).get(entity_id) or empty
+        else:
+            print(f"[outstanding ledger] {kind} {entity_id} kept changing, left for the next reconcile")
+    return corrected
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) < 0.005
+    if isinstance(a, datetime) and isinstance(b, datetime):
+        return a.replace(tzinfo=None) == b.replace(tzinfo=None)
+    return a == b
+
+
+async def reconcile_outstanding_ledger(company_id: ObjectId, progress: ProgressCallback = None) -> dict:
+    """
+    Rebuilds every job / AP invoice balance of the company from the source collections and
+    corrects the customer / vendor totals with guarded increments, so it can run beside route writes.
+    """
+    jobs = await _reconcile_documents(CUSTOMER, job_cards_collection, company_id, refresh_job_balances, progress,
+                                      0, 45)
+    invoices = await _reconcile_documents(VENDOR, ap_invoices_collection, company_id, refresh_ap_invoice_balances,
+                                          progress, 45, 90)
+    customers = await _reconcile_entities(CUSTOMER, company_id)
+    vendors = await _reconcile_entities(VENDOR, company_id)
+    if progress:
+        await progress(100)
+    return {
+        "job_cards": jobs,
+        "ap_invoices": invoices,
+        "corrected_customers": customers,
+        "corrected_vendors": vendors,
+    }
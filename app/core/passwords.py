@@ -0,0 +1,77 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+from passlib.context import CryptContext
+
+from app.core.security import pwd_ctx
+
+# argon2-cffi releases the GIL while hashing, so threads use every core without pickling to a process pool;
+# the bound also caps the memory argon2 allocates per hash (memory_cost) during a login burst
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+
+
+class PasswordHasher:
+    """
+    Runs the CPU- and memory-hard password hashing of `context` in a bounded thread pool, so a login
+    burst queues for the hashing threads instead of stalling every request on the event loop.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int = PASSWORD_HASH_WORKERS):
+        self.context = context
+        self.max_workers = max(max_workers, 1)
+        self.stats = {"hashed": 0, "verified": 0, "rehashed": 0, "in_flight": 0, "max_ms": 0.0}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password")
+        return self._executor
+
+    async def _run(self, func: Callable, *args):
+        self.stats["in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), partial(func, *args))
+        finally:
+            self.stats["in_flight"] -= 1
+            self.stats["max_ms"] = max(self.stats["max_ms"], (time.perf_counter() - started) * 1000)
+
+    async def hash(self, password: str) -> str:
+        result = await self._run(self.context.hash, password)
+        self.stats["hashed"] += 1
+        return result
+
+    async def verify(self, password: str, hashed: Optional[str]) -> bool:
+        if not hashed:
+            return False
+        result = await self._run(self.context.verify, password, hashed)
+        self.stats["verified"] += 1
+        return result
+
+    async def verify_and_update(self, password: str, hashed: Optional[str]) -> tuple[bool, Optional[str]]:
+        """
+        Verifies like `verify`; when the hash was made with a deprecated scheme or older argon2
+        parameters the second value is a new hash of the password to store, otherwise None.
+        """
+        if not hashed:
+            return False, None
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed)
+        self.stats["verified"] += 1
+        if new_hash:
+            self.stats["rehashed"] += 1
+        return valid, new_hash
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "max_ms": round(self.stats["max_ms"], 1), "workers": self.max_workers}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(pwd_ctx)
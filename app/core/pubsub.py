@@ -0,0 +1,170 @@
+import asyncio
+import os
+import socket
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from app.database import db
+
+# "memory" delivers events inside this process only, "mongo" shares them between workers / nodes
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory")
+PUBSUB_COLLECTION = os.getenv("PUBSUB_COLLECTION", "realtime_events")
+PUBSUB_CAPPED_BYTES = int(os.getenv("PUBSUB_CAPPED_BYTES", str(64 * 1024 * 1024)))
+# how far back a re-opened tail reads, events already delivered are skipped by id
+PUBSUB_REPLAY_SECONDS = int(os.getenv("PUBSUB_REPLAY_SECONDS", "5"))
+PUBSUB_RECENT_IDS = 10000
+# pause before re-opening a tail that ended without events, doubled each time up to the max
+PUBSUB_RETRY_SECONDS = 0.5
+PUBSUB_MAX_RETRY_SECONDS = float(os.getenv("PUBSUB_MAX_RETRY_SECONDS", "10"))
+HEARTBEAT = "heartbeat"
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+EventHandler = Callable[[dict], None]
+
+
+class InMemoryPubSub:
+    """Single process: a published event goes straight to the local handler."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._handler: Optional[EventHandler] = None
+
+    def subscribe(self, handler: EventHandler):
+        self._handler = handler
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, event: dict):
+        if self._handler:
+            self._handler(event)
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MongoPubSub:
+    """
+    Events are inserted into a capped collection that every worker tails with an awaitable cursor.
+    The publishing worker delivers its own events immediately and skips them in the tail. Capped
+    collections work on standalone servers too, unlike change streams.
+    """
+
+    name = "mongo"
+
+    def __init__(self, collection_name: str = PUBSUB_COLLECTION, capped_bytes: int = PUBSUB_CAPPED_BYTES):
+        self.collection_name = collection_name
+        self.capped_bytes = capped_bytes
+        self.collection = db[collection_name]
+        self._handler: Optional[EventHandler] = None
+        self._task: Optional[asyncio.Task] = None
+        self._recent_ids: deque = deque(maxlen=PUBSUB_RECENT_IDS)
+        self._recent_set: set = set()
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+
+    def subscribe(self, handler: EventHandler):
+        self._handler = handler
+
+    async def _ensure_collection(self):
+        try:
+            await db.create_collection(self.collection_name, capped=True, size=self.capped_bytes)
+        except CollectionInvalid:
+            pass
+
+    async def start(self):
+        await self._ensure_collection()
+        if self._task is None:
+            start_after = ObjectId.from_datetime(datetime.now(timezone.utc))
+            # a tailable query that matches nothing ends at once, so give the tail a first match
+            try:
+                await self.collection.insert_one({"_id": ObjectId(), "kind": HEARTBEAT, "origin": WORKER_ID})
+            except PyMongoError as error:
+                print(f"[pubsub] heartbeat not published: {error}")
+            self._task = asyncio.create_task(self._tail(start_after))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _remember(self, event_id: ObjectId) -> bool:
+        if event_id in self._recent_set:
+            return False
+        if len(self._recent_ids) == self._recent_ids.maxlen:
+            self._recent_set.discard(self._recent_ids[0])
+        self._recent_ids.append(event_id)
+        self._recent_set.add(event_id)
+        return True
+
+    async def publish(self, event: dict):
+        event = {**event, "_id": ObjectId(), "origin": WORKER_ID}
+        self._remember(event["_id"])
+        if self._handler:
+            self._handler(event)
+        try:
+            await self.collection.insert_one(event)
+            self.published += 1
+        except PyMongoError as error:
+            # the local sockets already have it; other workers miss this event
+            self.errors += 1
+            print(f"[pubsub] event not published: {error}")
+
+    async def _tail(self, start_after: ObjectId):
+        last_seen = start_after.generation_time
+        retry_seconds = PUBSUB_RETRY_SECONDS
+        while True:
+            received = False
+            try:
+                cursor = self.collection.find(
+                    {"_id": {"$gt": start_after}},
+                    cursor_type=CursorType.TAILABLE_AWAIT,
+                ).max_await_time_ms(1000)
+                while cursor.alive:
+                    async for event in cursor:
+                        received = True
+                        last_seen = max(last_seen, event["_id"].generation_time)
+                        if event.get("kind") == HEARTBEAT or event.get("origin") == WORKER_ID \
+                                or not self._remember(event["_id"]):
+                            continue
+                        self.received += 1
+                        if self._handler:
+                            try:
+                                self._handler(event)
+                            except Exception as error:
+                                print(f"[pubsub] event not delivered: {error}")
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as error:
+                self.errors += 1
+                print(f"[pubsub] tail restarted: {error}")
+            # a lost position ends the cursor, start again a little earlier; back off while nothing matches
+            retry_seconds = PUBSUB_RETRY_SECONDS if received else min(retry_seconds * 2, PUBSUB_MAX_RETRY_SECONDS)
+            await asyncio.sleep(retry_seconds)
+            start_after = ObjectId.from_datetime(last_seen - timedelta(seconds=PUBSUB_REPLAY_SECONDS))
+
+    def stats(self) -> dict:
+        return {"published": self.published, "received": self.received, "errors": self.errors,
+                "tailing": self._task is not None and not self._task.done()}
+
+
+def create_pubsub(backend: str = PUBSUB_BACKEND):
+    if backend == "mongo":
+        return MongoPubSub()
+    return InMemoryPubSub()
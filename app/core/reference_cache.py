@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from bson import ObjectId
+
+from app.websocket_config import manager
+
+# seconds a cached reference document stays valid, per collection
+REFERENCE_TTL_SECONDS = {
+    "all_brands": 600,
+    "all_brand_models": 600,
+    "all_countries": 3600,
+    "all_countries_cities": 3600,
+    "all_lists_values": 300,
+    "branches": 300,
+    "currencies": 300,
+}
+DEFAULT_TTL_SECONDS = 300
+MAX_ENTRIES = 20000
+
+CacheKey = tuple[str, Optional[ObjectId], ObjectId]
+
+
+class ReferenceCache:
+    """
+    Process-local LRU cache for small reference collections (brands, models, countries, ...).
+    Entries are keyed by (collection, company_id, _id) and expire after the collection's TTL.
+    Cached documents are shared between requests, callers must treat them as read-only.
+    Invalidations go through invalidate_reference so every worker drops its copy.
+    """
+
+    def __init__(self, ttl_seconds: dict[str, float], default_ttl: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[CacheKey, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, collection: str, company_id: Optional[ObjectId], _id: ObjectId) -> Optional[dict]:
+        key = (collection, company_id, _id)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, doc = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return doc
+
+    def set(self, collection: str, company_id: Optional[ObjectId], _id: ObjectId, doc: dict):
+        ttl = self.ttl_seconds.get(collection, self.default_ttl)
+        key = (collection, company_id, _id)
+        self._entries[key] = (time.monotonic() + ttl, doc)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, collection: str, _id: Any = None, company_id: Any = None):
+        """Drop one document (any company), one company's documents, or the whole collection."""
+        _id = ObjectId(_id) if _id is not None and ObjectId.is_valid(str(_id)) else None
+        company_id = ObjectId(company_id) if company_id and ObjectId.is_valid(str(company_id)) else None
+        for key in list(self._entries):
+            key_collection, key_company_id, key_id = key
+            if key_collection != collection:
+                continue
+            if _id is not None and key_id != _id:
+                continue
+            if _id is None and company_id is not None and key_company_id != company_id:
+                continue
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+reference_cache = ReferenceCache(REFERENCE_TTL_SECONDS)
+
+
+async def lookup_reference_docs(collection, ids: Iterable[ObjectId],
+                                company_id: Optional[ObjectId] = None) -> dict[ObjectId, dict]:
+    """Resolve reference documents by _id, reading only the ids missing from the cache."""
+    found: dict[ObjectId, dict] = {}
+    missing: list[ObjectId] = []
+    for _id in ids:
+        doc = reference_cache.get(collection.name, company_id, _id)
+        if doc is None:
+            missing.append(_id)
+        else:
+            found[_id] = doc
+
+    if missing:
+        docs = await collection.find({"_id": {"$in": missing}}).to_list(length=None)
+        for doc in docs:
+            reference_cache.set(collection.name, company_id, doc["_id"], doc)
+            found[doc["_id"]] = doc
+
+    return found
+
+
+def _evict_references(event: dict):
+    reference_cache.invalidate(event["collection"], _id=event.get("_id"), company_id=event.get("company_id"))
+
+
+manager.on_event("reference_invalidate", _evict_references)
+
+
+async def invalidate_reference(collection_name: str, _id: Any = None, company_id: Any = None):
+    """Drop cached reference documents on every worker, see ReferenceCache.invalidate."""
+    await manager.publish_event("reference_invalidate", collection=collection_name,
+                                _id=str(_id) if _id is not None else None,
+                                company_id=str(company_id) if company_id else None)
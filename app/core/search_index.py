@@ -0,0 +1,108 @@
+import os
+import re
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.database import get_collection
+
+# normalized search keys live next to the searched fields: {"search_keys": {"<field>": [...]}}
+SEARCH_KEYS = "search_keys"
+
+# every edge n-gram of every word: "Al Futtaim" is found by "al", "fut", "al futt"
+PREFIX = "prefix"
+# every substring of the whole value: codes and numbers found by any part, like "RE-00" or "4521"
+INFIX = "infix"
+
+SEARCH_MAX_GRAM_LENGTH = int(os.getenv("SEARCH_MAX_GRAM_LENGTH", "16"))
+# infix keys grow with the square of the length, longer values are indexed on their first characters
+SEARCH_MAX_INFIX_LENGTH = int(os.getenv("SEARCH_MAX_INFIX_LENGTH", "40"))
+SEARCH_REBUILD_BATCH_SIZE = int(os.getenv("SEARCH_REBUILD_BATCH_SIZE", "1000"))
+
+SEARCH_FIELDS: dict[str, dict[str, str]] = {
+    "entity_information": {"entity_name": PREFIX},
+    "inventory_items": {"code": INFIX, "name": PREFIX},
+    "receiving": {"receiving_number": INFIX, "reference_number": INFIX},
+    "job_cards": {"lpo_number": INFIX, "vehicle_identification_number": INFIX},
+}
+
+ProgressCallback = Optional[Callable[[int], Awaitable[Any]]]
+
+_word_pattern = re.compile(r"\w+")
+
+
+def normalize_search_text(value: Any) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).casefold().split())
+
+
+def search_grams(mode: str, value: Any) -> list[str]:
+    text = normalize_search_text(value)
+    if mode == PREFIX:
+        grams = (word[:length] for word in _word_pattern.findall(text)
+                 for length in range(1, min(len(word), SEARCH_MAX_GRAM_LENGTH) + 1))
+    else:
+        text = text[:SEARCH_MAX_INFIX_LENGTH]
+        grams = (text[start:start + length] for start in range(len(text))
+                 for length in range(1, min(len(text) - start, SEARCH_MAX_GRAM_LENGTH) + 1))
+    return list(dict.fromkeys(grams))
+
+
+def set_search_keys(collection_name: str, doc: dict) -> dict:
+    """Adds the search keys of a document about to be inserted (or fully replaced)."""
+    doc[SEARCH_KEYS] = {field: search_grams(mode, doc.get(field))
+                        for field, mode in SEARCH_FIELDS[collection_name].items()}
+    return doc
+
+
+def search_keys_update(collection_name: str, values: dict) -> dict:
+    """$set entries for the search keys of the fields present in a partial update."""
+    return {f"{SEARCH_KEYS}.{field}": search_grams(mode, values.get(field))
+            for field, mode in SEARCH_FIELDS[collection_name].items() if field in values}
+
+
+def search_match(collection_name: str, field: str, text: Any) -> dict:
+    """
+    Match conditions for a case-insensitive "contains" search on a configured field, using
+    its indexed keys. Terms longer than the indexed keys are also checked on the field itself.
+    """
+    mode = SEARCH_FIELDS[collection_name][field]
+    normalized = normalize_search_text(text)
+    terms = _word_pattern.findall(normalized) if mode == PREFIX else [normalized] if normalized else []
+    match: dict[str, Any] = {}
+    if terms:
+        match[f"{SEARCH_KEYS}.{field}"] = {"$all": list(dict.fromkeys(term[:SEARCH_MAX_GRAM_LENGTH]
+                                                                      for term in terms))}
+    long_terms = [term for term in terms if len(term) > SEARCH_MAX_GRAM_LENGTH]
+    if long_terms or not terms:
+        match[field] = {"$all": [re.compile(re.escape(term), re.IGNORECASE)
+                                 for term in long_terms or [str(text).strip()]]}
+    return match
+
+
+async def rebuild_search_keys(company_id: ObjectId, collection_names: Optional[Iterable[str]] = None,
+                              progress: ProgressCallback = None) -> dict:
+    """Recomputes the search keys of every document of the company, for documents written by imports."""
+    collection_names = list(collection_names or SEARCH_FIELDS)
+    rebuilt = {}
+    for index, collection_name in enumerate(collection_names):
+        collection = get_collection(collection_name)
+        fields = SEARCH_FIELDS[collection_name]
+        operations = []
+        count = 0
+        async for doc in collection.find({"company_id": company_id}, {field: 1 for field in fields}):
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": search_keys_update(collection_name, {
+                field: doc.get(field) for field in fields})}))
+            if len(operations) >= SEARCH_REBUILD_BATCH_SIZE:
+                await collection.bulk_write(operations, ordered=False)
+                count += len(operations)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            count += len(operations)
+        rebuilt[collection_name] = count
+        if progress:
+            await progress(int((index + 1) * 100 / len(collection_names)))
+    return rebuilt
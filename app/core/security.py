@@ -1,4 +1,4 @@
-import os, hashlib, uuid
+import os, hashlib, time, uuid
 from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 from fastapi import Header, HTTPException, status
@@ -6,15 +6,22 @@ from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from app.database import get_collection
+from app.websocket_config import manager
 
 ACCESS_SECRET = str(os.getenv("ACCESS_SECRET_KEY"))
 REFRESH_SECRET = str(os.getenv("REFRESH_SECRET_KEY"))
 ALGORITHM = "HS256"
 ACCESS_TTL_MIN = int(os.getenv("ACCESS_TTL_MIN", "60"))
 REFRESH_TTL_DAYS = int(os.getenv("REFRESH_TTL_DAYS", "60"))
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "15"))
+SESSION_CACHE_MAX_ENTRIES = 10000
 pwd_ctx = CryptContext(schemes=["argon2"], deprecated="auto")
 users_collection = get_collection("sys-users")
 
+# (user_id, company_id) -> (expires_at, session state), filled by get_current_user
+_session_state_cache: dict[tuple[ObjectId, ObjectId], tuple[float, dict]] = {}
+session_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
 
 def now_utc():
     return datetime.now(timezone.utc) + timedelta(hours=4)
@@ -96,27 +103,47 @@ def get_password_hash(password):
     return pwd_ctx.hash(password)
 
 
-async def get_current_user(authorization: str = Header(...)):
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authorization header")
+def _evict_session_states(event: dict):
+    user_id = ObjectId(event["user_id"]) if ObjectId.is_valid(str(event.get("user_id"))) else None
+    company_id = ObjectId(event["company_id"]) if ObjectId.is_valid(str(event.get("company_id"))) else None
+    if user_id is None and company_id is None:
+        return
+    for key in list(_session_state_cache):
+        if (user_id is None or key[0] == user_id) and (company_id is None or key[1] == company_id):
+            _session_state_cache.pop(key, None)
+            session_cache_stats["invalidations"] += 1
 
-    token = authorization.split(" ")[1]
 
-    # Use your existing decode method
-    payload = decode_access_token(token)
+manager.on_event("session_invalidate", _evict_session_states)
 
-    if payload is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
 
-    if payload.get("type") != "access":
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token type")
+async def invalidate_session_state(user_id, company_id=None):
+    """Drop cached session state on every worker so the next request re-reads the user document."""
+    if not ObjectId.is_valid(str(user_id)):
+        return
+    await manager.publish_event("session_invalidate", user_id=str(user_id),
+                                company_id=str(company_id) if company_id else None)
 
-    try:
-        user_id = ObjectId(str(payload.get("sub", "")))
-        company_id = ObjectId(str(payload.get("company_id", "")))
-    except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token identity")
 
+async def invalidate_company_session_states(company_id):
+    if not ObjectId.is_valid(str(company_id)):
+        return
+    await manager.publish_event("session_invalidate", user_id=None, company_id=str(company_id))
+
+
+def get_session_cache_stats() -> dict:
+    return {**session_cache_stats, "entries": len(_session_state_cache), "ttl_seconds": SESSION_CACHE_TTL_SECONDS}
+
+
+async def _get_session_state(user_id: ObjectId, company_id: ObjectId) -> tuple[dict | None, bool]:
+    """The user's session fields and whether they came from the cache."""
+    key = (user_id, company_id)
+    cached = _session_state_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        session_cache_stats["hits"] += 1
+        return cached[1], True
+
+    session_cache_stats["misses"] += 1
     user = await users_collection.find_one(
         {"_id": user_id, "company_id": company_id},
         {
@@ -126,20 +153,65 @@ async def get_current_user(authorization: str = Header(...)):
             "revoked_access_jtis": 1,
         },
     )
+    if user and SESSION_CACHE_TTL_SECONDS > 0:
+        if len(_session_state_cache) >= SESSION_CACHE_MAX_ENTRIES:
+            now = time.monotonic()
+            for stale_key in [k for k, v in _session_state_cache.items() if v[0] <= now]:
+                _session_state_cache.pop(stale_key, None)
+            if len(_session_state_cache) >= SESSION_CACHE_MAX_ENTRIES:
+                _session_state_cache.clear()
+        _session_state_cache[key] = (time.monotonic() + SESSION_CACHE_TTL_SECONDS, user)
+    return user, False
+
+
+def _session_rejection(payload: dict, user: dict | None) -> str | None:
     if not user or not user.get("status", False):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User session is inactive")
+        return "User session is inactive"
 
     token_version = int(payload.get("session_version", 0) or 0)
     current_version = int(user.get("session_version", 0) or 0)
     if token_version != current_version:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User session was revoked")
+        return "User session was revoked"
 
     session_id = str(payload.get("session_id", "") or "")
     if session_id and session_id in user.get("revoked_session_ids", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Device session was revoked")
+        return "Device session was revoked"
 
     access_jti = str(payload.get("jti", "") or "")
     if access_jti and access_jti in user.get("revoked_access_jtis", []):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Device access was revoked")
+        return "Device access was revoked"
+    return None
+
+
+async def get_current_user(authorization: str = Header(...)):
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authorization header")
+
+    token = authorization.split(" ")[1]
+
+    # Use your existing decode method
+    payload = decode_access_token(token)
+
+    if payload is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+
+    if payload.get("type") != "access":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token type")
+
+    try:
+        user_id = ObjectId(str(payload.get("sub", "")))
+        company_id = ObjectId(str(payload.get("company_id", "")))
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token identity")
+
+    user, cached = await _get_session_state(user_id, company_id)
+    rejection = _session_rejection(payload, user)
+    if rejection and cached:
+        # the cached state may predate a new login, only the user document can reject the token
+        _session_state_cache.pop((user_id, company_id), None)
+        user, _ = await _get_session_state(user_id, company_id)
+        rejection = _session_rejection(payload, user)
+    if rejection:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=rejection)
 
     return payload
@@ -0,0 +1,306 @@
+import os
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.core import security
+from app.database import get_collection
+
+receiving_collection = get_collection("receiving")
+receiving_items_collection = get_collection("receiving_items")
+issuing_collection = get_collection("issuing")
+issuing_items_details_collection = get_collection("issuing_items_details")
+
+# one document per posted receiving / issuing with the quantity and cost of each of its lines
+stock_movements_collection = get_collection("stock_movements")
+# per (company, inventory item, branch) perpetual totals, moved by the delta of each movement change
+stock_on_hand_collection = get_collection("stock_on_hand")
+
+RECEIVING = "receiving"
+ISSUING = "issuing"
+
+STOCK_KEY_FIELDS = ("company_id", "inventory_item_id", "branch")
+STOCK_VALUE_FIELDS = ("received_quantity", "received_value", "issued_quantity", "on_hand")
+
+STOCK_REBUILD_BATCH_SIZE = int(os.getenv("STOCK_REBUILD_BATCH_SIZE", "500"))
+# times a stock on hand correction is recomputed when route writes keep moving the totals
+STOCK_CORRECTION_RETRIES = 5
+
+ProgressCallback = Optional[Callable[[int], Awaitable[Any]]]
+
+
+def _unique_ids(ids: Iterable[Any]) -> list[ObjectId]:
+    return list(dict.fromkeys(ObjectId(i) for i in ids if i))
+
+
+def _receiving_lines(receiving: dict, items: list[dict]) -> list[dict]:
+    """
+    Landed unit cost of every line in local currency: net price plus its share of shipping,
+    handling and other charges, minus its share of the header discount, times the rate, plus VAT.
+    """
+    items_total = sum(((item.get("original_price") or 0) - (item.get("discount") or 0)) * (item.get("quantity") or 0)
+                      for item in items)
+    overhead = (receiving.get("shipping") or 0) + (receiving.get("handling") or 0) + (receiving.get("other") or 0)
+    global_discount = receiving.get("amount") or 0
+    rate = receiving.get("rate") or 1
+
+    lines = []
+    for item in items:
+        if not item.get("inventory_item_id"):
+            continue
+        base_net_price = (item.get("original_price") or 0) - (item.get("discount") or 0)
+        share = base_net_price / items_total if items_total else 0
+        unit_cost = (base_net_price + share * overhead - share * global_discount) * rate + (item.get("vat") or 0)
+        quantity = item.get("quantity") or 0
+        lines.append({
+            "inventory_item_id": item["inventory_item_id"],
+            "quantity": quantity,
+            "unit_cost": unit_cost,
+            "value": unit_cost * quantity,
+        })
+    return lines
+
+
+def _issuing_lines(items: list[dict]) -> list[dict]:
+    return [
+        {
+            "inventory_item_id": item["inventory_item_id"],
+            "quantity": -(item.get("quantity") or 0),
+            "unit_cost": item.get("price") or 0,
+            "value": 0,
+        }
+        for item in items if item.get("inventory_item_id")
+    ]
+
+
+async def _movement_docs(source: str, ids: list[ObjectId], session=None) -> dict[ObjectId, Optional[dict]]:
+    if source == RECEIVING:
+        headers_collection, lines_collection, parent_field = receiving_collection, receiving_items_collection, \
+            "receiving_id"
+        header_fields = {"company_id": 1, "branch": 1, "date": 1, "rate": 1, "shipping": 1, "handling": 1,
+                         "other": 1, "amount": 1}
+    else:
+        headers_collection, lines_collection, parent_field = issuing_collection, issuing_items_details_collection, \
+            "issue_id"
+        header_fields = {"company_id": 1, "branch": 1, "date": 1}
+
+    # only posted documents move stock; New and Cancelled ones have no movement
+    headers = await headers_collection.find({"_id": {"$in": ids}, "status": "Posted"}, header_fields,
+                                            session=session).to_list(None)
+    items_by_header: dict[ObjectId, list[dict]] = {header["_id"]: [] for header in headers}
+    if headers:
+        async for item in lines_collection.find({parent_field: {"$in": list(items_by_header)}},
+                                                session=session).sort("_id", 1):
+            items_by_header[item[parent_field]].append(item)
+
+    docs: dict[ObjectId, Optional[dict]] = {source_id: None for source_id in ids}
+    for header in headers:
+        items = items_by_header[header["_id"]]
+        lines = _receiving_lines(header, items) if source == RECEIVING else _issuing_lines(items)
+        docs[header["_id"]] = {
+            "source": source,
+            "company_id": header.get("company_id"),
+            "branch": header.get("branch"),
+            "date": header.get("date"),
+            "lines": lines,
+            "updatedAt": security.now_utc(),
+        }
+    return docs
+
+
+def _stock_rows(movement: Optional[dict]) -> list[tuple[tuple, dict]]:
+    if not movement:
+        return []
+    rows = []
+    for line in movement.get("lines") or []:
+        quantity = line.get("quantity") or 0
+        key = (movement.get("company_id"), line.get("inventory_item_id"), movement.get("branch"))
+        rows.append((key, {
+            "received_quantity": quantity if quantity > 0 else 0,
+            "received_value": line.get("value") or 0,
+            "issued_quantity": -quantity if quantity < 0 else 0,
+            "on_hand": quantity,
+        }))
+    return rows
+
+
+async def _latest_receipt(key: tuple, session=None) -> Optional[dict]:
+    company_id, inventory_item_id, branch = key
+    cursor = await stock_movements_collection.aggregate([
+        {"$match": {"company_id": company_id, "source": RECEIVING, "branch": branch,
+                    "lines.inventory_item_id": inventory_item_id}},
+        {"$sort": {"date": -1, "_id": -1}},
+        {"$limit": 1},
+        {"$unwind": "$lines"},
+        {"$match": {"lines.inventory_item_id": inventory_item_id}},
+        {"$group": {"_id": "$_id", "date": {"$first": "$date"}, "unit_cost": {"$last": "$lines.unit_cost"}}},
+    ], session=session)
+    latest = await cursor.to_list(None)
+    return latest[0] if latest else None
+
+
+async def _swap_movements(movements: dict[ObjectId, Optional[dict]], session=None):
+    """
+    Replaces each source's movement atomically and moves the old -> new difference onto the
+    stock on hand, so item totals never need the receiving / issuing history again.
+    """
+    deltas: dict[tuple, dict] = {}
+    receipts_changed: set[tuple] = set()
+
+    def add(movement: Optional[dict], sign: int):
+        for key, values in _stock_rows(movement):
+            delta = deltas.setdefault(key, {field: 0 for field in STOCK_VALUE_FIELDS})
+            for field in STOCK_VALUE_FIELDS:
+                delta[field] += sign * values[field]
+            if movement.get("source") == RECEIVING:
+                receipts_changed.add(key)
+
+    for source_id, movement in movements.items():
+        if movement is None:
+            old = await stock_movements_collection.find_one_and_delete({"_id": source_id}, session=session)
+        else:
+            old = await stock_movements_collection.find_one_and_update(
+                {"_id": source_id}, {"$set": movement}, upsert=True, session=session)
+        if old and movement and old.get("lines") == movement["lines"] and old.get("date") == movement["date"] \
+                and old.get("branch") == movement["branch"]:
+            continue
+        add(old, -1)
+        add(movement, 1)
+
+    for key, delta in deltas.items():
+        update: dict[str, Any] = {"$set": {"updatedAt": security.now_utc()}}
+        if any(abs(value) > 1e-9 for value in delta.values()):
+            update["$inc"] = delta
+        if key in receipts_changed:
+            latest = await _latest_receipt(key, session)
+            update["$set"]["last_price"] = latest["unit_cost"] if latest else 0
+            update["$set"]["last_received_at"] = latest["date"] if latest else None
+        await stock_on_hand_collection.update_one(dict(zip(STOCK_KEY_FIELDS, key)), update, upsert=True,
+                                                  session=session)
+
+
+async def refresh_receiving_stock(receiving_ids: Iterable[Any], session=None):
+    """Call after any write to a receiving or its items (same session)."""
+    receiving_ids = _unique_ids(receiving_ids)
+    if receiving_ids:
+        await _swap_movements(await _movement_docs(RECEIVING, receiving_ids, session), session)
+
+
+async def refresh_issuing_stock(issuing_ids: Iterable[Any], session=None):
+    """Call after any write to an issuing or its items details (same session)."""
+    issuing_ids = _unique_ids(issuing_ids)
+    if issuing_ids:
+        await _swap_movements(await _movement_docs(ISSUING, issuing_ids, session), session)
+
+
+async def _rebuild_sources(source: str, source_collection, refresh, company_id: ObjectId) -> int:
+    source_ids = [doc["_id"] async for doc in source_collection.find({"company_id": company_id}, {"_id": 1})]
+    known = set(source_ids)
+    # movements whose receiving / issuing was deleted are dropped by the refresh
+    source_ids += [
+        doc["_id"]
+        async for doc in stock_movements_collection.find({"company_id": company_id, "source": source}, {"_id": 1})
+        if doc["_id"] not in known
+    ]
+    for start in range(0, len(source_ids), STOCK_REBUILD_BATCH_SIZE):
+        await refresh(source_ids[start:start + STOCK_REBUILD_BATCH_SIZE])
+    return len(source_ids)
+
+
+async def _expected_stock(company_id: ObjectId, key: Optional[tuple] = None) -> dict[tuple, dict]:
+    match: dict[str, Any] = {"company_id": company_id}
+    lines_match: dict[str, Any] = {}
+    if key:
+        match["branch"] = key[2]
+        lines_match["lines.inventory_item_id"] = key[1]
+    cursor = await stock_movements_collection.aggregate([
+        {"$match": {**match, **lines_match}},
+        {"$unwind": "$lines"},
+        {"$match": lines_match},
+        {
+            "$group": {
+                "_id": {"inventory_item_id": "$lines.inventory_item_id", "branch": "$branch"},
+                "received_quantity": {"$sum": {"$max": ["$lines.quantity", 0]}},
+                "received_value": {"$sum": "$lines.value"},
+                "issued_quantity": {"$sum": {"$max": [{"$multiply": ["$lines.quantity", -1]}, 0]}},
+                "on_hand": {"$sum": "$lines.quantity"},
+            }
+        },
+    ])
+    return {
+        (company_id, doc["_id"].get("inventory_item_id"), doc["_id"].get("branch")): doc
+        for doc in await cursor.to_list(None)
+    }
+
+
+async def _correct_stock(key: tuple, have: Optional[dict], want: dict) -> Optional[bool]:
+    """
+    Moves one item / branch total from `have` to `want` with $inc, only if it still holds `have`, so
+    route writes that $inc the same total are never overwritten. None when the total moved meanwhile.
+    """
+    latest = await _latest_receipt(key)
+    last_price = latest["unit_cost"] if latest else 0
+    last_received_at = latest["date"] if latest else None
+    if have and all(abs((have.get(field) or 0) - (want.get(field) or 0)) < 0.005 for field in STOCK_VALUE_FIELDS) \
+            and abs((have.get("last_price") or 0) - last_price) < 0.005:
+        return False
+    now = security.now_utc()
+    if not have:
+        try:
+            await stock_on_hand_collection.insert_one({
+                **dict(zip(STOCK_KEY_FIELDS, key)), **{field: want.get(field) or 0 for field in STOCK_VALUE_FIELDS},
+                "last_price": last_price, "last_received_at": last_received_at, "updatedAt": now,
+            })
+        except DuplicateKeyError:
+            return None
+        return True
+    result = await stock_on_hand_collection.update_one(
+        {"_id": have["_id"], **{field: have.get(field) for field in STOCK_VALUE_FIELDS}},
+        {
+            "$inc": {field: (want.get(field) or 0) - (have.get(field) or 0) for field in STOCK_VALUE_FIELDS},
+            "$set": {"last_price": last_price, "last_received_at": last_received_at, "updatedAt": now},
+        },
+    )
+    return True if result.matched_count else None
+
+
+async def _correct_stock_on_hand(company_id: ObjectId) -> int:
+    """Brings every item / branch total back to the sum of its movements, fixing drift in the totals themselves."""
+    # totals are read before the movements they are compared with, a write in between fails the guard
+    current = {
+        tuple(doc.get(field) for field in STOCK_KEY_FIELDS): doc
+        for doc in await stock_on_hand_collection.find({"company_id": company_id}).to_list(None)
+    }
+    expected = await _expected_stock(company_id)
+
+    corrected = 0
+    for key in set(expected) | set(current):
+        have, want = current.get(key), expected.get(key) or {}
+        for _ in range(STOCK_CORRECTION_RETRIES):
+            result = await _correct_stock(key, have, want)
+            if result is not None:
+                corrected += result
+                break
+            have = await stock_on_hand_collection.find_one(dict(zip(STOCK_KEY_FIELDS, key)))
+            want = (await _expected_stock(company_id, key)).get(key) or {}
+        else:
+            print(f"[stock ledger] {key} kept changing, left for the next rebuild")
+    return corrected
+
+
+async def rebuild_stock_ledger(company_id: ObjectId, progress: ProgressCallback = None) -> dict:
+    """
+    Recomputes every movement and the stock on hand of the company from the receiving and
+    issuing collections, and corrects the totals with guarded increments so it can run beside route writes.
+    """
+    receiving = await _rebuild_sources(RECEIVING, receiving_collection, refresh_receiving_stock, company_id)
+    if progress:
+        await progress(40)
+    issuing = await _rebuild_sources(ISSUING, issuing_collection, refresh_issuing_stock, company_id)
+    if progress:
+        await progress(80)
+    corrected = await _correct_stock_on_hand(company_id)
+    if progress:
+        await progress(100)
+    return {"receiving": receiving, "issuing": issuing, "corrected_items": corrected}
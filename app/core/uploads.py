@@ -0,0 +1,218 @@
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from typing import BinaryIO, Callable, Iterable, Optional
+
+import cloudinary.uploader
+from fastapi import UploadFile
+
+from app.cloudinary_config import cloudinary
+
+# "cloudinary" in production, "local" stores files on disk so uploads can be exercised offline
+UPLOAD_BACKEND = os.getenv("UPLOAD_BACKEND", "cloudinary")
+# blocking SDK calls run in this many threads; uploads beyond it wait their turn without blocking the loop
+UPLOAD_MAX_WORKERS = int(os.getenv("UPLOAD_MAX_WORKERS", "8"))
+# files above this size are sent in chunks read from the spooled upload instead of one request
+UPLOAD_LARGE_FILE_BYTES = int(os.getenv("UPLOAD_LARGE_FILE_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(6 * 1024 * 1024)))
+UPLOAD_LOCAL_DIR = os.getenv("UPLOAD_LOCAL_DIR", "local_uploads")
+UPLOAD_LOCAL_BASE_URL = os.getenv("UPLOAD_LOCAL_BASE_URL", "/local_uploads")
+UPLOAD_METRICS_WINDOW = 500
+
+
+class CloudinaryBackend:
+    name = "cloudinary"
+
+    def upload(self, stream: BinaryIO, size: int, **options) -> dict:
+        if size > UPLOAD_LARGE_FILE_BYTES:
+            options.setdefault("resource_type", "image")
+            return cloudinary.uploader.upload_large(stream, chunk_size=UPLOAD_CHUNK_BYTES, **options)
+        return cloudinary.uploader.upload(stream, **options)
+
+    def destroy(self, public_id: str, **options) -> dict:
+        return cloudinary.uploader.destroy(public_id, **options)
+
+
+class LocalUploadBackend:
+    """Writes uploads under UPLOAD_LOCAL_DIR and answers like Cloudinary does."""
+
+    name = "local"
+
+    def __init__(self, root: str = UPLOAD_LOCAL_DIR, base_url: str = UPLOAD_LOCAL_BASE_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    @staticmethod
+    def _clean_public_id(public_id: str) -> str:
+        # folder and public_id come from the client: no absolute paths, no "." / ".." segments
+        segments = str(public_id).replace("\\", "/").split("/")
+        return "/".join(segment for segment in segments if segment not in ("", ".", ".."))
+
+    def _path(self, public_id: str) -> str:
+        public_id = self._clean_public_id(public_id)
+        if not public_id:
+            raise ValueError("Invalid public_id")
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, *public_id.split("/")))
+        if os.path.commonpath([root, path]) != root or path == root:
+            raise ValueError(f"Invalid public_id: {public_id}")
+        return path
+
+    def upload(self, stream: BinaryIO, size: int, **options) -> dict:
+        name = str(options.get("public_id") or uuid.uuid4().hex).replace("/", "_").replace("\\", "_")
+        name = name.replace(":", "-").lstrip(".") or uuid.uuid4().hex
+        public_id = self._clean_public_id(f"{options['folder']}/{name}" if options.get("folder") else name)
+        path = self._path(public_id)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        try:
+            with open(path, "wb") as target:
+                shutil.copyfileobj(stream, target, UPLOAD_CHUNK_BYTES)
+        except Exception:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        extension = os.path.splitext(name)[1].lstrip(".").lower()
+        resource_type = options.get("resource_type") or "image"
+        return {
+            "secure_url": f"{self.base_url}/{public_id}",
+            "public_id": public_id,
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "resource_type": "raw" if resource_type == "auto" else resource_type,
+            "format": extension or None,
+            "bytes": os.path.getsize(path),
+        }
+
+    def destroy(self, public_id: str, **options) -> dict:
+        path = self._path(public_id)
+        if not os.path.exists(path):
+            return {"result": "not found"}
+        os.remove(path)
+        return {"result": "ok"}
+
+
+class UploadMetrics:
+    """Latency and volume per operation (upload / destroy) over the last UPLOAD_METRICS_WINDOW calls."""
+
+    def __init__(self, window: int = UPLOAD_METRICS_WINDOW):
+        self.window = window
+        self._stats: dict[str, dict] = {}
+
+    def _operation(self, operation: str) -> dict:
+        return self._stats.setdefault(operation, {
+            "count": 0, "errors": 0, "bytes": 0, "in_flight": 0, "max_ms": 0.0,
+            "recent_ms": deque(maxlen=self.window),
+        })
+
+    def started(self, operation: str):
+        self._operation(operation)["in_flight"] += 1
+
+    def finished(self, operation: str, seconds: float, ok: bool, size: int = 0):
+        stats = self._operation(operation)
+        milliseconds = seconds * 1000
+        stats["in_flight"] -= 1
+        stats["count"] += 1
+        stats["bytes"] += size if ok else 0
+        stats["errors"] += 0 if ok else 1
+        stats["max_ms"] = max(stats["max_ms"], milliseconds)
+        stats["recent_ms"].append(milliseconds)
+
+    def snapshot(self) -> dict:
+        result = {}
+        for operation, stats in self._stats.items():
+            recent = sorted(stats["recent_ms"])
+
+            def percentile(p: float) -> Optional[float]:
+                return round(recent[min(len(recent) - 1, int(len(recent) * p))], 1) if recent else None
+
+            result[operation] = {
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "bytes": stats["bytes"],
+                "in_flight": stats["in_flight"],
+                "avg_ms": round(sum(recent) / len(recent), 1) if recent else None,
+                "p50_ms": percentile(0.5),
+                "p95_ms": percentile(0.95),
+                "max_ms": round(stats["max_ms"], 1),
+            }
+        return result
+
+
+def _file_size(stream: BinaryIO) -> int:
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+class UploadService:
+    """
+    Runs the blocking storage SDK in a bounded thread pool so a slow upload only holds a worker
+    thread, never the event loop. Files are handed over as the spooled file object, not read into memory.
+    """
+
+    def __init__(self, backend, max_workers: int = UPLOAD_MAX_WORKERS):
+        self.backend = backend
+        self.max_workers = max_workers
+        self.metrics = UploadMetrics()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="upload")
+        return self._executor
+
+    async def _run(self, operation: str, func: Callable[..., dict], *args, size: int = 0, **kwargs) -> dict:
+        self.metrics.started(operation)
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), partial(func, *args, **kwargs))
+            ok = True
+            return result
+        finally:
+            self.metrics.finished(operation, time.perf_counter() - started, ok, size)
+
+    async def upload(self, file: UploadFile, **options) -> dict:
+        stream = file.file
+        stream.seek(0)
+        size = file.size if getattr(file, "size", None) is not None else _file_size(stream)
+        return await self._run("upload", self.backend.upload, stream, size, size=size, **options)
+
+    async def upload_many(self, uploads: Iterable[tuple[UploadFile, dict]]) -> list[dict]:
+        """Uploads in parallel; if any upload fails the others are removed again and the error is raised."""
+        uploads = list(uploads)
+        results = await asyncio.gather(*[self.upload(file, **options) for file, options in uploads],
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await asyncio.gather(*[
+                self.destroy(result["public_id"], resource_type=result.get("resource_type") or "image")
+                for result in results if isinstance(result, dict) and result.get("public_id")
+            ], return_exceptions=True)
+            raise errors[0]
+        return results
+
+    async def destroy(self, public_id: str, **options) -> dict:
+        return await self._run("destroy", self.backend.destroy, public_id, **options)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def _create_backend():
+    if UPLOAD_BACKEND == "local":
+        return LocalUploadBackend()
+    return CloudinaryBackend()
+
+
+upload_service = UploadService(_create_backend())
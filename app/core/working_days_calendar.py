@@ -0,0 +1,157 @@
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Iterable, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.database import get_collection
+from app.websocket_config import manager
+
+legislations_collection = get_collection("legislations")
+public_holidays_collection = get_collection("public_holidays")
+
+# calendars are dropped on every worker on each holiday / legislation change, the TTL is only a safety net
+CALENDAR_TTL_SECONDS = 3600
+
+weekday_names = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+CalendarKey = tuple[Optional[ObjectId], Optional[ObjectId], int]
+
+
+def _as_date(value: Any) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+class WorkingDaysCalendar:
+    """
+    Working days of one (company, legislation, year): cumulative[i] is the number of
+    working days before day i of the year, so any range is a difference of two entries.
+    """
+
+    def __init__(self, year: int, weekend: Iterable[str], holiday_dates: Iterable[date]):
+        self.year = year
+        self.first_day = date(year, 1, 1)
+        self.weekend = list(weekend or [])
+        self.holiday_dates = frozenset(holiday_dates)
+
+        weekend_days = {index for index, name in enumerate(weekday_names) if name in self.weekend}
+        days_in_year = (date(year + 1, 1, 1) - self.first_day).days
+        self.cumulative = [0] * (days_in_year + 1)
+        current = self.first_day
+        for index in range(days_in_year):
+            is_working = current.weekday() not in weekend_days and current not in self.holiday_dates
+            self.cumulative[index + 1] = self.cumulative[index] + (1 if is_working else 0)
+            current += timedelta(days=1)
+
+    def working_days(self, start: date, end: date) -> int:
+        start = max(_as_date(start), self.first_day)
+        end = min(_as_date(end), date(self.year, 12, 31))
+        if start > end:
+            return 0
+        return self.cumulative[(end - self.first_day).days + 1] - self.cumulative[(start - self.first_day).days]
+
+
+_calendars: dict[CalendarKey, tuple[float, WorkingDaysCalendar]] = {}
+
+
+def working_days_between(calendars: dict[int, WorkingDaysCalendar], start: Any, end: Any) -> int:
+    """Pure range query over preloaded calendars (one per year the range touches)."""
+    start = _as_date(start)
+    end = _as_date(end)
+    return sum(calendars[year].working_days(start, end) for year in range(start.year, end.year + 1))
+
+
+async def get_working_days_calendars(company_id: Optional[ObjectId], legislation: Optional[ObjectId],
+                                     years: Iterable[int]) -> dict[int, WorkingDaysCalendar]:
+    now = time.monotonic()
+    calendars: dict[int, WorkingDaysCalendar] = {}
+    missing: list[int] = []
+    for year in sorted(set(years)):
+        entry = _calendars.get((company_id, legislation, year))
+        if entry and entry[0] > now:
+            calendars[year] = entry[1]
+        else:
+            missing.append(year)
+
+    if not missing:
+        return calendars
+
+    weekend = []
+    if legislation:
+        legislation_doc = await legislations_collection.find_one({"_id": legislation}, {"weekend": 1})
+        if not legislation_doc:
+            raise HTTPException(status_code=404, detail="Legislation not found")
+        weekend = legislation_doc.get("weekend", []) or []
+
+    match_stage: dict[str, Any] = {
+        "date": {"$gte": datetime(missing[0], 1, 1), "$lt": datetime(missing[-1] + 1, 1, 1)}
+    }
+    if company_id:
+        match_stage["company_id"] = company_id
+    if legislation:
+        match_stage["legislation"] = legislation
+    holidays = await public_holidays_collection.find(match_stage, {"date": 1}).to_list(None)
+
+    holidays_by_year: dict[int, set[date]] = {}
+    for holiday in holidays:
+        if isinstance(holiday.get("date"), datetime):
+            holiday_date = holiday["date"].date()
+            holidays_by_year.setdefault(holiday_date.year, set()).add(holiday_date)
+
+    expires_at = time.monotonic() + CALENDAR_TTL_SECONDS
+    for year in missing:
+        calendar = WorkingDaysCalendar(year, weekend, holidays_by_year.get(year, set()))
+        _calendars[(company_id, legislation, year)] = (expires_at, calendar)
+        calendars[year] = calendar
+    return calendars
+
+
+async def count_working_days_batch(company_id: Optional[ObjectId], legislation: Optional[ObjectId],
+                                   ranges: list[tuple[Any, Any]]) -> list[int]:
+    years = set()
+    for start, end in ranges:
+        if _as_date(start) > _as_date(end):
+            raise HTTPException(status_code=400, detail="Invalid date range")
+        years.update(range(_as_date(start).year, _as_date(end).year + 1))
+    calendars = await get_working_days_calendars(company_id, legislation, years)
+    return [working_days_between(calendars, start, end) for start, end in ranges]
+
+
+async def count_working_days(company_id: Optional[ObjectId], legislation: Optional[ObjectId], start: Any,
+                             end: Any) -> int:
+    return (await count_working_days_batch(company_id, legislation, [(start, end)]))[0]
+
+
+async def preload_working_days_calendars(keys: Iterable[tuple[Optional[ObjectId], Optional[ObjectId]]],
+                                         years: Iterable[int]) -> dict[tuple, dict[int, WorkingDaysCalendar]]:
+    """Load the calendars of several (company, legislation) pairs at once."""
+    keys = list(dict.fromkeys(keys))
+    years = list(years)
+    results = await asyncio.gather(*[
+        get_working_days_calendars(company_id, legislation, years)
+        for company_id, legislation in keys
+    ])
+    return dict(zip(keys, results))
+
+
+def _evict_calendars(event: dict):
+    company_id = ObjectId(event["company_id"]) if ObjectId.is_valid(str(event.get("company_id"))) else None
+    legislation = ObjectId(event["legislation"]) if ObjectId.is_valid(str(event.get("legislation"))) else None
+    for key in list(_calendars):
+        key_company_id, key_legislation, _ = key
+        if legislation is not None and key_legislation != legislation:
+            continue
+        if company_id is not None and key_company_id != company_id:
+            continue
+        del _calendars[key]
+
+
+manager.on_event("calendar_invalidate", _evict_calendars)
+
+
+async def invalidate_working_days_calendars(company_id: Any = None, legislation: Any = None):
+    """Drop one legislation's calendars, one company's calendars, or everything, on every worker."""
+    await manager.publish_event("calendar_invalidate", company_id=str(company_id) if company_id else None,
+                                legislation=str(legislation) if legislation else None)
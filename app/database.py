@@ -1,8 +1,9 @@
 from pymongo import AsyncMongoClient
 from .config import MONGO_URI, DATABASE_NAME
+from app.core.db_metrics import command_listener
 
 # أنشئ العميل async
-client = AsyncMongoClient(MONGO_URI, maxPoolSize=100, minPoolSize=5)
+client = AsyncMongoClient(MONGO_URI, maxPoolSize=100, minPoolSize=5, event_listeners=[command_listener])
 
 # اختار قاعدة البيانات
 db = client[DATABASE_NAME]
@@ -1,10 +1,18 @@
+import os
+import secrets
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
 from bson import ObjectId
+from app.core.db_metrics import DbMetricsMiddleware, db_metrics
+from app.core.jobs import start_job_runner, stop_job_runner
+from app.core.index_registry import ensure_indexes
+from app.core.uploads import upload_service
+from app.core.passwords import password_hasher
 from app.database import get_collection
 from app.widgets import upload_images
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import brands_and_models, users, countries_and_cities, functions, menus, responsibilities, auth, \
     companies, favourite_screens, list_of_values, counters, branches, car_trading, salesman, system_variables, \
@@ -12,38 +20,30 @@ from app.routes import brands_and_models, users, countries_and_cities, functions
     quotation_cards, job_tasks, time_sheets, employees_performance, company_variables, ar_receipts, ap_payments, \
     ap_invoices, inventory_items, employees, receiving, inspection_reports, converters, issue_items, data_migration, \
     job_cards_dashboard, to_do_list, account_transfers, batch_payment_process, attachment, legislation, \
-    payroll_elements, public_holidays, leave_types, payroll, payroll_runs, balances, loan_and_advances_types
+    payroll_elements, public_holidays, leave_types, payroll, payroll_runs, balances, loan_and_advances_types, jobs, \
+    outstanding_ledger, search_index
 
 from app.routes.manzel_healthcare_task import medication_reminder_system
 from app.routes import admin
 
 from app.websocket_config import manager
 
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 users_collection = get_collection("sys-users")
-companies_collection = get_collection("companies")
-currencies_collection = get_collection("currencies")
-company_mail_settings_collection = get_collection("company_mail_settings")
-company_mail_oauth_states_collection = get_collection("company_mail_oauth_states")
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    await companies_collection.create_index("company_name", unique=True)
-    await users_collection.create_index("email", unique=True)
-    await currencies_collection.create_index(
-        [("company_id", 1), ("country_id", 1)],
-        unique=True
-    )
-    await company_mail_settings_collection.create_index(
-        [("company_id", 1), ("provider", 1)],
-        unique=True
-    )
-    await company_mail_oauth_states_collection.create_index(
-        "expiresAt",
-        expireAfterSeconds=0
-    )
-    print("✅ Unique indexes ensured at startup")
+    await ensure_indexes()
+    print("✅ Indexes ensured at startup")
+    await manager.start()
+    await start_job_runner()
     yield
+    await stop_job_runner()
+    await manager.stop()
+    upload_service.shutdown()
+    password_hasher.shutdown()
     print("👋 App is shutting down")
 
 
@@ -65,6 +65,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(DbMetricsMiddleware)
 
 # Routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
@@ -121,6 +122,9 @@ app.include_router(payroll.router, prefix="/payroll", tags=["Payroll"])
 app.include_router(payroll_runs.router, prefix="/payroll_runs", tags=["Payroll Runs"])
 app.include_router(balances.router, prefix="/balance", tags=["Balance"])
 app.include_router(loan_and_advances_types.router, prefix="/loan_and_advances_types", tags=["Loan and Advances Types"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Background Jobs"])
+app.include_router(outstanding_ledger.router, prefix="/outstanding_ledger", tags=["Outstanding Ledger"])
+app.include_router(search_index.router, prefix="/search_index", tags=["Search Index"])
 
 
 # نقطة نهاية WebSocket العامة
@@ -158,6 +162,16 @@ async def websocket_endpoint(
             )
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(authorization: str = Header(default="")):
+    # Prometheus scrapes with a bearer token, without METRICS_TOKEN the endpoint is not exposed
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return db_metrics.render()
+
+
 @app.get("/")
 def home():
     return {"message": "DataHubAI"}
@@ -4,6 +4,7 @@ from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from app.core import security
+from app.core.dashboard_rollups import refresh_transfer_cashflow
 from app.database import get_collection
 from datetime import datetime
 
@@ -159,6 +160,7 @@ async def add_new_transfer(transfer_data: TransferModel, data: dict = Depends(se
         result = await account_transfers_collection.insert_one(transfer_data)
         if not result.inserted_id:
             raise HTTPException(status_code=500, detail="Failed to insert transfer item")
+        await refresh_transfer_cashflow([result.inserted_id])
 
         added_transfer = await get_transfer_details(result.inserted_id)
 
@@ -188,6 +190,7 @@ async def update_new_transfer(transfer_id: str, transfer_data: TransferModel,
         })
 
         await account_transfers_collection.update_one({"_id": transfer_id}, {"$set": transfer_data})
+        await refresh_transfer_cashflow([transfer_id])
 
         added_transfer = await get_transfer_details(transfer_id)
 
@@ -209,6 +212,7 @@ async def delete_transfer(transfer_id: str, data: dict = Depends(security.get_cu
         result = await account_transfers_collection.delete_one({"_id": transfer_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Transfer not found")
+        await refresh_transfer_cashflow([transfer_id])
 
         await manager.send_to_company(company_id,{
             "type": "transfer_deleted",
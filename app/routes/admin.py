@@ -8,6 +8,7 @@ from fastapi import APIRouter, Body, Depends, Header, HTTPException
 from pydantic import BaseModel
 
 from app.core import security
+from app.core.passwords import password_hasher
 from app.database import get_collection
 from app.websocket_config import manager
 
@@ -132,6 +133,7 @@ async def _revoke_user_sessions(
             },
         },
     )
+    await security.invalidate_session_state(target_id, company_id)
     deleted = await refresh_tokens_collection.delete_many({"user_id": target_id})
     disconnected = await manager.disconnect_user(str(target_id), reason=reason)
     await _audit(
@@ -369,6 +371,7 @@ async def force_logout_session(
             "$push": revoked_push,
         },
     )
+    await security.invalidate_session_state(target["_id"], company_id)
     disconnected = await manager.disconnect_session(
         str(target["_id"]),
         session_id,
@@ -452,6 +455,7 @@ async def force_logout_all(data: dict = Depends(_admin_access)):
             },
         },
     )
+    await security.invalidate_company_session_states(company_id)
     deleted = await refresh_tokens_collection.delete_many({"user_id": {"$in": target_ids}})
     disconnected_counts = await asyncio.gather(*[
         manager.disconnect_user(
@@ -499,6 +503,7 @@ async def change_user_status(
         {"_id": target["_id"], "company_id": company_id},
         {"$set": {"status": change.status, "updatedAt": now}},
     )
+    await security.invalidate_session_state(target["_id"], company_id)
     if not change.status:
         await _revoke_user_sessions(
             company_id,
@@ -518,3 +523,18 @@ async def change_user_status(
         "user_id": user_id,
         "status": change.status,
     }
+
+
+@router.get("/session_cache_stats")
+async def session_cache_stats(_: dict = Depends(_admin_access)):
+    return security.get_session_cache_stats()
+
+
+@router.get("/password_hasher_stats")
+async def password_hasher_stats(_: dict = Depends(_admin_access)):
+    return password_hasher.get_stats()
+
+
+@router.get("/websocket_stats")
+async def websocket_stats(_: dict = Depends(_admin_access)):
+    return manager.get_stats()
@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, ValidationError
 from app import database
 from app.core import security
+from app.core.outstanding_ledger import VENDOR, get_entity_outstanding, refresh_ap_invoice_balances
 from app.database import get_collection
 from datetime import datetime
 from app.routes.car_trading import PyObjectId
@@ -348,6 +349,7 @@ async def add_new_ap_invoice(invoices: APInvoicesModel, data: dict = Depends(sec
                 new_invoices = await ap_invoices_items_collection.insert_many(invoice_items, session=session)
                 if not new_invoices.inserted_ids:
                     raise HTTPException(status_code=500, detail="Failed to insert ap invoice items")
+            await refresh_ap_invoice_balances([result.inserted_id], session=session)
 
             await session.commit_transaction()
             new_receipt = await get_ap_invoice_details(result.inserted_id)
@@ -377,6 +379,7 @@ async def update_ap_invoice(invoice_id: str, invoice: APInvoicesModel, _: dict =
         result = await ap_invoices_collection.update_one({"_id": invoice_id}, {"$set": invoice_data_dict})
         if result.modified_count == 0:
             raise HTTPException(status_code=404)
+        await refresh_ap_invoice_balances([invoice_id])
         updated_ap_invoice = await get_ap_invoice_details(invoice_id)
         print(updated_ap_invoice)
         return {"updated_ap_invoice": updated_ap_invoice}
@@ -452,6 +455,12 @@ async def update_invoice_items(
 
         async with  database.client.start_session() as s:
             await s.start_transaction()
+            changed_ids = deleted_list + [item_id for item_id, _ in modified_list]
+            affected_invoice_ids = [item["ap_invoice_id"] for item in added_list]
+            if changed_ids:
+                affected_invoice_ids += await ap_invoices_items_collection.distinct(
+                    "ap_invoice_id", {"_id": {"$in": changed_ids}}, session=s
+                )
             if deleted_list:
                 await ap_invoices_items_collection.delete_many(
                     {"_id": {"$in": deleted_list}}, session=s
@@ -479,6 +488,7 @@ async def update_invoice_items(
                 # updated_list.append(
                 #     {"_id": str(item_id), "uuid": str(item_data["uuid"]) if item_data.get("uuid") else None})
 
+            await refresh_ap_invoice_balances(affected_invoice_ids, session=s)
             await s.commit_transaction()
             updated_ap_invoice = await get_ap_invoice_details(ObjectId(ap_invoice_id))
         return {"updated_ap_invoice": updated_ap_invoice}
@@ -530,6 +540,7 @@ async def delete_ap_invoice(invoice_id: str, _: dict = Depends(security.get_curr
             if result.deleted_count == 0:
                 raise HTTPException(status_code=404, detail="Invoice not found or already deleted")
             await ap_invoices_items_collection.delete_many({"ap_invoice_id": invoice_id}, session=session)
+            await refresh_ap_invoice_balances([invoice_id], session=session)
 
             await session.commit_transaction()
             return {"message": "Invoice deleted successfully", "invoice_id": str(invoice_id)}
@@ -623,135 +634,7 @@ async def get_vendor_outstanding(vendor_id: str, data: dict = Depends(security.g
     try:
         company_id = ObjectId(data.get("company_id"))
         vendor_id = ObjectId(vendor_id)
-
-        vendor_outstanding_pipeline = [
-            {
-                '$match': {
-                    'company_id': company_id,
-                    'vendor': vendor_id,
-                    'status': 'Posted'
-                }
-            }, {
-                '$lookup': {
-                    'from': 'ap_invoices_items',
-                    'localField': '_id',
-                    'foreignField': 'ap_invoice_id',
-                    'as': 'invoice_items_details'
-                }
-            }, {
-                '$addFields': {
-                    'amounts': {
-                        '$sum': {
-                            '$map': {
-                                'input': '$invoice_items_details',
-                                'as': 'item',
-                                'in': {
-                                    '$ifNull': [
-                                        '$$item.amount', 0
-                                    ]
-                                }
-                            }
-                        }
-                    }
-                }
-            }, {
-                '$lookup': {
-                    'from': 'all_payments_invoices',
-                    'localField': '_id',
-                    'foreignField': 'ap_invoices_id',
-                    'as': 'payments_invoices_details'
-                }
-            }, {
-                '$addFields': {
-                    'gived': {
-                        '$sum': {
-                            '$map': {
-                                'input': '$payments_invoices_details',
-                                'as': 'payment',
-                                'in': {
-                                    '$ifNull': [
-                                        '$$payment.amount', 0
-                                    ]
-                                }
-                            }
-                        }
-                    }
-                }
-            }, {
-                '$group': {
-                    '_id': None,
-                    'total_amounts': {
-                        '$sum': '$amounts'
-                    },
-                    'total_gived': {
-                        '$sum': '$gived'
-                    }
-                }
-            }, {
-                '$addFields': {
-                    'outstanding': {
-                        '$subtract': [
-                            '$total_amounts', '$total_gived'
-                        ]
-                    }
-                }
-            }, {
-                '$project': {
-                    '_id': 0,
-                    'outstanding': 1
-                }
-            }, {
-                '$facet': {
-                    'data': [
-                        {
-                            '$project': {
-                                'outstanding': 1
-                            }
-                        }
-                    ],
-                    'default': [
-                        {
-                            '$project': {
-                                '_id': 0,
-                                'outstanding': {
-                                    '$literal': 0
-                                }
-                            }
-                        }
-                    ]
-                }
-            }, {
-                '$project': {
-                    'merged': {
-                        '$concatArrays': [
-                            '$data', '$default'
-                        ]
-                    }
-                }
-            }, {
-                '$project': {
-                    'result': {
-                        '$arrayElemAt': [
-                            '$merged', 0
-                        ]
-                    }
-                }
-            }, {
-                '$replaceRoot': {
-                    'newRoot': {
-                        '$ifNull': [
-                            '$result', {
-                                'outstanding': 0
-                            }
-                        ]
-                    }
-                }
-            }
-        ]
-
-        cursor = await ap_invoices_collection.aggregate(vendor_outstanding_pipeline)
-        result = await cursor.next()
-        return result
+        return {"outstanding": await get_entity_outstanding(company_id, VENDOR, vendor_id)}
 
     except HTTPException:
         raise
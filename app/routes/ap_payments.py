@@ -5,6 +5,8 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from app import database
 from app.core import security
+from app.core.dashboard_rollups import refresh_payment_cashflow
+from app.core.outstanding_ledger import payment_invoice_ids, refresh_ap_invoice_balances
 from app.database import get_collection
 from datetime import datetime
 from app.routes.car_trading import PyObjectId
@@ -614,6 +616,9 @@ async def add_new_payment(
                 new_invoices = await ap_payment_invoices_collection.insert_many(payment_invoices, session=session)
                 if not new_invoices.inserted_ids:
                     raise HTTPException(status_code=500, detail="Failed to insert receipt invoices")
+                await refresh_ap_invoice_balances([inv.get("ap_invoices_id") for inv in payment_invoices],
+                                                  session=session)
+            await refresh_payment_cashflow([result.inserted_id], session=session)
 
             await session.commit_transaction()
             new_payment = await get_payment_details(result.inserted_id)
@@ -678,36 +683,44 @@ async def update_payment_invoices(
                     item.pop("is_modified", None)
                     modified_list.append((item_id, item))
 
-                if deleted_list:
-                    print(deleted_list)
-                    await ap_payment_invoices_collection.delete_many(
-                        {"_id": {"$in": deleted_list}}, session=s
-                    )
-
-                if added_list:
-                    added_invoices = await ap_payment_invoices_collection.insert_many(
-                        added_list, session=s
-                    )
-                    # inserted_ids = added_invoices.inserted_ids
-                    # for item, new_id in zip(added_list, inserted_ids):
-                    #     response_item = {
-                    #         "_id": str(new_id),
-                    #         "ap_invoice_id": str(item.get("ap_invoice_id")),
-                    #     }
-                    #     updated_list.append(response_item)
-
-                for item_id, item_data in modified_list:
-                    item_data.pop("id", None)
-                    await ap_payment_invoices_collection.update_one(
-                        {"_id": item_id},
-                        {"$set": item_data},
-                        session=s
-                    )
-                    # updated_list.append(
-                    #     {"_id": str(item_id),
-                    #      "ap_invoice_id": str(item_data["ap_invoice_id"]) if item_data.get("ap_invoice_id") else None})
-
-                await s.commit_transaction()
+            changed_ids = deleted_list + [item_id for item_id, _ in modified_list]
+            affected_invoice_ids = [item["ap_invoices_id"] for item in added_list]
+            if changed_ids:
+                affected_invoice_ids += await ap_payment_invoices_collection.distinct(
+                    "ap_invoices_id", {"_id": {"$in": changed_ids}}, session=s
+                )
+            if deleted_list:
+                print(deleted_list)
+                await ap_payment_invoices_collection.delete_many(
+                    {"_id": {"$in": deleted_list}}, session=s
+                )
+
+            if added_list:
+                added_invoices = await ap_payment_invoices_collection.insert_many(
+                    added_list, session=s
+                )
+                # inserted_ids = added_invoices.inserted_ids
+                # for item, new_id in zip(added_list, inserted_ids):
+                #     response_item = {
+                #         "_id": str(new_id),
+                #         "ap_invoice_id": str(item.get("ap_invoice_id")),
+                #     }
+                #     updated_list.append(response_item)
+
+            for item_id, item_data in modified_list:
+                item_data.pop("id", None)
+                await ap_payment_invoices_collection.update_one(
+                    {"_id": item_id},
+                    {"$set": item_data},
+                    session=s
+                )
+                # updated_list.append(
+                #     {"_id": str(item_id),
+                #      "ap_invoice_id": str(item_data["ap_invoice_id"]) if item_data.get("ap_invoice_id") else None})
+
+            await refresh_ap_invoice_balances(affected_invoice_ids, session=s)
+            await refresh_payment_cashflow([payment_id], session=s)
+            await s.commit_transaction()
             if payment_id:
                 new_payment = await get_payment_details(payment_id)
                 # serialized = serializer(new_payment)
@@ -738,6 +751,9 @@ async def update_ar_receipt(payment_id: str, payment: PaymentModel, _: dict = De
         result = await ap_payment_collection.update_one({"_id": payment_id}, {"$set": payment_data_dict})
         if result.modified_count == 0:
             raise HTTPException(status_code=404)
+        # posting / cancelling a payment changes what it settles
+        await refresh_ap_invoice_balances(await payment_invoice_ids([payment_id]))
+        await refresh_payment_cashflow([payment_id])
         updated_payment = await get_payment_details(payment_id)
         return {"updated_payment": updated_payment}
 
@@ -783,10 +799,13 @@ async def delete_payment(payment_id: str, _: dict = Depends(security.get_current
                 raise HTTPException(status_code=404, detail="Receipt not found")
             if current_payment['status'] != "New":
                 raise HTTPException(status_code=403, detail="Only New Payments allowed")
+            invoice_ids = await payment_invoice_ids([payment_id], session=session)
             result = await ap_payment_collection.delete_one({"_id": payment_id}, session=session)
             if result.deleted_count == 0:
                 raise HTTPException(status_code=404, detail="Payment not found or already deleted")
             await ap_payment_invoices_collection.delete_many({"payment_id": payment_id}, session=session)
+            await refresh_ap_invoice_balances(invoice_ids, session=session)
+            await refresh_payment_cashflow([payment_id], session=session)
 
             await session.commit_transaction()
             return {"message": "Payment deleted successfully", "payment_id": str(payment_id)}
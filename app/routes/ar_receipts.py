@@ -5,6 +5,8 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from app import database
 from app.core import security
+from app.core.dashboard_rollups import refresh_job_daily_stats, refresh_receipt_cashflow
+from app.core.outstanding_ledger import receipt_job_ids, refresh_job_balances
 from app.database import get_collection
 from datetime import datetime
 from app.routes.car_trading import PyObjectId
@@ -688,6 +690,9 @@ async def create_receipt_for_job_card(job_id: str, customer_id: str,
                 "updatedAt": security.now_utc(),
             }
             await receipts_invoices_collection.insert_one(receipt_invoice_dict, session=session)
+            await refresh_job_balances([job_id], session=session)
+            await refresh_job_daily_stats([job_id], session=session)
+            await refresh_receipt_cashflow([result.inserted_id], session=session)
             await session.commit_transaction()
             new_receipt = await get_receipt_details(result.inserted_id)
             serialized = serializer(new_receipt)
@@ -756,6 +761,10 @@ async def add_new_receipt(
                 new_invoices = await receipts_invoices_collection.insert_many(receipt_invoices, session=session)
                 if not new_invoices.inserted_ids:
                     raise HTTPException(status_code=500, detail="Failed to insert receipt invoices")
+                job_ids = [inv.get("job_id") for inv in receipt_invoices]
+                await refresh_job_balances(job_ids, session=session)
+                await refresh_job_daily_stats(job_ids, session=session)
+            await refresh_receipt_cashflow([result.inserted_id], session=session)
 
             await session.commit_transaction()
             new_receipt = await get_receipt_details(result.inserted_id)
@@ -819,6 +828,12 @@ async def update_receipt_invoices(
 
         async with  database.client.start_session() as s:
             await s.start_transaction()
+            changed_ids = deleted_list + [item_id for item_id, _ in modified_list]
+            affected_job_ids = [item["job_id"] for item in added_list]
+            if changed_ids:
+                affected_job_ids += await receipts_invoices_collection.distinct(
+                    "job_id", {"_id": {"$in": changed_ids}}, session=s
+                )
             if deleted_list:
                 await receipts_invoices_collection.delete_many(
                     {"_id": {"$in": deleted_list}}, session=s
@@ -846,6 +861,9 @@ async def update_receipt_invoices(
                 updated_list.append(
                     {"_id": str(item_id), "job_id": str(item_data["job_id"]) if item_data.get("job_id") else None})
 
+            await refresh_job_balances(affected_job_ids, session=s)
+            await refresh_job_daily_stats(affected_job_ids, session=s)
+            await refresh_receipt_cashflow([receipt_id], session=s)
             await s.commit_transaction()
         if receipt_id:
             new_receipt = await get_receipt_details(receipt_id)
@@ -879,6 +897,11 @@ async def update_ar_receipt(receipt_id: str, receipt: ReceiptsModel, _: dict = D
         result = await receipts_collection.update_one({"_id": receipt_id}, {"$set": receipt_data_dict})
         if result.modified_count == 0:
             raise HTTPException(status_code=404)
+        # posting / cancelling a receipt changes what it settles
+        job_ids = await receipt_job_ids([receipt_id])
+        await refresh_job_balances(job_ids)
+        await refresh_job_daily_stats(job_ids)
+        await refresh_receipt_cashflow([receipt_id])
 
     except Exception as e:
         print(e)
@@ -898,10 +921,14 @@ async def delete_receipt(receipt_id: str, _: dict = Depends(security.get_current
                 raise HTTPException(status_code=404, detail="Receipt not found")
             if current_receipt['status'] != "New":
                 raise HTTPException(status_code=403, detail="Only New Receipts allowed")
+            job_ids = await receipt_job_ids([receipt_id], session=session)
             result = await receipts_collection.delete_one({"_id": receipt_id}, session=session)
             if result.deleted_count == 0:
                 raise HTTPException(status_code=404, detail="Receipt not found or already deleted")
             await receipts_invoices_collection.delete_many({"receipt_id": receipt_id}, session=session)
+            await refresh_job_balances(job_ids, session=session)
+            await refresh_job_daily_stats(job_ids, session=session)
+            await refresh_receipt_cashflow([receipt_id], session=session)
 
             await session.commit_transaction()
             return {"message": "Receipt deleted successfully", "receipt_id": str(receipt_id)}
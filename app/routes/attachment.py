@@ -7,7 +7,7 @@ from pydantic import BaseModel
 from app.core import security
 from app.database import get_collection
 from datetime import datetime
-from app.widgets.upload_files import delete_file_from_server, upload_file
+from app.widgets.upload_files import delete_file_from_server, upload_files
 
 router = APIRouter()
 attachment_collection = get_collection("attachment")
@@ -164,22 +164,17 @@ async def add_new_attachment(code: str = Form(None),
         start_date_value = parse_optional_form_datetime(start_date, "start date")
         end_date_value = parse_optional_form_datetime(end_date, "end date")
         attachments_list = []
-        uploaded_public_ids = []
-        for attachment in attachments:
-            result = await upload_file(attachment, folder="attachments")
-            file_name = result.get("file_name")
-            attach_url = result.get("url")
-            attach_public_id = result.get("public_id")
-            if not attach_url or not attach_public_id:
-                for public_id in uploaded_public_ids:
-                    await delete_file_from_server(public_id)
-                raise HTTPException(status_code=500, detail="Failed to upload attachment")
-
-            uploaded_public_ids.append(attach_public_id)
+        # all files upload in parallel; a failed upload removes the others
+        results = await upload_files(attachments, folder="attachments")
+        if any(not result.get("url") or not result.get("public_id") for result in results):
+            for result in results:
+                await delete_file_from_server(result.get("public_id"))
+            raise HTTPException(status_code=500, detail="Failed to upload attachment")
+        for result in results:
             attachments_list.append({
-                "attach_url": attach_url,
-                "attach_public_id": attach_public_id,
-                "file_name": file_name,
+                "attach_url": result.get("url"),
+                "attach_public_id": result.get("public_id"),
+                "file_name": result.get("file_name"),
                 "resource_type": result.get("resource_type"),
                 "format": result.get("format"),
             })
@@ -3,6 +3,7 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, HTTPException, Form, Request
 from app.database import get_collection
 from app.core import security
+from app.core.passwords import password_hasher
 from app.widgets.check_date import is_date_equals_today_or_older
 import jwt
 
@@ -24,7 +25,8 @@ async def login(
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    if not security.verify_password(password, user["password_hash"]):
+    valid, new_password_hash = await password_hasher.verify_and_update(password, user.get("password_hash"))
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
     company_id = user.get("company_id")
@@ -64,6 +66,13 @@ async def login(
         or (request.client.host if request.client else "")
     )
     user_agent = request.headers.get("user-agent", "")
+    login_values = {
+        "last_login_at": login_at,
+        "last_seen_at": login_at,
+        "last_login_ip": client_ip,
+        "last_user_agent": user_agent,
+        "session_version": session_version,
+    }
     await refresh_tokens.insert_one({
         "user_id": ObjectId(user["_id"]),
         "company_id": company_id,
@@ -78,16 +87,15 @@ async def login(
     })
     await users.update_one(
         {"_id": user["_id"], "company_id": company_id},
-        {
-            "$set": {
-                "last_login_at": login_at,
-                "last_seen_at": login_at,
-                "last_login_ip": client_ip,
-                "last_user_agent": user_agent,
-                "session_version": session_version,
-            }
-        },
+        {"$set": login_values},
     )
+    if new_password_hash:
+        # the stored hash predates the current pwd_ctx parameters, upgrade it while the password is at hand,
+        # unless the password was changed while it was being verified
+        await users.update_one(
+            {"_id": user["_id"], "password_hash": user.get("password_hash")},
+            {"$set": {"password_hash": new_password_hash}},
+        )
 
     return {
         "user_id": str(user["_id"]),
@@ -127,6 +135,7 @@ async def logout(refresh_token: str = Form(...)):
                 "$push": revoked_push,
             },
         )
+        await security.invalidate_session_state(token_doc.get("user_id"))
     return {"message": "Logged out successfully from this device"}
 
 
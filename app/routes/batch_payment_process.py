@@ -1,4 +1,5 @@
 import asyncio
+import os
 from typing import Optional, Any
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Depends
@@ -6,9 +7,11 @@ from pydantic import BaseModel
 from starlette import status
 from app import database
 from app.core import security
+from app.core.dashboard_rollups import refresh_payment_cashflow
+from app.core.outstanding_ledger import refresh_ap_invoice_balances
 from app.database import get_collection
 from datetime import datetime
-from app.routes.counters import create_custom_counter
+from app.routes.counters import create_custom_counter, reserve_counter_block
 
 router = APIRouter()
 batch_payment_process_collection = get_collection("batch_payment_process")
@@ -18,6 +21,9 @@ ap_invoices_items_collection = get_collection("ap_invoices_items")
 ap_payment_collection = get_collection("all_payments")
 ap_payment_invoices_collection = get_collection("all_payments_invoices")
 
+# batches posted at once by post_all_new_batch_payment_process
+BATCH_POSTING_CONCURRENCY = int(os.getenv("BATCH_POSTING_CONCURRENCY", "4"))
+
 
 class BatchPaymentProcessModel(BaseModel):
     batch_date: Optional[datetime] = None
@@ -512,6 +518,143 @@ async def search_engine_for_batch_payment_process(filter_batch: BatchSearch,
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def build_batch_posting_documents(batch: dict, items: list[dict], invoice_numbers: list[str],
+                                  payment_numbers: list[str]) -> dict[str, list[dict]]:
+    """
+    Builds the AP invoices, invoice items, payments and payment links of one batch in memory.
+    Every document gets its _id up front so the links can be written in the same insert_many round.
+    """
+    now = security.now_utc()
+    batch_id = batch["_id"]
+    company_id = batch["company_id"]
+    documents = {"ap_invoices": [], "ap_invoices_items": [], "payments": [], "payment_invoices": []}
+    for item_index, item in enumerate(items):
+        ap_invoice_id = ObjectId()
+        payment_id = ObjectId()
+        documents["ap_invoices"].append({
+            "_id": ap_invoice_id,
+            "batch_id": batch_id,
+            "company_id": company_id,
+            "reference_number": invoice_numbers[item_index],
+            "status": 'Posted',
+            "transaction_date": batch.get('batch_date', None),
+            "invoice_date": item.get('invoice_date', None),
+            "invoice_type": None,
+            "invoice_number": item.get('invoice_number', None),
+            "vendor": item.get('vendor', None),
+            "description": batch.get('note', ''),
+            "createdAt": now,
+            "updatedAt": now,
+        })
+        documents["ap_invoices_items"].append({
+            "company_id": company_id,
+            "ap_invoice_id": ap_invoice_id,
+            "transaction_type": item.get('transaction_type', None),
+            "amount": item.get('amount', 0),
+            "vat": item.get('vat', 0),
+            "job_number_id": item.get('job_number_id', None),
+            "received_number_id": item.get('received_number', None),
+            "note": item.get('note', None),
+            "createdAt": now,
+            "updatedAt": now,
+        })
+        documents["payments"].append({
+            "_id": payment_id,
+            "batch_id": batch_id,
+            "company_id": company_id,
+            "payment_type": batch.get('payment_type', None),
+            "payment_date": batch.get('batch_date', None),
+            "status": 'Posted',
+            "vendor": item.get('vendor', None),
+            "note": batch.get('note', ''),
+            "cheque_number": batch.get('cheque_number', None),
+            "account": batch.get('account', None),
+            "currency": batch.get('currency', ""),
+            "rate": batch.get('rate', 1),
+            "cheque_date": batch.get('cheque_date', None),
+            "payment_number": payment_numbers[item_index],
+            "createdAt": now,
+            "updatedAt": now,
+        })
+        documents["payment_invoices"].append({
+            "company_id": company_id,
+            "ap_invoices_id": ap_invoice_id,
+            "amount": item.get('amount', 0),
+            "payment_id": payment_id,
+            "createdAt": now,
+            "updatedAt": now,
+        })
+    return documents
+
+
+async def reserve_batch_numbers(company_id: ObjectId, count: int, session=None) -> tuple[list[str], list[str]]:
+    if count < 1:
+        return [], []
+    invoice_numbers = await reserve_counter_block(company_id, "APIN", count, prefix="AI",
+                                                  description='AP Invoice Number', session=session)
+    payment_numbers = await reserve_counter_block(company_id, "PN", count, prefix="P",
+                                                  description='AP Payments Number', session=session)
+    return invoice_numbers, payment_numbers
+
+
+async def get_batch_items(batch_ids: list[ObjectId]) -> dict[ObjectId, list[dict]]:
+    items_by_batch = {batch_id: [] for batch_id in batch_ids}
+    cursor = batch_payment_process_items_collection.find({"batch_id": {"$in": batch_ids}}).sort("_id", 1)
+    async for item in cursor:
+        items_by_batch[item["batch_id"]].append(item)
+    return items_by_batch
+
+
+async def write_batch_posting(batch_id: ObjectId, company_id: ObjectId, items: Optional[list[dict]] = None,
+                              numbers: Optional[tuple[list[str], list[str]]] = None,
+                              refresh_in_transaction: bool = True) -> dict:
+    """
+    Posts one batch in its own transaction. The status is claimed first so a batch that is
+    already Posted is never posted twice. When `numbers` is given the counters were reserved
+    by the caller; otherwise they are reserved inside the transaction.
+    """
+    async with database.client.start_session() as session:
+        try:
+            await session.start_transaction()
+            batch = await batch_payment_process_collection.find_one_and_update(
+                {"_id": batch_id, "company_id": company_id, "status": {"$ne": "Posted"}},
+                {"$set": {"status": "Posted", "updatedAt": security.now_utc()}}, session=session)
+            if not batch:
+                raise HTTPException(status_code=409, detail="Batch not found or already posted")
+            if items is None:
+                items = await batch_payment_process_items_collection.find(
+                    {"batch_id": batch_id}, session=session).sort("_id", 1).to_list(None)
+            if numbers is None:
+                numbers = await reserve_batch_numbers(company_id, len(items), session=session)
+            documents = build_batch_posting_documents(batch, items, *numbers)
+            if items:
+                await ap_invoices_collection.insert_many(documents["ap_invoices"], session=session)
+                await ap_invoices_items_collection.insert_many(documents["ap_invoices_items"], session=session)
+                await ap_payment_collection.insert_many(documents["payments"], session=session)
+                await ap_payment_invoices_collection.insert_many(documents["payment_invoices"], session=session)
+            ap_invoice_ids = [invoice["_id"] for invoice in documents["ap_invoices"]]
+            payment_ids = [payment["_id"] for payment in documents["payments"]]
+            if refresh_in_transaction:
+                await refresh_ap_invoice_balances(ap_invoice_ids, session=session)
+                await refresh_payment_cashflow(payment_ids, session=session)
+            await session.commit_transaction()
+
+        except Exception:
+            await session.abort_transaction()
+            raise
+
+    if not refresh_in_transaction:
+        # concurrent batches share vendor and cashflow totals; $inc outside a transaction cannot conflict
+        try:
+            await refresh_ap_invoice_balances(ap_invoice_ids)
+            await refresh_payment_cashflow(payment_ids)
+        except Exception as e:
+            # the batch is posted; the ledger and dashboard rebuild jobs repair the totals
+            print(f"[batch posting] totals not refreshed for {batch_id}: {e}")
+    return {"batch_id": str(batch_id), "batch_number": batch.get("batch_number"), "status": "Posted",
+            "invoices": len(items)}
+
+
 @router.post("/post_all_new_batch_payment_process")
 async def post_all_new_batch_payment_process(data: dict = Depends(security.get_current_user)):
     try:
@@ -521,17 +664,45 @@ async def post_all_new_batch_payment_process(data: dict = Depends(security.get_c
         new_batches = await batch_payment_process_collection.find({
             "company_id": company_id,
             "status": "New"
-        }).to_list(length=None)
+        }, {"batch_number": 1}).sort("_id", 1).to_list(length=None)
 
         if not new_batches:
             return {"message": "No new batches found"}
 
-        for i, row in enumerate(new_batches, start=1):
-            if row['_id']:
-                await post_batch(str(row['_id']), data=data)
-                print(i)
-
-        return {"message": f"{len(new_batches)} batches processed successfully"}
+        batch_ids = [row["_id"] for row in new_batches]
+        items_by_batch = await get_batch_items(batch_ids)
+
+        # one counter round trip for every batch; each batch then takes its own slice
+        invoice_numbers, payment_numbers = await reserve_batch_numbers(
+            company_id, sum(len(items) for items in items_by_batch.values()))
+        numbers_by_batch = {}
+        start = 0
+        for batch_id in batch_ids:
+            end = start + len(items_by_batch[batch_id])
+            numbers_by_batch[batch_id] = (invoice_numbers[start:end], payment_numbers[start:end])
+            start = end
+
+        semaphore = asyncio.Semaphore(BATCH_POSTING_CONCURRENCY)
+
+        async def post_one(row: dict) -> dict:
+            async with semaphore:
+                try:
+                    return await write_batch_posting(row["_id"], company_id, items_by_batch[row["_id"]],
+                                                     numbers_by_batch[row["_id"]], refresh_in_transaction=False)
+                except Exception as e:
+                    error = e.detail if isinstance(e, HTTPException) else str(e)
+                    print(f"[batch posting] {row.get('batch_number')}: {error}")
+                    return {"batch_id": str(row["_id"]), "batch_number": row.get("batch_number"), "status": "Failed",
+                            "error": error}
+
+        results = await asyncio.gather(*[post_one(row) for row in new_batches])
+        posted = sum(1 for result in results if result["status"] == "Posted")
+        return {
+            "message": f"{posted} of {len(new_batches)} batches posted successfully",
+            "posted": posted,
+            "failed": len(new_batches) - posted,
+            "results": results,
+        }
 
     except Exception as e:
         print(e)
@@ -540,92 +711,12 @@ async def post_all_new_batch_payment_process(data: dict = Depends(security.get_c
 
 @router.post("/post_batch/{batch_id}")
 async def post_batch(batch_id: str, data: dict = Depends(security.get_current_user)):
-    async with database.client.start_session() as session:
-        try:
-            await session.start_transaction()
-            company_id = ObjectId(data.get("company_id"))
-            batch_id = ObjectId(batch_id)
-            current_batch = await get_batch_payment_process_details(str(batch_id))
-            current_batch_details = current_batch['batch_details']
-            items_details = current_batch_details.get('items_details', [])
-            if items_details:
-                for item in items_details:
-                    new_invoice_counter = await create_custom_counter("APIN", "AI", description='AP Invoice Number',
-                                                                      data=data,
-                                                                      session=session)
-                    ap_invoice_dict = {
-                        "batch_id": batch_id,
-                        "company_id": company_id,
-                        "reference_number": new_invoice_counter['final_counter'] if new_invoice_counter[
-                            'success'] else None,
-                        "status": 'Posted',
-                        "transaction_date": current_batch_details.get('batch_date', None),
-                        "invoice_date": item.get('invoice_date', None),
-                        "invoice_type": None,
-                        "invoice_number": item.get('invoice_number', None),
-                        "vendor": ObjectId(item['vendor']) if 'vendor' in item else None,
-                        "description": current_batch_details.get('note', ''),
-                        "createdAt": security.now_utc(),
-                        "updatedAt": security.now_utc(),
-                    }
-                    new_ap_invoice = await ap_invoices_collection.insert_one(ap_invoice_dict, session=session)
-                    ap_invoice_id = new_ap_invoice.inserted_id
-
-                    ap_invoice_item_dict = {
-                        "company_id": company_id,
-                        "ap_invoice_id": ap_invoice_id,
-                        "transaction_type": ObjectId(item['transaction_type']) if 'transaction_type' in item else None,
-                        "amount": item.get('amount', 0),
-                        "vat": item.get('vat', 0),
-                        "job_number_id": ObjectId(item['job_number_id']) if 'job_number_id' in item else None,
-                        "received_number_id": ObjectId(item['received_number']) if 'received_number' in item else None,
-                        "note": item.get('note', None),
-                        "createdAt": security.now_utc(),
-                        "updatedAt": security.now_utc(),
-                    }
-                    await ap_invoices_items_collection.insert_one(ap_invoice_item_dict, session=session)
-
-                    new_payment_counter = await create_custom_counter("PN", "P", description='AP Payments Number',
-                                                                      data=data,
-                                                                      session=session)
-
-                    ap_payment_dict = {
-                        "batch_id": batch_id,
-                        "company_id": company_id,
-                        "payment_type": ObjectId(
-                            current_batch_details['payment_type']) if 'payment_type' in current_batch_details else None,
-                        "payment_date": current_batch_details.get('batch_date', None),
-                        "status": 'Posted',
-                        "vendor": ObjectId(item['vendor']) if 'vendor' in item else None,
-                        "note": current_batch_details.get('note', ''),
-                        "cheque_number": current_batch_details.get('cheque_number', None),
-                        "account": ObjectId(
-                            current_batch_details['account']) if 'account' in current_batch_details else None,
-                        "currency": current_batch_details.get('currency', ""),
-                        "rate": current_batch_details.get('rate', 1),
-                        "cheque_date": current_batch_details.get('cheque_date', None),
-                        "payment_number": new_payment_counter['final_counter'] if new_payment_counter[
-                            'success'] else None,
-                        "createdAt": security.now_utc(),
-                        "updatedAt": security.now_utc(),
-                    }
-                    new_payment = await ap_payment_collection.insert_one(ap_payment_dict, session=session)
-
-                    ap_payment_invoice_dict = {
-                        "company_id": company_id,
-                        "ap_invoices_id": new_ap_invoice.inserted_id,
-                        "amount": item.get('amount', 0),
-                        "payment_id": new_payment.inserted_id,
-                        "createdAt": security.now_utc(),
-                        "updatedAt": security.now_utc(),
-                    }
-                    await ap_payment_invoices_collection.insert_one(ap_payment_invoice_dict, session=session)
-            await batch_payment_process_collection.update_one({"_id": batch_id}, {
-                "$set": {"status": "Posted", "updatedAt": security.now_utc()}}, session=session)
-            await session.commit_transaction()
-            return {"status": "Posted"}
-
+    try:
+        company_id = ObjectId(data.get("company_id"))
+        await write_batch_posting(ObjectId(batch_id), company_id)
+        return {"status": "Posted"}
 
-        except Exception as e:
-            await session.abort_transaction()
-            raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
@@ -3,6 +3,7 @@ from bson import ObjectId
 from fastapi import APIRouter, Body, HTTPException, Depends
 from pymongo import ReturnDocument
 from app.core import security
+from app.core.reference_cache import invalidate_reference
 from app.database import get_collection
 from datetime import datetime, timezone
 from app.websocket_config import manager
@@ -188,6 +189,7 @@ async def update_branch(branch_id: str, name: str = Body(None), code: str = Body
                       "city_id": ObjectId(city_id),
                       "updatedAt": datetime.now(timezone.utc), }},
         )
+        await invalidate_reference("branches", branch_id)
         if not result:
             raise HTTPException(status_code=404, detail="Branch not found")
 
@@ -212,6 +214,7 @@ async def change_branch_status(branch_id: str, status: bool = Body(None),
             {"_id": ObjectId(branch_id)}, {"$set": {"status": status, "updatedAt": datetime.now(timezone.utc), }},
             return_document=ReturnDocument.AFTER
         )
+        await invalidate_reference("branches", branch_id)
         if not result:
             raise HTTPException(status_code=404, detail="Branch not found")
         await manager.send_to_company(str(company_id), {
@@ -227,6 +230,7 @@ async def delete_branch(branch_id: str, data: dict = Depends(security.get_curren
     try:
         company_id = data.get("company_id")
         result = await branches_collection.delete_one({"_id": ObjectId(branch_id)})
+        await invalidate_reference("branches", branch_id)
         if result.deleted_count == 1:
             await manager.send_to_company(str(company_id), {
                 "type": "branch_deleted",
@@ -3,6 +3,7 @@ from typing import Optional
 from fastapi import APIRouter, Body, Depends
 
 from app.core import security
+from app.core.reference_cache import invalidate_reference
 from app.database import get_collection
 from app.widgets import upload_images
 from app.websocket_config import manager
@@ -117,6 +118,7 @@ async def update_brand(brand_id: str, name: str | None = Form(None), logo: Uploa
 
     brand_data['updatedAt'] = datetime.now(timezone.utc)
     await brands_collection.update_one({"_id": ObjectId(brand_id)}, {"$set": brand_data})
+    await invalidate_reference("all_brands", brand_id)
     brand_data['_id'] = ObjectId(brand_id)
     brand_data['createdAt'] = brand['createdAt']
     brand_data["status"] = brand.get("status", True)
@@ -149,6 +151,7 @@ async def delete_brand(brand_id: str, data: dict = Depends(security.get_current_
 
         # Delete the brand document regardless of logo
         result = await brands_collection.delete_one({"_id": ObjectId(brand_id)})
+        await invalidate_reference("all_brands", brand_id)
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Brand not found")
 
@@ -172,6 +175,7 @@ async def edit_brand_status(brand_id: str, status: bool = Body(..., embed=True),
     company_id = data.get("company_id")
     result = await brands_collection.update_one(
         {"_id": ObjectId(brand_id)}, {"$set": {"status": status, "updatedAt": datetime.now(timezone.utc)}})
+    await invalidate_reference("all_brands", brand_id)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Brand not found")
 
@@ -229,6 +233,7 @@ async def edit_model_status(model_id: str, status: bool = Body(..., embed=True),
     company_id = data.get("company_id")
     result = await models_collection.update_one({"_id": ObjectId(model_id)},
                                                 {"$set": {"status": status, "updatedAt": datetime.now(timezone.utc)}})
+    await invalidate_reference("all_brand_models", model_id)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Model not found")
 
@@ -247,6 +252,7 @@ async def delete_model(model_id: str, data: dict = Depends(security.get_current_
     try:
         company_id = data.get("company_id")
         await models_collection.delete_one({"_id": ObjectId(model_id)})
+        await invalidate_reference("all_brand_models", model_id)
         await manager.send_to_company(company_id, {
             "type": "model_deleted",
             "data": {"_id": model_id}
@@ -266,6 +272,7 @@ async def edit_model(model_id: str, name: str = Body(..., embed=True), data: dic
         {"$set": {"updatedAt": datetime.now(timezone.utc), "name": name}},
         return_document=ReturnDocument.AFTER  # بترجع المستند بعد التعديل
     )
+    await invalidate_reference("all_brand_models", model_id)
 
     if not updated_model:
         raise HTTPException(status_code=404, detail="Model not found")
@@ -9,6 +9,7 @@ from pymongo.errors import PyMongoError
 
 from app import database
 from app.core import security
+from app.core.bson_json import BsonJSONResponse
 from app.routes.counters import create_custom_counter
 from app.websocket_config import manager
 
@@ -16,8 +17,6 @@ from .common import (
     all_trades_collection,
     all_trades_items_collection,
     all_trades_purchase_agreement_items_collection,
-    car_trade_search_serializer,
-    ensure_car_trading_indexes,
     ensure_trade_belongs_to_company,
     exclusive_date_end,
     parse_object_id,
@@ -727,7 +726,6 @@ async def search_engine_for_car_trading(
         data: dict = Depends(security.get_current_user)
 ):
     try:
-        await ensure_car_trading_indexes()
         company_id = ObjectId(data.get("company_id"))
         match_stage: Any = {"company_id": company_id}
         if filter_trades.trade_id:
@@ -1077,7 +1075,7 @@ async def search_engine_for_car_trading(
         results = await cursor.to_list(None)
 
         if results:
-            return [car_trade_search_serializer(r) for r in results]
+            return BsonJSONResponse(results)
         return [{"trades": [], "grand_total_pay": 0, "grand_total_receive": 0, "grand_net": 0}]
 
     except Exception as e:
@@ -16,33 +16,6 @@ all_capitals_collection = get_collection("all_capitals")
 all_outstanding_collection = get_collection("all_outstanding")
 all_general_expenses_collection = get_collection("all_general_expenses")
 all_trades_transfers_collection = get_collection("all_trades_transfers")
-car_trading_indexes_ready = False
-
-
-async def ensure_car_trading_indexes():
-    global car_trading_indexes_ready
-    if car_trading_indexes_ready:
-        return
-
-    trade_filter_indexes = [
-        [("company_id", 1), ("status", 1)],
-        [("company_id", 1), ("car_brand", 1)],
-        [("company_id", 1), ("car_model", 1)],
-        [("company_id", 1), ("specification", 1)],
-        [("company_id", 1), ("engine_size", 1)],
-        [("company_id", 1), ("bought_from", 1)],
-        [("company_id", 1), ("bought_by", 1)],
-        [("company_id", 1), ("sold_by", 1)],
-        [("company_id", 1), ("sold_to", 1)],
-        [("company_id", 1), ("invested_by", 1)],
-        [("company_id", 1), ("consignment_for", 1)],
-    ]
-    for index in trade_filter_indexes:
-        await all_trades_collection.create_index(index)
-
-    await all_trades_items_collection.create_index([("trade_id", 1), ("company_id", 1)])
-    await all_trades_purchase_agreement_items_collection.create_index([("trade_id", 1), ("company_id", 1)])
-    car_trading_indexes_ready = True
 
 
 def bson_serializer(obj):
@@ -57,10 +30,6 @@ def bson_serializer(obj):
     return obj
 
 
-def car_trade_search_serializer(trade: dict) -> dict:
-    return bson_serializer(trade)
-
-
 def parse_object_id(value: Any, field_name: str = "id") -> ObjectId:
     if value in (None, ""):
         raise HTTPException(status_code=400, detail=f"{field_name} is required")
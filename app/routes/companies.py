@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile,
 from pymongo.errors import DuplicateKeyError, PyMongoError
 from app import database
 from app.core import security
+from app.core.passwords import password_hasher
 from app.database import get_collection
 from app.websocket_config import manager
 from app.widgets import upload_images
@@ -35,6 +36,7 @@ COMPANY_SCOPED_COLLECTION_NAMES = [
     "all_trades_items",
     "all_trades_purchase_agreement_items",
     "all_trades_transfers",
+    "ap_invoice_balances",
     "ap_invoices",
     "ap_invoices_items",
     "ap_payment_types",
@@ -44,11 +46,13 @@ COMPANY_SCOPED_COLLECTION_NAMES = [
     "batch_payment_process",
     "batch_payment_process_items",
     "branches",
+    "cashflow_daily_stats",
     "company_mail_oauth_states",
     "company_mail_settings",
     "converters",
     "counters",
     "currencies",
+    "dashboard_rollup_entries",
     "employees",
     "employees_address",
     "employees_bank_accounts",
@@ -60,6 +64,7 @@ COMPANY_SCOPED_COLLECTION_NAMES = [
     "employees_nationality",
     "employees_payrolls",
     "employees_phone",
+    "entity_balances",
     "entity_information",
     "favourite_screens",
     "inventory_items",
@@ -67,13 +72,17 @@ COMPANY_SCOPED_COLLECTION_NAMES = [
     "issuing",
     "issuing_converters_details",
     "issuing_items_details",
+    "job_balances",
     "job_cards",
+    "job_cards_daily_stats",
     "job_cards_internal_notes",
     "job_cards_invoice_items",
     "job_cards_inspection_reports",
+    "jobs",
     "leave_types",
     "legislations",
     "loan_and_advances_types",
+    "mail_messages",
     "payroll",
     "payroll_elements",
     "payroll_elements_based_elements",
@@ -88,6 +97,8 @@ COMPANY_SCOPED_COLLECTION_NAMES = [
     "receiving",
     "receiving_items",
     "sales_man",
+    "stock_movements",
+    "stock_on_hand",
     "system_variables",
     "time_sheets",
     "to_do_list",
@@ -527,7 +538,7 @@ async def register_company(
                 "company_id": res_company.inserted_id,
                 "email": payload["admin_email"],
                 "user_name": payload["admin_name"],
-                "password_hash": security.pwd_ctx.hash(payload["admin_password"]),
+                "password_hash": await password_hasher.hash(payload["admin_password"]),
                 "roles": payload["roles"],
                 "status": True,
                 "expiry_date": security.one_month_from_now_utc(),
@@ -653,7 +664,7 @@ async def update_company(company_id: str, user_id: str, company_name: str = Form
                 "city": payload["city"],
             }
             if payload["admin_password"]:
-                owner_doc["password_hash"] = security.pwd_ctx.hash(payload["admin_password"])
+                owner_doc["password_hash"] = await password_hasher.hash(payload["admin_password"])
             await users_collection.update_one({"_id": target_user_id}, {"$set": owner_doc}, session=s)
             await s.commit_transaction()
 
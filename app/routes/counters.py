@@ -1,6 +1,7 @@
 from bson import ObjectId
 from fastapi import APIRouter, Body, HTTPException, Depends
 from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from app.core import security
 from app.database import get_collection
 from datetime import datetime, timezone
@@ -141,6 +142,60 @@ from bson import ObjectId
 from typing import Optional
 
 
+COUNTER_DEFAULT_LENGTH = 5
+COUNTER_DEFAULT_SEPARATOR = "-"
+MAX_COUNTER_BLOCK_SIZE = 10000
+
+
+def format_counter(prefix: str, separator: str, value: int, length: int) -> str:
+    return f"{prefix}{separator}{str(value).rjust(length, '0')}"
+
+
+async def reserve_counter_block(company_id: ObjectId, code: str, count: int = 1, prefix: Optional[str] = None,
+                                description: Optional[str] = None, session: Optional[object] = None) -> list[str]:
+    """
+    Atomically allocates `count` consecutive numbers of a counter in one round trip
+    and returns them formatted. The counter is created on first use.
+    """
+    if count < 1 or count > MAX_COUNTER_BLOCK_SIZE:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {MAX_COUNTER_BLOCK_SIZE}")
+
+    update_query = {
+        "$inc": {"value": count},
+        "$set": {"updatedAt": security.now_utc()},
+        "$setOnInsert": {
+            "description": description if description else f"{code} Number",
+            "prefix": prefix or "",
+            "length": COUNTER_DEFAULT_LENGTH,
+            "separator": COUNTER_DEFAULT_SEPARATOR,
+            "createdAt": security.now_utc(),
+            "status": True,
+        },
+    }
+    query = {"company_id": company_id, "code": code}
+    try:
+        counter = await counters_collection.find_one_and_update(
+            query, update_query, upsert=True, return_document=ReturnDocument.AFTER, session=session
+        )
+    except DuplicateKeyError:
+        # another request created the counter between our match and insert. Inside a transaction the
+        # failed write already aborted it, so the caller has to retry the whole transaction
+        if session is not None:
+            raise
+        counter = await counters_collection.find_one_and_update(
+            query, update_query, upsert=True, return_document=ReturnDocument.AFTER, session=session
+        )
+
+    last_value = counter.get("value", count)
+    length = counter.get("length", COUNTER_DEFAULT_LENGTH)
+    counter_prefix = counter.get("prefix", "")
+    separator = counter.get("separator", COUNTER_DEFAULT_SEPARATOR)
+    return [
+        format_counter(counter_prefix, separator, value, length)
+        for value in range(last_value - count + 1, last_value + 1)
+    ]
+
+
 @router.post("/create_custom_counter")
 async def create_custom_counter(
         code: str = Body(...),
@@ -152,69 +207,35 @@ async def create_custom_counter(
 ):
     try:
         company_id = ObjectId(data.get("company_id"))
-        query = {
-            "company_id": company_id,
-            "code": code
-        }
+        counters = await reserve_counter_block(company_id, code, 1, prefix=prefix, description=description,
+                                               session=session)
 
-        # 👇 find existing counter
-        result = await counters_collection.find_one(query,
-                                                    session=session) if session else await counters_collection.find_one(
-            query)
+        return {
+            "success": True,
+            "final_counter": counters[0],
+        }
 
-        final_counter = ""
-        separator = "-"
-        description = description if description else f"{code} Number"
+    except HTTPException:
+        raise
+    except Exception as error:
+        raise HTTPException(status_code=500, detail=str(error))
 
-        if not result:
-            initial_value = 1
-            new_counter_dict = {
-                "code": code,
-                "description": description,
-                "prefix": prefix or "",
-                "value": initial_value,
-                "length": 5,
-                "separator": separator,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-                "company_id": company_id,
-                "status": True,
-            }
-
-            # 👇 insert with or without session
-            if session:
-                await counters_collection.insert_one(new_counter_dict, session=session)
-            else:
-                await counters_collection.insert_one(new_counter_dict)
-
-            final_counter = f"{prefix or ''}{separator}{str(initial_value).rjust(new_counter_dict['length'], '0')}"
 
-        else:
-            counter_id = result["_id"]
-            current_value = result.get("value", 0)
-            next_value = current_value + 1
-            length = result.get("length", 5)
-            prefix = result.get("prefix", "")
-            separator = result.get("separator", "-")
-
-            final_counter = f"{prefix}{separator}{str(next_value).rjust(length, '0')}"
-
-            update_query = {
-                "$set": {
-                    "value": next_value,
-                    "updatedAt": security.now_utc()
-                }
-            }
-
-            # 👇 update with or without session
-            if session:
-                await counters_collection.update_one({"_id": ObjectId(counter_id)}, update_query, session=session)
-            else:
-                await counters_collection.update_one({"_id": ObjectId(counter_id)}, update_query)
+@router.post("/reserve_counter_block")
+async def reserve_counter_block_route(
+        code: str = Body(...),
+        count: int = Body(...),
+        prefix: str = Body(None),
+        description: str = Body(None),
+        data: dict = Depends(security.get_current_user),
+):
+    try:
+        company_id = ObjectId(data.get("company_id"))
+        counters = await reserve_counter_block(company_id, code, count, prefix=prefix, description=description)
 
         return {
             "success": True,
-            "final_counter": final_counter,
+            "counters": counters,
         }
 
     except HTTPException:
@@ -4,6 +4,7 @@ from typing import Optional
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Form, File, UploadFile, Body, Depends
 from app.core import security
+from app.core.reference_cache import invalidate_reference
 from app.database import get_collection
 from datetime import datetime, timezone
 from app.widgets import upload_images
@@ -93,6 +94,7 @@ async def change_country_status(country_id: str, status: bool = Body(..., embed=
             {"$set": {"status": status, "updatedAt": datetime.now(timezone.utc)}},
             return_document=ReturnDocument.AFTER
         )
+        await invalidate_reference("all_countries", country_id)
 
         if not updated_country:
             raise HTTPException(status_code=404, detail="Country not found")
@@ -129,6 +131,7 @@ async def delete_country(country_id: str, _: dict = Depends(security.get_current
 
         # Delete the country document
         result = await countries_collection.delete_one({"_id": ObjectId(country_id)})
+        await invalidate_reference("all_countries", country_id)
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Country not found")
 
@@ -185,6 +188,7 @@ async def update_country(country_id: str, name: str | None = Form(None), flag: U
 
         country["updatedAt"] = datetime.now(timezone.utc)
         await countries_collection.update_one({"_id": ObjectId(country_id)}, {"$set": country})
+        await invalidate_reference("all_countries", country_id)
 
         serialized = country_serializer(country)
 
@@ -242,6 +246,7 @@ async def change_city_status(city_id: str, status: bool = Body(..., embed=True),
             {"$set": {"available": status, "updatedAt": datetime.now(timezone.utc)}},
             return_document=ReturnDocument.AFTER
         )
+        await invalidate_reference("all_countries_cities", city_id)
 
         if not updated_city:
             raise HTTPException(status_code=404, detail="City not found")
@@ -278,6 +283,7 @@ async def update_city(city_id: str, name: str | None = Form(None),
 
         city["updatedAt"] = datetime.now(timezone.utc)
         await cities_collection.update_one({"_id": ObjectId(city_id)}, {"$set": city})
+        await invalidate_reference("all_countries_cities", city_id)
 
         serialized = city_serializer(city)
 
@@ -298,6 +304,7 @@ async def update_city(city_id: str, name: str | None = Form(None),
 async def delete_city(city_id: str, _: dict = Depends(security.get_current_user)):
     try:
         result = await cities_collection.delete_one({"_id": ObjectId(city_id)})
+        await invalidate_reference("all_countries_cities", city_id)
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="City not found")
         else:
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from pymongo.errors import DuplicateKeyError
 
 from app.core import security
+from app.core.reference_cache import invalidate_reference
 from app.database import get_collection
 from datetime import datetime
 from app.websocket_config import manager
@@ -154,6 +155,7 @@ async def update_currency(currency_id: str, currency: Currencies, data: dict = D
         currency_id = ObjectId(currency_id)
         await currencies_collection.update_one(
             {"_id": currency_id}, {"$set": currency})
+        await invalidate_reference("currencies", currency_id)
         updated_currency = await get_currency_details(currency_id)
         serialized = serializer(updated_currency)
         await manager.send_to_company(company_id, {
@@ -173,6 +175,7 @@ async def delete_currency(currency_id: str, data: dict = Depends(security.get_cu
     try:
         company_id = data.get("company_id")
         result = await currencies_collection.delete_one({"_id": ObjectId(currency_id)})
+        await invalidate_reference("currencies", currency_id)
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Salesman not found")
 
@@ -194,6 +197,7 @@ async def change_user_status(currency_id: str, status: bool = Body(None),
         await currencies_collection.update_one(
             {"_id": ObjectId(currency_id)}, {"$set": {"status": status, "updatedAt": security.now_utc()}},
         )
+        await invalidate_reference("currencies", currency_id)
 
         await manager.send_to_company(company_id, {
             "type": "currency_status_updated",
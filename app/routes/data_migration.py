@@ -1,10 +1,16 @@
 from datetime import timedelta, datetime
-from typing import Any, Optional
+from typing import Optional
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from app.core import security
+from app.core.jobs import JobContext, register_job_type, submit_job
+from app.core.dashboard_rollups import rebuild_dashboard_rollups
+from app.core.outstanding_ledger import reconcile_outstanding_ledger
+from app.core.search_index import set_search_keys
+from app.core.stock_ledger import rebuild_stock_ledger
 from app.database import get_collection
 import math
+import os
 
 from app.routes.ap_payment_types import APPaymentTypes, add_new_ap_payment_type
 from app.routes.banks_and_others import BanksModel, add_new_bank
@@ -16,10 +22,15 @@ from app.routes.invoice_items import InvoiceItem, add_new_invoice_item
 from app.routes.job_tasks import JobTaskModel, add_new_job_task
 from app.routes.list_of_values import add_new_value
 from app.routes.salesman import add_new_salesman, SaleManModel
+from app.widgets.job_card_dates import set_job_card_date_field_to_filter
 import pandas as pd
 from io import BytesIO
 
-from app.websocket_config import manager
+from app.routes.data_migration_widgets.import_pipeline import ImportReport, BulkInserter, ImportProgress, \
+    create_missing, insert_new_documents
+from app.routes.data_migration_widgets.column_batches import read_import_batches
+from app.routes.data_migration_widgets.import_schemas import JOB_CARDS_SCHEMA, JOB_CARDS_ITEMS_SCHEMA, \
+    AR_RECEIPTS_SCHEMA, AR_RECEIPTS_INVOICES_SCHEMA, AP_INVOICES_SCHEMA
 
 router = APIRouter()
 job_cards_collection = get_collection("job_cards")
@@ -174,46 +185,167 @@ async def get_currencies(company_id: ObjectId):
     return results
 
 
+async def get_import_rows(file: UploadFile | bytes, fill_na: bool = True, lower_columns: bool = False,
+                          date_cols: Optional[list[str]] = None):
+    # background imports hand over the spooled file contents instead of the upload
+    contents = file if isinstance(file, bytes) else await file.read()
+    df = pd.read_excel(BytesIO(contents))
+    if fill_na:
+        df = df.fillna("")
+    if lower_columns:
+        df.columns = df.columns.str.strip().str.lower()
+    for col in date_cols or []:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df, list(df.itertuples(index=False))
+
+
+async def create_missing_banks(existing_banks: dict, account_numbers, report: ImportReport, data: dict):
+    uae_country_doc = await countries_collection.find_one({"code": "UAE"})
+    uae_currency_doc = await currencies_collection.find_one({"country_id": uae_country_doc["_id"]})
+    account_types_bank_doc = await value_collection.find_one({"name": "Bank"})
+
+    async def create(account_number: str):
+        account_model = BanksModel(
+            account_name=account_number,
+            account_number=account_number,
+            currency_id=str(uae_currency_doc["_id"]),
+            account_type_id=str(account_types_bank_doc["_id"])
+        )
+        new_account = await add_new_bank(bank=account_model, data=data)
+        return ObjectId(new_account['account']['_id'])
+
+    await create_missing(existing_banks, account_numbers, create, report, "banks")
+
+
+async def create_missing_ap_payment_types(existing_ap_payment_types: dict, types, report: ImportReport, data: dict):
+    async def create(key: str):
+        new_ap_payment_type = await add_new_ap_payment_type(types=APPaymentTypes(type=key), data=data)
+        return new_ap_payment_type['type']['_id']
+
+    await create_missing(existing_ap_payment_types, types, create, report, "ap payment types")
+
+
+async def create_missing_inventory_items(existing_inventory_items: dict, items: dict, report: ImportReport,
+                                         data: dict):
+    # items: name -> code
+    async def create(name: str):
+        item_model = InventoryItem(name=name, code=items[name], min_quantity=0)
+        new_item = await add_new_inventory_item(inventory_item=item_model, data=data)
+        return ObjectId(new_item['item']['_id'])
+
+    await create_missing(existing_inventory_items, items.keys(), create, report, "inventory items")
+
+
+async def create_missing_vendors(existing_vendors: dict, vendor_names, company_id: ObjectId,
+                                 report: ImportReport):
+    new_vendors = []
+    for vendor_name in dict.fromkeys(vendor_names):
+        if vendor_name and vendor_name not in existing_vendors:
+            vendor_doc = build_entity_doc(entity_name=vendor_name,
+                                          entity_code='Vendor',
+                                          credit_limit=0,
+                                          warranty_days=0,
+                                          salesman_id=None,
+                                          entity_status='Company',
+                                          group_name="",
+                                          industry_id=None,
+                                          trn="",
+                                          entity_type_id=None,
+                                          entity_address=[],
+                                          entity_phone=[],
+                                          entity_social=[],
+                                          company_id=company_id,
+                                          lpo_required="N")
+            existing_vendors[vendor_name] = vendor_doc
+            new_vendors.append(vendor_doc)
+    await insert_new_documents(entity_information_collection, new_vendors, report, "vendors")
+
+
 # =========================== main function section ===========================
+import_screen_names = ['job cards', 'job cards invoice items', 'ar receipts', 'ar receipts items', 'ap invoices',
+                       'receiving', 'receiving items', 'time sheets', 'converters', 'issuing header',
+                       'issuing items details', 'issuing converters details', 'account transfers',
+                       'batch payment process', 'batch payment items process']
+# imports write straight to the source collections, the ledger / dashboard stats are rebuilt after them
+ledger_screen_names = ['job cards', 'job cards invoice items', 'ar receipts', 'ar receipts items', 'ap invoices']
+dashboard_screen_names = ledger_screen_names + ['account transfers']
+stock_screen_names = ['receiving', 'receiving items', 'issuing header', 'issuing items details']
+IMPORT_JOB_CONCURRENCY = int(os.getenv("IMPORT_JOB_CONCURRENCY", "1"))
+
+
 @router.post('/get_file')
 async def get_file(file: UploadFile = File(...), screen_name: str = Form(...),
                    delete_every_thing: bool = Form(...),
                    data: dict = Depends(security.get_current_user)):
+    try:
+        if screen_name.lower() not in import_screen_names:
+            raise HTTPException(status_code=400, detail=f"Unknown screen name: {screen_name}")
+        contents = await file.read()
+        job = await submit_job("data_migration", data,
+                               payload={"screen_name": screen_name, "delete_every_thing": delete_every_thing},
+                               files={"import.xlsx": contents},
+                               description=f"Import {screen_name}")
+        return {"job": job}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def run_import_job(job: JobContext):
+    file = await job.read_file("import.xlsx")
+    return await run_import(job.payload["screen_name"], file, job.user_data, job.payload["delete_every_thing"])
+
+
+register_job_type("data_migration", run_import_job, concurrency=IMPORT_JOB_CONCURRENCY)
+
+
+async def run_import(screen_name: str, file: UploadFile | bytes, data: dict, delete_every_thing: bool):
     try:
         print(delete_every_thing)
+        report = None
         if screen_name.lower() == 'job cards':
-            await dealing_with_job_cards(file, data, delete_every_thing)
+            report = await dealing_with_job_cards(file, data, delete_every_thing)
         elif screen_name.lower() == 'job cards invoice items':
-            await dealing_with_job_cards_items(file, data, delete_every_thing)
+            report = await dealing_with_job_cards_items(file, data, delete_every_thing)
         elif screen_name.lower() == 'ar receipts':
-            await dealing_with_ar_receipts(file, data, delete_every_thing)
+            report = await dealing_with_ar_receipts(file, data, delete_every_thing)
         elif screen_name.lower() == 'ar receipts items':
-            await dealing_with_ar_receipts_invoices(file, data, delete_every_thing)
+            report = await dealing_with_ar_receipts_invoices(file, data, delete_every_thing)
         elif screen_name.lower() == 'ap invoices':
-            await dealing_with_ap_invoices(file, data, delete_every_thing)
+            report = await dealing_with_ap_invoices(file, data, delete_every_thing)
         elif screen_name.lower() == 'receiving':
-            await dealing_with_receiving_header(file, data, delete_every_thing)
+            report = await dealing_with_receiving_header(file, data, delete_every_thing)
         elif screen_name.lower() == 'receiving items':
-            await dealing_with_receiving_items(file, data, delete_every_thing)
+            report = await dealing_with_receiving_items(file, data, delete_every_thing)
         elif screen_name.lower() == 'time sheets':
-            await dealing_with_time_sheets(file, data, delete_every_thing)
+            report = await dealing_with_time_sheets(file, data, delete_every_thing)
         elif screen_name.lower() == 'converters':
-            await dealing_with_converters(file, data, delete_every_thing)
+            report = await dealing_with_converters(file, data, delete_every_thing)
         elif screen_name.lower() == 'issuing header':
-            await dealing_with_issuing_header(file, data, delete_every_thing)
+            report = await dealing_with_issuing_header(file, data, delete_every_thing)
         elif screen_name.lower() == 'issuing items details':
-            await dealing_with_issuing_items_details(file, data, delete_every_thing)
+            report = await dealing_with_issuing_items_details(file, data, delete_every_thing)
         elif screen_name.lower() == 'issuing converters details':
-            await dealing_with_issuing_converters_details(file, data, delete_every_thing)
+            report = await dealing_with_issuing_converters_details(file, data, delete_every_thing)
         elif screen_name.lower() == 'account transfers':
-            await dealing_with_account_transfers(file, data, delete_every_thing)
+            report = await dealing_with_account_transfers(file, data, delete_every_thing)
         elif screen_name.lower() == 'batch payment process':
-            await dealing_with_batch_payment_process(file, data, delete_every_thing)
+            report = await dealing_with_batch_payment_process(file, data, delete_every_thing)
         elif screen_name.lower() == 'batch payment items process':
-            await dealing_with_batch_payment_items_process(file, data, delete_every_thing)
-
-
-
+            report = await dealing_with_batch_payment_items_process(file, data, delete_every_thing)
+        if report is not None and screen_name.lower() in ledger_screen_names:
+            report["outstanding_ledger"] = await reconcile_outstanding_ledger(ObjectId(data.get("company_id")))
+        if report is not None and screen_name.lower() in dashboard_screen_names:
+            report["dashboard_rollups"] = await rebuild_dashboard_rollups(ObjectId(data.get("company_id")))
+        if report is not None and screen_name.lower() in stock_screen_names:
+            report["stock_ledger"] = await rebuild_stock_ledger(ObjectId(data.get("company_id")))
+        return report
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -226,10 +358,9 @@ async def dealing_with_batch_payment_items_process(file, data, delete_every_thin
         if delete_every_thing:
             await batch_payment_process_items_collection.delete_many({'company_id': company_id})
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
+        df, rows = await get_import_rows(file)
         total_rows = len(df)
+        report = ImportReport("batch payment items process", total_rows)
 
         try:
             existing_vendors = {b['entity_name'].strip(): b for b in
@@ -238,11 +369,13 @@ async def dealing_with_batch_payment_items_process(file, data, delete_every_thin
             print("got existing_vendors")
 
             existing_job_cards = {b.get("job_id", None): ObjectId(b["_id"]) for b in
-                                  await job_cards_collection.find({"company_id": company_id}).to_list()}
+                                  await job_cards_collection.find({"company_id": company_id},
+                                                                  {"job_id": 1}).to_list()}
             print("got existing_job_cards")
 
             existing_receiving = {str(b.get("receiving_id", None)): ObjectId(b["_id"]) for b in
-                                  await job_cards_collection.find({"company_id": company_id}).to_list()}
+                                  await job_cards_collection.find({"company_id": company_id},
+                                                                  {"receiving_id": 1}).to_list()}
             print("got existing_receiving")
 
             existing_ap_payment_types = {b["type"].capitalize().strip(): b["_id"] for b in
@@ -259,156 +392,71 @@ async def dealing_with_batch_payment_items_process(file, data, delete_every_thin
             print("Error while loading existing data:", e)
             raise
 
-        await manager.broadcast({"type": "start", "total": total_rows})
+        await create_missing_vendors(existing_vendors, [str(row[3]).strip() for row in rows if row[3]], company_id,
+                                     report)
+        await create_missing_ap_payment_types(existing_ap_payment_types,
+                                              [str(row[4]).capitalize().strip() for row in rows if row[4]],
+                                              report, data)
+
+        items_inserter = BulkInserter(batch_payment_process_items_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
 
         # ===== MAIN LOOP =====
-        for i, row in enumerate(df.itertuples(index=False), start=1):
+        for i, row in enumerate(rows, start=1):
             try:
-                print(f"\nProcessing row {i}")
-
-                try:
-                    reference_number = normalize_number_to_string(row[0])
-                    invoice_number = normalize_number_to_string(row[1])
-                    # invoice_date = to_mongo_datetime(row[2]) if row[2] else None
-                    vendor = row[3]
-                    transaction_type = row[4]
-                    amount = safe_float(row[5])
-                    vat = safe_float(row[6])
-                    job_id = normalize_number_to_string(row[7])
-                    received_number = normalize_number_to_string(row[8])
-                    note = row[9]
-                except Exception as e:
-                    print(f"[Row {i}] Error parsing row: {e}")
-                    print("Row Data:", row)
-                    raise
+                reference_number = normalize_number_to_string(row[0])
+                invoice_number = normalize_number_to_string(row[1])
+                vendor = row[3]
+                transaction_type = row[4]
+                amount = safe_float(row[5])
+                vat = safe_float(row[6])
+                job_id = normalize_number_to_string(row[7])
+                received_number = normalize_number_to_string(row[8])
+                note = row[9]
 
                 raw_date = row[2]
-
+                invoice_date = None
                 if raw_date:
-                    try:
-                        parsed_date = pd.to_datetime(raw_date, errors='coerce')
-
-                        if pd.isna(parsed_date):
-                            print(f"[Row {i}] ❌ Bad date format: {raw_date}")
-                            invoice_date = None
-                        else:
-                            invoice_date = parsed_date.to_pydatetime()
-                    except Exception as e:
-                        print(f"[Row {i}] Date conversion error: {e}")
-                        raise
+                    parsed_date = pd.to_datetime(raw_date, errors='coerce')
+                    if not pd.isna(parsed_date):
+                        invoice_date = parsed_date.to_pydatetime()
+
+                vendor_data = existing_vendors.get(str(vendor).strip()) if vendor else None
+                vendor_id = vendor_data.get("_id") if vendor_data else None
+                job_card_id = existing_job_cards.get(int(job_id), None) if job_id else None
+                transaction_type_id = existing_ap_payment_types.get(
+                    str(transaction_type).capitalize().strip()) if transaction_type else None
+                reference_number_id = existing_batches.get(str(reference_number), None) if reference_number else None
+                received_number_id = existing_receiving.get(str(received_number), None) if received_number else None
+
+                if reference_number_id:
+                    item_dict = {
+                        "batch_id": ObjectId(reference_number_id),
+                        "company_id": company_id,
+                        "transaction_type": transaction_type_id,
+                        "received_number": ObjectId(received_number_id) if received_number_id else None,
+                        "vendor": ObjectId(vendor_id) if vendor_id else None,
+                        "amount": amount,
+                        "vat": vat,
+                        "invoice_number": invoice_number,
+                        "invoice_date": invoice_date,
+                        "job_number_id": job_card_id,
+                        "note": note,
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+                    }
+                    await items_inserter.add(item_dict, i)
                 else:
-                    invoice_date = None
-
-                # ===== VENDOR =====
-                try:
-                    if vendor:
-                        vendor_data = existing_vendors.get(vendor.strip())
-                        if vendor_data:
-                            vendor_id = vendor_data.get("_id")
-                        else:
-                            vendor_details = await create_entity_service(
-                                entity_name=str(vendor.strip()),
-                                entity_code='Vendor',
-                                credit_limit=0,
-                                warranty_days=0,
-                                salesman_id=None,
-                                entity_status='Company',
-                                group_name="",
-                                industry_id=None,
-                                trn="",
-                                entity_type_id=None,
-                                entity_address=[],
-                                entity_phone=[],
-                                entity_social=[],
-                                company_id=company_id,
-                                lpo_required="N"
-                            )
-                            print(f"[Row {i}] Added new vendor")
-                            existing_vendors[str(vendor).strip()] = vendor_details
-                            vendor_id = vendor_details['_id']
-                    else:
-                        vendor_id = None
-                except Exception as e:
-                    print(f"[Row {i}] Error in vendor handling: {e}")
-                    print("Row Data:", row)
-                    raise
-
-                # ===== JOB CARD =====
-                try:
-                    job_card_id = existing_job_cards.get(int(job_id), None) if job_id else None
-                except Exception as e:
-                    print(f"[Row {i}] Error in job_id: {e}")
-                    print("job_id value:", job_id)
-                    raise
-
-                # ===== TRANSACTION TYPE =====
-                try:
-                    if transaction_type:
-                        key = transaction_type.capitalize().strip()
-                        transaction_type_id = existing_ap_payment_types.get(key)
-
-                        if not transaction_type_id:
-                            ap_payment_type_model = APPaymentTypes(type=key)
-                            new_ap_payment_type = await add_new_ap_payment_type(types=ap_payment_type_model, data=data)
-                            transaction_type_id = new_ap_payment_type['type']['_id']
-                            existing_ap_payment_types[key] = transaction_type_id
-                    else:
-                        transaction_type_id = None
-                except Exception as e:
-                    print(f"[Row {i}] Error in transaction type: {e}")
-                    print("transaction_type:", transaction_type)
-                    raise
-
-                # ===== REFERENCES =====
-                try:
-                    reference_number_id = existing_batches.get(str(reference_number),
-                                                               None) if reference_number else None
-                    received_number_id = existing_receiving.get(str(received_number), None) if received_number else None
-                except Exception as e:
-                    print(f"[Row {i}] Error in references: {e}")
-                    raise
-
-                # ===== INSERT =====
-                item_dict = {}
-                try:
-                    if reference_number_id:
-                        item_dict = {
-                            "batch_id": ObjectId(reference_number_id) if reference_number_id else None,
-                            "company_id": company_id,
-                            "transaction_type": transaction_type_id,
-                            "received_number": ObjectId(received_number_id) if received_number_id else None,
-                            "vendor": ObjectId(vendor_id) if vendor_id else None,
-                            "amount": amount,
-                            "vat": vat,
-                            "invoice_number": invoice_number,
-                            "invoice_date": invoice_date,
-                            "job_number_id": job_card_id,
-                            "note": note,
-                            "createdAt": security.now_utc(),
-                            "updatedAt": security.now_utc(),
-                        }
-
-                        await batch_payment_process_items_collection.insert_one(item_dict)
-
-                except Exception as e:
-                    print(f"[Row {i}] Error inserting item: {e}")
-                    print("Item Data:", item_dict)
-                    raise
-
-                print(f"Row {i} inserted successfully")
-
-                progress = int((i / total_rows) * 100)
-                await manager.send_progress(progress)
+                    report.skip()
 
             except Exception as row_error:
-                print("\n========== ERROR FOUND ==========")
-                print(f"Row Number: {i}")
-                print("Row Content:", row)
-                print("Error:", str(row_error))
-                print("=================================\n")
-                raise  # STOP PROCESS
+                report.row_error(i, row_error)
+            await progress.update(i)
 
-        await manager.broadcast({"type": "done"})
+        await items_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -425,16 +473,9 @@ async def dealing_with_batch_payment_process(file, data, delete_every_thing: boo
             await batch_payment_process_collection.delete_many({'company_id': company_id})
             await batch_payment_process_items_collection.delete_many({'company_id': company_id})
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
+        df, rows = await get_import_rows(file)
         total_rows = len(df)
-        uae_country_doc = await countries_collection.find_one({"code": "UAE"})
-        uae_country_id = str(uae_country_doc["_id"])
-        uae_currency_doc = await currencies_collection.find_one({"country_id": ObjectId(uae_country_id)})
-        uae_currency_id = str(uae_currency_doc["_id"])
-        account_types_bank_doc = await value_collection.find_one({"name": "Bank"})
-        account_types_list_id = str(account_types_bank_doc["_id"])
+        report = ImportReport("batch payment process", total_rows)
 
         existing_banks = {b["account_number"].strip(): ObjectId(b["_id"]) for b in
                           await banks_collection.find({"company_id": company_id}).to_list(length=None)}
@@ -445,65 +486,55 @@ async def dealing_with_batch_payment_process(file, data, delete_every_thing: boo
                                length=None)}
         print("got existing_values")
 
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            batch_number = normalize_number_to_string(row[0])
-            batch_date = to_mongo_datetime(row[1]) if row[1] else None
-            status = row[2].capitalize()
-            note = row[3]
-            payment_type = row[4]
-            account = row[5]
-            cheque_number = normalize_number_to_string(row[6])
-            cheque_date = to_mongo_datetime(row[7]) if row[7] else None
-            currency = row[8]
-            rate = row[9]
-
-            # if status == 'Posted':
-            if payment_type:
-                payment_type_to_search = 'Credit Card' if payment_type.capitalize() == 'Card' else payment_type
-                payment_type_id = existing_values.get(payment_type_to_search.capitalize().strip(), None)
-            else:
-                payment_type_id = None
+        await create_missing_banks(existing_banks, [str(row[5]).strip() for row in rows if row[5]], report, data)
 
+        batches_inserter = BulkInserter(batch_payment_process_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        for i, row in enumerate(rows, start=1):
             try:
-                if account:
-                    account_id = existing_banks.get(str(account).strip())
-                    if not account_id:
-                        account_model = BanksModel(
-                            account_name=account,
-                            account_number=account,
-                            currency_id=uae_currency_id,
-                            account_type_id=account_types_list_id
-                        )
-                        new_account = await add_new_bank(bank=account_model, data=data)
-                        account_id = ObjectId(new_account['account']['_id'])
-                        existing_banks[str(account).strip()] = account_id
+                batch_number = normalize_number_to_string(row[0])
+                batch_date = to_mongo_datetime(row[1]) if row[1] else None
+                status = row[2].capitalize()
+                note = row[3]
+                payment_type = row[4]
+                account = row[5]
+                cheque_number = normalize_number_to_string(row[6])
+                cheque_date = to_mongo_datetime(row[7]) if row[7] else None
+                currency = row[8]
+                rate = row[9]
+
+                if payment_type:
+                    payment_type_to_search = 'Credit Card' if payment_type.capitalize() == 'Card' else payment_type
+                    payment_type_id = existing_values.get(payment_type_to_search.capitalize().strip(), None)
                 else:
-                    account_id = None
-            except Exception as e:
-                print(f"error in account {e}")
-                raise
-
-            batch_doc = {
-                "batch_number": batch_number,
-                "batch_date": batch_date,
-                "status": status,
-                "cheque_date": cheque_date,
-                "note": note,
-                "cheque_number": cheque_number,
-                "currency": currency,
-                "rate": rate,
-                'payment_type': payment_type_id,
-                "account": account_id,
-                "company_id": company_id,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-            }
-            await batch_payment_process_collection.insert_one(batch_doc)
-            print(i)
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
+                    payment_type_id = None
+
+                account_id = existing_banks.get(str(account).strip()) if account else None
+
+                batch_doc = {
+                    "batch_number": batch_number,
+                    "batch_date": batch_date,
+                    "status": status,
+                    "cheque_date": cheque_date,
+                    "note": note,
+                    "cheque_number": cheque_number,
+                    "currency": currency,
+                    "rate": rate,
+                    'payment_type': payment_type_id,
+                    "account": account_id,
+                    "company_id": company_id,
+                    "createdAt": security.now_utc(),
+                    "updatedAt": security.now_utc(),
+                }
+                await batches_inserter.add(batch_doc, i)
+            except Exception as row_error:
+                report.row_error(i, row_error)
+            await progress.update(i)
+
+        await batches_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -515,87 +546,52 @@ async def dealing_with_account_transfers(file, data, delete_every_thing):
         company_id = ObjectId(data.get('company_id'))
         if delete_every_thing:
             await account_transfers_collection.delete_many({'company_id': company_id})
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
+        df, rows = await get_import_rows(file)
         total_rows = len(df)
+        report = ImportReport("account transfers", total_rows)
 
         existing_banks = {b["account_number"].strip(): ObjectId(b["_id"]) for b in
                           await banks_collection.find({"company_id": company_id}).to_list(length=None)}
         print("got existing_banks")
-        uae_country_doc = await countries_collection.find_one({"code": "UAE"})
-        uae_country_id = str(uae_country_doc["_id"])
-        uae_currency_doc = await currencies_collection.find_one({"country_id": ObjectId(uae_country_id)})
-        uae_currency_id = str(uae_currency_doc["_id"])
-        account_types_bank_doc = await value_collection.find_one({"name": "Bank"})
-        account_types_list_id = str(account_types_bank_doc["_id"])
-
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            transfer_number = normalize_number_to_string(row[0])
-            status = "Posted" if row[1] == "P" else "New"
-            date = to_mongo_datetime(row[2]) if row[2] else None
-            from_account_number = row[3]
-            to_account_number = row[4]
-            amount = safe_float(row[5]) if row[5] else 0
-            comment = row[6] if row[6] else ""
 
-            try:
-                if from_account_number:
-                    from_account_number_id = existing_banks.get(str(from_account_number).strip())
-                    if not from_account_number_id:
-                        account_model = BanksModel(
-                            account_name=from_account_number,
-                            account_number=from_account_number,
-                            currency_id=uae_currency_id,
-                            account_type_id=account_types_list_id
-                        )
-                        new_account = await add_new_bank(bank=account_model, data=data)
-                        account_id = ObjectId(new_account['account']['_id'])
-                        existing_banks[str(from_account_number).strip()] = account_id
-                else:
-                    from_account_number_id = None
-            except Exception as e:
-                print(f"error in from account {e}")
-                raise
+        await create_missing_banks(existing_banks,
+                                   [str(account).strip() for row in rows for account in (row[3], row[4]) if account],
+                                   report, data)
 
+        transfers_inserter = BulkInserter(account_transfers_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        for i, row in enumerate(rows, start=1):
             try:
-                if to_account_number:
-                    to_account_number_id = existing_banks.get(str(to_account_number).strip())
-                    if not to_account_number_id:
-                        account_model = BanksModel(
-                            account_name=to_account_number,
-                            account_number=to_account_number,
-                            currency_id=uae_currency_id,
-                            account_type_id=account_types_list_id
-                        )
-                        new_account = await add_new_bank(bank=account_model, data=data)
-                        account_id = ObjectId(new_account['account']['_id'])
-                        existing_banks[str(to_account_number).strip()] = account_id
-                else:
-                    to_account_number_id = None
-            except Exception as e:
-                print(f"error in from account {e}")
-                raise
-
-            transfer_doc = {
-                "transfer_number": transfer_number,
-                "date": date,
-                "from_account": from_account_number_id,
-                "to_account": to_account_number_id,
-                "amount": amount,
-                "comment": comment,
-                "status": status,
-                "company_id": company_id,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-            }
+                transfer_number = normalize_number_to_string(row[0])
+                status = "Posted" if row[1] == "P" else "New"
+                date = to_mongo_datetime(row[2]) if row[2] else None
+                from_account_number = row[3]
+                to_account_number = row[4]
+                amount = safe_float(row[5]) if row[5] else 0
+                comment = row[6] if row[6] else ""
+
+                transfer_doc = {
+                    "transfer_number": transfer_number,
+                    "date": date,
+                    "from_account": existing_banks.get(
+                        str(from_account_number).strip()) if from_account_number else None,
+                    "to_account": existing_banks.get(str(to_account_number).strip()) if to_account_number else None,
+                    "amount": amount,
+                    "comment": comment,
+                    "status": status,
+                    "company_id": company_id,
+                    "createdAt": security.now_utc(),
+                    "updatedAt": security.now_utc(),
+                }
+                await transfers_inserter.add(transfer_doc, i)
+            except Exception as row_error:
+                report.row_error(i, row_error)
+            await progress.update(i)
 
-            await account_transfers_collection.insert_one(transfer_doc)
-            print(i)
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
+        await transfers_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -607,49 +603,50 @@ async def dealing_with_issuing_converters_details(file, data, delete_every_thing
         company_id = ObjectId(data.get('company_id'))
         if delete_every_thing:
             await issuing_converters_details_collection.delete_many({'company_id': company_id})
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
+        df, rows = await get_import_rows(file)
         total_rows = len(df)
+        report = ImportReport("issuing converters details", total_rows)
         existing_issuing = {b.get("issue_id", None): ObjectId(b["_id"]) for b in
-                            await issuing_collection.find({"company_id": company_id}).to_list()}
+                            await issuing_collection.find({"company_id": company_id}, {"issue_id": 1}).to_list()}
         print("got existing_issuing")
         existing_converters = {b.get("converter_id", None): ObjectId(b['_id']) for b in
-                               await converters_collection.find({"company_id": company_id}).to_list()}
+                               await converters_collection.find({"company_id": company_id},
+                                                                {"converter_id": 1}).to_list()}
         print("got existing_converters")
 
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            issue_id = int(row[0])
-            converter_id = int(row[1])
-            quantity = int(row[2])
-            price = safe_float(row[3])
-
-            if issue_id:
-                current_issue_id = existing_issuing.get(issue_id, None)
-            else:
-                current_issue_id = None
-
-            if converter_id:
-                current_converter_id = existing_converters.get(converter_id, None)
-            else:
-                current_converter_id = None
-
-            if current_issue_id:
-                issuing_converter_details_dict = {
-                    "company_id": company_id,
-                    "converter_id": ObjectId(current_converter_id),
-                    "quantity": quantity,
-                    "price": price,
-                    "issue_id": current_issue_id,
-                    "createdAt": security.now_utc(),
-                    "updatedAt": security.now_utc(),
-                }
-                await issuing_converters_details_collection.insert_one(issuing_converter_details_dict)
-                print(i)
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
+        details_inserter = BulkInserter(issuing_converters_details_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        for i, row in enumerate(rows, start=1):
+            try:
+                issue_id = int(row[0])
+                converter_id = int(row[1])
+                quantity = int(row[2])
+                price = safe_float(row[3])
+
+                current_issue_id = existing_issuing.get(issue_id, None) if issue_id else None
+                current_converter_id = existing_converters.get(converter_id, None) if converter_id else None
+
+                if current_issue_id:
+                    issuing_converter_details_dict = {
+                        "company_id": company_id,
+                        "converter_id": ObjectId(current_converter_id),
+                        "quantity": quantity,
+                        "price": price,
+                        "issue_id": current_issue_id,
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+                    }
+                    await details_inserter.add(issuing_converter_details_dict, i)
+                else:
+                    report.skip()
+            except Exception as row_error:
+                report.row_error(i, row_error)
+            await progress.update(i)
+
+        await details_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -661,61 +658,54 @@ async def dealing_with_issuing_items_details(file, data, delete_every_thing):
         if delete_every_thing:
             await issuing_items_details_collection.delete_many({'company_id': company_id})
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
+        df, rows = await get_import_rows(file)
         total_rows = len(df)
+        report = ImportReport("issuing items details", total_rows)
         existing_issuing = {b.get("issue_id", None): ObjectId(b["_id"]) for b in
-                            await issuing_collection.find({"company_id": company_id}).to_list()}
+                            await issuing_collection.find({"company_id": company_id}, {"issue_id": 1}).to_list()}
         print("got existing_issuing")
         existing_inventory_items = {b.get("code", None): ObjectId(b['_id']) for b in
-                                    await inventory_items_collection.find({"company_id": company_id}).to_list()}
+                                    await inventory_items_collection.find({"company_id": company_id},
+                                                                          {"code": 1}).to_list()}
         print("got existing_inventory_items")
 
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            issue_id = int(row[0])
-            # item_code = row[1]
-            item_name = row[2]
-            quantity = int(row[3])
-            price = safe_float(row[4])
-
-            if item_name:
-                inventory_item_id = existing_inventory_items.get(str(item_name.upper().strip()))
-                if not inventory_item_id:
-                    item_model = InventoryItem(
-                        name=str(item_name).upper().strip(),
-                        code=str(item_name).upper().strip(),
-                        min_quantity=0,
-                    )
-                    new_item = await add_new_inventory_item(inventory_item=item_model, data=data)
-                    inventory_item_id = ObjectId(new_item['item']['_id'])
-                    existing_inventory_items[str(item_name.upper().strip())] = inventory_item_id
-                    print(f"yes added new inventory item: {inventory_item_id}")
-
-            else:
-                inventory_item_id = None
+        new_items = {}
+        for row in rows:
+            if row[2]:
+                item_name = str(row[2]).upper().strip()
+                new_items.setdefault(item_name, item_name)
+        await create_missing_inventory_items(existing_inventory_items, new_items, report, data)
+
+        details_inserter = BulkInserter(issuing_items_details_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        for i, row in enumerate(rows, start=1):
+            try:
+                issue_id = int(row[0])
+                item_name = row[2]
+                quantity = int(row[3])
+                price = safe_float(row[4])
 
-            if issue_id:
-                current_issue_id = existing_issuing.get(issue_id, None)
-            else:
-                current_issue_id = None
+                inventory_item_id = existing_inventory_items.get(str(item_name).upper().strip()) if item_name else None
+                current_issue_id = existing_issuing.get(issue_id, None) if issue_id else None
 
-            issue_item_details_dict = {
-                "company_id": company_id,
-                "inventory_item_id": ObjectId(inventory_item_id),
-                "quantity": quantity,
-                "price": price,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-                "issue_id": ObjectId(current_issue_id)
-            }
-            if issue_item_details_dict:
-                await issuing_items_details_collection.insert_one(issue_item_details_dict)
-                print(i)
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
+                issue_item_details_dict = {
+                    "company_id": company_id,
+                    "inventory_item_id": ObjectId(inventory_item_id),
+                    "quantity": quantity,
+                    "price": price,
+                    "createdAt": security.now_utc(),
+                    "updatedAt": security.now_utc(),
+                    "issue_id": ObjectId(current_issue_id)
+                }
+                await details_inserter.add(issue_item_details_dict, i)
+            except Exception as row_error:
+                report.row_error(i, row_error)
+            await progress.update(i)
+
+        await details_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -729,18 +719,17 @@ async def dealing_with_issuing_header(file, data, delete_every_thing):
             await issuing_items_details_collection.delete_many({'company_id': company_id})
             await issuing_converters_details_collection.delete_many({'company_id': company_id})
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
+        df, rows = await get_import_rows(file, date_cols=['HD_DATE'])
         total_rows = len(df)
-        df['HD_DATE'] = pd.to_datetime(df['HD_DATE'], errors='coerce')
+        report = ImportReport("issuing header", total_rows)
         dubai_branch_id = ObjectId("6985ce2cb11b34fc2024f5fa")
         existing_job_cards = {b.get("job_id", None): ObjectId(b["_id"]) for b in
-                              await job_cards_collection.find({"company_id": company_id}).to_list()}
+                              await job_cards_collection.find({"company_id": company_id}, {"job_id": 1}).to_list()}
         print("got existing_job_cards")
 
         existing_converters = {b.get("converter_id", None): ObjectId(b["_id"]) for b in
-                               await converters_collection.find({"company_id": company_id}).to_list()}
+                               await converters_collection.find({"company_id": company_id},
+                                                                {"converter_id": 1}).to_list()}
         print("got existing_converters")
 
         issue_type_list = await list_collection.find_one({"code": 'ISSUE_TYPES'}, {"_id": 1})
@@ -755,59 +744,53 @@ async def dealing_with_issuing_header(file, data, delete_every_thing):
                                     await value_collection.find({"list_id": ObjectId(issue_to_list_id)}).to_list(
                                         None)}
 
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            issue_id = int(row[0])
-            date = to_mongo_datetime(row[1])
-            issue_type = row[2].capitalize()
-            job_converter_id = int(row[3])
-            # branch = row[4]
-            issue_to = row[5].capitalize()
-            notes = row[6]
-            status = row[7].capitalize()
-
-            if issue_type:
-                issue_type_id = existing_issue_types_values.get(str(issue_type))
-            else:
-                issue_type_id = None
-
-            if issue_to:
-                issue_to_id = existing_issue_to_values.get(str(issue_to))
-            else:
-                issue_to_id = None
-
-            job_id = None
-            converter_id = None
-            if job_converter_id:
-                if issue_type.lower() == 'job card':
-                    job_id = existing_job_cards.get(job_converter_id, None)
-                else:
-                    converter_id = existing_converters.get(job_converter_id, None)
-            else:
+        issuing_inserter = BulkInserter(issuing_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        for i, row in enumerate(rows, start=1):
+            try:
+                issue_id = int(row[0])
+                date = to_mongo_datetime(row[1])
+                issue_type = row[2].capitalize()
+                job_converter_id = int(row[3])
+                issue_to = row[5].capitalize()
+                notes = row[6]
+                status = row[7].capitalize()
+
+                issue_type_id = existing_issue_types_values.get(str(issue_type)) if issue_type else None
+                issue_to_id = existing_issue_to_values.get(str(issue_to)) if issue_to else None
+
                 job_id = None
                 converter_id = None
+                if job_converter_id:
+                    if issue_type.lower() == 'job card':
+                        job_id = existing_job_cards.get(job_converter_id, None)
+                    else:
+                        converter_id = existing_converters.get(job_converter_id, None)
 
-            issuing_dict = {
-                'company_id': company_id,
-                "issue_id": issue_id,
-                "date": date,
-                "branch": dubai_branch_id,
-                "issue_type": issue_type_id,
-                "job_card_id": job_id,
-                "converter_id": converter_id,
-                "note": notes,
-                "received_by": issue_to_id,
-                "status": status,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-                "issuing_number": str(issue_id)
-            }
-            if issuing_dict:
-                await issuing_collection.insert_one(issuing_dict)
-                print(i)
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
+                issuing_dict = {
+                    'company_id': company_id,
+                    "issue_id": issue_id,
+                    "date": date,
+                    "branch": dubai_branch_id,
+                    "issue_type": issue_type_id,
+                    "job_card_id": job_id,
+                    "converter_id": converter_id,
+                    "note": notes,
+                    "received_by": issue_to_id,
+                    "status": status,
+                    "createdAt": security.now_utc(),
+                    "updatedAt": security.now_utc(),
+                    "issuing_number": str(issue_id)
+                }
+                await issuing_inserter.add(issuing_dict, i)
+            except Exception as row_error:
+                report.row_error(i, row_error)
+            await progress.update(i)
+
+        await issuing_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -819,38 +802,34 @@ async def dealing_with_converters(file, data, delete_every_thing):
         company_id = ObjectId(data.get('company_id'))
         if delete_every_thing:
             await converters_collection.delete_many({'company_id': company_id})
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
+        df, rows = await get_import_rows(file, date_cols=['HD_DATE'])
         total_rows = len(df)
-        df['HD_DATE'] = pd.to_datetime(df['HD_DATE'], errors='coerce')
-
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            converter_id = int(row[0])
-            date = to_mongo_datetime(row[1])
-            converter_number = row[2]
-            converter_name = row[3]
-            note = row[4]
-            status = row[5].capitalize()
-
-            converter_dict = {
-                "converter_id": converter_id,
-                'company_id': company_id,
-                "date": date,
-                "status": status,
-                "description": note,
-                "converter_number": str(converter_number),
-                "name": converter_name,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-            }
-            await converters_collection.insert_one(converter_dict)
-            print(i)
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
+        report = ImportReport("converters", total_rows)
 
+        converters_inserter = BulkInserter(converters_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        for i, row in enumerate(rows, start=1):
+            try:
+                converter_dict = {
+                    "converter_id": int(row[0]),
+                    'company_id': company_id,
+                    "date": to_mongo_datetime(row[1]),
+                    "status": row[5].capitalize(),
+                    "description": row[4],
+                    "converter_number": str(row[2]),
+                    "name": row[3],
+                    "createdAt": security.now_utc(),
+                    "updatedAt": security.now_utc(),
+                }
+                await converters_inserter.add(converter_dict, i)
+            except Exception as row_error:
+                report.row_error(i, row_error)
+            await progress.update(i)
+
+        await converters_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -864,15 +843,12 @@ async def dealing_with_time_sheets(file, data, delete_every_thing):
             await time_sheets_collection.delete_many({'company_id': company_id})
             await job_tasks_collection.delete_many({'company_id': company_id})
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
+        df, rows = await get_import_rows(file, date_cols=['START_DATE', 'END_DATE'])
         total_rows = len(df)
-        df['START_DATE'] = pd.to_datetime(df['START_DATE'], errors='coerce')
-        df['END_DATE'] = pd.to_datetime(df['END_DATE'], errors='coerce')
+        report = ImportReport("time sheets", total_rows)
 
         existing_job_cards = {b.get("job_id", None): ObjectId(b["_id"]) for b in
-                              await job_cards_collection.find({"company_id": company_id}).to_list()}
+                              await job_cards_collection.find({"company_id": company_id}, {"job_id": 1}).to_list()}
         print("got existing_job_cards")
         existing_job_tasks = {b.get("name_en", None): ObjectId(b["_id"]) for b in
                               await job_tasks_collection.find({"company_id": company_id}).to_list()}
@@ -881,70 +857,66 @@ async def dealing_with_time_sheets(file, data, delete_every_thing):
                            await value_collection.find({}).to_list(length=None)}
         print("got existing_values")
 
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            job_id = row[0]
-            employee = row[1]
-            start_date = to_mongo_datetime(row[2]) if row[2] else None
-            end_date = to_mongo_datetime(row[3]) if row[3] else None
+        # first row of each task wins, like the row by row import did
+        new_tasks = {}
+        for row in rows:
             task_en = str(row[4]).strip()
-            task_ar = str(row[5]).strip()
-            category = str(row[6]).strip()
-            points = float(row[7]) if row[7] != "" else 0
+            if task_en and task_en not in new_tasks:
+                new_tasks[task_en] = JobTaskModel(
+                    name_en=task_en,
+                    name_ar=str(row[5]).strip(),
+                    category=str(row[6]).strip(),
+                    points=safe_float(row[7]),
+                )
+
+        async def create_job_task(task_en: str):
+            new_task_en = await add_new_job_task(task=new_tasks[task_en], data=data)
+            return ObjectId(new_task_en['task']['_id'])
+
+        await create_missing(existing_job_tasks, new_tasks.keys(), create_job_task, report, "job tasks")
+
+        time_sheets_inserter = BulkInserter(time_sheets_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        for i, row in enumerate(rows, start=1):
+            try:
+                job_id = row[0]
+                employee = row[1]
+                start_date = to_mongo_datetime(row[2]) if row[2] else None
+                end_date = to_mongo_datetime(row[3]) if row[3] else None
+                task_en = str(row[4]).strip()
 
-            if employee:
-                employee_id = existing_values.get(employee.strip())
-            else:
-                employee_id = None
+                employee_id = existing_values.get(employee.strip()) if employee else None
+                task_en_id = existing_job_tasks.get(task_en) if task_en else None
+                job_card_id = existing_job_cards.get(int(job_id), None) if job_id else None
 
-            try:
-                if task_en:
-                    task_en_id = existing_job_tasks.get(str(task_en))
-                    if not task_en_id:
-                        task_model = JobTaskModel(
-                            name_en=task_en,
-                            name_ar=task_ar,
-                            category=str(category),
-                            points=float(points),
-                        )
-                        new_task_en = await add_new_job_task(task=task_model, data=data)
-                        task_en_id = ObjectId(new_task_en['task']['_id'])
-                        existing_job_tasks[task_en] = task_en_id
-                        print("added new job task")
+                if job_card_id:
+                    time_sheets_dict = {
+                        "company_id": company_id,
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+                        "job_id": job_card_id,
+                        "task_id": task_en_id,
+                        "employee_id": employee_id,
+                        "start_date": start_date,
+                        "end_date": end_date,
+                        "active_periods": [
+                            {
+                                "from": start_date,
+                                "to": end_date,
+                            }
+                        ]
+                    }
+                    await time_sheets_inserter.add(time_sheets_dict, i)
                 else:
-                    task_en_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error job tasks processing row {i}: {row_err}")
-                raise
-
-            if job_id:
-                job_card_id = existing_job_cards.get(int(job_id), None)
-            else:
-                job_card_id = None
-
-            if job_card_id:
-                time_sheets_dict = {
-                    "company_id": company_id,
-                    "createdAt": security.now_utc(),
-                    "updatedAt": security.now_utc(),
-                    "job_id": job_card_id,
-                    "task_id": task_en_id,
-                    "employee_id": employee_id,
-                    "start_date": start_date,
-                    "end_date": end_date,
-                    "active_periods": [
-                        {
-                            "from": start_date,
-                            "to": end_date,
-                        }
-                    ]
-                }
-                await time_sheets_collection.insert_one(time_sheets_dict)
-                print(i)
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
+                    report.skip()
+            except Exception as row_error:
+                report.row_error(i, row_error)
+            await progress.update(i)
+
+        await time_sheets_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -959,9 +931,9 @@ async def dealing_with_receiving_items(file, data, delete_every_thing: bool):
             await inventory_items_collection.delete_many({'company_id': company_id})
             print("all deleted")
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df.columns = df.columns.str.strip().str.lower()
+        df, rows = await get_import_rows(file, fill_na=False, lower_columns=True)
+        total_rows = len(df)
+        report = ImportReport("receiving items", total_rows)
         existing_inventory_items = {b['name'].upper().strip(): ObjectId(b['_id']) for b in
                                     await inventory_items_collection.find({"company_id": company_id},
                                                                           {"_id": 1, "name": 1}
@@ -969,58 +941,60 @@ async def dealing_with_receiving_items(file, data, delete_every_thing: bool):
                                         length=None)}
         existing_receiving = {b['receiving_id']: ObjectId(b['_id']) for b in
                               await receiving_collection.find({"company_id": company_id},
-                                                              ).to_list(length=None)}
-
-        items_buffer = []
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            receiving_id = int(row[0])
-            inventory_item_code = row[1]
-            inventory_item_name = row[2]
-            quantity = safe_float(row[3])
-            price = safe_float(row[4])
-            discount = safe_float(row[5])
-            vat = safe_float(row[9])
-
-            inventory_item_id = None
-            if receiving_id:
-                matched_receiving_id = existing_receiving.get(int(receiving_id), None)
-                if not matched_receiving_id:
-
-                    if inventory_item_name:
-                        inventory_item_id = existing_inventory_items.get(str(inventory_item_name.upper().strip()))
-                        if not inventory_item_id:
-                            item_model = InventoryItem(
-                                name=str(inventory_item_name).upper().strip(),
-                                code=str(inventory_item_code).upper().strip(),
-                                min_quantity=0,
-                            )
-                            new_item = await add_new_inventory_item(inventory_item=item_model, data=data)
-                            inventory_item_id = ObjectId(new_item['item']['_id'])
-                            existing_inventory_items[str(inventory_item_name.upper().strip())] = inventory_item_id
-                            print(f"yes added new inventory item: {inventory_item_id}")
+                                                              {"receiving_id": 1}).to_list(length=None)}
 
-                    else:
-                        inventory_item_id = None
+        # items are only created for rows whose receiving header is not in the system yet
+        new_items = {}
+        for row in rows:
+            try:
+                receiving_id = int(row[0])
+            except (TypeError, ValueError):
+                continue
+            if receiving_id and not existing_receiving.get(receiving_id) and isinstance(row[2], str) and row[2]:
+                new_items.setdefault(row[2].upper().strip(), str(row[1]).upper().strip())
+        await create_missing_inventory_items(existing_inventory_items, new_items, report, data)
+
+        items_inserter = BulkInserter(receiving_items_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        for i, row in enumerate(rows, start=1):
+            try:
+                receiving_id = int(row[0])
+                inventory_item_name = row[2]
+                quantity = safe_float(row[3])
+                price = safe_float(row[4])
+                discount = safe_float(row[5])
+                vat = safe_float(row[9])
 
-            else:
+                inventory_item_id = None
                 matched_receiving_id = None
+                if receiving_id:
+                    matched_receiving_id = existing_receiving.get(int(receiving_id), None)
+                    if not matched_receiving_id and inventory_item_name:
+                        inventory_item_id = existing_inventory_items.get(str(inventory_item_name.upper().strip()))
 
-            if receiving_id:
-                receiving_item_dict = {
-                    "company_id": company_id,
-                    "inventory_item_id": ObjectId(inventory_item_id),
-                    "receiving_id": ObjectId(matched_receiving_id),
-                    "quantity": float(quantity),
-                    "original_price": float(price),
-                    "discount": float(discount),
-                    "vat": float(vat),
-                    "createdAt": security.now_utc(),
-                    "updatedAt": security.now_utc(),
-                }
-                items_buffer.append(receiving_item_dict)
-                print(i)
-        if items_buffer:
-            await receiving_items_collection.insert_many(items_buffer)
+                if receiving_id:
+                    receiving_item_dict = {
+                        "company_id": company_id,
+                        "inventory_item_id": ObjectId(inventory_item_id),
+                        "receiving_id": ObjectId(matched_receiving_id),
+                        "quantity": float(quantity),
+                        "original_price": float(price),
+                        "discount": float(discount),
+                        "vat": float(vat),
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+                    }
+                    await items_inserter.add(receiving_item_dict, i)
+                else:
+                    report.skip()
+            except Exception as row_error:
+                report.row_error(i, row_error)
+            await progress.update(i)
+
+        await items_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         print(e)
@@ -1032,22 +1006,11 @@ async def dealing_with_receiving_header(file, data, delete_every_thing: bool):
         company_id = ObjectId(data.get('company_id'))
         if delete_every_thing:
             await receiving_collection.delete_many({'company_id': company_id})
-            # await employees_collection.delete_many({'company_id': company_id, "department": {"$in": ["Receiving"]}})
             print("all deleted")
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
+        df, rows = await get_import_rows(file, lower_columns=True, date_cols=['hd_date'])
         total_rows = len(df)
-        df.columns = df.columns.str.strip().str.lower()
-        df['hd_date'] = pd.to_datetime(df['hd_date'], errors='coerce')
-        # df_2025 = df[
-        #     (
-        #         (df["hd_date"].dt.year == 2025)
-        #     )
-        #
-        # ].sort_values(by=df.columns[0])
-        # print("number of rows: ", len(df_2025))
+        report = ImportReport("receiving", total_rows)
 
         existing_branches = {b['name']: ObjectId(b['_id']) for b in
                              await branches_collection.find({"company_id": company_id}).to_list(length=None)}
@@ -1058,150 +1021,75 @@ async def dealing_with_receiving_header(file, data, delete_every_thing: bool):
         employees_list_id = ObjectId(employees_list['_id']) if employees_list else None
         employees_list_values = {b['name'].strip(): b['_id'] for b in
                                  await value_collection.find({"list_id": employees_list_id}).to_list(length=None)}
-        print(employees_list_values.get('000- PAUL'))
 
         all_currencies = {b['currency_code'].strip(): b['_id'] for b in await get_currencies(company_id)}
 
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            # receiving_id = clean_value(row[0], number=True),
-            date = row[1]
-            reference_number = clean_value(row[2])
-            vendor = clean_value(row[3])
-            notes = clean_value(row[4])
-            status = row[5].capitalize()
-            branch = clean_value(row[6])
-            approved_by = clean_value(row[7])
-            ordered_by = clean_value(row[8])
-            purchased_by = clean_value(row[9])
-            currency = clean_value(row[10])
-            rate = safe_float(row[11])
-            shipping = safe_float(row[12])
-            handling = safe_float(row[13])
-            others = safe_float(row[14])
-            amount = safe_float(row[15])
+        await create_missing_vendors(existing_vendors,
+                                     [clean_value(row[3]).strip() for row in rows if clean_value(row[3])],
+                                     company_id, report)
 
-            try:
-                if currency:
-                    currency_id = all_currencies.get(currency.upper())
-                    if not currency_id:
-                        currency_id = None
-                else:
-                    currency_id = None
-            except Exception as e:
-                print(f"Error currency processing row {i}: {e}")
-                raise
-
-            if vendor:
-                vendor_data = existing_vendors.get(vendor.strip())
-                if vendor_data:
-                    vendor_id = vendor_data.get("_id")
-                else:
-                    vendor_details = await create_entity_service(entity_name=str(vendor.strip()),
-                                                                 entity_code='Vendor',
-                                                                 credit_limit=0,
-                                                                 warranty_days=0,
-                                                                 salesman_id=None,
-                                                                 entity_status='Company',
-                                                                 group_name="",
-                                                                 industry_id=None, trn="",
-                                                                 entity_type_id=None,
-                                                                 entity_address=[],
-                                                                 entity_phone=[],
-                                                                 entity_social=[],
-                                                                 company_id=company_id,
-                                                                 lpo_required="N"
-                                                                 )
-                    print("added new Vendor")
-                    existing_vendors[str(vendor).strip()] = vendor_details
-                    vendor_id = vendor_details['_id']
-            else:
-                vendor_id = None
+        async def create_branch(branch_name: str):
+            new_branch = await add_new_branch(name=branch_name, code=None, line=None, country_id=None,
+                                              city_id=None, data=data)
+            return ObjectId(new_branch['branch']['_id'])
 
-            try:
-                if branch:
-                    branch_id = existing_branches.get(str(branch).upper())
-                    if not branch_id:
-                        new_branch = await add_new_branch(name=str(branch).upper(), code=None, line=None,
-                                                          country_id=None,
-                                                          city_id=None, data=data)
-                        branch_id = ObjectId(new_branch['branch']['_id'])
-                        existing_branches[str(branch).upper()] = branch_id
-                else:
-                    branch_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error Branch processing row {i}: {row_err}")
-                raise
+        await create_missing(existing_branches,
+                             [str(clean_value(row[6])).upper() for row in rows if clean_value(row[6])],
+                             create_branch, report, "branches")
 
-            try:
-                if approved_by:
-                    approved_by_id = employees_list_values.get(str(approved_by).upper())
-                    if not approved_by_id:
-                        approved_by_id = None
-                else:
-                    approved_by_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error APPROVED BY processing row {i}: {row_err}")
-                raise
+        def list_value_id(value):
+            return employees_list_values.get(str(value).upper()) if value else None
 
+        receiving_inserter = BulkInserter(receiving_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        for i, row in enumerate(rows, start=1):
             try:
-                if ordered_by:
-                    ordered_by_id = employees_list_values.get(str(ordered_by).upper())
-                    if not ordered_by_id:
-                        ordered_by_id = None
-                else:
-                    ordered_by_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error ORDERED BY processing row {i}: {row_err}")
-                raise
+                vendor = clean_value(row[3])
+                branch = clean_value(row[6])
+                currency = clean_value(row[10])
+                notes = clean_value(row[4])
+
+                currency_id = all_currencies.get(currency.upper()) if currency else None
+                vendor_data = existing_vendors.get(vendor.strip()) if vendor else None
+                vendor_id = vendor_data.get("_id") if vendor_data else None
+                branch_id = existing_branches.get(str(branch).upper()) if branch else None
+                approved_by_id = list_value_id(clean_value(row[7]))
+                ordered_by_id = list_value_id(clean_value(row[8]))
+                purchased_by_id = list_value_id(clean_value(row[9]))
+                amount = safe_float(row[15])
 
-            try:
-                if purchased_by:
-                    purchased_by_id = employees_list_values.get(str(purchased_by).upper())
-                    if not purchased_by_id:
-                        purchased_by_id = None
-                else:
-                    purchased_by_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error PURCHASED BY processing row {i}: {row_err}")
-                raise
-
-            try:
                 receiving_dict = {
                     "company_id": company_id,
                     "receiving_id": int(row[0]),
-                    "date": date,
+                    "date": row[1],
                     "receiving_number": str(int(row[0])),
-                    "reference_number": reference_number,
+                    "reference_number": clean_value(row[2]),
                     "vendor": ObjectId(vendor_id),
                     "note": notes if notes else "",
-                    "status": status,
+                    "status": row[5].capitalize(),
                     "branch": branch_id,
                     "approved_by": ObjectId(approved_by_id) if approved_by_id else None,
                     "ordered_by": ObjectId(ordered_by_id) if ordered_by_id else None,
                     "purchased_by": ObjectId(purchased_by_id) if purchased_by_id else None,
                     "currency": ObjectId(currency_id),
-                    "rate": float(rate),
-                    "shipping": float(shipping),
-                    "handling": float(handling),
-                    "other": float(others),
+                    "rate": float(safe_float(row[11])),
+                    "shipping": float(safe_float(row[12])),
+                    "handling": float(safe_float(row[13])),
+                    "other": float(safe_float(row[14])),
                     "amount": float(amount) if amount else 0,
                     "createdAt": security.now_utc(),
                     "updatedAt": security.now_utc(),
                 }
-                await receiving_collection.insert_one(receiving_dict)
-            except Exception as row_err:
-                print(f"Error inserting receiving processing row {i}, id: {int(row[0])},: {row_err}")
-                raise
-            print(f"added new receiving doc for row : {i}")
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
+                set_search_keys("receiving", receiving_dict)
+                await receiving_inserter.add(receiving_dict, i)
+            except Exception as row_error:
+                report.row_error(i, row_error)
+            await progress.update(i)
 
+        await receiving_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         print(e)
@@ -1223,24 +1111,8 @@ async def dealing_with_ap_invoices(file, data, delete_every_thing: bool):
             await ap_payment_invoices_collection.delete_many({'company_id': company_id})
             await ap_payment_types_collection.delete_many({'company_id': company_id})
             print("all deleted")
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
-        total_rows = len(df)
-        df.columns = df.columns.str.strip().str.lower()
-        date_cols = ["transaction_date", "invoice_date"]
-        for col in date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-        # df_2025 = df[(df["transaction_date"].dt.year >= 2025) | df['invoice_Date'].dt.year >= 2025]
-        # df_2025 = df[
-        #     (
-        #             (df["transaction_date"].dt.year == 2025) & (df["transaction_date"].dt.month == 12)
-        #     ) |
-        #     (
-        #             (df["invoice_date"].dt.year == 2025) & (df["invoice_date"].dt.month == 12)
-        #     )
-        #     ].sort_values(by=df.columns[0])
+        batches = await read_import_batches(file, AP_INVOICES_SCHEMA)
+        report = ImportReport("ap invoices", batches.total_rows)
 
         existing_values = {b["name"].capitalize(): ObjectId(b["_id"]) for b in
                            await value_collection.find({}).to_list(length=None)}
@@ -1257,193 +1129,134 @@ async def dealing_with_ap_invoices(file, data, delete_every_thing: bool):
         print("got existing_ap_payment_types")
 
         existing_job_cards = {b.get("job_id", None): ObjectId(b["_id"]) for b in
-                              await job_cards_collection.find({"company_id": company_id}).to_list()}
+                              await job_cards_collection.find({"company_id": company_id}, {"job_id": 1}).to_list()}
         print("got existing_job_cards")
 
         existing_banks = {b["account_number"].strip(): ObjectId(b["_id"]) for b in
                           await banks_collection.find({"company_id": company_id}).to_list(length=None)}
         print("got existing_banks")
 
-        account_types_bank_doc = await value_collection.find_one({"name": "Bank"})
-        account_types_list_id = str(account_types_bank_doc["_id"])
-        uae_country_doc = await countries_collection.find_one({"code": "UAE"})
-        uae_country_id = str(uae_country_doc["_id"])
-        uae_currency_doc = await currencies_collection.find_one({"country_id": ObjectId(uae_country_id)})
-        uae_currency_id = str(uae_currency_doc["_id"])
+        invoices_inserter = BulkInserter(ap_invoices_collection, report)
+        invoice_items_inserter = BulkInserter(ap_invoices_items_collection, report)
+        payments_inserter = BulkInserter(ap_payment_collection, report)
+        payment_invoices_inserter = BulkInserter(ap_payment_invoices_collection, report)
 
         print("starting the loop...")
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            # print(row)
-            reference_number = normalize_number_to_string(row[0])
-            status = clean_value(row[1])
-            transaction_date = row[2]
-            invoice_type = clean_value(row[3])
-            invoice_number = normalize_number_to_string(row[4])
-            invoice_date = row[5]
-            vendor = clean_value(row[6])
-            description = clean_value(row[7])
-            payment_type = clean_value(row[8])
-            account = clean_value(row[9])
-            cheque_number = clean_value(row[10])
-            cheque_date = to_mongo_datetime(row[11]) if pd.notna(row[11]) else None
-            payment_date = to_mongo_datetime(row[14]) if pd.notna(row[14]) else None
-            rate = clean_value(row[13], number=True)
-            payment_number = clean_value(row[15], number=True)
-            payment_amount = clean_value(row[16], number=True)
-            transaction_type = clean_value(row[17])
-            amount = clean_value(row[18], number=True)
-            vat = clean_value(row[19], number=True)
-            job_id = clean_value(row[20], number=True)
-            received_number = clean_value(row[21])
-            notes = clean_value(row[22])
-
-            if invoice_type:
-                invoice_type_id = existing_values.get(invoice_type.capitalize())
-            else:
-                invoice_type_id = None
-
-            try:
-                if vendor:
-                    vendor_data = existing_vendors.get(vendor.capitalize())
-                    if vendor_data:
-                        vendor_id = vendor_data.get("_id")
+        progress = ImportProgress(report, data)
+        await progress.start()
+        async for batch in batches:
+            invoice_items = []
+            payment_invoices = []
+            await create_missing_vendors(existing_vendors, batch.distinct("vendor"), company_id, report)
+            await create_missing_ap_payment_types(existing_ap_payment_types,
+                                                  [value.capitalize() for value in batch.distinct("transaction_type")],
+                                                  report, data)
+            await create_missing_banks(existing_banks, batch.distinct("account"), report, data)
+
+            for i, error, row in batch.records():
+                if error:
+                    report.row_error(i, error)
+                    await progress.update(i)
+                    continue
+                try:
+                    status = row["status"]
+                    invoice_type = row["invoice_type"]
+                    vendor = row["vendor"]
+                    description = row["description"]
+                    payment_type = row["payment_type"]
+                    account = row["account"]
+                    transaction_type = row["transaction_type"]
+                    job_id = row["job_id"]
+
+                    invoice_type_id = existing_values.get(invoice_type.capitalize()) if invoice_type else None
+                    vendor_data = existing_vendors.get(vendor) if vendor else None
+                    vendor_id = vendor_data.get("_id") if vendor_data else None
+                    transaction_type_id = existing_ap_payment_types.get(
+                        transaction_type.capitalize()) if transaction_type else None
+                    job_card_id = existing_job_cards.get(job_id, None) if job_id else None
+                    if payment_type:
+                        payment_type_to_search = 'Credit Card' if payment_type.capitalize() == 'Card' else payment_type
+                        payment_type_id = existing_values.get(payment_type_to_search.capitalize().strip(), None)
                     else:
-                        vendor_details = await create_entity_service(entity_name=str(vendor.strip()),
-                                                                     entity_code='Vendor',
-                                                                     credit_limit=0,
-                                                                     warranty_days=0,
-                                                                     salesman_id=None,
-                                                                     entity_status='Company',
-                                                                     group_name="",
-                                                                     industry_id=None, trn="",
-                                                                     entity_type_id=None,
-                                                                     entity_address=[],
-                                                                     entity_phone=[],
-                                                                     entity_social=[],
-                                                                     company_id=company_id,
-                                                                     lpo_required="N"
-                                                                     )
-                        print("added new Vendor")
-                        existing_vendors[str(vendor).strip()] = vendor_details
-                        vendor_id = vendor_details['_id']
-                else:
-                    vendor_id = None
-            except Exception as e:
-                print(f"error in vendors: {e}")
-                raise
-
-            ap_invoice_dict = {
-                "company_id": company_id,
-                "reference_number": reference_number.strip(),
-                "status": status.capitalize().strip(),
-                "transaction_date": to_mongo_datetime(transaction_date) if pd.notna(transaction_date) else None,
-                "invoice_date": to_mongo_datetime(invoice_date) if pd.notna(invoice_date) else None,
-                "invoice_type": ObjectId(invoice_type_id),
-                "invoice_number": invoice_number.strip(),
-                "vendor": ObjectId(vendor_id) if vendor_id else None,
-                "description": description,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-            }
-            new_ap_invoice = await ap_invoices_collection.insert_one(ap_invoice_dict)
-            print(f"added new AP Invoice for row: {i}")
-            ap_invoice_id = new_ap_invoice.inserted_id
-
-            try:
-                if transaction_type:
-                    transaction_type_id = existing_ap_payment_types.get(transaction_type.capitalize().strip())
-                    if not transaction_type_id:
-                        ap_payment_type_model = APPaymentTypes(type=transaction_type.capitalize().strip())
-                        new_ap_payment_type = await add_new_ap_payment_type(types=ap_payment_type_model, data=data)
-                        transaction_type_id = new_ap_payment_type['type']['_id']
-                        existing_ap_payment_types[transaction_type.capitalize().strip()] = transaction_type_id
-                else:
-                    transaction_type_id = None
-            except Exception as e:
-                print(f"error in transaction types: {e}")
-                raise
-
-            if job_id:
-                job_card_id = existing_job_cards.get(int(job_id), None)
-
-            else:
-                job_card_id = None
-
-            ap_invoice_item_dict = {
-                "company_id": company_id,
-                "ap_invoice_id": ap_invoice_id,
-                "transaction_type": ObjectId(transaction_type_id),
-                "amount": amount,
-                "vat": vat,
-                "job_number_id": ObjectId(job_card_id) if job_card_id else None,
-                "received_number": received_number,
-                "note": notes,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-            }
-            await ap_invoices_items_collection.insert_one(ap_invoice_item_dict)
-            print(f"added new AP Invoice Item for row: {i}")
-
-            if payment_type:
-                payment_type_to_search = 'Credit Card' if payment_type.capitalize() == 'Card' else payment_type
-                payment_type_id = existing_values.get(payment_type_to_search.capitalize().strip(), None)
-            else:
-                payment_type_id = None
-
-            try:
-                if account:
-                    account_id = existing_banks.get(str(account).strip())
-                    if not account_id:
-                        account_model = BanksModel(
-                            account_name=account,
-                            account_number=account,
-                            currency_id=uae_currency_id,
-                            account_type_id=account_types_list_id
-                        )
-                        new_account = await add_new_bank(bank=account_model, data=data)
-                        account_id = ObjectId(new_account['account']['_id'])
-                        existing_banks[str(account).strip()] = account_id
-                else:
-                    account_id = None
-            except Exception as e:
-                print(f"error in account {e}")
-                raise
-
-            ap_payment_dict = {
-                "company_id": company_id,
-                "payment_type": ObjectId(payment_type_id),
-                "payment_date": payment_date,
-                "status": status.capitalize().strip(),
-                "vendor": ObjectId(vendor_id) if vendor_id else None,
-                "note": description,
-                "cheque_number": cheque_number,
-                "account": account_id,
-                "currency": 'AED',
-                "rate": rate,
-                "cheque_date": cheque_date,
-                "payment_number": str(payment_number),
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-            }
-            new_payment = await ap_payment_collection.insert_one(ap_payment_dict)
-            print(f"added new AP Payment for row: {i}")
-
-            ap_payment_invoice_dict = {
-                "company_id": company_id,
-                "ap_invoices_id": new_ap_invoice.inserted_id,
-                "amount": payment_amount,
-                "payment_id": new_payment.inserted_id,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-            }
-            await ap_payment_invoices_collection.insert_one(ap_payment_invoice_dict)
-            print(f"added new AP Payment Item for row: {i}")
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
-
-
+                        payment_type_id = None
+                    account_id = existing_banks.get(account) if account else None
+
+                    ap_invoice_dict = {
+                        "_id": ObjectId(),
+                        "company_id": company_id,
+                        "reference_number": row["reference_number"],
+                        "status": status.capitalize(),
+                        "transaction_date": row["transaction_date"],
+                        "invoice_date": row["invoice_date"],
+                        "invoice_type": ObjectId(invoice_type_id),
+                        "invoice_number": row["invoice_number"],
+                        "vendor": ObjectId(vendor_id) if vendor_id else None,
+                        "description": description,
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+                    }
+                    ap_invoice_item_dict = {
+                        "company_id": company_id,
+                        "ap_invoice_id": ap_invoice_dict["_id"],
+                        "transaction_type": ObjectId(transaction_type_id),
+                        "amount": row["amount"],
+                        "vat": row["vat"],
+                        "job_number_id": ObjectId(job_card_id) if job_card_id else None,
+                        "received_number": row["received_number"],
+                        "note": row["notes"],
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+                    }
+                    ap_payment_dict = {
+                        "_id": ObjectId(),
+                        "company_id": company_id,
+                        "payment_type": ObjectId(payment_type_id),
+                        "payment_date": row["payment_date"],
+                        "status": status.capitalize(),
+                        "vendor": ObjectId(vendor_id) if vendor_id else None,
+                        "note": description,
+                        "cheque_number": row["cheque_number"],
+                        "account": account_id,
+                        "currency": 'AED',
+                        "rate": row["rate"],
+                        "cheque_date": row["cheque_date"],
+                        "payment_number": row["payment_number"],
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+                    }
+                    ap_payment_invoice_dict = {
+                        "company_id": company_id,
+                        "ap_invoices_id": ap_invoice_dict["_id"],
+                        "amount": row["payment_amount"],
+                        "payment_id": ap_payment_dict["_id"],
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+                    }
+                    # all four documents are built before any is queued, so a bad row writes nothing
+                    await invoices_inserter.add(ap_invoice_dict, i)
+                    await payments_inserter.add(ap_payment_dict, i)
+                    invoice_items.append((i, ap_invoice_item_dict))
+                    payment_invoices.append((i, ap_payment_invoice_dict))
+                except Exception as row_error:
+                    report.row_error(i, row_error)
+                await progress.update(i)
+
+            # items and payment links are written after their invoices and payments,
+            # so children of rejected parents are dropped
+            await invoices_inserter.flush()
+            await payments_inserter.flush()
+            for row_number, item in invoice_items:
+                if item["ap_invoice_id"] not in invoices_inserter.failed_ids:
+                    await invoice_items_inserter.add(item, row_number)
+            for row_number, link in payment_invoices:
+                if (link["ap_invoices_id"] not in invoices_inserter.failed_ids
+                        and link["payment_id"] not in payments_inserter.failed_ids):
+                    await payment_invoices_inserter.add(link, row_number)
+
+        await invoice_items_inserter.flush()
+        await payment_invoices_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         print(e)
@@ -1458,128 +1271,74 @@ async def dealing_with_ar_receipts(file: UploadFile, data: dict, delete_every_th
             await receipts_collection.delete_many({'company_id': company_id})
             await receipts_invoices_collection.delete_many({'company_id': company_id})
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        total_rows = len(df)
-        df.columns = df.columns.str.strip().str.lower()
-        # print(df.columns)
-        date_cols = ["receipt_date", "cheque_date"]
-        for col in date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-        # df_2025 = df[(df["receipt_date"].dt.year == 2025)]
-        # df_2025 = df[
-        #     (
-        #             (df["receipt_date"].dt.year == 2025) & (df["receipt_date"].dt.month == 12)
-        #     )
-        # ].sort_values(by=df.columns[0])
-        # print(df_2025.shape)
-        # print(df_2025.head())
-        # print(df_2025["receipt_type"].value_counts())
-        # print(df_2025.head())
+        batches = await read_import_batches(file, AR_RECEIPTS_SCHEMA)
+        report = ImportReport("ar receipts", batches.total_rows)
 
         # getting data section
         bank_name_doc = await list_collection.find_one({"code": "BANKS"})
         bank_name_list_id = str(bank_name_doc["_id"])
-        account_types_bank_doc = await value_collection.find_one({"name": "Bank"})
-        account_types_list_id = str(account_types_bank_doc["_id"])
         existing_customers = {b['entity_name'].strip(): b for b in
                               await entity_information_collection.find({"company_id": company_id}).to_list(length=None)}
         existing_values = {b["name"].strip(): ObjectId(b["_id"]) for b in
                            await value_collection.find({"company_id": company_id}).to_list(length=None)}
         existing_banks = {b["account_number"].strip(): ObjectId(b["_id"]) for b in
                           await banks_collection.find({"company_id": company_id}).to_list(length=None)}
-        uae_country_doc = await countries_collection.find_one({"code": "UAE"})
-        uae_country_id = str(uae_country_doc["_id"])
-        uae_currency_doc = await currencies_collection.find_one({"country_id": ObjectId(uae_country_id)})
-        uae_currency_id = str(uae_currency_doc["_id"])
-
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            receipt_id = clean_value(row[0])
-            receipt_number = normalize_number_to_string(row[1])
-            receipt_date = to_mongo_datetime(row[2])
-            customer_name = clean_value(row[3])
-            receipt_type = clean_value(row[4])
-            status = clean_value(row[5])
-            bank_name = clean_value(row[10])
-            cheque_date = to_mongo_datetime(row[11])
-            account_number = clean_value(row[6])
-
-            customer_id = None
-            if customer_name:
-                customer_data = existing_customers.get(customer_name.strip())
-                if customer_data:
-                    customer_id = customer_data["_id"]
-                else:
-                    customer_id = None
-
-            if receipt_type:
-                receipt_type_id = existing_values.get(str(receipt_type).strip())
-                if not receipt_type_id:
-                    receipt_type_id = None
-            else:
-                receipt_type_id = None
-
-            try:
-                if bank_name:
-                    bank_name_id = existing_values.get(str(bank_name).strip())
-                    if not bank_name_id:
-                        new_bank_name = await add_new_value(list_id=bank_name_list_id, name=str(bank_name),
-                                                            mastered_by_id=None, data=data)
-                        bank_name_id = ObjectId(new_bank_name['list']['_id'])
-                        existing_values[str(bank_name).strip()] = bank_name_id
-                else:
-                    bank_name_id = None
-
-            except Exception as e:
-                print(f"error in bank name {e}")
-                raise
-
-            try:
-                if account_number:
-                    account_id = existing_banks.get(str(account_number).strip())
-                    if not account_id:
-                        account_model = BanksModel(
-                            account_name=account_number,
-                            account_number=account_number,
-                            currency_id=uae_currency_id,
-                            account_type_id=account_types_list_id
-                        )
-                        new_account = await add_new_bank(bank=account_model, data=data)
-                        account_id = ObjectId(new_account['account']['_id'])
-                        existing_banks[str(account_number).strip()] = account_id
-                else:
-                    account_id = None
-            except Exception as e:
-                print(f"error in account {e}")
-                raise
-
-            # insert data:
-            receipt_dict = {
-                "company_id": company_id,
-                "receipt_id": receipt_id,
-                "receipt_number": receipt_number,
-                "receipt_date": receipt_date,
-                "customer": customer_id,
-                "receipt_type": receipt_type_id,
-                "status": status.capitalize(),
-                "currency": 'AED',
-                "rate": clean_value(row[8], number=True),
-                "cheque_number": clean_value(row[9]) if clean_value(row[9]) != 0 else "",
-                "cheque_date": cheque_date,
-                "note": clean_value(row[12]) if clean_value(row[12]) != 0 else "",
-                "bank_name": bank_name_id,
-                "account": account_id,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-            }
-            await receipts_collection.insert_one(receipt_dict)
-            print(f"added {i}")
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
 
+        async def create_bank_name(bank_name: str):
+            new_bank_name = await add_new_value(list_id=bank_name_list_id, name=bank_name,
+                                                mastered_by_id=None, data=data)
+            return ObjectId(new_bank_name['list']['_id'])
+
+        receipts_inserter = BulkInserter(receipts_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        async for batch in batches:
+            await create_missing(existing_values, batch.distinct("bank_name"), create_bank_name, report, "bank names")
+            await create_missing_banks(existing_banks, batch.distinct("account_number"), report, data)
+
+            for i, error, row in batch.records():
+                if error:
+                    report.row_error(i, error)
+                    await progress.update(i)
+                    continue
+                try:
+                    customer_name = row["customer"]
+                    receipt_type = row["receipt_type"]
+                    bank_name = row["bank_name"]
+                    account_number = row["account_number"]
+
+                    customer_data = existing_customers.get(customer_name) if customer_name else None
+                    customer_id = customer_data["_id"] if customer_data else None
+                    receipt_type_id = existing_values.get(receipt_type) if receipt_type else None
+                    bank_name_id = existing_values.get(bank_name) if bank_name else None
+                    account_id = existing_banks.get(account_number) if account_number else None
+
+                    receipt_dict = {
+                        "company_id": company_id,
+                        "receipt_id": row["receipt_id"],
+                        "receipt_number": row["receipt_number"],
+                        "receipt_date": row["receipt_date"],
+                        "customer": customer_id,
+                        "receipt_type": receipt_type_id,
+                        "status": row["status"].capitalize(),
+                        "currency": 'AED',
+                        "rate": row["rate"],
+                        "cheque_number": row["cheque_number"] if row["cheque_number"] != "0" else "",
+                        "cheque_date": row["cheque_date"],
+                        "note": row["note"] if row["note"] != "0" else "",
+                        "bank_name": bank_name_id,
+                        "account": account_id,
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+                    }
+                    await receipts_inserter.add(receipt_dict, i)
+                except Exception as row_error:
+                    report.row_error(i, row_error)
+                await progress.update(i)
+
+        await receipts_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         print(e)
@@ -1594,49 +1353,48 @@ async def dealing_with_ar_receipts_invoices(file: UploadFile, data: dict, delete
         if delete_every_thing:
             await receipts_invoices_collection.delete_many({"company_id": company_id})
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        total_rows = len(df)
-        df.columns = df.columns.str.strip().str.lower()
+        batches = await read_import_batches(file, AR_RECEIPTS_INVOICES_SCHEMA)
+        report = ImportReport("ar receipts invoices", batches.total_rows)
         existing_ar_receipts = {b.get("receipt_id", None): ObjectId(b["_id"]) for b in
-                                await receipts_collection.find({"company_id": company_id}).to_list()}
+                                await receipts_collection.find({"company_id": company_id},
+                                                               {"receipt_id": 1}).to_list()}
         existing_job_cards = {b.get("job_id", None): ObjectId(b["_id"]) for b in
-                              await job_cards_collection.find({"company_id": company_id}).to_list()}
-
-        invoice_items_buffer = []
-
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            receipt_id = normalize_number_to_string(row[0])
-            job_id = clean_value(row[1])
-            amount = clean_value(row[2], number=True)
-
-            if job_id:
-                job_card_id = existing_job_cards.get(int(job_id), None)
-            else:
-                job_card_id = None
-
-            if receipt_id:
-                new_receipt_id = existing_ar_receipts.get(receipt_id, None)
-            else:
-                new_receipt_id = None
-            if new_receipt_id and job_card_id:
-                invoice_dict = {
-                    "company_id": company_id,
-                    "receipt_id": new_receipt_id,
-                    "job_id": job_card_id,
-                    "amount": amount,
-                    "createdAt": security.now_utc(),
-                    "updatedAt": security.now_utc(),
-                }
-                invoice_items_buffer.append(invoice_dict)
-                print(f"Row: {i}")
-                progress = int((i / total_rows) * 100)
-                await manager.send_progress(progress)
+                              await job_cards_collection.find({"company_id": company_id}, {"job_id": 1}).to_list()}
+
+        invoices_inserter = BulkInserter(receipts_invoices_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        async for batch in batches:
+            for i, error, row in batch.records():
+                if error:
+                    report.row_error(i, error)
+                    await progress.update(i)
+                    continue
+                try:
+                    receipt_id = row["receipt_id"]
+                    job_id = row["job_id"]
 
-        if invoice_items_buffer:
-            await receipts_invoices_collection.insert_many(invoice_items_buffer)
-        await manager.broadcast({"type": "done"})
+                    job_card_id = existing_job_cards.get(job_id, None) if job_id else None
+                    new_receipt_id = existing_ar_receipts.get(receipt_id, None) if receipt_id else None
+                    if new_receipt_id and job_card_id:
+                        invoice_dict = {
+                            "company_id": company_id,
+                            "receipt_id": new_receipt_id,
+                            "job_id": job_card_id,
+                            "amount": row["amount"],
+                            "createdAt": security.now_utc(),
+                            "updatedAt": security.now_utc(),
+                        }
+                        await invoices_inserter.add(invoice_dict, i)
+                    else:
+                        report.skip()
+                except Exception as row_error:
+                    report.row_error(i, row_error)
+                await progress.update(i)
+
+        await invoices_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         print(e)
@@ -1645,7 +1403,7 @@ async def dealing_with_ar_receipts_invoices(file: UploadFile, data: dict, delete
 
 # =========================== job cards section ===========================
 
-async def create_entity_service(
+def build_entity_doc(
         *,
         entity_name: str,
         entity_code: str,
@@ -1674,7 +1432,8 @@ async def create_entity_service(
     if entity_social:
         for entity in entity_social:
             entity['type_id'] = ObjectId(entity['type_id']) if entity['type_id'] else None
-    doc = {
+    return set_search_keys("entity_information", {
+        "_id": ObjectId(),
         "entity_name": entity_name,
         "entity_code": entity_code,
         "credit_limit": credit_limit,
@@ -1695,10 +1454,14 @@ async def create_entity_service(
         "lpo_required": lpo_required,
         "createdAt": security.now_utc(),
         "updatedAt": security.now_utc(),
-    }
+    })
+
+
 
-    result = await entity_information_collection.insert_one(doc)
-    doc["_id"] = str(result.inserted_id)
+async def create_entity_service(**kwargs):
+    doc = build_entity_doc(**kwargs)
+    await entity_information_collection.insert_one(doc)
+    doc["_id"] = str(doc["_id"])
     return doc
 
 
@@ -1745,33 +1508,8 @@ async def dealing_with_job_cards(file: UploadFile, data: dict, delete_every_thin
                 "entity_code": {"$in": ["Customer"]}
             })
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
-        total_rows = len(df)
-        df.columns = df.columns.str.strip().str.lower()
-        date_cols = ["job_date", "invoice_date", "cancellation_date", "approval_date",
-                     "start_date", "end_date", "delivery_date", "invoice_new_date"]
-        for col in date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-        # df_2025 = df[
-        #     (
-        #         (df["job_date"].dt.year == 2025)
-        #         # & (df["job_date"].dt.month == 12)
-        #     ) |
-        #     (
-        #         (df["invoice_date"].dt.year == 2025)
-        #         # & (df["invoice_date"].dt.month == 12)
-        #     ) |
-        #     (
-        #         (df["cancellation_date"].dt.year == 2025)
-        #         # & (df["cancellation_date"].dt.month == 12)
-        #     )
-        #
-        #     ].sort_values(by=df.columns[0])
-        print(df.shape)
-        print(df.head())
+        batches = await read_import_batches(file, JOB_CARDS_SCHEMA)
+        report = ImportReport("job cards", batches.total_rows)
 
         color_doc = await list_collection.find_one({"code": "COLORS"})
         color_list_id = str(color_doc["_id"])
@@ -1807,370 +1545,264 @@ async def dealing_with_job_cards(file: UploadFile, data: dict, delete_every_thin
         existing_customers = {b['entity_name'].strip(): b for b in
                               await entity_information_collection.find({"company_id": company_id}).to_list(length=None)}
 
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            # for row in df[:50].itertuples(index=False):  # 20604
-            brand = clean_value(row[1])
-            model = clean_value(row[2])
-            color = clean_value(row[4])
-            city = clean_value(row[7])
-            salesman = clean_value(row[13])
-            branch = clean_value(row[14])
-            payment_type = clean_value(row[17])
-            mileage_in = safe_float(row[10] or 0)
-            mileage_out = safe_float(row[11] or 0)
-            job_min_test_km = clean_value(row[12], number=True)
-            returned = clean_value(row[18])
-            job_number = clean_value(row[19])
-            job_date = row[20]
-            invoice_number = normalize_number_to_string(clean_value(row[21]))
-            invoice_date = row[22]
-            job_cancellation_date = row[23]
-            lpo_number = clean_value(row[24])
-            job_approval_date = row[25]
-            job_start_date = row[26]
-            job_finish_date = row[27]
-            job_delivery_date = row[28]
-            job_warranty_days = clean_value(row[29], number=True)
-            job_warranty_km = clean_value(row[30], number=True)
-            reference_1 = clean_value(row[31])
-            reference_2 = clean_value(row[32])
-            invoice_new_date = row[33]
-            job_notes = clean_value(row[34])
-            job_delivery_notes = clean_value(row[35])
-            job_status_1 = clean_value(row[37])
-            job_status_2 = "Closed" if job_status_1.capitalize() == "Posted" else "Cancelled" if job_status_1.capitalize() == "Cancelled" else clean_value(
-                row[38])
-            customer = clean_value(row[39])
-            customer_group_name = clean_value(row[40])
-            trn = clean_value(row[41])
-            entity_status = clean_value(row[42])
-            customer_phone_name = clean_value(row[43])
-            customer_phone_number = clean_value(row[44])
-            customer_phone_work_number = clean_value(row[45])
-            customer_phone_email = clean_value(row[46])
-            customer_website = clean_value(row[47])
-            customer_address_line = clean_value(row[48])
-            customer_address_country = clean_value(row[49])
-            customer_address_city = clean_value(row[50])
-            customer_credit_limit = clean_value(row[51], number=True)
-            customer_warranty_days = clean_value(row[52], number=True)
-            customer_salesman = clean_value(row[53])
-            customer_lpo_required = clean_value(row[54])
-            internal_notes = clean_value(row[36])
-
-            try:
-                # brand section
-                if brand:
-                    # brand_id: Any = existing_brands.get(brand.upper())['_id']
-                    # brand_logo = existing_brands.get(brand.upper())['logo']
-                    brand_data = existing_brands.get(brand.upper())
-                    if brand_data:
-                        brand_id = brand_data["_id"]
-                        brand_logo = brand_data.get("logo")
-                    else:
-                        brand_id = None
-                        brand_logo = None
-                    if not brand_id:
-                        new_brand = await create_brand(name=str(brand).upper(), logo=None, data=data)
-                        print("added new brand")
-                        brand_id: Any = ObjectId(new_brand['brand']['_id'])
-                        existing_brands[str(brand).upper()] = {"_id": brand_id, "logo": brand_logo}
-                        # existing_brands[str(brand).upper()] = brand_id
-                else:
-                    brand_id = None
-                    brand_logo = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error Brand processing row {i}: {row_err}")
-                raise
-
-                # model section
-            try:
-                if model and brand:
-                    model_id = existing_models.get(str(model).upper())
-                    if not model_id:
-                        new_model = await add_new_model(brand_id=str(brand_id), name=str(model).upper(), data=data)
-                        print("added new model")
-                        model_id = ObjectId(new_model['model']['_id'])
-                        existing_models[str(model).upper()] = model_id
-
-                else:
-                    model_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error Model processing row {i}: {row_err}, Job Number: {job_number}")
-                raise
-
-                # color section
-            try:
-                if color:
-                    color_id = existing_values.get(str(color).upper())
-                    if not color_id:
-                        new_color = await add_new_value(list_id=color_list_id, name=str(color).upper(),
-                                                        mastered_by_id=None)
-                        color_id = ObjectId(new_color['list']['_id'])
-                        existing_values[str(color).upper()] = color_id
-                else:
-                    color_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error Color processing row {i}: {row_err}")
-                raise
-
-            # cities section
-            try:
-                if city and city != 0 and city != '0':
-                    city_id = existing_cities.get(city)
-                    if not city_id:
-                        new_city = await add_new_city(country_id=str(uae_country_id), name=str(city),
-                                                      code=str(city).upper())
-                        city_id = ObjectId(new_city['City']['_id'])
-                        existing_cities[str(city)] = city_id
-                else:
-                    city_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error City processing row {i}: {row_err}")
-                raise
-
-            # salesman section
-            try:
-                if salesman:
-                    salesman_id = existing_salesman.get(str(salesman).upper())
-                    if not salesman_id:
-                        sale_man_model = SaleManModel(
-                            name=str(salesman).upper(),
-                            target=0
-                        )
-                        new_salesman = await add_new_salesman(sale_man=sale_man_model, data=data)
-                        salesman_id = ObjectId(new_salesman['salesman']['_id'])
-                        existing_salesman[str(salesman).upper()] = salesman_id
-                else:
-                    salesman_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error Salesman processing row {i}: {row_err}")
-                raise
-
-            # branches section
-            try:
-                if branch:
-                    branch_id = existing_branches.get(str(branch).upper())
-                    if not branch_id:
-                        new_branch = await add_new_branch(name=str(branch).upper(), code=None, line=None,
-                                                          country_id=None,
-                                                          city_id=None, data=data)
-                        branch_id = ObjectId(new_branch['branch']['_id'])
-                        existing_branches[str(branch).upper()] = branch_id
-                else:
-                    branch_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error Branch processing row {i}: {row_err}")
-                raise
-
-            try:
-                # customer section
-                if customer:
-                    # customer_id = existing_customers.get(customer.strip())['_id']
-                    customer_data = existing_customers.get(customer.strip())
-                    if customer_data:
-                        customer_id = customer_data["_id"]
-                        print("found the customer")
-                    else:
-                        customer_id = None
-                    if not customer_id:
-                        print("creating the customer")
-
-                        try:
-                            if customer_salesman:
-                                customer_salesman_id_for_new_customer = existing_salesman.get(
-                                    str(customer_salesman).upper())
-                                if not customer_salesman_id_for_new_customer:
-                                    sale_man_model = SaleManModel(
-                                        name=str(customer_salesman).upper(),
-                                        target=0
-                                    )
-                                    new_salesman = await add_new_salesman(sale_man=sale_man_model, data=data)
-                                    print("added new customer salesman")
-                                    customer_salesman_id_for_new_customer = ObjectId(new_salesman['salesman']['_id'])
-                                    existing_salesman[str(salesman).upper()] = customer_salesman_id_for_new_customer
-                            else:
-                                customer_salesman_id_for_new_customer = None
-                        except Exception as row_err:
-                            # This will show exactly which row failed
-                            print(f"Error Customer salesman processing row {i}: {row_err}")
-                            raise
-                        print("done from salesman")
-
-                        try:
-                            if customer_address_city and (customer_address_city != 0 and customer_address_city != '0'):
+        model_brands = {}
+
+        async def create_brand_entry(brand_name: str):
+            new_brand = await create_brand(name=brand_name, logo=None, data=data)
+            return {"_id": ObjectId(new_brand['brand']['_id']), "logo": None}
+
+        async def create_model(model_name: str):
+            new_model = await add_new_model(brand_id=str(existing_brands[model_brands[model_name]]["_id"]),
+                                            name=model_name, data=data)
+            return ObjectId(new_model['model']['_id'])
+
+        async def create_color(color_name: str):
+            new_color = await add_new_value(list_id=color_list_id, name=color_name, mastered_by_id=None, data=data)
+            return ObjectId(new_color['list']['_id'])
+
+        async def create_city(city_name: str):
+            new_city = await add_new_city(country_id=str(uae_country_id), name=city_name, code=city_name.upper())
+            return ObjectId(new_city['City']['_id'])
+
+        async def create_salesman(salesman_name: str):
+            new_salesman = await add_new_salesman(sale_man=SaleManModel(name=salesman_name, target=0), data=data)
+            return ObjectId(new_salesman['salesman']['_id'])
+
+        async def create_branch(branch_name: str):
+            new_branch = await add_new_branch(name=branch_name, code=None, line=None, country_id=None,
+                                              city_id=None, data=data)
+            return ObjectId(new_branch['branch']['_id'])
+
+        new_customers = []
+        jobs_inserter = BulkInserter(job_cards_collection, report)
+        internal_notes = []
+
+        progress = ImportProgress(report, data)
+        await progress.start()
+        async for batch in batches:
+            # lookups section: everything the rows of the batch reference is created once, before its rows
+            cities = []
+            salesmen = []
+            for _, error, row in batch.records():
+                if error:
+                    continue
+                if row["model"] and row["brand"]:
+                    model_brands.setdefault(row["model"].upper(), row["brand"].upper())
+                for city in (row["city"], row["customer_address_city"]):
+                    if city and city != '0':
+                        cities.append(city)
+                if row["salesman"]:
+                    salesmen.append(row["salesman"].upper())
+                if row["customer"] and row["customer_salesman"] and row["customer"] not in existing_customers:
+                    salesmen.append(row["customer_salesman"].upper())
+
+            await create_missing(existing_brands, [value.upper() for value in batch.distinct("brand")],
+                                 create_brand_entry, report, "brands")
+            await create_missing(existing_models,
+                                 [model for model, brand in model_brands.items() if brand in existing_brands],
+                                 create_model, report, "models")
+            await create_missing(existing_values, [value.upper() for value in batch.distinct("color")],
+                                 create_color, report, "colors")
+            await create_missing(existing_cities, cities, create_city, report, "cities")
+            await create_missing(existing_salesman, salesmen, create_salesman, report, "salesmen")
+            await create_missing(existing_branches, [value.upper() for value in batch.distinct("branch")],
+                                 create_branch, report, "branches")
+
+            for i, error, row in batch.records():
+                if error:
+                    report.row_error(i, error, job_id=row["job_id"])
+                    await progress.update(i)
+                    continue
+                try:
+                    brand = row["brand"]
+                    model = row["model"]
+                    color = row["color"]
+                    city = row["city"]
+                    salesman = row["salesman"]
+                    branch = row["branch"]
+                    payment_type = row["payment_type"]
+                    mileage_in = row["mileage_in"]
+                    mileage_out = row["mileage_out"]
+                    job_date = row["job_date"]
+                    job_delivery_date = row["delivery_date"] or job_date
+                    job_warranty_days = row["job_warranty_days"]
+                    job_status_1 = row["job_status_1"]
+                    job_status_2 = "Closed" if job_status_1.capitalize() == "Posted" else "Cancelled" if job_status_1.capitalize() == "Cancelled" else row[
+                        "job_status_2"]
+                    customer = row["customer"]
+                    customer_phone_name = row["customer_phone_name"]
+                    customer_phone_number = row["customer_phone_number"]
+                    customer_phone_work_number = row["customer_phone_work_number"]
+                    customer_phone_email = row["customer_phone_email"]
+                    customer_website = row["customer_website"]
+                    customer_address_city = row["customer_address_city"]
+                    customer_credit_limit = row["customer_credit_limit"]
+                    customer_warranty_days = row["customer_warranty_days"]
+                    customer_salesman = row["customer_salesman"]
+                    internal_note = row["internal_note"]
+
+                    brand_data = existing_brands.get(brand.upper()) if brand else None
+                    brand_id = brand_data["_id"] if brand_data else None
+                    brand_logo = brand_data.get("logo") if brand_data else None
+                    model_id = existing_models.get(model.upper()) if model and brand else None
+                    color_id = existing_values.get(color.upper()) if color else None
+                    city_id = existing_cities.get(city) if city and city != '0' else None
+                    salesman_id = existing_salesman.get(salesman.upper()) if salesman else None
+                    branch_id = existing_branches.get(branch.upper()) if branch else None
+
+                    # customer section
+                    if customer:
+                        customer_data = existing_customers.get(customer)
+                        if not customer_data:
+                            customer_salesman_id_for_new_customer = existing_salesman.get(
+                                customer_salesman.upper()) if customer_salesman else None
+                            if customer_address_city and customer_address_city != '0':
                                 customer_address_city = existing_cities.get(customer_address_city)
-                                if not customer_address_city:
-                                    new_city = await add_new_city(country_id=str(uae_country_id), name=str(city),
-                                                                  code=str(city).upper())
-                                    print("added new customer city country")
-
-                                    customer_address_city = ObjectId(new_city['City']['_id'])
-                                    existing_cities[str(customer_address_city)] = city_id
                             else:
                                 customer_address_city = None
-                        except Exception as row_err:
-                            # This will show exactly which row failed
-                            print(f"Error customer city country processing row {i}: {row_err}")
-                            raise
-                        print("done from address city")
 
-                        address_list = [
-                            {
-                                "line": str(customer_address_line),
-                                "isPrimary": True,
-                                "country_id": uae_country_id,
-                                "city_id": customer_address_city,
-                            }
-                        ]
-                        print("done from address_list")
-
-                        phone_list = [{
-                            "number": str(customer_phone_number),
-                            "name": str(customer_phone_name) if customer_phone_name != 0 else "",
-                            "job_title": "",
-                            "email": str(customer_phone_email) if customer_phone_email != 0 else "",
-                            "isPrimary": True,
-                            "type_id": ObjectId(phone_type_personal_id)
-                        }]
-                        if customer_phone_work_number and customer_phone_work_number != "" and customer_phone_work_number != "0" and customer_phone_work_number != 0:
-                            phone_list.append({
-                                "number": str(customer_phone_work_number),
-                                "name": str(customer_phone_name) if customer_phone_name != 0 else "",
+                            address_list = [
+                                {
+                                    "line": row["customer_address_line"],
+                                    "isPrimary": True,
+                                    "country_id": uae_country_id,
+                                    "city_id": customer_address_city,
+                                }
+                            ]
+                            phone_list = [{
+                                "number": customer_phone_number,
+                                "name": customer_phone_name if customer_phone_name != "0" else "",
                                 "job_title": "",
-                                "email": str(customer_phone_email) if customer_phone_email != 0 else "",
-                                "isPrimary": False,
-                                "type_id": ObjectId(phone_type_work_id)
-                            })
-                        print("done from phone_list")
-
-                        website_list = []
-                        if customer_website and customer_website != "" and customer_website != "0" and customer_website != 0:
-                            website_list.append({
-                                "type_id": ObjectId(website_www_id),
-                                "link": str(customer_website)
-                            })
-                        print("done from website_list")
-
-                        customer_details = await create_entity_service(entity_name=str(customer.strip()),
-                                                                       entity_code='Customer',
-                                                                       credit_limit=float(
-                                                                           customer_credit_limit) if customer_credit_limit else 0,
-                                                                       warranty_days=int(
-                                                                           customer_warranty_days) if customer_warranty_days else 0,
-                                                                       salesman_id=customer_salesman_id_for_new_customer,
-                                                                       entity_status=str(entity_status).capitalize(),
-                                                                       group_name=str(customer_group_name),
-                                                                       industry_id=None, trn=str(trn),
-                                                                       entity_type_id=None,
-                                                                       entity_address=address_list,
-                                                                       entity_phone=phone_list,
-                                                                       entity_social=website_list,
-                                                                       company_id=company_id,
-                                                                       lpo_required=str(customer_lpo_required)
-                                                                       )
-                        print("added new customer")
-                        existing_customers[str(customer).strip()] = customer_details
-                        customer_id = customer_details['_id']
-
-                else:
-                    customer_id = None
-            except Exception as row_err:
-                # This will show exactly which row failed
-                print(f"Error Customer processing row {i}: {row_err} : job id : {clean_value(row[0], number=True)}")
-                raise
-
-            job_dict = {
-                "job_id": clean_value(row[0], number=True),
-                "car_brand_logo": brand_logo,
-                "company_id": company_id,
-                "car_brand": brand_id,
-                "car_model": model_id,
-                "year": clean_value(row[3]),
-                "color": color_id,
-                "plate_number": str(clean_value(row[5])),
-                "plate_code": str(clean_value(row[6])),
-                "country": ObjectId(uae_country_id),
-                "city": city_id,
-                "vehicle_identification_number": clean_value(row[8]),
-                "type": clean_value(row[9]),
-                "mileage_in": mileage_in,
-                "mileage_out": mileage_out,
-                "mileage_in_out_diff": mileage_out - mileage_in,
-                "fuel_amount": 0,
-                "job_min_test_km": job_min_test_km,
-                "salesman": salesman_id,
-                "branch": branch_id,
-                "currency": ObjectId(uae_currency_id),
-                "rate": uae_currency_rate if uae_currency_rate else 0,
-                "payment_method": payment_type.capitalize() if payment_type == 'CREDIT' else 'Cash',
-                "label": returned.capitalize(),
-                "job_number": job_number,
-                "job_date": to_mongo_datetime(job_date),
-                "invoice_number": invoice_number if invoice_number != "0" else "",
-                "invoice_date": to_mongo_datetime(invoice_date),
-                "job_cancellation_date": to_mongo_datetime(job_cancellation_date),
-                "lpo_number": lpo_number,
-                "job_approval_date": to_mongo_datetime(job_approval_date),
-                "job_start_date": to_mongo_datetime(job_start_date),
-                "job_finish_date": to_mongo_datetime(job_finish_date),
-                "job_delivery_date": to_mongo_datetime(job_delivery_date) if to_mongo_datetime(
-                    job_delivery_date) else to_mongo_datetime(job_date),
-                "job_warranty_days": int(job_warranty_days),
-                "job_warranty_km": float(job_warranty_km) if job_warranty_km else 0,
-                "job_reference_1": reference_1 if reference_1 else "",
-                "job_reference_2": reference_2 if reference_2 else "",
-                "invoice_new_date": to_mongo_datetime(invoice_new_date),
-                "job_notes": job_notes if job_notes else "",
-                "job_delivery_notes": job_delivery_notes if job_delivery_notes else "",
-                "job_status_1": job_status_1.capitalize(),
-                "job_status_2": job_status_2.capitalize(),
-                "customer": ObjectId(customer_id),
-                "contact_name": str(customer_phone_name) if customer_phone_name != 0 else "",
-                "contact_number": customer_phone_work_number,
-                "contact_email": customer_phone_email,
-                "credit_limit": float(customer_credit_limit) if customer_credit_limit else 0,
-                "engine_type": None,
-                "transmission_type": "",
-                "job_warranty_end_date": (
-                    (dt + timedelta(days=float(job_warranty_days)))
-                    if (dt := to_mongo_datetime(job_delivery_date)) else None
-                ),
-                "delivery_time": None,
-                "createdAt": security.now_utc(),
-                "updatedAt": security.now_utc(),
-
-            }
-            # print(job_dict)
-            result = await job_cards_collection.insert_one(job_dict)
-            job_id = result.inserted_id
-            internal_note_dict = {}
-            if internal_notes:
-                internal_note_dict["type"] = 'text'
-                internal_note_dict["job_card_id"] = job_id
-                internal_note_dict['company_id'] = company_id
-                internal_note_dict["note"] = internal_notes
-                internal_note_dict["user_id"] = user_id
-                internal_note_dict["createdAt"] = to_mongo_datetime(job_date)
-                internal_note_dict["updatedAt"] = to_mongo_datetime(job_date)
-                internal_note_dict["file_type"] = None
-                internal_note_dict["note_public_id"] = None
-                await job_cards_internal_notes_collection.insert_one(internal_note_dict)
-            print(f"added new job for row: {i}")
-            progress = int((i / total_rows) * 100)
-            await manager.send_progress(progress)
-        await manager.broadcast({"type": "done"})
-
-
-
+                                "email": customer_phone_email if customer_phone_email != "0" else "",
+                                "isPrimary": True,
+                                "type_id": ObjectId(phone_type_personal_id)
+                            }]
+                            if customer_phone_work_number and customer_phone_work_number != "0":
+                                phone_list.append({
+                                    "number": customer_phone_work_number,
+                                    "name": customer_phone_name if customer_phone_name != "0" else "",
+                                    "job_title": "",
+                                    "email": customer_phone_email if customer_phone_email != "0" else "",
+                                    "isPrimary": False,
+                                    "type_id": ObjectId(phone_type_work_id)
+                                })
+                            website_list = []
+                            if customer_website and customer_website != "0":
+                                website_list.append({
+                                    "type_id": ObjectId(website_www_id),
+                                    "link": customer_website
+                                })
+
+                            customer_data = build_entity_doc(entity_name=customer,
+                                                             entity_code='Customer',
+                                                             credit_limit=float(customer_credit_limit),
+                                                             warranty_days=int(customer_warranty_days),
+                                                             salesman_id=customer_salesman_id_for_new_customer,
+                                                             entity_status=row["entity_status"].capitalize(),
+                                                             group_name=row["customer_group_name"],
+                                                             industry_id=None, trn=row["trn"],
+                                                             entity_type_id=None,
+                                                             entity_address=address_list,
+                                                             entity_phone=phone_list,
+                                                             entity_social=website_list,
+                                                             company_id=company_id,
+                                                             lpo_required=row["lpo_required"]
+                                                             )
+                            existing_customers[customer] = customer_data
+                            new_customers.append(customer_data)
+                        customer_id = customer_data["_id"]
+                    else:
+                        customer_id = None
 
+                    job_dict = {
+                        "job_id": row["job_id"],
+                        "car_brand_logo": brand_logo,
+                        "company_id": company_id,
+                        "car_brand": brand_id,
+                        "car_model": model_id,
+                        "year": row["year"],
+                        "color": color_id,
+                        "plate_number": row["plate_number"],
+                        "plate_code": row["plate_code"],
+                        "country": ObjectId(uae_country_id),
+                        "city": city_id,
+                        "vehicle_identification_number": row["vehicle_identification_number"],
+                        "type": row["type"],
+                        "mileage_in": mileage_in,
+                        "mileage_out": mileage_out,
+                        "mileage_in_out_diff": mileage_out - mileage_in,
+                        "fuel_amount": 0,
+                        "job_min_test_km": row["job_min_test_km"],
+                        "salesman": salesman_id,
+                        "branch": branch_id,
+                        "currency": ObjectId(uae_currency_id),
+                        "rate": uae_currency_rate if uae_currency_rate else 0,
+                        "payment_method": payment_type.capitalize() if payment_type == 'CREDIT' else 'Cash',
+                        "label": row["returned"].capitalize(),
+                        "job_number": row["job_number"],
+                        "job_date": job_date,
+                        "invoice_number": row["invoice_number"] if row["invoice_number"] != "0" else "",
+                        "invoice_date": row["invoice_date"],
+                        "job_cancellation_date": row["cancellation_date"],
+                        "lpo_number": row["lpo_number"],
+                        "job_approval_date": row["approval_date"],
+                        "job_start_date": row["start_date"],
+                        "job_finish_date": row["end_date"],
+                        "job_delivery_date": job_delivery_date,
+                        "job_warranty_days": int(job_warranty_days),
+                        "job_warranty_km": row["job_warranty_km"],
+                        "job_reference_1": row["reference_1"],
+                        "job_reference_2": row["reference_2"],
+                        "invoice_new_date": row["invoice_new_date"],
+                        "job_notes": row["job_notes"],
+                        "job_delivery_notes": row["job_delivery_notes"],
+                        "job_status_1": job_status_1.capitalize(),
+                        "job_status_2": job_status_2.capitalize(),
+                        "customer": ObjectId(customer_id),
+                        "contact_name": customer_phone_name if customer_phone_name != "0" else "",
+                        "contact_number": customer_phone_work_number,
+                        "contact_email": customer_phone_email,
+                        "credit_limit": float(customer_credit_limit),
+                        "engine_type": None,
+                        "transmission_type": "",
+                        "job_warranty_end_date": (
+                            (row["delivery_date"] + timedelta(days=float(job_warranty_days)))
+                            if row["delivery_date"] else None
+                        ),
+                        "delivery_time": None,
+                        "createdAt": security.now_utc(),
+                        "updatedAt": security.now_utc(),
+
+                    }
+                    set_job_card_date_field_to_filter(job_dict)
+                    set_search_keys("job_cards", job_dict)
+                    job_id = await jobs_inserter.add(job_dict, i)
+                    if internal_note:
+                        internal_notes.append((i, {
+                            "type": 'text',
+                            "job_card_id": job_id,
+                            "company_id": company_id,
+                            "note": internal_note,
+                            "user_id": user_id,
+                            "createdAt": job_date,
+                            "updatedAt": job_date,
+                            "file_type": None,
+                            "note_public_id": None,
+                        }))
+                except Exception as row_error:
+                    report.row_error(i, row_error, job_id=row["job_id"])
+                await progress.update(i)
+
+        await insert_new_documents(entity_information_collection, new_customers, report, "customers")
+        await jobs_inserter.flush()
+        # notes are written after their job cards so notes of rejected jobs are dropped
+        notes_inserter = BulkInserter(job_cards_internal_notes_collection, report)
+        for row_number, note in internal_notes:
+            if note["job_card_id"] not in jobs_inserter.failed_ids:
+                await notes_inserter.add(note, row_number)
+        await notes_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         print(f"Fatal error in dealing_with_job_cards: {e}")
@@ -2186,91 +1818,76 @@ async def dealing_with_job_cards_items(file: UploadFile, data: dict, delete_ever
             await job_cards_invoice_items_collection.delete_many({"company_id": company_id})
             await invoice_items_collection.delete_many({"company_id": company_id})
 
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        df = df.fillna("")
-        df.columns = df.columns.str.strip().str.lower()
-        df["new"] = df["item_code"] + "-" + df["item_name"]
-        print(df.head())
+        batches = await read_import_batches(file, JOB_CARDS_ITEMS_SCHEMA)
+        report = ImportReport("job cards items", batches.total_rows)
         existing_invoice_items = {b["name"].strip(): ObjectId(b["_id"]) for b in
                                   await invoice_items_collection.find({"company_id": company_id}).to_list(
                                       length=None)}
         existing_job_cards = {b.get("job_id", None): ObjectId(b["_id"]) for b in
-                              await job_cards_collection.find({"company_id": company_id}).to_list()}
-
-        invoice_items_buffer = []
-        total_rows = len(df)
-
-        await manager.broadcast({"type": "start", "total": total_rows})
-        for i, row in enumerate(df.itertuples(index=False), start=1):
-            job_id = clean_value(row[0])
-            item_code = clean_value(row[1])
-            item_name = str(clean_value(row[2]) or "").strip()
-            item_description = clean_value(row[3])
-            quantity = clean_value(row[4], number=True)
-            price = clean_value(row[5], number=True)
-            vat = clean_value(row[6], number=True)
-            discount = clean_value(row[7], number=True)
-
-            quantity = quantity or 0
-            price = price or 0
-            vat = vat or 0
-            discount = discount or 0
-
-            amount = price * quantity
-            total = amount - discount
-            net = total + vat
-
-            item_id = None
-            if job_id:
-                job_card_id = existing_job_cards.get(int(job_id), None)
-                if job_card_id:
-                    if item_name:
-                        item_id = existing_invoice_items.get(str(item_name))
-                        if not item_id:
-                            item_model = InvoiceItem(
-                                name=(str(item_name.strip())),
-                                price=0,
-                                description=str(clean_value(row[3]) or ""),
-                            )
-                            new_item = await add_new_invoice_item(invoice=item_model, data=data)
-                            item_id = ObjectId(new_item['invoice']['_id'])
-                            existing_invoice_items[item_name] = item_id
-                            print(f"yes added new invoice item: {item_id}")
-
+                              await job_cards_collection.find({"company_id": company_id}, {"job_id": 1}).to_list()}
+
+        new_item_descriptions = {}
+
+        async def create_invoice_item(item_name: str):
+            item_model = InvoiceItem(name=item_name, price=0, description=new_item_descriptions[item_name])
+            new_item = await add_new_invoice_item(invoice=item_model, data=data)
+            return ObjectId(new_item['invoice']['_id'])
+
+        items_inserter = BulkInserter(job_cards_invoice_items_collection, report)
+        progress = ImportProgress(report, data)
+        await progress.start()
+        async for batch in batches:
+            for _, error, row in batch.records():
+                if not error and row["item_name"] and row["job_id"] and existing_job_cards.get(row["job_id"]):
+                    new_item_descriptions.setdefault(row["item_name"], row["item_description"])
+            await create_missing(existing_invoice_items, new_item_descriptions.keys(), create_invoice_item, report,
+                                 "invoice items")
+
+            for i, error, row in batch.records():
+                if error:
+                    report.row_error(i, error)
+                    await progress.update(i)
+                    continue
+                try:
+                    item_name = row["item_name"]
+                    quantity = row["quantity"]
+                    price = row["price"]
+                    vat = row["vat"]
+                    discount = row["discount"]
+
+                    amount = price * quantity
+                    total = amount - discount
+                    net = total + vat
+
+                    job_card_id = existing_job_cards.get(row["job_id"]) if row["job_id"] else None
+                    if job_card_id:
+                        item_id = existing_invoice_items.get(item_name) if item_name else None
+                        invoice_items_dict = {
+                            "company_id": company_id,
+                            "job_card_id": ObjectId(job_card_id),
+                            "line_number": 0,
+                            "quantity": quantity,
+                            "price": price,
+                            "vat": vat,
+                            "discount": discount,
+                            "amount": amount,
+                            "total": total,
+                            "net": net,
+                            "name": ObjectId(item_id),
+                            "description": row["item_description"],
+                            "createdAt": security.now_utc(),
+                            "updatedAt": security.now_utc(),
+                        }
+                        await items_inserter.add(invoice_items_dict, i)
                     else:
-                        item_id = None
-
-            else:
-                job_card_id = None
-
-            if job_card_id:
-                invoice_items_dict = {
-                    "company_id": company_id,
-                    "job_card_id": ObjectId(job_card_id),
-                    "line_number": 0,
-                    "quantity": quantity,
-                    "price": price,
-                    "vat": vat,
-                    "discount": discount,
-                    "amount": amount,
-                    "total": total,
-                    "net": net,
-                    "name": ObjectId(item_id),
-                    "description": str(item_description),
-                    "createdAt": security.now_utc(),
-                    "updatedAt": security.now_utc(),
-                }
-                invoice_items_buffer.append(invoice_items_dict)
-                print(i)
-                progress = int((i / total_rows) * 100)
-                await manager.send_progress(progress)
-
-        if invoice_items_buffer:
-            print(len(invoice_items_buffer))
-            await job_cards_invoice_items_collection.insert_many(invoice_items_buffer)
-        await manager.broadcast({"type": "done"})
-
+                        report.skip()
+                except Exception as row_error:
+                    report.row_error(i, row_error)
+                await progress.update(i)
+
+        await items_inserter.flush()
+        await progress.done(report)
+        return report.as_dict()
 
     except Exception as e:
         print(e)
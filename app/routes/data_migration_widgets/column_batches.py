@@ -0,0 +1,225 @@
+import asyncio
+import os
+from io import BytesIO
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import UploadFile
+from openpyxl import load_workbook
+
+# rows parsed and converted at a time, so peak memory follows the chunk and not the workbook
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "5000"))
+
+# stripped string, None when blank
+TEXT = "text"
+# identifier typed as a number in Excel: "1,234" / 1234.0 -> "1234", other values kept as stripped text
+CODE = "code"
+NUMBER = "number"
+INTEGER = "integer"
+DATE = "date"
+
+
+_KIND_DEFAULTS = {TEXT: None, CODE: "", NUMBER: 0, INTEGER: 0, DATE: None}
+_UNSET = object()
+
+
+class Column:
+    """One sheet column; blank cells take `default` (None for text and dates, "" for codes, 0 for numbers)."""
+
+    def __init__(self, position: int, name: str, kind: str = TEXT, required: bool = False, default: Any = _UNSET):
+        self.position = position
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.default = _KIND_DEFAULTS[kind] if default is _UNSET else default
+
+
+class ImportSchema:
+    """Sheet layout of one data migration screen: the columns it reads, by position, and their types."""
+
+    def __init__(self, screen_name: str, columns: list[Column]):
+        self.screen_name = screen_name
+        self.columns = columns
+        self.width = max(column.position for column in columns) + 1
+
+
+class ColumnBatch:
+    """
+    Converted columns of consecutive sheet rows. `errors` holds one message per row, None for
+    valid rows: a required value is blank or a number / date cell cannot be read.
+    """
+
+    def __init__(self, row_numbers: list[int], columns: dict[str, list], errors: list[Optional[str]]):
+        self.row_numbers = row_numbers
+        self.columns = columns
+        self.errors = errors
+
+    def __len__(self) -> int:
+        return len(self.row_numbers)
+
+    def distinct(self, name: str) -> list:
+        """Distinct non-blank values of a column over the valid rows, for creating missing lookups."""
+        return list(dict.fromkeys(value for value, error in zip(self.columns[name], self.errors)
+                                  if error is None and value not in (None, "")))
+
+    def records(self) -> Iterator[tuple[int, Optional[str], dict]]:
+        names = list(self.columns)
+        for row_number, error, values in zip(self.row_numbers, self.errors, zip(*self.columns.values())):
+            yield row_number, error, dict(zip(names, values))
+
+
+def _blank_text(series: pd.Series) -> tuple[pd.Series, np.ndarray]:
+    text = series.astype("string").str.strip()
+    blank = text.fillna("").eq("").to_numpy(dtype=bool)
+    return text, blank
+
+
+def _numbers(series: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        numbers = series.to_numpy(dtype="float64", na_value=np.nan)
+        return numbers, np.isnan(numbers)
+    text, blank = _blank_text(series)
+    numbers = pd.to_numeric(text.str.replace(",", "", regex=False), errors="coerce")
+    return numbers.to_numpy(dtype="float64", na_value=np.nan), blank
+
+
+def _convert(series: pd.Series, column: Column) -> tuple[list, np.ndarray, np.ndarray]:
+    """Returns the column as python values, its blank mask and its unreadable mask."""
+    size = len(series)
+    if column.kind in (NUMBER, INTEGER):
+        numbers, blank = _numbers(series)
+        invalid = ~blank & np.isnan(numbers)
+        if column.kind == INTEGER:
+            invalid |= ~blank & ~invalid & (np.mod(numbers, 1) != 0)
+        filled = ~blank & ~invalid
+        values = np.full(size, column.default, dtype=object)
+        values[filled] = (numbers[filled].astype(np.int64) if column.kind == INTEGER
+                          else numbers[filled]).astype(object)
+        return values.tolist(), blank, invalid
+
+    if column.kind == DATE:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            dates = series
+        else:
+            dates = pd.to_datetime(series, errors="coerce", format="mixed")
+        _, blank = _blank_text(series)
+        missing = dates.isna().to_numpy(dtype=bool)
+        values = np.array(dates.dt.to_pydatetime(), dtype=object)
+        values[missing] = column.default
+        # like the old per-cell parsing, an unreadable date imports as empty instead of failing the row
+        return values.tolist(), blank, np.zeros(size, dtype=bool)
+
+    text, blank = _blank_text(series)
+    values = text.to_numpy(dtype=object, na_value=None)
+    if column.kind == CODE:
+        numbers = pd.to_numeric(text.str.replace(",", "", regex=False), errors="coerce").to_numpy(
+            dtype="float64", na_value=np.nan)
+        numeric = ~np.isnan(numbers) & np.isfinite(numbers)
+        whole = numeric & (np.mod(np.where(numeric, numbers, 0), 1) == 0)
+        values[whole] = numbers[whole].astype(np.int64).astype(str)
+        values[numeric & ~whole] = numbers[numeric & ~whole].astype(str)
+    values[blank] = column.default
+    return values.tolist(), blank, np.zeros(size, dtype=bool)
+
+
+def convert_columns(columns: list[list], row_numbers: list[int], schema: ImportSchema) -> ColumnBatch:
+    """Converts whole raw columns (indexed by sheet position) to a validated ColumnBatch."""
+    errors = np.full(len(row_numbers), None, dtype=object)
+    failed = np.zeros(len(row_numbers), dtype=bool)
+    converted = {}
+    for column in schema.columns:
+        values, blank, invalid = _convert(pd.Series(columns[column.position], dtype=object), column)
+        converted[column.name] = values
+        for mask, message in ((blank if column.required else None, f"{column.name} is required"),
+                              (invalid, f"{column.name} is not a valid {column.kind}")):
+            if mask is not None:
+                errors[mask & ~failed] = message
+                failed |= mask
+    return ColumnBatch(row_numbers, converted, errors.tolist())
+
+
+class ImportBatches:
+    """
+    Async iterator of ColumnBatch chunks of the first sheet of a workbook. xlsx files are streamed
+    row by row with openpyxl in read-only mode; other formats are read with pandas and then sliced.
+    Parsing and conversion run in a worker thread so the event loop keeps serving requests.
+    """
+
+    def __init__(self, contents: bytes, schema: ImportSchema, chunk_rows: int = IMPORT_CHUNK_ROWS):
+        self.contents = contents
+        self.schema = schema
+        self.chunk_rows = max(chunk_rows, 1)
+        self.total_rows = 0
+        self._chunks: Optional[Iterator[ColumnBatch]] = None
+        self._workbook = None
+
+    def _check_width(self, width: int):
+        if width < self.schema.width:
+            raise ValueError(f"The {self.schema.screen_name} sheet needs {self.schema.width} columns, "
+                             f"the file has {width}")
+
+    def _open(self):
+        if self.contents[:4] == b"PK\x03\x04":
+            self._workbook = load_workbook(BytesIO(self.contents), read_only=True, data_only=True)
+            sheet = self._workbook.worksheets[0]
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, ())
+            self._check_width(len(header))
+            self.total_rows = max((sheet.max_row or 1) - 1, 0)
+            self._chunks = self._stream_chunks(rows, len(header))
+        else:
+            frame = pd.read_excel(BytesIO(self.contents), dtype=object).dropna(how="all")
+            self._check_width(len(frame.columns))
+            self.total_rows = len(frame)
+            self._chunks = self._frame_chunks(frame)
+
+    def _stream_chunks(self, rows, width: int) -> Iterator[ColumnBatch]:
+        chunk, row_numbers = [], []
+        for row_number, row in enumerate(rows, start=1):
+            if all(value is None or value == "" for value in row):
+                continue
+            # read-only sheets can return short rows when their trailing cells are empty
+            chunk.append(row[:width] + (None,) * (width - len(row)))
+            row_numbers.append(row_number)
+            if len(chunk) >= self.chunk_rows:
+                yield convert_columns(list(zip(*chunk)), row_numbers, self.schema)
+                chunk, row_numbers = [], []
+        if chunk:
+            yield convert_columns(list(zip(*chunk)), row_numbers, self.schema)
+
+    def _frame_chunks(self, frame: pd.DataFrame) -> Iterator[ColumnBatch]:
+        row_numbers = (frame.index + 1).tolist()
+        for start in range(0, len(frame), self.chunk_rows):
+            part = frame.iloc[start:start + self.chunk_rows]
+            yield convert_columns([part.iloc[:, position].tolist() for position in range(len(part.columns))],
+                                  row_numbers[start:start + self.chunk_rows], self.schema)
+
+    def _next_chunk(self) -> Optional[ColumnBatch]:
+        return next(self._chunks, None)
+
+    async def open(self) -> "ImportBatches":
+        await asyncio.to_thread(self._open)
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> ColumnBatch:
+        batch = await asyncio.to_thread(self._next_chunk)
+        if batch is None:
+            self.close()
+            raise StopAsyncIteration
+        return batch
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+
+async def read_import_batches(file: UploadFile | bytes, schema: ImportSchema,
+                              chunk_rows: int = IMPORT_CHUNK_ROWS) -> ImportBatches:
+    # background imports hand over the spooled file contents instead of the upload
+    contents = file if isinstance(file, bytes) else await file.read()
+    return await ImportBatches(contents, schema, chunk_rows).open()
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.core.jobs import current_job, report_job_progress
+from app.websocket_config import manager
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# parallel calls when missing lookup entities are created through their add_new_* routes
+IMPORT_CREATE_CONCURRENCY = int(os.getenv("IMPORT_CREATE_CONCURRENCY", "8"))
+MAX_REPORTED_ERRORS = 500
+IMPORT_PROGRESS_INTERVAL_MS = int(os.getenv("IMPORT_PROGRESS_INTERVAL_MS", "250"))
+
+
+class ImportReport:
+    """Outcome of one data migration import: counts, created lookups and per-row errors."""
+
+    def __init__(self, screen_name: str, total_rows: int):
+        self.screen_name = screen_name
+        self.total_rows = total_rows
+        self.inserted: dict[str, int] = {}
+        self.skipped = 0
+        self.failed_rows: set[int] = set()
+        self.created: dict[str, int] = {}
+        self.errors: list[dict] = []
+        self._started = time.perf_counter()
+
+    def row_error(self, row_number: Optional[int], error: Any, **details):
+        if row_number is not None:
+            self.failed_rows.add(row_number)
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": str(error), **details})
+        print(f"[import {self.screen_name}] row {row_number}: {error}")
+
+    def skip(self):
+        self.skipped += 1
+
+    def count_inserted(self, collection_name: str, count: int):
+        self.inserted[collection_name] = self.inserted.get(collection_name, 0) + count
+
+    def count_created(self, entity_name: str, count: int):
+        if count:
+            self.created[entity_name] = self.created.get(entity_name, 0) + count
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "screen_name": self.screen_name,
+            "total_rows": self.total_rows,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "failed": len(self.failed_rows),
+            "created": self.created,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(self.total_rows / elapsed, 1) if elapsed > 0 else None,
+        }
+
+
+class BulkInserter:
+    """
+    Buffers documents and writes them with unordered insert_many batches.
+    Documents get their _id up front so rows can reference each other before the flush.
+    """
+
+    def __init__(self, collection, report: ImportReport, batch_size: int = IMPORT_BATCH_SIZE):
+        self.collection = collection
+        self.report = report
+        self.batch_size = max(batch_size, 1)
+        self.failed_ids: set[ObjectId] = set()
+        self._docs: list[dict] = []
+        self._rows: list[Optional[int]] = []
+
+    async def add(self, doc: dict, row_number: Optional[int] = None) -> ObjectId:
+        doc.setdefault("_id", ObjectId())
+        self._docs.append(doc)
+        self._rows.append(row_number)
+        if len(self._docs) >= self.batch_size:
+            await self.flush()
+        return doc["_id"]
+
+    async def flush(self):
+        if not self._docs:
+            return
+        docs, rows = self._docs, self._rows
+        self._docs, self._rows = [], []
+        try:
+            result = await self.collection.insert_many(docs, ordered=False)
+            self.report.count_inserted(self.collection.name, len(result.inserted_ids))
+        except BulkWriteError as exc:
+            details = exc.details or {}
+            self.report.count_inserted(self.collection.name, details.get("nInserted", 0))
+            for write_error in details.get("writeErrors", []):
+                index = write_error.get("index")
+                if index is None or index >= len(docs):
+                    continue
+                self.failed_ids.add(docs[index]["_id"])
+                self.report.row_error(rows[index], write_error.get("errmsg"), collection=self.collection.name)
+
+
+class ImportProgress:
+    """
+    Progress of one import, sent only to the user who started it (their company when there is no user).
+    Sends are throttled to one per IMPORT_PROGRESS_INTERVAL_MS and run beside the row loop; updates
+    arriving while a send is in flight or inside the interval are coalesced into the next one.
+    """
+
+    def __init__(self, report: ImportReport, data: dict):
+        self.report = report
+        self.total_rows = report.total_rows
+        self.user_id = str(data.get("sub") or "")
+        self.company_id = str(data.get("company_id") or "")
+        job = current_job.get()
+        self.job_id = str(job.job_id) if job else None
+        self._percent = 0
+        self._sent_percent = -1
+        self._last_sent_at = 0.0
+        self._in_flight: Optional[asyncio.Task] = None
+
+    async def _send(self, message: dict):
+        message = {**message, "screen_name": self.report.screen_name, "job_id": self.job_id}
+        if self.user_id:
+            await manager.send_to_user(self.user_id, message)
+        elif self.company_id:
+            await manager.send_to_company(self.company_id, message)
+
+    async def _send_progress(self, percent: int):
+        try:
+            # inside a job the client follows the job_progress messages
+            if self.job_id:
+                await report_job_progress(percent)
+            else:
+                await self._send({"type": "progress", "progress": percent})
+        except Exception as error:
+            print(f"[import {self.report.screen_name}] progress not sent: {error}")
+
+    async def start(self):
+        await self._send({"type": "start", "total": self.total_rows})
+
+    async def update(self, row_number: int):
+        self._percent = int((row_number / self.total_rows) * 100) if self.total_rows else 100
+        if self._percent == self._sent_percent:
+            return
+        if self._in_flight and not self._in_flight.done():
+            return
+        now = time.monotonic()
+        if (now - self._last_sent_at) * 1000 < IMPORT_PROGRESS_INTERVAL_MS:
+            return
+        self._sent_percent = self._percent
+        self._last_sent_at = now
+        self._in_flight = asyncio.create_task(self._send_progress(self._percent))
+
+    async def done(self, report: ImportReport):
+        if self._in_flight:
+            await self._in_flight
+        if self._percent != self._sent_percent:
+            self._sent_percent = self._percent
+            await self._send_progress(self._percent)
+        await self._send({"type": "done", "report": report.as_dict()})
+
+
+async def create_missing(existing: dict, keys: Iterable[Hashable],
+                         create: Callable[[Any], Awaitable[Any]], report: ImportReport, entity_name: str):
+    """
+    Creates every distinct key missing from `existing` before the row loop, with bounded
+    concurrency, and stores the new ids in `existing`. Failures are reported, not raised.
+    """
+    missing = [key for key in dict.fromkeys(keys) if key and key not in existing]
+    if not missing:
+        return
+    semaphore = asyncio.Semaphore(IMPORT_CREATE_CONCURRENCY)
+
+    async def create_one(key):
+        async with semaphore:
+            try:
+                existing[key] = await create(key)
+                return True
+            except Exception as error:
+                report.row_error(None, error, entity=entity_name, key=str(key))
+                return False
+
+    results = await asyncio.gather(*[create_one(key) for key in missing])
+    report.count_created(entity_name, sum(1 for created in results if created))
+
+
+async def insert_new_documents(collection, docs: list[dict], report: ImportReport, entity_name: str,
+                               batch_size: int = IMPORT_BATCH_SIZE):
+    """Bulk-creates lookup documents that the import builds itself (customers, vendors)."""
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
+        try:
+            await collection.insert_many(batch, ordered=False)
+            report.count_created(entity_name, len(batch))
+        except BulkWriteError as exc:
+            details = exc.details or {}
+            report.count_created(entity_name, details.get("nInserted", 0))
+            for write_error in details.get("writeErrors", []):
+                report.row_error(None, write_error.get("errmsg"), entity=entity_name)
@@ -0,0 +1,112 @@
+from app.routes.data_migration_widgets.column_batches import Column, ImportSchema, CODE, NUMBER, INTEGER, DATE
+
+JOB_CARDS_SCHEMA = ImportSchema("job cards", [
+    Column(0, "job_id", INTEGER, default=None),
+    Column(1, "brand"),
+    Column(2, "model"),
+    Column(3, "year", CODE),
+    Column(4, "color"),
+    Column(5, "plate_number", CODE),
+    Column(6, "plate_code", CODE),
+    Column(7, "city"),
+    Column(8, "vehicle_identification_number"),
+    Column(9, "type"),
+    Column(10, "mileage_in", NUMBER),
+    Column(11, "mileage_out", NUMBER),
+    Column(12, "job_min_test_km", NUMBER),
+    Column(13, "salesman"),
+    Column(14, "branch"),
+    Column(17, "payment_type"),
+    Column(18, "returned", required=True),
+    Column(19, "job_number", CODE),
+    Column(20, "job_date", DATE),
+    Column(21, "invoice_number", CODE),
+    Column(22, "invoice_date", DATE),
+    Column(23, "cancellation_date", DATE),
+    Column(24, "lpo_number", CODE, default=None),
+    Column(25, "approval_date", DATE),
+    Column(26, "start_date", DATE),
+    Column(27, "end_date", DATE),
+    Column(28, "delivery_date", DATE),
+    Column(29, "job_warranty_days", NUMBER),
+    Column(30, "job_warranty_km", NUMBER),
+    Column(31, "reference_1", default=""),
+    Column(32, "reference_2", default=""),
+    Column(33, "invoice_new_date", DATE),
+    Column(34, "job_notes", default=""),
+    Column(35, "job_delivery_notes", default=""),
+    Column(36, "internal_note"),
+    Column(37, "job_status_1", required=True),
+    Column(38, "job_status_2"),
+    Column(39, "customer"),
+    Column(40, "customer_group_name", default=""),
+    Column(41, "trn", CODE),
+    Column(42, "entity_status", default=""),
+    Column(43, "customer_phone_name", default=""),
+    Column(44, "customer_phone_number", CODE),
+    Column(45, "customer_phone_work_number", CODE),
+    Column(46, "customer_phone_email", default=""),
+    Column(47, "customer_website"),
+    Column(48, "customer_address_line", default=""),
+    Column(50, "customer_address_city"),
+    Column(51, "customer_credit_limit", NUMBER),
+    Column(52, "customer_warranty_days", NUMBER),
+    Column(53, "customer_salesman"),
+    Column(54, "lpo_required", default=""),
+])
+
+JOB_CARDS_ITEMS_SCHEMA = ImportSchema("job cards items", [
+    Column(0, "job_id", INTEGER, default=None),
+    Column(2, "item_name", default=""),
+    Column(3, "item_description", default=""),
+    Column(4, "quantity", NUMBER),
+    Column(5, "price", NUMBER),
+    Column(6, "vat", NUMBER),
+    Column(7, "discount", NUMBER),
+])
+
+AR_RECEIPTS_SCHEMA = ImportSchema("ar receipts", [
+    Column(0, "receipt_id", CODE),
+    Column(1, "receipt_number", CODE),
+    Column(2, "receipt_date", DATE),
+    Column(3, "customer"),
+    Column(4, "receipt_type"),
+    Column(5, "status", required=True),
+    Column(6, "account_number", CODE),
+    Column(8, "rate", NUMBER, default=1),
+    Column(9, "cheque_number", CODE),
+    Column(10, "bank_name"),
+    Column(11, "cheque_date", DATE),
+    Column(12, "note", default=""),
+])
+
+AR_RECEIPTS_INVOICES_SCHEMA = ImportSchema("ar receipts invoices", [
+    Column(0, "receipt_id", CODE),
+    Column(1, "job_id", INTEGER, default=None),
+    Column(2, "amount", NUMBER),
+])
+
+AP_INVOICES_SCHEMA = ImportSchema("ap invoices", [
+    Column(0, "reference_number", CODE),
+    Column(1, "status", required=True),
+    Column(2, "transaction_date", DATE),
+    Column(3, "invoice_type"),
+    Column(4, "invoice_number", CODE),
+    Column(5, "invoice_date", DATE),
+    Column(6, "vendor"),
+    Column(7, "description"),
+    Column(8, "payment_type"),
+    Column(9, "account", CODE),
+    Column(10, "cheque_number", CODE, default=None),
+    Column(11, "cheque_date", DATE),
+    Column(13, "rate", NUMBER, default=1),
+    Column(14, "payment_date", DATE),
+    Column(15, "payment_number", CODE),
+    Column(16, "payment_amount", NUMBER),
+    Column(17, "transaction_type"),
+    Column(18, "amount", NUMBER),
+    Column(19, "vat", NUMBER),
+    Column(20, "job_id", INTEGER, default=None),
+    Column(21, "received_number", CODE, default=None),
+    Column(22, "notes"),
+])
@@ -7,8 +7,9 @@ from fastapi import APIRouter, HTTPException, Depends, Form, UploadFile, File, B
 from pydantic import BaseModel, EmailStr
 from app import database
 from app.core import security
+from app.core.working_days_calendar import get_working_days_calendars, working_days_between
 from app.database import get_collection
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 
 from app.routes.car_trading import PyObjectId
 from app.routes.counters import create_custom_counter
@@ -3921,6 +3922,10 @@ class NumberOfDaysForWorkingDaysModel(BaseModel):
     leave_type: Optional[str] = None
 
 
+class NumberOfDaysBatchModel(BaseModel):
+    ranges: List[NumberOfDaysForWorkingDaysModel] = []
+
+
 class EmployeeLeavesModel(BaseModel):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
@@ -3992,98 +3997,92 @@ async def get_employee_leave_details(leave_id: ObjectId):
 
 
 # this function is to calculate the number of holidays between 2 dates
-async def calculate_number_of_days(
+async def calculate_number_of_days_batch(
         employee_id: str,
-        data: NumberOfDaysForWorkingDaysModel,
+        ranges: List[NumberOfDaysForWorkingDaysModel],
         user_data: dict,
-):
+) -> list[dict]:
     try:
         company_id = ObjectId(user_data.get("company_id"))
         employee_id = ObjectId(employee_id)
-        leave_type = data.leave_type
-
-        if leave_type:
-            result = await leave_types_collection.find_one({"_id": ObjectId(leave_type)})
-            if result:
-                leave_type: str = result.get("type", None)
-                if leave_type.lower() == "calendar days":
-                    return {
-                        "working_days": (data.end_date - data.start_date).days + 1,
-                        "total_days_including_weekends": (data.end_date - data.start_date).days + 1,
-                        "holidays_count": 0,
-                        "weekends": []
-                    }
+
+        leave_type_ids = {ObjectId(item.leave_type) for item in ranges if item.leave_type}
+        leave_types_by_id = {}
+        if leave_type_ids:
+            leave_types = await leave_types_collection.find(
+                {"_id": {"$in": list(leave_type_ids)}}, {"type": 1}
+            ).to_list(None)
+            leave_types_by_id = {str(item["_id"]): item for item in leave_types}
+
+        def is_calendar_days(item: NumberOfDaysForWorkingDaysModel) -> bool:
+            leave_type_doc = leave_types_by_id.get(str(item.leave_type)) if item.leave_type else None
+            return bool(leave_type_doc) and str(leave_type_doc.get("type") or "").lower() == "calendar days"
+
+        results: list[Optional[dict]] = [None] * len(ranges)
+        working_day_ranges = []
+        for index, item in enumerate(ranges):
+            if is_calendar_days(item):
+                results[index] = {
+                    "working_days": (item.end_date - item.start_date).days + 1,
+                    "total_days_including_weekends": (item.end_date - item.start_date).days + 1,
+                    "holidays_count": 0,
+                    "weekends": []
+                }
+            else:
+                working_day_ranges.append(index)
+
+        if not working_day_ranges:
+            return results
 
         employee_doc = await employees_collection.find_one({
             "_id": employee_id,
             "company_id": company_id,
-        })
+        }, {"company_id": 1, "legislation": 1})
         if not employee_doc:
             raise HTTPException(status_code=404, detail="Employee not found")
-        # Default empty weekend
-        legislations_weekend = []
-        legislation = None
-        if "legislation" in employee_doc:
-            legislation = employee_doc["legislation"]
-            legislation_doc = await legislations_collection.find_one({"_id": legislation})
-            if not legislation_doc:
-                raise HTTPException(status_code=404, detail="Legislation not found")
-
-            legislations_weekend = legislation_doc.get("weekend", [])
-        start_date = data.start_date
-        end_date = data.end_date
-        if start_date > end_date:
-            raise HTTPException(status_code=400, detail="Invalid date range")
-        # Map weekday index to name
-        weekday_map = {
-            0: "Monday",
-            1: "Tuesday",
-            2: "Wednesday",
-            3: "Thursday",
-            4: "Friday",
-            5: "Saturday",
-            6: "Sunday"
-        }
+
+        legislation = employee_doc.get("legislation")
         company_id = employee_doc.get("company_id")
-        match_stage = {}
-        if company_id:
-            match_stage["company_id"] = company_id
-        if legislation:
-            match_stage['legislation'] = legislation
-        if start_date and end_date:
-            match_stage['date'] = {
-                "$gte": start_date,
-                "$lte": end_date
+        for index in working_day_ranges:
+            if ranges[index].start_date > ranges[index].end_date:
+                raise HTTPException(status_code=400, detail="Invalid date range")
+
+        years = set()
+        for index in working_day_ranges:
+            years.update(range(ranges[index].start_date.year, ranges[index].end_date.year + 1))
+        calendars = await get_working_days_calendars(company_id, legislation, years)
+
+        for index in working_day_ranges:
+            start_date = ranges[index].start_date
+            end_date = ranges[index].end_date
+            weekends = calendars[start_date.year].weekend
+            holidays_count = sum(
+                1
+                for year in range(start_date.year, end_date.year + 1)
+                for holiday_date in calendars[year].holiday_dates
+                if start_date.date() <= holiday_date <= end_date.date()
+            )
+            results[index] = {
+                "working_days": working_days_between(calendars, start_date, end_date),
+                "total_days_including_weekends": (end_date - start_date).days + 1,
+                "holidays_count": holidays_count,
+                "weekends": weekends
             }
-        # Fetch holidays in range
-        holidays = await public_holidays_collection.find(
-            match_stage,
-            {"date": 1}
-        ).to_list(None)
-        holiday_dates = set(h["date"].date() for h in holidays)
-        # Calculate working days
-        total_days = 0
-        current_date = start_date
-
-        while current_date <= end_date:
-            day_name = weekday_map[current_date.weekday()]
-            # Skip weekends
-            if day_name not in legislations_weekend:
-                # Skip holidays
-                if current_date.date() not in holiday_dates:
-                    total_days += 1
-            current_date += timedelta(days=1)
-        return {
-            "working_days": total_days,
-            "total_days_including_weekends": (end_date - start_date).days + 1,
-            "holidays_count": len(holiday_dates),
-            "weekends": legislations_weekend
-        }
+        return results
 
     except Exception:
         raise
 
 
+async def calculate_number_of_days(
+        employee_id: str,
+        data: NumberOfDaysForWorkingDaysModel,
+        user_data: dict,
+):
+    results = await calculate_number_of_days_batch(employee_id, [data], user_data)
+    return results[0]
+
+
 @router.post("/get_number_of_days/{employee_id}")
 async def get_number_of_days(
         employee_id: str,
@@ -4093,6 +4092,15 @@ async def get_number_of_days(
     return await calculate_number_of_days(employee_id, data, user_data)
 
 
+@router.post("/get_number_of_days_batch/{employee_id}")
+async def get_number_of_days_batch(
+        employee_id: str,
+        data: NumberOfDaysBatchModel,
+        user_data: dict = Depends(security.get_current_user),
+):
+    return {"results": await calculate_number_of_days_batch(employee_id, data.ranges, user_data)}
+
+
 @router.get("/get_all_employee_leaves/{employee_id}")
 async def get_all_employee_leaves(employee_id: str, data: dict = Depends(security.get_current_user)):
     try:
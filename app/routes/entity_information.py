@@ -2,10 +2,10 @@ import copy
 from typing import Optional, Dict, Any
 from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException, Body, Form, UploadFile, File
-from pymongo.errors import OperationFailure
 from pydantic import BaseModel
 import json
 from app.core import security
+from app.core.search_index import search_keys_update, search_match, set_search_keys
 from app.database import get_collection
 from datetime import datetime
 from app.routes.car_trading import PyObjectId
@@ -15,7 +15,6 @@ from app.widgets import upload_images
 router = APIRouter()
 entity_information_collection = get_collection("entity_information")
 salesman_collection = get_collection("sales_man")
-_entity_lookup_indexes_ready = False
 
 
 def serializer(doc: dict) -> dict:
@@ -538,28 +537,6 @@ customer_vendor_pipeline = [
 ]
 
 
-async def ensure_entity_lookup_indexes():
-    global _entity_lookup_indexes_ready
-    if _entity_lookup_indexes_ready:
-        return
-
-    try:
-        await entity_information_collection.create_index(
-            [
-                ("company_id", 1),
-                ("entity_code", 1),
-                ("status", 1),
-                ("entity_name", 1),
-            ],
-            background=True,
-        )
-    except OperationFailure as exc:
-        if exc.code != 85:
-            raise
-
-    _entity_lookup_indexes_ready = True
-
-
 def primary_phone_numbers(entity_phone: list) -> str:
     return " - ".join(
         str(phone.get("number", "")).strip()
@@ -655,7 +632,6 @@ async def get_all_entities(data: dict = Depends(security.get_current_user)):
 async def get_all_customers(data: dict = Depends(security.get_current_user)):
     try:
         company_id = ObjectId(data.get("company_id"))
-        await ensure_entity_lookup_indexes()
 
         customers = await entity_information_collection.find(
             {
@@ -743,7 +719,6 @@ async def get_all_customers(data: dict = Depends(security.get_current_user)):
 async def get_all_vendors(data: dict = Depends(security.get_current_user)):
     try:
         company_id = ObjectId(data.get("company_id"))
-        await ensure_entity_lookup_indexes()
 
         vendors = await entity_information_collection.find(
             {
@@ -862,6 +837,7 @@ async def add_new_entity(
             "updatedAt": security.now_utc(),
         }
 
+        set_search_keys("entity_information", doc)
         result = await entity_information_collection.insert_one(doc)
         new_entity = await get_entity_details(result.inserted_id)
         serialized = serializer(new_entity)
@@ -938,6 +914,7 @@ async def update_entity(entity_id: str, entity_name: str = Form(None),
                 entity.pop('type')
             doc["entity_social"] = entity_social
 
+        doc.update(search_keys_update("entity_information", doc))
         await  entity_information_collection.update_one({"_id": ObjectId(entity_id)}, {"$set": doc})
         updated_entity = await get_entity_details(ObjectId(entity_id))
         serialized = serializer(updated_entity)
@@ -997,7 +974,7 @@ async def search_engine_for_entity_information(filter_entities: EntityInformatio
         if filter_entities.code:
             match_stage["entity_code"] = filter_entities.code
         if filter_entities.name:
-            match_stage["entity_name"] = {"$regex": filter_entities.name, "$options": "i"}
+            match_stage.update(search_match("entity_information", "entity_name", filter_entities.name))
         if filter_entities.country:
             match_stage["entity_address"] = {
                 "$elemMatch": {
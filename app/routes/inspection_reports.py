@@ -5,12 +5,16 @@ from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, Form, File
 from app import database
 from app.core import security
+from app.core.dashboard_rollups import refresh_job_daily_stats
+from app.core.outstanding_ledger import refresh_job_balances
+from app.core.search_index import search_keys_update, set_search_keys
 from app.database import get_collection
 from datetime import datetime
 from app.routes.counters import create_custom_counter
 from app.routes.job_cards import get_user_branches
 from app.websocket_config import manager
 from app.widgets import upload_images
+from app.widgets.job_card_dates import job_card_date_field_to_filter, set_job_card_date_field_to_filter
 
 router = APIRouter()
 job_cards_collection = get_collection("job_cards")
@@ -486,6 +490,8 @@ async def create_job_from_inspection_report(job_date: Optional[datetime] = Form(
                 "createdAt": security.now_utc(),
                 "updatedAt": security.now_utc(),
             }
+            set_job_card_date_field_to_filter(job_card_section_dict)
+            set_search_keys("job_cards", job_card_section_dict)
             result = await job_cards_collection.insert_one(job_card_section_dict, session=session)
             if not result.inserted_id:
                 raise HTTPException(status_code=500, detail="Failed to insert job card")
@@ -542,6 +548,7 @@ async def create_job_from_inspection_report(job_date: Optional[datetime] = Form(
                                                                                   session=session)
             if not ins_result.inserted_id:
                 raise HTTPException(status_code=500, detail="Failed to insert inspection report")
+            await refresh_job_daily_stats([result.inserted_id], session=session)
             await session.commit_transaction()
 
             res = await get_current_job_card_inspection_report_details(str(result.inserted_id))
@@ -662,7 +669,11 @@ async def update_job_from_inspection_report(
             "vehicle_identification_number": vin if vin else "",
             "updatedAt": security.now_utc(),
         }
+        job_updates["date_field_to_filter"] = job_card_date_field_to_filter({**job_card, **job_updates})
+        job_updates.update(search_keys_update("job_cards", job_updates))
         await job_cards_collection.update_one({"_id": job_card_id}, {"$set": job_updates})
+        await refresh_job_balances([job_card_id])
+        await refresh_job_daily_stats([job_card_id])
 
         # 🟦 4) تحديث الصور
         old_images = report.get("car_images", [])
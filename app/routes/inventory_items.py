@@ -5,6 +5,9 @@ from fastapi import APIRouter, Body, HTTPException, Depends
 from pydantic import BaseModel
 from pymongo import ReturnDocument
 from app.core import security
+from app.core.jobs import JOB_MAX_ATTEMPTS, JobContext, register_job_type, submit_job
+from app.core.search_index import SEARCH_KEYS, search_keys_update, search_match, set_search_keys
+from app.core.stock_ledger import rebuild_stock_ledger
 from app.database import get_collection
 from datetime import datetime, timezone
 from app.websocket_config import manager
@@ -14,6 +17,7 @@ inventory_items_collection = get_collection("inventory_items")
 
 
 def serializer(item: dict) -> dict:
+    item.pop(SEARCH_KEYS, None)
     item["_id"] = str(item["_id"])
     if item['company_id']:
         item['company_id'] = str(item['company_id'])
@@ -29,6 +33,13 @@ class InventoryItem(BaseModel):
     min_quantity: Optional[float] = None
 
 
+async def run_stock_rebuild_job(job: JobContext):
+    return await rebuild_stock_ledger(ObjectId(job.user_data.get("company_id")), job.report_progress)
+
+
+register_job_type("stock_ledger_rebuild", run_stock_rebuild_job, max_attempts=JOB_MAX_ATTEMPTS)
+
+
 @router.get("/get_all_inventory_items")
 async def get_all_inventory_items(data: dict = Depends(security.get_current_user)):
     try:
@@ -53,6 +64,7 @@ async def add_new_inventory_item(inventory_item: InventoryItem, data: dict = Dep
             "createdAt": security.now_utc(),
             "updatedAt": security.now_utc(),
         }
+        set_search_keys("inventory_items", item_dict)
         result = await inventory_items_collection.insert_one(item_dict)
         if not result.inserted_id:
             raise HTTPException(status_code=500, detail="Failed to insert item")
@@ -79,6 +91,7 @@ async def update_inventory_item(item_id: str, inventory_item: InventoryItem,
         item_id = ObjectId(item_id)
         items = inventory_item.model_dump(exclude_unset=True)
         items["updatedAt"] = security.now_utc()
+        items.update(search_keys_update("inventory_items", items))
         result = await inventory_items_collection.find_one_and_update(
             {"_id": item_id},
             {"$set": items},
@@ -126,13 +139,14 @@ async def search_engine_for_inventory_items(items: InventoryItem, data: dict = D
         if company_id:
             match_stage["company_id"] = company_id
         if items.code:
-            match_stage["code"] = {"$regex": items.code, "$options": "i"}
+            match_stage.update(search_match("inventory_items", "code", items.code))
         if items.name:
-            match_stage["name"] = {"$regex": items.name, "$options": "i"}
+            match_stage.update(search_match("inventory_items", "name", items.name))
         if items.min_quantity:
             match_stage["min_quantity"] = items.min_quantity
 
         pipeline.append({"$match": match_stage})
+        pipeline.append({"$project": {SEARCH_KEYS: 0}})
         pipeline.append({
             '$addFields': {
                 '_id': {
@@ -152,3 +166,15 @@ async def search_engine_for_inventory_items(items: InventoryItem, data: dict = D
 
     except Exception as error:
         return {"message": str(error)}
+
+
+@router.post("/rebuild_stock_ledger")
+async def rebuild_stock_ledger_route(data: dict = Depends(security.get_current_user)):
+    try:
+        job = await submit_job("stock_ledger_rebuild", data, description="Rebuild stock on hand")
+        return {"job": job}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -5,6 +5,9 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from app import database
 from app.core import security
+from app.core.bson_json import BsonJSONResponse
+from app.core.search_index import search_match
+from app.core.stock_ledger import refresh_issuing_stock
 from app.database import get_collection
 from datetime import datetime
 from app.routes.car_trading import PyObjectId
@@ -508,10 +511,11 @@ issuing_totals_pipeline = [
         }
     }
 ]
+# on hand and last price come from the perpetual stock ledger (app/core/stock_ledger.py)
 items_details_pipeline = [
     {
         '$lookup': {
-            'from': 'receiving_items',
+            'from': 'stock_on_hand',
             'let': {
                 'inventory_item_id': '$_id',
                 'compId': '$company_id'
@@ -533,258 +537,56 @@ items_details_pipeline = [
                             ]
                         }
                     }
-                }, {
-                    '$lookup': {
-                        'from': 'receiving',
-                        'localField': 'receiving_id',
-                        'foreignField': '_id',
-                        'as': 'parent_check'
-                    }
-                }, {
-                    '$match': {
-                        'parent_check.status': 'Posted'
-                    }
                 }, {
                     '$sort': {
-                        'createdAt': -1,
-                        '_id': -1
-                    }
-                }, {
-                    '$limit': 1
-                }, {
-                    '$project': {
-                        'parent_check': 0
-                    }
-                }
-            ],
-            'as': 'latest_item'
-        }
-    }, {
-        '$unwind': {
-            'path': '$latest_item',
-            'preserveNullAndEmptyArrays': True
-        }
-    }, {
-        '$lookup': {
-            'from': 'receiving',
-            'localField': 'latest_item.receiving_id',
-            'foreignField': '_id',
-            'as': 'header'
-        }
-    }, {
-        '$unwind': {
-            'path': '$header',
-            'preserveNullAndEmptyArrays': True
-        }
-    }, {
-        '$lookup': {
-            'from': 'receiving_items',
-            'let': {
-                'rid': '$header._id'
-            },
-            'pipeline': [
-                {
-                    '$match': {
-                        '$expr': {
-                            '$eq': [
-                                '$receiving_id', '$$rid'
-                            ]
-                        }
+                        'last_received_at': -1
                     }
                 }, {
                     '$group': {
                         '_id': None,
-                        'total': {
-                            '$sum': {
-                                '$multiply': [
-                                    {
-                                        '$subtract': [
-                                            '$original_price', '$discount'
-                                        ]
-                                    }, '$quantity'
-                                ]
-                            }
+                        'final_quantity': {
+                            '$sum': '$on_hand'
+                        },
+                        'received_quantity': {
+                            '$sum': '$received_quantity'
+                        },
+                        'received_value': {
+                            '$sum': '$received_value'
+                        },
+                        'last_price': {
+                            '$first': '$last_price'
                         }
                     }
                 }
             ],
-            'as': 'calculated_totals'
+            'as': 'stock'
         }
     }, {
-        '$lookup': {
-            'from': 'issuing_items_details',
-            'let': {
-                'inventory_item_id': '$_id',
-                'compId': '$company_id'
-            },
-            'pipeline': [
-                {
-                    '$match': {
-                        '$expr': {
-                            '$and': [
-                                {
-                                    '$eq': [
-                                        '$inventory_item_id', '$$inventory_item_id'
-                                    ]
-                                }, {
-                                    '$eq': [
-                                        '$company_id', '$$compId'
-                                    ]
-                                }
-                            ]
-                        }
-                    }
-                }, {
-                    '$group': {
-                        '_id': None,
-                        'total_used_quantity': {
-                            '$sum': '$quantity'
-                        }
-                    }
-                }
-            ],
-            'as': 'all_issuing_items_details'
+        '$unwind': {
+            'path': '$stock',
+            'preserveNullAndEmptyArrays': True
         }
     }, {
         '$addFields': {
-            'items_total': {
-                '$ifNull': [
-                    {
-                        '$first': '$calculated_totals.total'
-                    }, 0
-                ]
-            },
-            'total_used_quantity': {
-                '$ifNull': [
-                    {
-                        '$first': '$all_issuing_items_details.total_used_quantity'
-                    }, 0
-                ]
-            },
-            'rate': {
+            'final_quantity': {
                 '$ifNull': [
-                    '$header.rate', 1
+                    '$stock.final_quantity', 0
                 ]
             },
-            'overhead_sum': {
-                '$add': [
-                    {
-                        '$ifNull': [
-                            '$header.shipping', 0
-                        ]
-                    }, {
-                        '$ifNull': [
-                            '$header.handling', 0
-                        ]
-                    }, {
-                        '$ifNull': [
-                            '$header.other', 0
-                        ]
-                    }
-                ]
-            },
-            'global_discount_amount': {
+            'last_price': {
                 '$ifNull': [
-                    '$header.amount', 0
-                ]
-            }
-        }
-    }, {
-        '$addFields': {
-            'final_quantity': {
-                '$subtract': [
-                    {
-                        '$ifNull': [
-                            '$latest_item.quantity', 0
-                        ]
-                    }, {
-                        '$ifNull': [
-                            '$total_used_quantity', 0
-                        ]
-                    }
-                ]
-            }
-        }
-    }, {
-        '$addFields': {
-            'base_net_price': {
-                '$subtract': [
-                    {
-                        '$ifNull': [
-                            '$latest_item.original_price', 0
-                        ]
-                    }, {
-                        '$ifNull': [
-                            '$latest_item.discount', 0
-                        ]
-                    }
-                ]
-            }
-        }
-    }, {
-        '$addFields': {
-            'add_cost': {
-                '$cond': [
-                    {
-                        '$eq': [
-                            '$items_total', 0
-                        ]
-                    }, 0, {
-                        '$multiply': [
-                            {
-                                '$divide': [
-                                    '$base_net_price', '$items_total'
-                                ]
-                            }, '$overhead_sum'
-                        ]
-                    }
+                    '$stock.last_price', 0
                 ]
             },
-            'add_disc': {
+            'average_cost': {
                 '$cond': [
                     {
-                        '$eq': [
-                            '$items_total', 0
+                        '$gt': [
+                            '$stock.received_quantity', 0
                         ]
-                    }, 0, {
-                        '$multiply': [
-                            {
-                                '$divide': [
-                                    '$base_net_price', '$items_total'
-                                ]
-                            }, '$global_discount_amount'
-                        ]
-                    }
-                ]
-            }
-        }
-    }, {
-        '$addFields': {
-            'local_price': {
-                '$multiply': [
-                    {
-                        '$add': [
-                            '$base_net_price', {
-                                '$subtract': [
-                                    '$add_cost', '$add_disc'
-                                ]
-                            }
-                        ]
-                    }, '$rate'
-                ]
-            }
-        }
-    }, {
-        '$addFields': {
-            'last_price': {
-                '$ifNull': [
-                    {
-                        '$add': [
-                            {
-                                '$ifNull': [
-                                    '$latest_item.vat', 0
-                                ]
-                            }, '$local_price'
+                    }, {
+                        '$divide': [
+                            '$stock.received_value', '$stock.received_quantity'
                         ]
                     }, 0
                 ]
@@ -804,7 +606,8 @@ items_details_pipeline = [
             'code': 1,
             'total': 1,
             'final_quantity': 1,
-            'last_price': 1
+            'last_price': 1,
+            'average_cost': 1
         }
     },
     {
@@ -1019,11 +822,11 @@ async def get_items_details_section(filter_items: SearchItemsDetailsModel,
         if company_id:
             match_stage["company_id"] = company_id
         if filter_items.code:
-            match_stage["code"] = {"$regex": filter_items.code, "$options": "i"}
+            match_stage.update(search_match("inventory_items", "code", filter_items.code))
         if filter_items.name:
-            match_stage["name"] = {"$regex": filter_items.name, "$options": "i"}
+            match_stage.update(search_match("inventory_items", "name", filter_items.name))
         new_pipeline.insert(0, {"$match": match_stage})
-        new_pipeline.append({"$limit": 200})
+        new_pipeline.insert(1, {"$limit": 200})
         cursor = await inventory_items_collection.aggregate(new_pipeline)
         results = await cursor.to_list(None)
         return {"items_details": results}
@@ -1153,6 +956,7 @@ async def add_new_issuing(issue: IssuingModel, data: dict = Depends(security.get
                 if not new_converter.inserted_ids:
                     raise HTTPException(status_code=500, detail="Failed to insert issuing converters details")
 
+            await refresh_issuing_stock([result.inserted_id], session=session)
             await session.commit_transaction()
             return {"issuing_id": str(result.inserted_id),
                     "issuing_number": new_issuing_counter['final_counter'] if new_issuing_counter[
@@ -1181,6 +985,7 @@ async def update_issuing(issue_id: str, issuing: IssuingModel, _: dict = Depends
         result = await issuing_collection.update_one({"_id": issue_id}, {"$set": issuing})
         if result.modified_count == 0:
             raise HTTPException(status_code=404)
+        await refresh_issuing_stock([issue_id])
 
         updated_issuing = await get_issuing_details(issue_id)
         serialized = serializer(updated_issuing)
@@ -1261,6 +1066,7 @@ async def update_issuing_items_details(
                         session=s
                     )
 
+                await refresh_issuing_stock([issuing_id], session=s)
                 await s.commit_transaction()
             except Exception as e:
                 await s.abort_transaction()
@@ -1468,10 +1274,10 @@ async def search_engine_for_issuing(
         result = await cursor.to_list(None)
         cursor2 = await issuing_collection.aggregate(totals_search_pipeline)
         total_result = await cursor2.to_list(None)
-        return {
+        return BsonJSONResponse({
             "issuing": result if result else [],
             "grand_totals": total_result[0] if total_result else {"total_amount": 0, "total_items_count": 0},
-        }
+        })
 
 
 
@@ -1,18 +1,28 @@
 import asyncio
+import base64
 import copy
+import json
 from typing import Optional, List, Any
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, Form, File
-from pymongo.errors import OperationFailure
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app import database
 from app.core import security
+from app.core.bson_json import BsonJSONResponse, bson_dumps
+from app.core.dashboard_rollups import refresh_job_daily_stats
+from app.core.jobs import JOB_MAX_ATTEMPTS, JobContext, register_job_type, submit_job
+from app.core.outstanding_ledger import CUSTOMER, get_entity_outstanding, get_paid_by_job, refresh_job_balances
+from app.core.reference_cache import lookup_reference_docs
+from app.core.search_index import SEARCH_KEYS, search_keys_update, search_match, set_search_keys
 from app.database import get_collection
 from datetime import datetime
 from app.routes.car_trading import PyObjectId
 from app.routes.counters import create_custom_counter
 from app.routes.quotation_cards import get_quotation_card_details
 from app.widgets.check_date import is_date_equals_today_or_older
+from app.widgets.job_card_dates import JOB_CARD_DATE_SOURCE_FIELDS, date_field_to_filter_expression, \
+    job_card_date_field_to_filter, set_job_card_date_field_to_filter
 from app.widgets.upload_files import upload_file, delete_file_from_server
 from app.widgets.upload_images import upload_image, delete_image_from_server
 
@@ -37,7 +47,8 @@ currencies_collection = get_collection("currencies")
 receipts_invoices_collection = get_collection("all_receipts_invoices")
 receipts_collection = get_collection("all_receipts")
 invoice_items_collection = get_collection("invoice_items")
-_job_card_search_indexes_ready = False
+JOB_CARDS_SEARCH_PAGE_SIZE = 100
+JOB_CARDS_SEARCH_MAX_PAGE_SIZE = 500
 
 
 class InvoiceItems(BaseModel):
@@ -130,6 +141,9 @@ class JobCardSearch(BaseModel):
     today: Optional[bool] = False
     this_month: Optional[bool] = False
     this_year: Optional[bool] = False
+    cursor: Optional[str] = None
+    page_size: Optional[int] = None
+    stream: Optional[bool] = False
 
 
 pipeline: list[dict[str, Any]] = [
@@ -660,7 +674,8 @@ pipeline: list[dict[str, Any]] = [
             'branch_details': 0,
             'currency_details': 0,
             'currency_country_details': 0,
-            'quotation_details': 0
+            'quotation_details': 0,
+            SEARCH_KEYS: 0
         }
     }
 ]
@@ -810,42 +825,6 @@ def serializer(doc: dict) -> dict:
     return {k: convert(v) for k, v in doc.items()}
 
 
-async def _create_index_if_needed(collection, keys):
-    try:
-        await collection.create_index(keys, background=True)
-    except OperationFailure as exc:
-        if exc.code != 85:
-            raise
-
-
-async def ensure_job_card_search_indexes():
-    global _job_card_search_indexes_ready
-    if _job_card_search_indexes_ready:
-        return
-
-    await asyncio.gather(
-        _create_index_if_needed(
-            job_cards_collection,
-            [("company_id", 1), ("branch", 1), ("job_date", -1)],
-        ),
-        _create_index_if_needed(
-            job_cards_collection,
-            [("company_id", 1), ("branch", 1), ("invoice_date", -1)],
-        ),
-        _create_index_if_needed(
-            job_cards_collection,
-            [("company_id", 1), ("branch", 1), ("job_cancellation_date", -1)],
-        ),
-        _create_index_if_needed(job_cards_collection, [("job_number", 1)]),
-        _create_index_if_needed(job_cards_collection, [("invoice_number", 1)]),
-        _create_index_if_needed(job_cards_invoice_items_collection, [("job_card_id", 1)]),
-        _create_index_if_needed(receipts_invoices_collection, [("job_id", 1)]),
-        _create_index_if_needed(receipts_invoices_collection, [("receipt_id", 1)]),
-        _create_index_if_needed(receipts_collection, [("status", 1)]),
-    )
-    _job_card_search_indexes_ready = True
-
-
 def _ids_from_docs(docs: list[dict], field: str) -> set[ObjectId]:
     return {
         doc[field]
@@ -886,45 +865,6 @@ async def _invoice_totals_by_job(job_ids: list[ObjectId]) -> dict[ObjectId, dict
     return {doc["_id"]: doc for doc in docs}
 
 
-async def _paid_totals_by_job(job_ids: list[ObjectId]) -> dict[ObjectId, float]:
-    if not job_ids:
-        return {}
-
-    cursor = await receipts_invoices_collection.aggregate([
-        {"$match": {"job_id": {"$in": job_ids}}},
-        {
-            "$lookup": {
-                "from": "all_receipts",
-                "let": {"receipt_id": "$receipt_id"},
-                "pipeline": [
-                    {
-                        "$match": {
-                            "$expr": {
-                                "$and": [
-                                    {"$eq": ["$_id", "$$receipt_id"]},
-                                    {"$eq": ["$status", "Posted"]},
-                                ]
-                            }
-                        }
-                    },
-                    {"$project": {"_id": 1}},
-                ],
-                "as": "receipt_details",
-            }
-        },
-        {"$match": {"receipt_details": {"$ne": []}}},
-        {
-            "$group": {
-                "_id": "$job_id",
-                "paid": {"$sum": {"$ifNull": ["$amount", 0]}},
-            }
-        },
-    ])
-    docs = await cursor.to_list(length=None)
-
-    return {doc["_id"]: doc.get("paid", 0) for doc in docs}
-
-
 async def _invoice_items_by_job(job_ids: list[ObjectId]) -> dict[ObjectId, list[dict]]:
     if not job_ids:
         return {}
@@ -950,7 +890,7 @@ async def _invoice_items_by_job(job_ids: list[ObjectId]) -> dict[ObjectId, list[
 
     grouped: dict[ObjectId, list[dict]] = {}
     for doc in docs:
-        grouped.setdefault(doc.get("job_card_id"), []).append(serializer(doc))
+        grouped.setdefault(doc.get("job_card_id"), []).append(doc)
 
     return grouped
 
@@ -1027,6 +967,8 @@ async def add_new_job_card(job_data: JobCard, data: dict = Depends(security.get_
                 "currency": ObjectId(job_data_dict["currency"]) if job_data_dict["currency"] else None,
                 "job_number": new_job_counter['final_counter'] if new_job_counter['success'] else None,
             })
+            set_job_card_date_field_to_filter(job_data_dict)
+            set_search_keys("job_cards", job_data_dict)
 
             result = await job_cards_collection.insert_one(job_data_dict, session=session)
             if not result.inserted_id:
@@ -1052,6 +994,8 @@ async def add_new_job_card(job_data: JobCard, data: dict = Depends(security.get_
                 new_invoices = await job_cards_invoice_items_collection.insert_many(items_dict, session=session)
                 if not new_invoices.inserted_ids:
                     raise HTTPException(status_code=500, detail="Failed to insert job items")
+            await refresh_job_balances([result.inserted_id], session=session)
+            await refresh_job_daily_stats([result.inserted_id], session=session)
             await session.commit_transaction()
             new_job = await get_job_card_details(result.inserted_id)
             serialized = serializer(new_job)
@@ -1106,6 +1050,8 @@ async def delete_job_card(job_id: str, _: dict = Depends(security.get_current_us
                 if 'car_dialog_public_id' in inspection_report and inspection_report['car_dialog_public_id']:
                     await delete_image_from_server(inspection_report['car_dialog_public_id'])
                 await job_cards_inspection_reports_collection.delete_one({"job_card_id": job_id}, session=session)
+            await refresh_job_balances([job_id], session=session)
+            await refresh_job_daily_stats([job_id], session=session)
             await session.commit_transaction()
             return {"message": "Job card deleted successfully", "job_id": str(job_id)}
 
@@ -1146,6 +1092,8 @@ async def copy_job_card(job_id: str, data: dict = Depends(security.get_current_u
                     original_job['label'] = ""
                 else:
                     original_job['label'] = "Returned"
+            set_job_card_date_field_to_filter(original_job)
+            set_search_keys("job_cards", original_job)
             new_job = await job_cards_collection.insert_one(original_job, session=session)
             new_job_id = new_job.inserted_id
             related_items = await job_cards_invoice_items_collection.find({"job_card_id": job_id}).to_list(None)
@@ -1153,6 +1101,8 @@ async def copy_job_card(job_id: str, data: dict = Depends(security.get_current_u
                 item.pop("_id", None)
                 item["job_card_id"] = new_job_id
                 await job_cards_invoice_items_collection.insert_one(item, session=session)
+            await refresh_job_balances([new_job_id], session=session)
+            await refresh_job_daily_stats([new_job_id], session=session)
 
             await session.commit_transaction()
             new_job_details = await get_job_card_details(new_job_id)
@@ -1196,9 +1146,18 @@ async def update_job_card(job_id: str, job_data: JobCard, data: dict = Depends(s
             "branch": ObjectId(job_data_dict["branch"]) if job_data_dict["branch"] else None,
             "currency": ObjectId(job_data_dict["currency"]) if job_data_dict["currency"] else None,
         })
+        if any(field in job_data_dict for field in JOB_CARD_DATE_SOURCE_FIELDS):
+            current_job = await job_cards_collection.find_one(
+                {"_id": job_id}, {field: 1 for field in JOB_CARD_DATE_SOURCE_FIELDS}
+            ) or {}
+            current_job.update(job_data_dict)
+            job_data_dict["date_field_to_filter"] = job_card_date_field_to_filter(current_job)
+        job_data_dict.update(search_keys_update("job_cards", job_data_dict))
         result = await job_cards_collection.update_one({"_id": job_id}, {"$set": job_data_dict})
         if result.modified_count == 0:
             raise HTTPException(status_code=404)
+        await refresh_job_balances([job_id])
+        await refresh_job_daily_stats([job_id])
 
         updated = await get_job_card_details(job_id)
         serialized = serializer(updated)
@@ -1259,6 +1218,12 @@ async def update_job_invoice_items(
 
         async with  database.client.start_session() as s:
             await s.start_transaction()
+            changed_ids = deleted_list + [item_id for item_id, _ in modified_list]
+            affected_job_ids = [item["job_card_id"] for item in added_list]
+            if changed_ids:
+                affected_job_ids += await job_cards_invoice_items_collection.distinct(
+                    "job_card_id", {"_id": {"$in": changed_ids}}, session=s
+                )
             if deleted_list:
                 await job_cards_invoice_items_collection.delete_many(
                     {"_id": {"$in": deleted_list}}, session=s
@@ -1285,6 +1250,8 @@ async def update_job_invoice_items(
                 )
                 updated_list.append({"_id": str(item_id), "uid": item_data["uid"]})
 
+            await refresh_job_balances(affected_job_ids, session=s)
+            await refresh_job_daily_stats(affected_job_ids, session=s)
             await s.commit_transaction()
         return {"updated_items": updated_list, "deleted_items": [str(d) for d in deleted_list]}
 
@@ -1317,316 +1284,411 @@ async def get_job_card_status(job_id: str, _: dict = Depends(security.get_curren
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
-@router.post("/search_engine_for_job_cards_3")
-async def search_engine_for_job_cards_3(
-        filter_jobs: JobCardSearch,
-        data: dict = Depends(security.get_current_user)
-):
+async def run_date_field_migration_job(job: JobContext):
+    result = await job_cards_collection.update_many(
+        {"company_id": ObjectId(job.user_data.get("company_id"))},
+        [{"$set": {"date_field_to_filter": date_field_to_filter_expression}}],
+    )
+    return {"matched": result.matched_count, "modified": result.modified_count}
+
+
+register_job_type("job_cards_date_field_migration", run_date_field_migration_job, max_attempts=JOB_MAX_ATTEMPTS)
+
+
+@router.post("/migrate_job_cards_date_field_to_filter")
+async def migrate_job_cards_date_field_to_filter(data: dict = Depends(security.get_current_user)):
     try:
-        await ensure_job_card_search_indexes()
+        job = await submit_job("job_cards_date_field_migration", data,
+                               description="Migrate job cards date_field_to_filter")
+        return {"job": job}
 
-        company_id = ObjectId(data.get("company_id"))
-        user_id = ObjectId(data.get("sub"))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Migration error: {str(e)}")
+
+
+job_cards_search_projection = {
+    "_id": 1,
+    "company_id": 1,
+    "quotation_id": 1,
+    "label": 1,
+    "type": 1,
+    "job_status_1": 1,
+    "job_status_2": 1,
+    "car_brand": 1,
+    "car_model": 1,
+    "plate_number": 1,
+    "plate_code": 1,
+    "country": 1,
+    "city": 1,
+    "year": 1,
+    "color": 1,
+    "engine_type": 1,
+    "vehicle_identification_number": 1,
+    "transmission_type": 1,
+    "mileage_in": 1,
+    "mileage_out": 1,
+    "mileage_in_out_diff": 1,
+    "fuel_amount": 1,
+    "customer": 1,
+    "contact_name": 1,
+    "contact_email": 1,
+    "contact_number": 1,
+    "credit_limit": 1,
+    "outstanding": 1,
+    "salesman": 1,
+    "branch": 1,
+    "currency": 1,
+    "rate": 1,
+    "payment_method": 1,
+    "lpo_number": 1,
+    "job_approval_date": 1,
+    "job_start_date": 1,
+    "job_cancellation_date": 1,
+    "job_finish_date": 1,
+    "job_delivery_date": 1,
+    "job_warranty_days": 1,
+    "job_warranty_km": 1,
+    "job_warranty_end_date": 1,
+    "job_min_test_km": 1,
+    "job_reference_1": 1,
+    "job_reference_2": 1,
+    "job_reference_3": 1,
+    "delivery_time": 1,
+    "job_notes": 1,
+    "job_delivery_notes": 1,
+    "job_date": 1,
+    "invoice_date": 1,
+    "invoice_number": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+    "job_number": 1,
+    "technician": 1,
+    "date_field_to_filter": 1,
+}
+
+
+def _encode_job_cards_cursor(job: dict) -> str:
+    date_value = job.get("date_field_to_filter")
+    raw = json.dumps({
+        "date": date_value.isoformat() if isinstance(date_value, datetime) else None,
+        "id": str(job["_id"]),
+    })
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-        user_branches = await get_user_branches(user_id)
-        if user_branches:
-            branch_filters = [{"branch": b, "company_id": company_id} for b in user_branches]
-            match_stage: Any = {"$or": branch_filters}
-        else:
-            match_stage = {"company_id": company_id}
 
-        if filter_jobs.from_date or filter_jobs.to_date:
-            match_stage['date_field_to_filter'] = {}
-            if filter_jobs.from_date:
-                match_stage['date_field_to_filter']["$gte"] = filter_jobs.from_date
-            if filter_jobs.to_date:
-                match_stage['date_field_to_filter']["$lte"] = filter_jobs.to_date
+def _decode_job_cards_cursor(cursor: str) -> dict:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        last_id = ObjectId(raw["id"])
+        last_date = datetime.fromisoformat(raw["date"]) if raw.get("date") else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # keyset on (date_field_to_filter desc, _id desc), missing dates sort last
+    if last_date is None:
+        return {"date_field_to_filter": None, "_id": {"$lt": last_id}}
+    return {
+        "$or": [
+            {"date_field_to_filter": {"$lt": last_date}},
+            {"date_field_to_filter": last_date, "_id": {"$lt": last_id}},
+            {"date_field_to_filter": None},
+        ]
+    }
+
 
-        if filter_jobs.car_brand:
-            match_stage["car_brand"] = filter_jobs.car_brand
-        if filter_jobs.car_model:
-            match_stage["car_model"] = filter_jobs.car_model
-        if filter_jobs.branch:
+async def _job_cards_search_match(filter_jobs: JobCardSearch, data: dict) -> dict:
+    company_id = ObjectId(data.get("company_id"))
+    user_id = ObjectId(data.get("sub"))
+
+    user_branches = await get_user_branches(user_id)
+    match_stage: Any = {"company_id": company_id}
+    if user_branches:
+        match_stage["branch"] = {"$in": user_branches}
+
+    if filter_jobs.from_date or filter_jobs.to_date:
+        match_stage['date_field_to_filter'] = {}
+        if filter_jobs.from_date:
+            match_stage['date_field_to_filter']["$gte"] = filter_jobs.from_date
+        if filter_jobs.to_date:
+            match_stage['date_field_to_filter']["$lte"] = filter_jobs.to_date
+
+    if filter_jobs.car_brand:
+        match_stage["car_brand"] = filter_jobs.car_brand
+    if filter_jobs.car_model:
+        match_stage["car_model"] = filter_jobs.car_model
+    if filter_jobs.branch:
+        if user_branches and filter_jobs.branch not in user_branches:
+            match_stage["branch"] = {"$in": []}
+        else:
             match_stage["branch"] = filter_jobs.branch
 
-        if filter_jobs.label:
-            match_stage["label"] = (
-                filter_jobs.label if filter_jobs.label == "Returned" else "Not Returned"
-            )
+    if filter_jobs.label:
+        match_stage["label"] = (
+            filter_jobs.label if filter_jobs.label == "Returned" else "Not Returned"
+        )
 
-        if filter_jobs.job_number:
-            match_stage["job_number"] = filter_jobs.job_number
-        if filter_jobs.invoice_number:
-            match_stage["invoice_number"] = filter_jobs.invoice_number
-        if filter_jobs.plate_number:
-            match_stage["plate_number"] = filter_jobs.plate_number
+    if filter_jobs.job_number:
+        match_stage["job_number"] = filter_jobs.job_number
+    if filter_jobs.invoice_number:
+        match_stage["invoice_number"] = filter_jobs.invoice_number
+    if filter_jobs.plate_number:
+        match_stage["plate_number"] = filter_jobs.plate_number
+
+    if filter_jobs.type:
+        match_stage["type"] = "SALES" if filter_jobs.type == "SALE" else "JOB"
+
+    if filter_jobs.lpo:
+        match_stage.update(search_match("job_cards", "lpo_number", filter_jobs.lpo))
+    if filter_jobs.vin:
+        match_stage.update(search_match("job_cards", "vehicle_identification_number", filter_jobs.vin))
+
+    if filter_jobs.customer_name:
+        match_stage["customer"] = filter_jobs.customer_name
+
+    if filter_jobs.status:
+        if filter_jobs.status == "Posted" or filter_jobs.status == 'New':
+            match_stage["job_status_1"] = filter_jobs.status
+        elif filter_jobs.status.lower() == "not approved":
+            match_stage["job_status_2"] = 'New'
+        else:
+            match_stage["job_status_2"] = filter_jobs.status
+
+    return match_stage
+
+
+async def _job_cards_search_page(
+        match_stage: dict,
+        page_size: int,
+        cursor: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    page_match = match_stage
+    if cursor:
+        page_match = {"$and": [match_stage, _decode_job_cards_cursor(cursor)]}
+
+    job_cards_cursor = await job_cards_collection.aggregate(
+        [
+            {"$match": page_match},
+            {"$sort": {"date_field_to_filter": -1, "_id": -1}},
+            {"$limit": page_size + 1},
+            {"$project": job_cards_search_projection},
+        ],
+        allowDiskUse=True,
+    )
+    job_cards = await job_cards_cursor.to_list(length=None)
 
-        if filter_jobs.type:
-            match_stage["type"] = "SALES" if filter_jobs.type == "SALE" else "JOB"
+    next_cursor = None
+    if len(job_cards) > page_size:
+        job_cards = job_cards[:page_size]
+        next_cursor = _encode_job_cards_cursor(job_cards[-1])
 
-        if filter_jobs.lpo:
-            match_stage["lpo_number"] = {"$regex": filter_jobs.lpo, "$options": "i"}
-        if filter_jobs.vin:
-            match_stage["vehicle_identification_number"] = {
-                "$regex": filter_jobs.vin,
-                "$options": "i"
-            }
+    return await _enrich_job_cards(job_cards), next_cursor
 
-        if filter_jobs.customer_name:
-            match_stage["customer"] = filter_jobs.customer_name
 
-        if filter_jobs.status:
-            if filter_jobs.status == "Posted" or filter_jobs.status == 'New':
-                match_stage["job_status_1"] = filter_jobs.status
-            elif filter_jobs.status.lower() == "not approved":
-                match_stage["job_status_2"] = 'New'
-            else:
-                match_stage["job_status_2"] = filter_jobs.status
+async def _enrich_job_cards(job_cards: list[dict]) -> list[dict]:
+    all_job_ids = [job["_id"] for job in job_cards]
+    if not all_job_ids:
+        return []
+    company_id = job_cards[0].get("company_id")
 
-        date_field_stage = {
-            "$addFields": {
-                "date_field_to_filter": {
-                    "$switch": {
-                        "branches": [
-                            {
-                                "case": {"$eq": [{"$toLower": "$job_status_1"}, "new"]},
-                                "then": "$job_date"
-                            },
-                            {
-                                "case": {"$eq": [{"$toLower": "$job_status_1"}, "cancelled"]},
-                                "then": "$job_cancellation_date"
-                            },
-                            {
-                                "case": {"$eq": [{"$toLower": "$job_status_1"}, "posted"]},
-                                "then": "$invoice_date"
-                            }
-                        ],
-                        "default": "$job_date"
-                    }
-                }
-            }
-        }
+    invoice_totals_task = _invoice_totals_by_job(all_job_ids)
+    paid_totals_task = get_paid_by_job(all_job_ids)
+    invoice_items_task = _invoice_items_by_job(all_job_ids)
 
-        job_projection = {
-            "_id": 1,
-            "company_id": 1,
-            "quotation_id": 1,
-            "label": 1,
-            "type": 1,
-            "job_status_1": 1,
-            "job_status_2": 1,
-            "car_brand": 1,
-            "car_model": 1,
-            "plate_number": 1,
-            "plate_code": 1,
-            "country": 1,
-            "city": 1,
-            "year": 1,
-            "color": 1,
-            "engine_type": 1,
-            "vehicle_identification_number": 1,
-            "transmission_type": 1,
-            "mileage_in": 1,
-            "mileage_out": 1,
-            "mileage_in_out_diff": 1,
-            "fuel_amount": 1,
-            "customer": 1,
-            "contact_name": 1,
-            "contact_email": 1,
-            "contact_number": 1,
-            "credit_limit": 1,
-            "outstanding": 1,
-            "salesman": 1,
-            "branch": 1,
-            "currency": 1,
-            "rate": 1,
-            "payment_method": 1,
-            "lpo_number": 1,
-            "job_approval_date": 1,
-            "job_start_date": 1,
-            "job_cancellation_date": 1,
-            "job_finish_date": 1,
-            "job_delivery_date": 1,
-            "job_warranty_days": 1,
-            "job_warranty_km": 1,
-            "job_warranty_end_date": 1,
-            "job_min_test_km": 1,
-            "job_reference_1": 1,
-            "job_reference_2": 1,
-            "job_reference_3": 1,
-            "delivery_time": 1,
-            "job_notes": 1,
-            "job_delivery_notes": 1,
-            "job_date": 1,
-            "invoice_date": 1,
-            "invoice_number": 1,
-            "createdAt": 1,
-            "updatedAt": 1,
-            "job_number": 1,
-            "technician": 1,
-        }
+    brand_task = lookup_reference_docs(
+        brands_collection,
+        _ids_from_docs(job_cards, "car_brand"),
+        company_id,
+    )
+    model_task = lookup_reference_docs(
+        models_collection,
+        _ids_from_docs(job_cards, "car_model"),
+        company_id,
+    )
+    country_task = lookup_reference_docs(
+        countries_collection,
+        _ids_from_docs(job_cards, "country"),
+        company_id,
+    )
+    city_task = lookup_reference_docs(
+        cities_collection,
+        _ids_from_docs(job_cards, "city"),
+        company_id,
+    )
+    list_value_ids = _ids_from_docs(job_cards, "color") | _ids_from_docs(job_cards, "engine_type")
+    list_values_task = lookup_reference_docs(
+        list_values_collection,
+        list_value_ids,
+        company_id,
+    )
+    salesman_task = _lookup_by_ids(
+        salesman_collection,
+        _ids_from_docs(job_cards, "salesman"),
+        {"name": 1},
+    )
+    branch_task = lookup_reference_docs(
+        branches_collection,
+        _ids_from_docs(job_cards, "branch"),
+        company_id,
+    )
+    customer_task = _lookup_by_ids(
+        entity_information_collection,
+        _ids_from_docs(job_cards, "customer"),
+        {"entity_name": 1},
+    )
+    quotation_task = _lookup_by_ids(
+        quotation_cards_collection,
+        _ids_from_docs(job_cards, "quotation_id"),
+        {"quotation_number": 1},
+    )
+    currency_task = lookup_reference_docs(
+        currencies_collection,
+        _ids_from_docs(job_cards, "currency"),
+        company_id,
+    )
 
-        base_pipeline = [date_field_stage, {"$match": match_stage}]
-        job_cards_cursor = await job_cards_collection.aggregate(
-            base_pipeline + [
-                {"$sort": {"date_field_to_filter": -1}},
-                {"$project": job_projection},
-            ],
-            allowDiskUse=True,
-        )
+    (
+        invoice_totals,
+        paid_totals,
+        invoice_items,
+        brands,
+        models,
+        countries,
+        cities,
+        list_values,
+        salesmen,
+        branches,
+        customers,
+        quotations,
+        currencies,
+    ) = await asyncio.gather(
+        invoice_totals_task,
+        paid_totals_task,
+        invoice_items_task,
+        brand_task,
+        model_task,
+        country_task,
+        city_task,
+        list_values_task,
+        salesman_task,
+        branch_task,
+        customer_task,
+        quotation_task,
+        currency_task,
+    )
 
-        job_cards = await job_cards_cursor.to_list(length=None)
-        all_job_ids = [job["_id"] for job in job_cards]
+    currency_country_ids = {
+        currency["country_id"]
+        for currency in currencies.values()
+        if isinstance(currency.get("country_id"), ObjectId)
+    }
+    currency_countries = await lookup_reference_docs(
+        countries_collection,
+        currency_country_ids,
+        company_id,
+    )
 
-        if not all_job_ids:
-            return {
-                "job_cards": [],
-                "grand_totals": _grand_totals([], {}, {}),
-            }
+    for job in job_cards:
+        job_id = job["_id"]
+        brand = brands.get(job.get("car_brand"), {})
+        currency = currencies.get(job.get("currency"), {})
+        currency_country = currency_countries.get(currency.get("country_id"), {})
+        totals = invoice_totals.get(job_id, {})
+        paid = paid_totals.get(job_id, 0) or 0
+        total_net = totals.get("total_net", 0) or 0
+
+        job.update({
+            "invoice_items_details": invoice_items.get(job_id, []),
+            "total_amount": totals.get("total_amount", 0) or 0,
+            "total_vat": totals.get("total_vat", 0) or 0,
+            "total_net": total_net,
+            "paid": paid,
+            "final_outstanding": total_net - paid,
+            "car_brand_name": brand.get("name"),
+            "car_brand_logo": brand.get("logo"),
+            "car_model_name": models.get(job.get("car_model"), {}).get("name"),
+            "country_name": countries.get(job.get("country"), {}).get("name"),
+            "city_name": cities.get(job.get("city"), {}).get("name"),
+            "color_name": list_values.get(job.get("color"), {}).get("name"),
+            "engine_type_name": list_values.get(job.get("engine_type"), {}).get("name"),
+            "customer_name": customers.get(job.get("customer"), {}).get("entity_name"),
+            "salesman_name": salesmen.get(job.get("salesman"), {}).get("name"),
+            "branch_name": branches.get(job.get("branch"), {}).get("name"),
+            "currency_code": currency_country.get("currency_code"),
+            "quotation_number": quotations.get(job.get("quotation_id"), {}).get("quotation_number"),
+        })
 
-        invoice_totals_task = _invoice_totals_by_job(all_job_ids)
-        paid_totals_task = _paid_totals_by_job(all_job_ids)
-        invoice_items_task = _invoice_items_by_job(all_job_ids)
+    # raw documents: BsonJSONResponse / bson_dumps encode their ObjectIds and dates
+    return job_cards
 
-        brand_task = _lookup_by_ids(
-            brands_collection,
-            _ids_from_docs(job_cards, "car_brand"),
-            {"name": 1, "logo": 1},
-        )
-        model_task = _lookup_by_ids(
-            models_collection,
-            _ids_from_docs(job_cards, "car_model"),
-            {"name": 1},
-        )
-        country_task = _lookup_by_ids(
-            countries_collection,
-            _ids_from_docs(job_cards, "country"),
-            {"name": 1},
-        )
-        city_task = _lookup_by_ids(
-            cities_collection,
-            _ids_from_docs(job_cards, "city"),
-            {"name": 1},
-        )
-        list_value_ids = _ids_from_docs(job_cards, "color") | _ids_from_docs(job_cards, "engine_type")
-        list_values_task = _lookup_by_ids(
-            list_values_collection,
-            list_value_ids,
-            {"name": 1},
-        )
-        salesman_task = _lookup_by_ids(
-            salesman_collection,
-            _ids_from_docs(job_cards, "salesman"),
-            {"name": 1},
-        )
-        branch_task = _lookup_by_ids(
-            branches_collection,
-            _ids_from_docs(job_cards, "branch"),
-            {"name": 1},
-        )
-        customer_task = _lookup_by_ids(
-            entity_information_collection,
-            _ids_from_docs(job_cards, "customer"),
-            {"entity_name": 1},
-        )
-        quotation_task = _lookup_by_ids(
-            quotation_cards_collection,
-            _ids_from_docs(job_cards, "quotation_id"),
-            {"quotation_number": 1},
-        )
-        currency_task = _lookup_by_ids(
-            currencies_collection,
-            _ids_from_docs(job_cards, "currency"),
-            {"country_id": 1},
-        )
 
-        (
-            invoice_totals,
-            paid_totals,
-            invoice_items,
-            brands,
-            models,
-            countries,
-            cities,
-            list_values,
-            salesmen,
-            branches,
-            customers,
-            quotations,
-            currencies,
-        ) = await asyncio.gather(
-            invoice_totals_task,
-            paid_totals_task,
-            invoice_items_task,
-            brand_task,
-            model_task,
-            country_task,
-            city_task,
-            list_values_task,
-            salesman_task,
-            branch_task,
-            customer_task,
-            quotation_task,
-            currency_task,
-        )
+async def _job_cards_search_grand_totals(match_stage: dict) -> dict:
+    cursor = await job_cards_collection.aggregate(
+        [{"$match": match_stage}, {"$project": {"_id": 1}}] + totals_job_cards_pipeline,
+        allowDiskUse=True,
+    )
+    totals = await cursor.to_list(length=None)
+    return totals[0] if totals else _grand_totals([], {}, {})
 
-        currency_country_ids = {
-            currency["country_id"]
-            for currency in currencies.values()
-            if isinstance(currency.get("country_id"), ObjectId)
-        }
-        currency_countries = await _lookup_by_ids(
-            countries_collection,
-            currency_country_ids,
-            {"currency_code": 1},
-        )
 
-        results = []
-        for job in job_cards:
-            job_id = job["_id"]
-            brand = brands.get(job.get("car_brand"), {})
-            currency = currencies.get(job.get("currency"), {})
-            currency_country = currency_countries.get(currency.get("country_id"), {})
-            totals = invoice_totals.get(job_id, {})
-            paid = paid_totals.get(job_id, 0) or 0
-            total_net = totals.get("total_net", 0) or 0
-
-            job.update({
-                "invoice_items_details": invoice_items.get(job_id, []),
-                "total_amount": totals.get("total_amount", 0) or 0,
-                "total_vat": totals.get("total_vat", 0) or 0,
-                "total_net": total_net,
-                "paid": paid,
-                "final_outstanding": total_net - paid,
-                "car_brand_name": brand.get("name"),
-                "car_brand_logo": brand.get("logo"),
-                "car_model_name": models.get(job.get("car_model"), {}).get("name"),
-                "country_name": countries.get(job.get("country"), {}).get("name"),
-                "city_name": cities.get(job.get("city"), {}).get("name"),
-                "color_name": list_values.get(job.get("color"), {}).get("name"),
-                "engine_type_name": list_values.get(job.get("engine_type"), {}).get("name"),
-                "customer_name": customers.get(job.get("customer"), {}).get("entity_name"),
-                "salesman_name": salesmen.get(job.get("salesman"), {}).get("name"),
-                "branch_name": branches.get(job.get("branch"), {}).get("name"),
-                "currency_code": currency_country.get("currency_code"),
-                "quotation_number": quotations.get(job.get("quotation_id"), {}).get("quotation_number"),
-            })
-            results.append(serializer(job))
+def _job_cards_page_size(filter_jobs: JobCardSearch) -> int:
+    page_size = filter_jobs.page_size or JOB_CARDS_SEARCH_PAGE_SIZE
+    return max(1, min(page_size, JOB_CARDS_SEARCH_MAX_PAGE_SIZE))
 
-        return {
+
+async def _stream_job_cards(match_stage: dict, page_size: int, cursor: Optional[str]):
+    count = 0
+    while True:
+        results, cursor = await _job_cards_search_page(match_stage, page_size, cursor)
+        for job in results:
+            count += 1
+            yield bson_dumps({"type": "job_card", "data": job}) + b"\n"
+        if not cursor:
+            break
+    yield bson_dumps({"type": "done", "count": count}) + b"\n"
+
+
+@router.post("/search_engine_for_job_cards_3")
+async def search_engine_for_job_cards_3(
+        filter_jobs: JobCardSearch,
+        data: dict = Depends(security.get_current_user)
+):
+    try:
+        match_stage = await _job_cards_search_match(filter_jobs, data)
+        page_size = _job_cards_page_size(filter_jobs)
+
+        if filter_jobs.stream:
+            if filter_jobs.cursor:
+                _decode_job_cards_cursor(filter_jobs.cursor)
+            return StreamingResponse(
+                _stream_job_cards(match_stage, page_size, filter_jobs.cursor),
+                media_type="application/x-ndjson",
+            )
+
+        # grand totals scan the whole range; clients fetch them from /search_engine_for_job_cards_totals
+        results, next_cursor = await _job_cards_search_page(match_stage, page_size, filter_jobs.cursor)
+
+        return BsonJSONResponse({
             "job_cards": results,
-            "grand_totals": _grand_totals(all_job_ids, invoice_totals, paid_totals),
-        }
+            "next_cursor": next_cursor,
+            "grand_totals": None,
+        })
 
-        # if job_cards.get("job_cards"):
-        #     all_job_cards = job_cards["job_cards"]
-        # else:
-        #     all_job_cards = []
-        # if job_cards.get('grand_totals'):
-        #     all_grand_totals = job_cards['grand_totals'][0]
-        # else:
-        #     all_grand_totals = {}
-        # return {"job_cards": all_job_cards, "grand_totals": all_grand_totals}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/search_engine_for_job_cards_totals")
+async def search_engine_for_job_cards_totals(
+        filter_jobs: JobCardSearch,
+        data: dict = Depends(security.get_current_user)
+):
+    try:
+        match_stage = await _job_cards_search_match(filter_jobs, data)
+        return {"grand_totals": await _job_cards_search_grand_totals(match_stage)}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1662,7 +1724,7 @@ async def search_engine_for_job_card_in_ap_invoices_screen(filter_jobs: JobCardS
         if filter_jobs.plate_number:
             match_stage["plate_number"] = filter_jobs.plate_number
         if filter_jobs.vin:
-            match_stage["vehicle_identification_number"] = {"$regex": filter_jobs.vin, "$options": "i"}
+            match_stage.update(search_match("job_cards", "vehicle_identification_number", filter_jobs.vin))
         if filter_jobs.customer_name:
             match_stage["customer"] = filter_jobs.customer_name
         match_stage['type'] = "JOB"
@@ -1979,133 +2041,7 @@ async def get_customer_outstanding(customer_id: str, data: dict = Depends(securi
     try:
         company_id = ObjectId(data.get("company_id"))
         customer_id = ObjectId(customer_id)
-        customer_outstanding_pipeline = [
-            {
-                '$match': {
-                    'company_id': company_id,
-                    'customer': customer_id,
-                    'job_status_1': 'Posted'
-                }
-            }, {
-                '$lookup': {
-                    'from': 'job_cards_invoice_items',
-                    'let': {
-                        'job_id': '$_id'
-                    },
-                    'pipeline': [
-                        {
-                            '$match': {
-                                '$expr': {
-                                    '$eq': [
-                                        '$job_card_id', '$$job_id'
-                                    ]
-                                }
-                            }
-                        }, {
-                            '$project': {
-                                'net': 1
-                            }
-                        }
-                    ],
-                    'as': 'invoice_items_details'
-                }
-            }, {
-                '$addFields': {
-                    'net_amount': {
-                        '$sum': {
-                            '$map': {
-                                'input': '$invoice_items_details',
-                                'as': 'item',
-                                'in': {
-                                    '$ifNull': [
-                                        '$$item.net', 0
-                                    ]
-                                }
-                            }
-                        }
-                    }
-                }
-            }, {
-                '$lookup': {
-                    'from': 'all_receipts_invoices',
-                    'localField': '_id',
-                    'foreignField': 'job_id',
-                    'as': 'receipts_invoices_details'
-                }
-            }, {
-                '$addFields': {
-                    'received': {
-                        '$sum': {
-                            '$map': {
-                                'input': '$receipts_invoices_details',
-                                'as': 'receipt',
-                                'in': {
-                                    '$ifNull': [
-                                        '$$receipt.amount', 0
-                                    ]
-                                }
-                            }
-                        }
-                    }
-                }
-            }, {
-                '$group': {
-                    '_id': None,
-                    'total_net_amount': {
-                        '$sum': '$net_amount'
-                    },
-                    'total_received': {
-                        '$sum': '$received'
-                    }
-                }
-            }, {
-                '$addFields': {
-                    'outstanding': {
-                        '$subtract': [
-                            '$total_net_amount', '$total_received'
-                        ]
-                    }
-                }
-            }, {
-                '$project': {
-                    '_id': 0,
-                    'outstanding': 1
-                }
-            },
-            {
-                '$facet': {
-                    'data': [{'$project': {'outstanding': 1}}],
-                    'default': [
-                        {
-                            '$project': {
-                                '_id': 0,
-                                'outstanding': {'$literal': 0},
-                            }
-                        }
-                    ]
-                }
-            },
-            {
-                '$project': {
-                    'merged': {
-                        '$concatArrays': ['$data', '$default']
-                    }
-                }
-            },
-            {
-                '$project': {
-                    'result': {'$arrayElemAt': ['$merged', 0]}
-                }
-            },
-            {
-                '$replaceRoot': {
-                    'newRoot': {'$ifNull': ['$result', {'outstanding': 0}]}
-                }
-            }
-        ]
-        cursor = await job_cards_collection.aggregate(customer_outstanding_pipeline)
-        result = await cursor.next()
-        return result
+        return {"outstanding": await get_entity_outstanding(company_id, CUSTOMER, customer_id)}
 
     except HTTPException:
         raise
@@ -6,12 +6,14 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 
 from app.core import security
+from app.core.dashboard_rollups import cashflow_daily_stats_collection, day_of, job_cards_daily_stats_collection, \
+    rebuild_dashboard_rollups
+from app.core.jobs import JOB_MAX_ATTEMPTS, JobContext, register_job_type, submit_job
+from app.core.outstanding_ledger import CUSTOMER, job_balances_collection
 from app.database import get_collection
 
 router = APIRouter()
 job_cards_collection = get_collection("job_cards")
-branches_collection = get_collection("branches")
-salesman_collection = get_collection("sales_man")
 receipts_collection = get_collection("all_receipts")
 all_banks_collection = get_collection("all_banks")
 
@@ -22,411 +24,116 @@ class TimeFilter(BaseModel):
     type: Optional[str] = None
 
 
+async def run_rebuild_job(job: JobContext):
+    from_date = job.payload.get("from_date")
+    to_date = job.payload.get("to_date")
+    return await rebuild_dashboard_rollups(ObjectId(job.user_data.get("company_id")),
+                                           datetime.fromisoformat(from_date) if from_date else None,
+                                           datetime.fromisoformat(to_date) if to_date else None,
+                                           job.report_progress)
+
+
+register_job_type("dashboard_rollups_rebuild", run_rebuild_job, max_attempts=JOB_MAX_ATTEMPTS)
+
+
+def stats_day_range(from_date: Optional[datetime], to_date: Optional[datetime]) -> dict:
+    # the daily stats are bucketed by day, a range covers every day it touches
+    day_range = {}
+    if from_date:
+        day_range["$gte"] = day_of(from_date)
+    if to_date:
+        day_range["$lt"] = to_date
+    return day_range or {"$exists": True}
+
+
+async def job_cards_stats_summary(company_id: ObjectId, group_field: str, names_from: str,
+                                  from_date: Optional[datetime], to_date: Optional[datetime],
+                                  statuses: Optional[list[str]] = None) -> list[dict]:
+    """One row per branch / salesman with jobs in the range, plus the ALL BRANCHES total row."""
+    match_stage = {'company_id': company_id, 'day': stats_day_range(from_date, to_date)}
+    if statuses:
+        match_stage['status'] = {'$in': statuses}
+    cursor = await job_cards_daily_stats_collection.aggregate([
+        {
+            '$match': match_stage
+        }, {
+            '$group': {
+                '_id': f'${group_field}',
+                'matched_jobs': {'$sum': '$jobs'},
+                'total_posted': {'$sum': {'$cond': [{'$eq': ['$status', 'Posted']}, '$jobs', 0]}},
+                'total_new': {'$sum': {'$cond': [{'$eq': ['$status', 'New']}, '$jobs', 0]}},
+                'total_items_amount': {'$sum': '$items_total'},
+                'total_items_net': {'$sum': '$items_net'},
+                'total_items_paid': {'$sum': '$items_paid'},
+            }
+        }, {
+            '$match': {
+                '_id': {'$ne': None},
+                'matched_jobs': {'$gt': 0}
+            }
+        }, {
+            '$lookup': {
+                'from': names_from,
+                'localField': '_id',
+                'foreignField': '_id',
+                'pipeline': [
+                    {'$match': {'company_id': company_id}},
+                    {'$project': {'name': 1}}
+                ],
+                'as': 'details'
+            }
+        }, {
+            '$unwind': '$details'
+        }
+    ])
+    groups = await cursor.to_list(None)
+
+    total_fields = ('total_posted', 'total_new', 'total_items_amount', 'total_items_net', 'total_items_paid')
+    results = [
+        {
+            '_id': str(group['_id']),
+            'name': group['details'].get('name'),
+            **{field: group[field] for field in total_fields},
+            'jobs_count': group['total_new'] + group['total_posted'],
+            'is_summary': 0,
+        }
+        for group in groups
+    ]
+    results.sort(key=lambda row: row['jobs_count'], reverse=True)
+    if results:
+        summary = {field: sum(row[field] for row in results) for field in total_fields}
+        results.append({
+            '_id': None,
+            'name': 'ALL BRANCHES',
+            **summary,
+            'jobs_count': summary['total_new'] + summary['total_posted'],
+            'is_summary': 1,
+        })
+    return results
+
+
+@router.post("/rebuild_daily_stats")
+async def rebuild_daily_stats(time_filter: TimeFilter, data: dict = Depends(security.get_current_user)):
+    try:
+        job = await submit_job("dashboard_rollups_rebuild", data,
+                               payload={"from_date": time_filter.from_date.isoformat() if time_filter.from_date else None,
+                                        "to_date": time_filter.to_date.isoformat() if time_filter.to_date else None},
+                               description="Rebuild dashboard daily stats")
+        return {"job": job}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/get_job_cards_daily_summary")
 async def get_job_cards_daily_summary(time_filter: TimeFilter, data: dict = Depends(security.get_current_user)):
     try:
-        from_date = time_filter.from_date
-        to_date = time_filter.to_date
         company_id = ObjectId(data.get('company_id'))
-        job_status_filter = []
-
-        if time_filter.type == "month":
-            job_status_filter.append({
-                "$eq": ["$job_status_1", "Posted"]
-            })
-        daily_summary_pipeline = [
-            {
-                '$match': {
-                    'company_id': company_id,
-                }
-            }, {
-                '$lookup': {
-                    'from': 'job_cards',
-                    'let': {
-                        'branch_id': '$_id'
-                    },
-                    'pipeline': [
-                        {
-                            '$match': {
-                                '$expr': {
-                                    '$and': [
-                                        {'$eq': ['$branch', '$$branch_id']},
-                                        *job_status_filter
-                                    ]
-                                }
-                            }
-                        }, {
-                            '$addFields': {
-                                'date_field_to_filter': {
-                                    '$switch': {
-                                        'branches': [
-                                            {
-                                                'case': {
-                                                    '$eq': [
-                                                        {
-                                                            '$toLower': '$job_status_1'
-                                                        }, 'new'
-                                                    ]
-                                                },
-                                                'then': '$job_date'
-                                            }, {
-                                                'case': {
-                                                    '$eq': [
-                                                        {
-                                                            '$toLower': '$job_status_1'
-                                                        }, 'cancelled'
-                                                    ]
-                                                },
-                                                'then': '$job_cancellation_date'
-                                            }, {
-                                                'case': {
-                                                    '$eq': [
-                                                        {
-                                                            '$toLower': '$job_status_1'
-                                                        }, 'posted'
-                                                    ]
-                                                },
-                                                'then': '$invoice_date'
-                                            }
-                                        ],
-                                        'default': '$job_date'
-                                    }
-                                }
-                            }
-                        }, {
-                            '$match': {
-                                '$expr': {
-                                    '$and': [
-                                        {
-                                            '$gte': [
-                                                '$date_field_to_filter',
-                                                from_date
-                                            ]
-                                        }, {
-                                            '$lt': [
-                                                '$date_field_to_filter',
-                                                to_date
-                                            ]
-                                        }
-                                    ]
-                                }
-                            }
-                        }, {
-                            '$lookup': {
-                                'from': 'job_cards_invoice_items',
-                                'localField': '_id',
-                                'foreignField': 'job_card_id',
-                                'as': 'jobs_items'
-                            }
-                        }, {
-                            '$lookup': {
-                                'from': 'all_receipts_invoices',
-                                'let': {
-                                    'jobId': '$_id'
-                                },
-                                'pipeline': [
-                                    {
-                                        '$match': {
-                                            '$expr': {
-                                                '$eq': [
-                                                    '$job_id', '$$jobId'
-                                                ]
-                                            }
-                                        }
-                                    }, {
-                                        '$lookup': {
-                                            'from': 'all_receipts',
-                                            'let': {
-                                                'receiptId': '$receipt_id'
-                                            },
-                                            'pipeline': [
-                                                {
-                                                    '$match': {
-                                                        '$expr': {
-                                                            '$and': [
-                                                                {
-                                                                    '$eq': [
-                                                                        '$_id', '$$receiptId'
-                                                                    ]
-                                                                }, {
-                                                                    '$eq': [
-                                                                        '$status', 'Posted'
-                                                                    ]
-                                                                }
-                                                            ]
-                                                        }
-                                                    }
-                                                }
-                                            ],
-                                            'as': 'receipt_details'
-                                        }
-                                    }, {
-                                        '$match': {
-                                            'receipt_details': {
-                                                '$ne': []
-                                            }
-                                        }
-                                    }
-                                ],
-                                'as': 'receipts_invoices_details'
-                            }
-                        }, {
-                            '$addFields': {
-                                'itemsTotal': {
-                                    '$sum': {
-                                        '$map': {
-                                            'input': '$jobs_items',
-                                            'as': 'it',
-                                            'in': {
-                                                '$cond': [
-                                                    {
-                                                        '$eq': [
-                                                            '$job_status_1', 'Posted'
-                                                        ]
-                                                    }, {
-                                                        '$ifNull': [
-                                                            '$$it.total', 0
-                                                        ]
-                                                    }, 0
-                                                ]
-                                            }
-                                        }
-                                    }
-                                },
-                                'itemsPaid': {
-                                    '$sum': {
-                                        '$map': {
-                                            'input': '$receipts_invoices_details',
-                                            'as': 'it_paid',
-                                            'in': {
-                                                '$ifNull': [
-                                                    '$$it_paid.amount', 0
-                                                ]
-                                            }
-                                        }
-                                    }
-                                },
-                                'itemsNet': {
-                                    '$sum': {
-                                        '$map': {
-                                            'input': '$jobs_items',
-                                            'as': 'it',
-                                            'in': {
-                                                '$cond': [
-                                                    {
-                                                        '$eq': [
-                                                            '$job_status_1', 'Posted'
-                                                        ]
-                                                    }, {
-                                                        '$add': [
-                                                            {
-                                                                '$ifNull': [
-                                                                    '$$it.total', 0
-                                                                ]
-                                                            }, {
-                                                                '$ifNull': [
-                                                                    '$$it.vat', 0
-                                                                ]
-                                                            }
-                                                        ]
-                                                    }, 0
-                                                ]
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }, {
-                            '$group': {
-                                '_id': None,
-                                'totalPosted': {
-                                    '$sum': {
-                                        '$cond': [
-                                            {
-                                                '$eq': [
-                                                    '$job_status_1', 'Posted'
-                                                ]
-                                            }, 1, 0
-                                        ]
-                                    }
-                                },
-                                'totalNew': {
-                                    '$sum': {
-                                        '$cond': [
-                                            {
-                                                '$eq': [
-                                                    '$job_status_1', 'New'
-                                                ]
-                                            }, 1, 0
-                                        ]
-                                    }
-                                },
-                                'totalItemsAmount': {
-                                    '$sum': '$itemsTotal'
-                                },
-                                'totalItemsNet': {
-                                    '$sum': '$itemsNet'
-                                },
-                                'totalItemsPaid': {
-                                    '$sum': '$itemsPaid'
-                                }
-                            }
-                        }, {
-                            '$addFields': {
-                                'totalJobs': {
-                                    '$add': [
-                                        '$totalNew', '$totalPosted'
-                                    ]
-                                }
-                            }
-                        }
-                    ],
-                    'as': 'job_details'
-                }
-            }, {
-                '$match': {
-                    'job_details.0': {
-                        '$exists': True
-                    }
-                }
-            }, {
-                '$project': {
-                    'name': 1,
-                    'job_details': 1
-                }
-            }, {
-                '$unwind': '$job_details'
-            }, {
-                '$facet': {
-                    'branches': [
-                        {
-                            '$project': {
-                                '_id': 1,
-                                'name': 1,
-                                'job_details': [
-                                    '$job_details'
-                                ]
-                            }
-                        }
-                    ],
-                    'summary': [
-                        {
-                            '$group': {
-                                '_id': None,
-                                'totalPosted': {
-                                    '$sum': '$job_details.totalPosted'
-                                },
-                                'totalNew': {
-                                    '$sum': '$job_details.totalNew'
-                                },
-                                'totalItemsAmount': {
-                                    '$sum': '$job_details.totalItemsAmount'
-                                },
-                                'totalJobs': {
-                                    '$sum': '$job_details.totalJobs'
-                                },
-                                'totalItemsNet': {
-                                    '$sum': '$job_details.totalItemsNet'
-                                },
-                                'totalItemsPaid': {
-                                    '$sum': '$job_details.totalItemsPaid'
-                                }
-                            }
-                        }, {
-                            '$project': {
-                                '_id': None,
-                                'name': 'ALL BRANCHES',
-                                'job_details': [
-                                    {
-                                        '_id': None,
-                                        'totalPosted': '$totalPosted',
-                                        'totalNew': '$totalNew',
-                                        'totalItemsAmount': '$totalItemsAmount',
-                                        'totalJobs': '$totalJobs',
-                                        'totalItemsNet': '$totalItemsNet',
-                                        'totalItemsPaid': '$totalItemsPaid',
-                                    }
-                                ]
-                            }
-                        }
-                    ]
-                }
-            }, {
-                '$project': {
-                    'all': {
-                        '$concatArrays': [
-                            '$branches', '$summary'
-                        ]
-                    }
-                }
-            }, {
-                '$unwind': '$all'
-            }, {
-                '$replaceRoot': {
-                    'newRoot': '$all'
-                }
-            }, {
-                '$addFields': {
-                    '_id': {
-                        '$toString': '$_id'
-                    },
-                    'total_posted': {
-                        '$arrayElemAt': [
-                            '$job_details.totalPosted', 0
-                        ]
-                    },
-                    'total_new': {
-                        '$arrayElemAt': [
-                            '$job_details.totalNew', 0
-                        ]
-                    },
-                    'total_items_amount': {
-                        '$arrayElemAt': [
-                            '$job_details.totalItemsAmount', 0
-                        ]
-                    },
-                    'total_items_net': {
-                        '$arrayElemAt': [
-                            '$job_details.totalItemsNet', 0
-                        ]
-                    },
-                    'total_items_paid': {
-                        '$arrayElemAt': [
-                            '$job_details.totalItemsPaid', 0
-                        ]
-                    },
-                    'jobs_count': {
-                        '$arrayElemAt': [
-                            '$job_details.totalJobs', 0
-                        ]
-                    }
-                }
-            }, {
-                '$project': {
-                    'job_details': 0
-                }
-            },
-            {
-                '$addFields': {
-                    'is_summary': {
-                        '$cond': [
-                            {
-                                '$eq': [
-                                    '$name', 'ALL BRANCHES'
-                                ]
-                            }, 1, 0
-                        ]
-                    }
-                }
-            }, {
-                '$sort': {
-                    'is_summary': 1,
-                    'jobs_count': -1
-                }
-            }
-        ]
-        cursor = await branches_collection.aggregate(daily_summary_pipeline)
-        results = await cursor.to_list(None)
+        statuses = ["Posted"] if time_filter.type == "month" else None
+        results = await job_cards_stats_summary(company_id, "branch", "branches", time_filter.from_date,
+                                                time_filter.to_date, statuses)
         return {"daily_summary": results}
 
 
@@ -766,455 +473,58 @@ async def get_jobs_dates(date_type: str, data: dict = Depends(security.get_curre
                 '$sort': {
                     'dateObj': -1
                 }
-            }, {
-                '$setWindowFields': {
-                    'sortBy': {
-                        'dateObj': -1
-                    },
-                    'output': {
-                        'idx': {
-                            '$documentNumber': {}
-                        }
-                    }
-                }
-            }, {
-                '$project': {
-                    'k': {
-                        '$toString': '$idx'
-                    },
-                    'v': {
-                        'date': '$date'
-                    }
-                }
-            }, {
-                '$group': {
-                    '_id': None,
-                    'items': {
-                        '$push': {
-                            'k': '$k',
-                            'v': '$v'
-                        }
-                    }
-                }
-            }, {
-                '$replaceRoot': {
-                    'newRoot': {
-                        '$arrayToObject': '$items'
-                    }
-                }
-            }
-        ]
-        cursor = await job_cards_collection.aggregate(jobs_dates_pipeline)
-        results = await cursor.next()
-        return {"dates": results}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@router.post("/get_salesman_summary")
-async def get_salesman_summary(time_filter: TimeFilter, data: dict = Depends(security.get_current_user)):
-    try:
-        company_id = ObjectId(data.get('company_id'))
-        from_date = time_filter.from_date
-        to_date = time_filter.to_date
-        salesman_summary_pipeline = [
-            {
-                '$match': {
-                    'company_id': company_id
-                }
-            }, {
-                '$lookup': {
-                    'from': 'job_cards',
-                    'let': {
-                        'salesman': '$_id'
-                    },
-                    'pipeline': [
-                        {
-                            '$match': {
-                                '$expr': {
-                                    '$and': [
-                                        {'$eq': [
-                                            '$salesman', '$$salesman'
-                                        ]},
-                                        {'$eq': [
-                                            '$job_status_1', 'Posted'
-                                        ]}
-                                    ]
-                                }
-                            }
-                        }, {
-                            '$addFields': {
-                                'date_field_to_filter': {
-                                    '$switch': {
-                                        'branches': [
-                                            {
-                                                'case': {
-                                                    '$eq': [
-                                                        {
-                                                            '$toLower': '$job_status_1'
-                                                        }, 'new'
-                                                    ]
-                                                },
-                                                'then': '$job_date'
-                                            }, {
-                                                'case': {
-                                                    '$eq': [
-                                                        {
-                                                            '$toLower': '$job_status_1'
-                                                        }, 'cancelled'
-                                                    ]
-                                                },
-                                                'then': '$job_cancellation_date'
-                                            }, {
-                                                'case': {
-                                                    '$eq': [
-                                                        {
-                                                            '$toLower': '$job_status_1'
-                                                        }, 'posted'
-                                                    ]
-                                                },
-                                                'then': '$invoice_date'
-                                            }
-                                        ],
-                                        'default': '$job_date'
-                                    }
-                                }
-                            }
-                        }, {
-                            '$match': {
-                                '$expr': {
-                                    '$and': [
-                                        {
-                                            '$gte': [
-                                                '$date_field_to_filter',
-                                                from_date
-                                            ]
-                                        }, {
-                                            '$lt': [
-                                                '$date_field_to_filter',
-                                                to_date
-                                            ]
-                                        }
-                                    ]
-                                }
-                            }
-                        }, {
-                            '$lookup': {
-                                'from': 'job_cards_invoice_items',
-                                'localField': '_id',
-                                'foreignField': 'job_card_id',
-                                'as': 'jobs_items'
-                            }
-                        }, {
-                            '$lookup': {
-                                'from': 'all_receipts_invoices',
-                                'let': {
-                                    'jobId': '$_id'
-                                },
-                                'pipeline': [
-                                    {
-                                        '$match': {
-                                            '$expr': {
-                                                '$eq': [
-                                                    '$job_id', '$$jobId'
-                                                ]
-                                            }
-                                        }
-                                    }, {
-                                        '$lookup': {
-                                            'from': 'all_receipts',
-                                            'let': {
-                                                'receiptId': '$receipt_id'
-                                            },
-                                            'pipeline': [
-                                                {
-                                                    '$match': {
-                                                        '$expr': {
-                                                            '$and': [
-                                                                {
-                                                                    '$eq': [
-                                                                        '$_id', '$$receiptId'
-                                                                    ]
-                                                                }, {
-                                                                    '$eq': [
-                                                                        '$status', 'Posted'
-                                                                    ]
-                                                                }
-                                                            ]
-                                                        }
-                                                    }
-                                                }
-                                            ],
-                                            'as': 'receipt_details'
-                                        }
-                                    }, {
-                                        '$match': {
-                                            'receipt_details': {
-                                                '$ne': []
-                                            }
-                                        }
-                                    }
-                                ],
-                                'as': 'receipts_invoices_details'
-                            }
-                        }, {
-                            '$addFields': {
-                                'itemsTotal': {
-                                    '$sum': {
-                                        '$map': {
-                                            'input': '$jobs_items',
-                                            'as': 'it',
-                                            'in': {
-                                                '$cond': [
-                                                    {
-                                                        '$eq': [
-                                                            '$job_status_1', 'Posted'
-                                                        ]
-                                                    }, {
-                                                        '$ifNull': [
-                                                            '$$it.total', 0
-                                                        ]
-                                                    }, 0
-                                                ]
-                                            }
-                                        }
-                                    }
-                                },
-                                'itemsPaid': {
-                                    '$sum': {
-                                        '$map': {
-                                            'input': '$receipts_invoices_details',
-                                            'as': 'it_paid',
-                                            'in': {
-                                                '$ifNull': [
-                                                    '$$it_paid.amount', 0
-                                                ]
-                                            }
-                                        }
-                                    }
-                                },
-                                'itemsNet': {
-                                    '$sum': {
-                                        '$map': {
-                                            'input': '$jobs_items',
-                                            'as': 'it',
-                                            'in': {
-                                                '$cond': [
-                                                    {
-                                                        '$eq': [
-                                                            '$job_status_1', 'Posted'
-                                                        ]
-                                                    }, {
-                                                        '$add': [
-                                                            {
-                                                                '$ifNull': [
-                                                                    '$$it.total', 0
-                                                                ]
-                                                            }, {
-                                                                '$ifNull': [
-                                                                    '$$it.vat', 0
-                                                                ]
-                                                            }
-                                                        ]
-                                                    }, 0
-                                                ]
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }, {
-                            '$group': {
-                                '_id': None,
-                                'totalPosted': {
-                                    '$sum': {
-                                        '$cond': [
-                                            {
-                                                '$eq': [
-                                                    '$job_status_1', 'Posted'
-                                                ]
-                                            }, 1, 0
-                                        ]
-                                    }
-                                },
-                                'totalNew': {
-                                    '$sum': {
-                                        '$cond': [
-                                            {
-                                                '$eq': [
-                                                    '$job_status_1', 'New'
-                                                ]
-                                            }, 1, 0
-                                        ]
-                                    }
-                                },
-                                'totalItemsAmount': {
-                                    '$sum': '$itemsTotal'
-                                },
-                                'totalItemsNet': {
-                                    '$sum': '$itemsNet'
-                                },
-                                'totalItemsPaid': {
-                                    '$sum': '$itemsPaid'
-                                }
-                            }
-                        }, {
-                            '$addFields': {
-                                'totalJobs': {
-                                    '$add': [
-                                        '$totalNew', '$totalPosted'
-                                    ]
-                                }
-                            }
-                        }
-                    ],
-                    'as': 'job_details'
-                }
-            }, {
-                '$match': {
-                    'job_details.0': {
-                        '$exists': True
-                    }
-                }
-            }, {
-                '$project': {
-                    'name': 1,
-                    'job_details': 1
-                }
-            }, {
-                '$unwind': '$job_details'
-            }, {
-                '$facet': {
-                    'branches': [
-                        {
-                            '$project': {
-                                '_id': 1,
-                                'name': 1,
-                                'job_details': [
-                                    '$job_details'
-                                ]
-                            }
-                        }
-                    ],
-                    'summary': [
-                        {
-                            '$group': {
-                                '_id': None,
-                                'totalPosted': {
-                                    '$sum': '$job_details.totalPosted'
-                                },
-                                'totalNew': {
-                                    '$sum': '$job_details.totalNew'
-                                },
-                                'totalItemsAmount': {
-                                    '$sum': '$job_details.totalItemsAmount'
-                                },
-                                'totalJobs': {
-                                    '$sum': '$job_details.totalJobs'
-                                },
-                                'totalItemsNet': {
-                                    '$sum': '$job_details.totalItemsNet'
-                                },
-                                'totalItemsPaid': {
-                                    '$sum': '$job_details.totalItemsPaid'
-                                }
-                            }
-                        }, {
-                            '$project': {
-                                '_id': None,
-                                'name': 'ALL BRANCHES',
-                                'job_details': [
-                                    {
-                                        '_id': None,
-                                        'totalPosted': '$totalPosted',
-                                        'totalNew': '$totalNew',
-                                        'totalItemsAmount': '$totalItemsAmount',
-                                        'totalJobs': '$totalJobs',
-                                        'totalItemsNet': '$totalItemsNet',
-                                        'totalItemsPaid': '$totalItemsPaid',
-                                    }
-                                ]
-                            }
-                        }
-                    ]
-                }
-            }, {
-                '$project': {
-                    'all': {
-                        '$concatArrays': [
-                            '$branches', '$summary'
-                        ]
-                    }
-                }
-            }, {
-                '$unwind': '$all'
-            }, {
-                '$replaceRoot': {
-                    'newRoot': '$all'
-                }
-            }, {
-                '$addFields': {
-                    '_id': {
-                        '$toString': '$_id'
-                    },
-                    'total_posted': {
-                        '$arrayElemAt': [
-                            '$job_details.totalPosted', 0
-                        ]
-                    },
-                    'total_new': {
-                        '$arrayElemAt': [
-                            '$job_details.totalNew', 0
-                        ]
-                    },
-                    'total_items_amount': {
-                        '$arrayElemAt': [
-                            '$job_details.totalItemsAmount', 0
-                        ]
-                    },
-                    'total_items_net': {
-                        '$arrayElemAt': [
-                            '$job_details.totalItemsNet', 0
-                        ]
-                    },
-                    'total_items_paid': {
-                        '$arrayElemAt': [
-                            '$job_details.totalItemsPaid', 0
-                        ]
+            }, {
+                '$setWindowFields': {
+                    'sortBy': {
+                        'dateObj': -1
                     },
-                    'jobs_count': {
-                        '$arrayElemAt': [
-                            '$job_details.totalJobs', 0
-                        ]
+                    'output': {
+                        'idx': {
+                            '$documentNumber': {}
+                        }
                     }
                 }
             }, {
                 '$project': {
-                    'job_details': 0
+                    'k': {
+                        '$toString': '$idx'
+                    },
+                    'v': {
+                        'date': '$date'
+                    }
                 }
-            },
-            {
-                '$addFields': {
-                    'is_summary': {
-                        '$cond': [
-                            {
-                                '$eq': [
-                                    '$name', 'ALL BRANCHES'
-                                ]
-                            }, 1, 0
-                        ]
+            }, {
+                '$group': {
+                    '_id': None,
+                    'items': {
+                        '$push': {
+                            'k': '$k',
+                            'v': '$v'
+                        }
                     }
                 }
             }, {
-                '$sort': {
-                    'is_summary': 1,
-                    'jobs_count': -1
+                '$replaceRoot': {
+                    'newRoot': {
+                        '$arrayToObject': '$items'
+                    }
                 }
             }
         ]
-        cursor = await salesman_collection.aggregate(salesman_summary_pipeline)
-        results = await cursor.to_list(None)
+        cursor = await job_cards_collection.aggregate(jobs_dates_pipeline)
+        results = await cursor.next()
+        return {"dates": results}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/get_salesman_summary")
+async def get_salesman_summary(time_filter: TimeFilter, data: dict = Depends(security.get_current_user)):
+    try:
+        company_id = ObjectId(data.get('company_id'))
+        results = await job_cards_stats_summary(company_id, "salesman", "sales_man", time_filter.from_date,
+                                                time_filter.to_date, ["Posted"])
         return {"salesman_summary": results}
 
     except Exception as e:
@@ -1228,109 +538,19 @@ async def get_customer_aging_summary(data: dict = Depends(security.get_current_u
         customers_aging_pipeline = [
             {
                 '$match': {
-                    'company_id': ObjectId('68bbfc4b56c35562f967422d'),
-                    'job_status_1': 'Posted'
-                }
-            }, {
-                '$project': {
-                    'customer': 1,
-                    'invoice_date': 1,
-                    'company_id': 1
-                }
-            }, {
-                '$lookup': {
-                    'from': 'job_cards_invoice_items',
-                    'let': {
-                        'job_id': '$_id'
-                    },
-                    'pipeline': [
-                        {
-                            '$match': {
-                                '$expr': {
-                                    '$eq': [
-                                        '$job_card_id', '$$job_id'
-                                    ]
-                                }
-                            }
-                        }, {
-                            '$group': {
-                                '_id': None,
-                                'total_net': {
-                                    '$sum': '$net'
-                                }
-                            }
-                        }
-                    ],
-                    'as': 'invoice_sum'
-                }
-            }, {
-                '$set': {
-                    'net_amount': {
-                        '$ifNull': [
-                            {
-                                '$first': '$invoice_sum.total_net'
-                            }, 0
-                        ]
-                    }
-                }
-            }, {
-                '$lookup': {
-                    'from': 'all_receipts_invoices',
-                    'let': {
-                        'jobId': '$_id'
-                    },
-                    'pipeline': [
-                        {
-                            '$match': {
-                                '$expr': {
-                                    '$eq': [
-                                        '$job_id', '$$jobId'
-                                    ]
-                                }
-                            }
-                        }, {
-                            '$lookup': {
-                                'from': 'all_receipts',
-                                'localField': 'receipt_id',
-                                'foreignField': '_id',
-                                'as': 'receipt'
-                            }
-                        }, {
-                            '$unwind': '$receipt'
-                        }, {
-                            '$match': {
-                                'receipt.status': 'Posted'
-                            }
-                        }, {
-                            '$group': {
-                                '_id': None,
-                                'total_received': {
-                                    '$sum': '$amount'
-                                }
-                            }
-                        }
-                    ],
-                    'as': 'receipt_sum'
-                }
-            }, {
-                '$set': {
-                    'received': {
-                        '$ifNull': [
-                            {
-                                '$first': '$receipt_sum.total_received'
-                            }, 0
-                        ]
+                    'company_id': company_id,
+                    'posted': True,
+                    'outstanding': {
+                        '$gt': 0.01
                     }
                 }
             }, {
-                '$set': {
+                '$project': {
+                    'customer': '$entity_id',
+                    'invoice_date': '$document_date',
                     'outstanding': {
                         '$round': [
-                            {
-                                '$subtract': [
-                                    '$net_amount', '$received'
-                                ]
-                            }, 2
+                            '$outstanding', 2
                         ]
                     }
                 }
@@ -1617,28 +837,21 @@ async def get_customer_aging_summary(data: dict = Depends(security.get_current_u
                 }
             }, {
                 '$lookup': {
-                    'from': 'all_receipts',
+                    'from': 'entity_balances',
                     'let': {
                         'customer_ids': '$customer_ids'
                     },
                     'pipeline': [
                         {
+                            '$match': {
+                                'company_id': company_id,
+                                'kind': CUSTOMER
+                            }
+                        }, {
                             '$match': {
                                 '$expr': {
-                                    '$and': [
-                                        {
-                                            '$in': [
-                                                '$customer', '$$customer_ids'
-                                            ]
-                                        }, {
-                                            '$eq': [
-                                                '$company_id', ObjectId('68bbfc4b56c35562f967422d')
-                                            ]
-                                        }, {
-                                            '$eq': [
-                                                '$status', 'Posted'
-                                            ]
-                                        }
+                                    '$in': [
+                                        '$entity_id', '$$customer_ids'
                                     ]
                                 }
                             }
@@ -1646,7 +859,7 @@ async def get_customer_aging_summary(data: dict = Depends(security.get_current_u
                             '$group': {
                                 '_id': None,
                                 'last_payment_date': {
-                                    '$max': '$receipt_date'
+                                    '$max': '$last_payment_date'
                                 }
                             }
                         }
@@ -1700,7 +913,7 @@ async def get_customer_aging_summary(data: dict = Depends(security.get_current_u
             }
         ]
 
-        cursor = await job_cards_collection.aggregate(customers_aging_pipeline)
+        cursor = await job_balances_collection.aggregate(customers_aging_pipeline)
         results = await cursor.to_list(None)
         print("Aging done")
 
@@ -2022,167 +1235,11 @@ async def get_cashflow_dates(data: dict = Depends(security.get_current_user)):
 async def get_cashflow_summary(time_filter: TimeFilter, data: dict = Depends(security.get_current_user)):
     try:
         company_id = ObjectId(data.get("company_id"))
-        from_date = time_filter.from_date
-        to_date = time_filter.to_date
-        print(from_date)
-        print(to_date)
         cashflow_pipeline = [
             {
                 '$match': {
                     'company_id': company_id,
-                    'status': 'Posted',
-                    'receipt_date': {
-                        '$gte': from_date,
-                        '$lt': to_date
-                    }
-                }
-            }, {
-                '$project': {
-                    'account': 1,
-                    'rate': 1
-                }
-            }, {
-                '$lookup': {
-                    'from': 'all_receipts_invoices',
-                    'localField': '_id',
-                    'foreignField': 'receipt_id',
-                    'as': 'inv'
-                }
-            }, {
-                '$set': {
-                    'received': {
-                        '$multiply': [
-                            {
-                                '$ifNull': [
-                                    {
-                                        '$sum': '$inv.amount'
-                                    }, 0
-                                ]
-                            }, {
-                                '$ifNull': [
-                                    '$rate', 1
-                                ]
-                            }
-                        ]
-                    },
-                    'paid': 0,
-                    'trans_in': 0,
-                    'trans_out': 0
-                }
-            }, {
-                '$project': {
-                    'account': 1,
-                    'received': 1,
-                    'paid': 1,
-                    'trans_in': 1,
-                    'trans_out': 1
-                }
-            }, {
-                '$unionWith': {
-                    'coll': 'all_payments',
-                    'pipeline': [
-                        {
-                            '$match': {
-                                'company_id': company_id,
-                                'status': 'Posted',
-                                'payment_date': {
-                                    '$gte': from_date,
-                                    '$lt': to_date
-                                }
-                            }
-                        }, {
-                            '$project': {
-                                'account': 1,
-                                'rate': 1
-                            }
-                        }, {
-                            '$lookup': {
-                                'from': 'all_payments_invoices',
-                                'localField': '_id',
-                                'foreignField': 'payment_id',
-                                'as': 'inv'
-                            }
-                        }, {
-                            '$set': {
-                                'paid': {
-                                    '$multiply': [
-                                        {
-                                            '$ifNull': [
-                                                {
-                                                    '$sum': '$inv.amount'
-                                                }, 0
-                                            ]
-                                        }, {
-                                            '$ifNull': [
-                                                '$rate', 1
-                                            ]
-                                        }, -1
-                                    ]
-                                },
-                                'received': 0,
-                                'trans_in': 0,
-                                'trans_out': 0
-                            }
-                        }, {
-                            '$project': {
-                                'account': 1,
-                                'received': 1,
-                                'paid': 1,
-                                'trans_in': 1,
-                                'trans_out': 1
-                            }
-                        }
-                    ]
-                }
-            }, {
-                '$unionWith': {
-                    'coll': 'account_transfers',
-                    'pipeline': [
-                        {
-                            '$match': {
-                                'company_id': company_id,
-                                'status': 'Posted',
-                                'date': {
-                                    '$gte': from_date,
-                                    '$lt': to_date
-                                }
-                            }
-                        }, {
-                            '$project': {
-                                'entries': [
-                                    {
-                                        'account': '$from_account',
-                                        'trans_out': {
-                                            '$multiply': [
-                                                '$amount', -1
-                                            ]
-                                        },
-                                        'trans_in': 0,
-                                        'received': 0,
-                                        'paid': 0
-                                    }, {
-                                        'account': '$to_account',
-                                        'trans_in': '$amount',
-                                        'trans_out': 0,
-                                        'received': 0,
-                                        'paid': 0
-                                    }
-                                ]
-                            }
-                        }, {
-                            '$unwind': '$entries'
-                        }, {
-                            '$replaceRoot': {
-                                'newRoot': '$entries'
-                            }
-                        }, {
-                            '$match': {
-                                'account': {
-                                    '$ne': None
-                                }
-                            }
-                        }
-                    ]
+                    'day': stats_day_range(time_filter.from_date, time_filter.to_date)
                 }
             }, {
                 '$group': {
@@ -2239,9 +1296,8 @@ async def get_cashflow_summary(time_filter: TimeFilter, data: dict = Depends(sec
                 }
             }
         ]
-        cursor = await receipts_collection.aggregate(cashflow_pipeline)
+        cursor = await cashflow_daily_stats_collection.aggregate(cashflow_pipeline)
         results = await cursor.to_list(None)
-        print(results)
         return {"summary": results}
 
     except Exception as e:
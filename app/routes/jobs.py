@@ -0,0 +1,44 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, HTTPException, Depends
+from app.core import security
+from app.core.jobs import jobs_collection, get_job, cancel_job, serialize_job
+
+router = APIRouter()
+
+
+def _job_object_id(job_id: str) -> ObjectId:
+    try:
+        return ObjectId(job_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid job id")
+
+
+@router.get("/get_all_jobs")
+async def get_all_jobs(status: str | None = None, job_type: str | None = None, limit: int = 50,
+                       data: dict = Depends(security.get_current_user)):
+    try:
+        company_id = ObjectId(data.get("company_id"))
+        match_stage = {"company_id": company_id}
+        if status:
+            match_stage["status"] = status
+        if job_type:
+            match_stage["type"] = job_type
+        jobs = await jobs_collection.find(match_stage, {"payload": 0}).sort("createdAt", -1).limit(
+            max(1, min(limit, 200))).to_list(None)
+        return {"jobs": [serialize_job(job) for job in jobs]}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/get_job/{job_id}")
+async def get_job_status(job_id: str, data: dict = Depends(security.get_current_user)):
+    job = await get_job(_job_object_id(job_id), ObjectId(data.get("company_id")))
+    return {"job": serialize_job(job)}
+
+
+@router.post("/cancel_job/{job_id}")
+async def cancel_job_route(job_id: str, data: dict = Depends(security.get_current_user)):
+    job = await cancel_job(_job_object_id(job_id), ObjectId(data.get("company_id")))
+    return {"job": serialize_job(job)}
@@ -4,6 +4,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from app.core import security
+from app.core.working_days_calendar import invalidate_working_days_calendars
 from app.database import get_collection
 from app.websocket_config import manager
 
@@ -98,6 +99,7 @@ async def update_legislation(leg_id: str, leg: LegislationModel, data: dict = De
 
         if updated_leg.matched_count == 0:
             raise HTTPException(status_code=404, detail="legislation not found")
+        await invalidate_working_days_calendars(company_id, legislation=leg_id)
         leg['_id'] = str(leg_id)
         leg = jsonable_encoder(leg)
 
@@ -118,6 +120,7 @@ async def delete_legislation(leg_id: str, data: dict = Depends(security.get_curr
         company_id = data.get("company_id")
         result = await legislations_collection.delete_one({"_id": ObjectId(leg_id)})
         if result.deleted_count == 1:
+            await invalidate_working_days_calendars(company_id, legislation=leg_id)
             await manager.send_to_company(str(company_id), {
                 "type": "leg_deleted",
                 "data": {"_id": leg_id}
@@ -2,6 +2,7 @@ from typing import Optional
 from bson import ObjectId
 from fastapi import APIRouter, Body, Depends, Query, Path, HTTPException
 from app.core import security
+from app.core.reference_cache import invalidate_reference
 from app.database import get_collection
 from datetime import datetime, timezone
 from app.websocket_config import manager
@@ -306,6 +307,7 @@ async def delete_value(value_id: str, data: dict = Depends(security.get_current_
     try:
         company_id = data.get("company_id")
         result = await value_collection.delete_one({"_id": ObjectId(value_id)})
+        await invalidate_reference("all_lists_values", value_id)
         if result.deleted_count == 1:
             await manager.send_to_company(company_id, {
                 "type": "list_value_deleted",
@@ -331,6 +333,7 @@ async def update_value(value_id: str, name: str = Body(None),
             {"$set": {"name": name, "mastered_by": mastered_by_id,
                       "updatedAt": datetime.now(timezone.utc), }},
         )
+        await invalidate_reference("all_lists_values", value_id)
         if not result:
             raise HTTPException(status_code=404, detail="Model not found")
 
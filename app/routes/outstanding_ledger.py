@@ -0,0 +1,31 @@
+import os
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Depends
+from app.core import security
+from app.core.jobs import JOB_MAX_ATTEMPTS, JobContext, register_job_type, submit_job
+from app.core.outstanding_ledger import reconcile_outstanding_ledger
+
+router = APIRouter()
+
+LEDGER_JOB_CONCURRENCY = int(os.getenv("LEDGER_JOB_CONCURRENCY", "1"))
+
+
+async def run_reconcile_job(job: JobContext):
+    return await reconcile_outstanding_ledger(ObjectId(job.user_data.get("company_id")), job.report_progress)
+
+
+register_job_type("outstanding_ledger_reconcile", run_reconcile_job, concurrency=LEDGER_JOB_CONCURRENCY,
+                  max_attempts=JOB_MAX_ATTEMPTS)
+
+
+@router.post("/reconcile")
+async def reconcile(data: dict = Depends(security.get_current_user)):
+    try:
+        job = await submit_job("outstanding_ledger_reconcile", data, description="Rebuild outstanding ledger")
+        return {"job": job}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
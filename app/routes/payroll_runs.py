@@ -7,13 +7,15 @@ import re
 from datetime import datetime
 from email.message import EmailMessage
 from email.utils import formataddr
+from functools import partial
 from typing import Optional, Any
 from bson import ObjectId
 from bson.errors import InvalidId
 from fastapi import APIRouter, HTTPException, Depends, File, UploadFile
 from pydantic import BaseModel, EmailStr, TypeAdapter, ValidationError
 from app import database
-from app.core import security, google_mail
+from app.core import security, google_mail, mail_dispatch
+from app.core.jobs import JobContext, register_job_type, report_job_progress, submit_job
 from app.database import get_collection
 from app.routes.car_trading import PyObjectId
 from app.routes.counters import create_custom_counter
@@ -21,6 +23,8 @@ from app.routes.employees import calculate_number_of_days, NumberOfDaysForWorkin
 from app.routes.payroll_runs_widgets.helpers_functions import get_employee_element_value, \
     get_period_days, get_current_leave_used_days, get_used_leave_days, is_within_period, get_previous_gratuity_accrual, \
     to_float, calculate_progressive_income_tax, income_tax_brackets
+from app.routes.payroll_runs_widgets.evaluation_context import PayrollEvaluationContext, \
+    load_payroll_evaluation_context
 
 router = APIRouter()
 payroll_runs_collection = get_collection("payroll_runs")
@@ -48,6 +52,8 @@ payroll_elements_based_elements_collection = get_collection("payroll_elements_ba
 
 
 MAX_PAYSLIP_PDF_SIZE = 5 * 1024 * 1024
+PAYROLL_RUN_JOB_CONCURRENCY = int(os.getenv("PAYROLL_RUN_JOB_CONCURRENCY", "2"))
+PAYSLIP_EMAIL_JOB_CONCURRENCY = int(os.getenv("PAYSLIP_EMAIL_JOB_CONCURRENCY", "2"))
 email_address_adapter = TypeAdapter(EmailStr)
 
 
@@ -65,56 +71,42 @@ def _safe_file_name(value: Any) -> str:
     return cleaned[:80] or "Employee"
 
 
-def _send_payslip_messages(
-        access_token: str,
+def _payslip_raw_message(
         company_name: str,
         company_email: str,
         run_label: str,
         period_name: str,
-        messages: list[dict],
-) -> list[dict]:
-    results = []
+        item: dict,
+) -> str:
     safe_company_name = " ".join(company_name.splitlines()).strip() or "Company"
     safe_period_name = " ".join((period_name or run_label).splitlines()).strip()
-    for item in messages:
-        employee_name = str(item["employee_name"])
-        message = EmailMessage()
-        message["From"] = formataddr((safe_company_name, company_email))
-        message["To"] = item["email"]
-        message["Reply-To"] = company_email
-        message["Subject"] = f"Payslip - {safe_period_name}"
-        message.set_content(
-                f"Dear {employee_name},\n\n"
-                f"Please find attached your payslip for {safe_period_name}.\n\n"
-                f"Regards,\n{safe_company_name}"
-        )
-        message.add_alternative(
-                f"<p>Dear {html.escape(employee_name)},</p>"
-                f"<p>Please find attached your payslip for "
-                f"<strong>{html.escape(safe_period_name)}</strong>.</p>"
-                f"<p>Regards,<br>{html.escape(safe_company_name)}</p>",
-                subtype="html",
-        )
-        message.add_attachment(
-                item["pdf"],
-                maintype="application",
-                subtype="pdf",
-                filename=f"Payslip - {_safe_file_name(employee_name)}.pdf",
-        )
-        raw_message = base64.urlsafe_b64encode(
-            message.as_bytes()
-        ).decode("ascii").rstrip("=")
-        try:
-            google_mail.send_raw_message(access_token, raw_message)
-            results.append({**item["result"], "status": "sent"})
-        except google_mail.GoogleMailError as error:
-            results.append({
-                **item["result"],
-                "status": "failed",
-                "reason": error.message[:180],
-            })
-
-    return results
+    employee_name = str(item["employee_name"])
+    message = EmailMessage()
+    message["From"] = formataddr((safe_company_name, company_email))
+    message["To"] = item["email"]
+    message["Reply-To"] = company_email
+    message["Subject"] = f"Payslip - {safe_period_name}"
+    message.set_content(
+            f"Dear {employee_name},\n\n"
+            f"Please find attached your payslip for {safe_period_name}.\n\n"
+            f"Regards,\n{safe_company_name}"
+    )
+    message.add_alternative(
+            f"<p>Dear {html.escape(employee_name)},</p>"
+            f"<p>Please find attached your payslip for "
+            f"<strong>{html.escape(safe_period_name)}</strong>.</p>"
+            f"<p>Regards,<br>{html.escape(safe_company_name)}</p>",
+            subtype="html",
+    )
+    message.add_attachment(
+            item["pdf"],
+            maintype="application",
+            subtype="pdf",
+            filename=f"Payslip - {_safe_file_name(employee_name)}.pdf",
+    )
+    return base64.urlsafe_b64encode(
+        message.as_bytes()
+    ).decode("ascii").rstrip("=")
 
 
 class PayrollRunModel(BaseModel):
@@ -241,8 +233,14 @@ async def save_payroll_run(
 
 
 @router.post("/payroll_run")
-async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_current_user)):
+async def payroll_run(run: PayrollRunModel, background: bool = False,
+                      data: dict = Depends(security.get_current_user)):
     try:
+        if background:
+            payload = {key: str(value) if value else None for key, value in run.model_dump().items()}
+            job = await submit_job("payroll_run", data, payload=payload, description="Payroll run")
+            return {"job": job}
+
         payroll_id = run.payroll_id
         period_id = run.period_id
         employee_id = run.employee_id
@@ -271,6 +269,7 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
             "end_date": 1,
             "full_name": 1,
             "legislation": 1,
+            "company_id": 1,
         }
 
         if employee_id:
@@ -383,7 +382,7 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
         ).to_list(None)
         leave_types_task = leave_types_collection.find(
             {"_id": {"$in": list(leave_type_ids)}},
-            {"based_element": 1, "name": 1},
+            {"based_element": 1, "name": 1, "type": 1},
         ).to_list(None)
         loan_types_task = loan_and_advances_types_collection.find(
             {"_id": {"$in": list(loan_type_ids)}},
@@ -462,6 +461,15 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
             document["_id"]: document
             for document in legislation_documents
         }
+        evaluation_context = await load_payroll_evaluation_context(
+            ObjectId(data.get("company_id")),
+            all_employees,
+            all_employee_leaves,
+            legislations_by_id,
+            leave_types_by_id,
+            period_start_date,
+            period_end_date,
+        )
 
         employee_values_by_name = {}
         employee_payrolls_by_id = {}
@@ -511,7 +519,8 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
         # === loop employees ===:
         description = ""
         elements_values_maps = {}
-        for employee in all_employees:
+        for employee_index, employee in enumerate(all_employees):
+            await report_job_progress(int(employee_index * 100 / len(all_employees)))
             current_employee_id = employee.get("_id")
             elements_values_maps[current_employee_id] = []
             employee_hire_date = employee.get("hire_date") or datetime.min
@@ -673,7 +682,8 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
                                                                      employee_element_value(
                                                                          employee_payroll.get("name"),
                                                                          current_employee_id),
-                                                                     legislation_document)
+                                                                     legislation_document,
+                                                                     evaluation_context)
                                 if value:
                                     elements_values_maps[current_employee_id].append({
                                         "element_id": employee_payroll.get("_id"),
@@ -720,7 +730,8 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
                                                                        is_pay_in_advanced, data,
                                                                        employee_element_value(
                                                                            based_element_id,
-                                                                           current_employee_id))
+                                                                           current_employee_id),
+                                                                       evaluation_context)
 
                         elements_values_maps[current_employee_id].append({
                             "element_id": leave["_id"],
@@ -735,7 +746,8 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
                                                                            leave_start_date, leave_end_date, data,
                                                                            employee_element_value(
                                                                                based_element_id,
-                                                                               current_employee_id))
+                                                                               current_employee_id),
+                                                                           evaluation_context)
 
                         elements_values_maps[current_employee_id].append({
                             "element_id": leave["_id"],
@@ -752,7 +764,8 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
                                                                          employee_element_value(
                                                                              based_element_id,
                                                                              current_employee_id),
-                                                                         legislation_document)
+                                                                         legislation_document,
+                                                                         evaluation_context)
 
                         elements_values_maps[current_employee_id].append({
                             "element_id": leave["_id"],
@@ -769,7 +782,8 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
                                                                               employee_element_value(
                                                                                   based_element_id,
                                                                                   current_employee_id),
-                                                                              legislation_document)
+                                                                              legislation_document,
+                                                                              evaluation_context)
 
                         elements_values_maps[current_employee_id].append({
                             "element_id": leave["_id"],
@@ -786,7 +800,8 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
                                                                               employee_element_value(
                                                                                   based_element_id,
                                                                                   current_employee_id),
-                                                                              legislation_document)
+                                                                              legislation_document,
+                                                                              evaluation_context)
 
                         elements_values_maps[current_employee_id].append({
                             "element_id": leave["_id"],
@@ -804,7 +819,8 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
                                                                                   employee_element_value(
                                                                                       based_element_id,
                                                                                       current_employee_id),
-                                                                                  legislation_document)
+                                                                                  legislation_document,
+                                                                                  evaluation_context)
 
                         elements_values_maps[current_employee_id].append({
                             "element_id": leave["_id"],
@@ -859,6 +875,13 @@ async def payroll_run(run: PayrollRunModel, data: dict = Depends(security.get_cu
         raise
 
 
+async def run_payroll_run_job(job: JobContext):
+    return await payroll_run(PayrollRunModel(**job.payload), data=job.user_data)
+
+
+register_job_type("payroll_run", run_payroll_run_job, concurrency=PAYROLL_RUN_JOB_CONCURRENCY)
+
+
 # ==== PY_INPUT_VALUE_FF ====
 async def py_input_value_ff(employee_hire_date: datetime, employee_end_date: datetime,
                             element_start: datetime,
@@ -913,12 +936,25 @@ async def py_annual_leave_entitlement_ff(employee_hire_date: datetime, employee_
         raise e
 
 
+async def leave_working_days(leave_id: ObjectId, employee_id: ObjectId, date1: datetime, date2: datetime,
+                             user_data: dict, context: Optional[PayrollEvaluationContext] = None) -> int:
+    if context is not None:
+        return context.working_days(employee_id, leave_id, date1, date2)
+    number_of_days = await calculate_number_of_days(str(employee_id),
+                                                    NumberOfDaysForWorkingDaysModel(start_date=date1,
+                                                                                    end_date=date2,
+                                                                                    leave_type=str(leave_id)),
+                                                    user_data)
+    return number_of_days['working_days']
+
+
 # ==== PY_ANNUAL_LEAVE_FF ====
 async def py_annual_leave_ff(leave_id: ObjectId, employee_id: ObjectId, period_start_date: datetime,
                              period_end_date: datetime,
                              based_element_id: ObjectId, leave_start_date: datetime, leave_end_date: datetime,
                              is_pay_in_advanced: bool, user_data: dict,
-                             based_value: Optional[float] = None):
+                             based_value: Optional[float] = None,
+                             context: Optional[PayrollEvaluationContext] = None):
     try:
         value = based_value
         if value is None:
@@ -928,12 +964,7 @@ async def py_annual_leave_ff(leave_id: ObjectId, employee_id: ObjectId, period_s
         date1 = max(period_start_date, leave_start_date)
         date2 = min(period_end_date, leave_end_date)
         # l_days = (date2 - date1).days + 1
-        number_of_days = await calculate_number_of_days(str(employee_id),
-                                                        NumberOfDaysForWorkingDaysModel(start_date=date1,
-                                                                                        end_date=date2,
-                                                                                        leave_type=str(leave_id)),
-                                                        user_data)
-        l_days: int = number_of_days['working_days']
+        l_days: int = await leave_working_days(leave_id, employee_id, date1, date2, user_data, context)
 
         final_value = round(((value or 0) * (l_days * 12 / 365)), 2)
 
@@ -947,7 +978,8 @@ async def py_annual_leave_ff(leave_id: ObjectId, employee_id: ObjectId, period_s
 async def py_unpaid_leave_ff(leave_id: ObjectId, employee_id: ObjectId, period_start_date: datetime,
                              period_end_date: datetime,
                              based_element_id: ObjectId, leave_start_date: datetime, leave_end_date: datetime,
-                             user_data: dict, based_value: Optional[float] = None):
+                             user_data: dict, based_value: Optional[float] = None,
+                             context: Optional[PayrollEvaluationContext] = None):
     try:
         value = based_value
         if value is None:
@@ -957,12 +989,7 @@ async def py_unpaid_leave_ff(leave_id: ObjectId, employee_id: ObjectId, period_s
         date1 = max(period_start_date, leave_start_date)
         date2 = min(period_end_date, leave_end_date)
         # l_days = (date2 - date1).days + 1
-        number_of_days = await calculate_number_of_days(str(employee_id),
-                                                        NumberOfDaysForWorkingDaysModel(start_date=date1,
-                                                                                        end_date=date2,
-                                                                                        leave_type=str(leave_id)),
-                                                        user_data)
-        l_days: int = number_of_days['working_days']
+        l_days: int = await leave_working_days(leave_id, employee_id, date1, date2, user_data, context)
 
         final_value = round(((value or 0) * (l_days / period_days)), 2)
 
@@ -978,7 +1005,8 @@ async def py_sick_leave_ff(leave_id: ObjectId, employee_id: ObjectId, period_sta
                            based_element_id: ObjectId, legislation: ObjectId, leave_start_date: datetime,
                            leave_end_date: datetime, user_data: dict,
                            based_value: Optional[float] = None,
-                           legislation_document: Optional[dict] = None):
+                           legislation_document: Optional[dict] = None,
+                           context: Optional[PayrollEvaluationContext] = None):
     try:
         value = based_value
         if value is None:
@@ -995,17 +1023,15 @@ async def py_sick_leave_ff(leave_id: ObjectId, employee_id: ObjectId, period_sta
         half_limit = legislation_doc.get("number_of_half_paid_days_for_sick_leave", 0)
 
         #  get previously used days
-        used_days_before = await get_used_leave_days("SL", employee_id, leave_start_date, period_start_date)
+        if context is not None:
+            used_days_before = context.used_leave_days("SL", employee_id, leave_start_date, period_start_date)
+        else:
+            used_days_before = await get_used_leave_days("SL", employee_id, leave_start_date, period_start_date)
 
         date1 = max(period_start_date, leave_start_date)
         date2 = min(period_end_date, leave_end_date)
         # l_days = (date2 - date1).days + 1
-        number_of_days = await calculate_number_of_days(str(employee_id),
-                                                        NumberOfDaysForWorkingDaysModel(start_date=date1,
-                                                                                        end_date=date2,
-                                                                                        leave_type=str(leave_id)),
-                                                        user_data)
-        l_days: int = number_of_days['working_days']
+        l_days: int = await leave_working_days(leave_id, employee_id, date1, date2, user_data, context)
 
         remaining_days = l_days
         total_value = 0
@@ -1040,7 +1066,8 @@ async def py_maternity_leave_ff(leave_id: ObjectId, employee_id: ObjectId, perio
                                 based_element_id: ObjectId, legislation: ObjectId, leave_start_date: datetime,
                                 leave_end_date: datetime, user_data: dict,
                                 based_value: Optional[float] = None,
-                                legislation_document: Optional[dict] = None):
+                                legislation_document: Optional[dict] = None,
+                                context: Optional[PayrollEvaluationContext] = None):
     try:
         value = based_value
         if value is None:
@@ -1061,12 +1088,7 @@ async def py_maternity_leave_ff(leave_id: ObjectId, employee_id: ObjectId, perio
         date2 = min(period_end_date, leave_end_date)
 
         # l_days = (date2 - date1).days + 1
-        number_of_days = await calculate_number_of_days(str(employee_id),
-                                                        NumberOfDaysForWorkingDaysModel(start_date=date1,
-                                                                                        end_date=date2,
-                                                                                        leave_type=str(leave_id)),
-                                                        user_data)
-        l_days: int = number_of_days['working_days']
+        l_days: int = await leave_working_days(leave_id, employee_id, date1, date2, user_data, context)
 
         remaining_days = l_days
         total_value = 0
@@ -1091,7 +1113,8 @@ async def py_paternity_leave_ff(leave_id: ObjectId, employee_id: ObjectId, perio
                                 based_element_id: ObjectId, legislation: ObjectId, leave_start_date: datetime,
                                 leave_end_date: datetime, user_data: dict,
                                 based_value: Optional[float] = None,
-                                legislation_document: Optional[dict] = None):
+                                legislation_document: Optional[dict] = None,
+                                context: Optional[PayrollEvaluationContext] = None):
     try:
         value = based_value
         if value is None:
@@ -1112,12 +1135,7 @@ async def py_paternity_leave_ff(leave_id: ObjectId, employee_id: ObjectId, perio
         date2 = min(period_end_date, leave_end_date)
 
         # l_days = (date2 - date1).days + 1
-        number_of_days = await calculate_number_of_days(str(employee_id),
-                                                        NumberOfDaysForWorkingDaysModel(start_date=date1,
-                                                                                        end_date=date2,
-                                                                                        leave_type=str(leave_id)),
-                                                        user_data)
-        l_days: int = number_of_days['working_days']
+        l_days: int = await leave_working_days(leave_id, employee_id, date1, date2, user_data, context)
 
         remaining_days = l_days
         total_value = 0
@@ -1142,7 +1160,8 @@ async def py_compassionate_leave_ff(leave_id: ObjectId, employee_id: ObjectId, p
                                     based_element_id: ObjectId, legislation: ObjectId, leave_start_date: datetime,
                                     leave_end_date: datetime, user_data: dict,
                                     based_value: Optional[float] = None,
-                                    legislation_document: Optional[dict] = None):
+                                    legislation_document: Optional[dict] = None,
+                                    context: Optional[PayrollEvaluationContext] = None):
     try:
         value = based_value
         if value is None:
@@ -1163,12 +1182,7 @@ async def py_compassionate_leave_ff(leave_id: ObjectId, employee_id: ObjectId, p
         date2 = min(period_end_date, leave_end_date)
 
         # l_days = (date2 - date1).days + 1
-        number_of_days = await calculate_number_of_days(str(employee_id),
-                                                        NumberOfDaysForWorkingDaysModel(start_date=date1,
-                                                                                        end_date=date2,
-                                                                                        leave_type=str(leave_id)),
-                                                        user_data)
-        l_days: int = number_of_days['working_days']
+        l_days: int = await leave_working_days(leave_id, employee_id, date1, date2, user_data, context)
 
         remaining_days = l_days
         total_value = 0
@@ -1313,7 +1327,8 @@ async def py_gratuity_accrual_ff(employee_id: ObjectId, employee_hire_date: date
                                  element_start: datetime, element_end: datetime, period_start_date: datetime,
                                  period_end_date: datetime, based_element_id: ObjectId, legislation: ObjectId,
                                  based_value: Optional[float] = None,
-                                 legislation_document: Optional[dict] = None):
+                                 legislation_document: Optional[dict] = None,
+                                 context: Optional[PayrollEvaluationContext] = None):
     try:
         basic_salary = based_value
         if basic_salary is None:
@@ -1341,9 +1356,12 @@ async def py_gratuity_accrual_ff(employee_id: ObjectId, employee_hire_date: date
         gratuity_days_after_5 = (after_5_years_days / 365) * gratuity_after_5_years
         total_gratuity_days = gratuity_days_first_5 + gratuity_days_after_5
         total_gratuity_liability = (total_gratuity_days * basic_salary) / 30
-        previous_accrued_amount = await get_previous_gratuity_accrual(
-            employee_id=employee_id,
-        )
+        if context is not None:
+            previous_accrued_amount = context.previous_gratuity_accrual(employee_id)
+        else:
+            previous_accrued_amount = await get_previous_gratuity_accrual(
+                employee_id=employee_id,
+            )
         current_period_accrual = (total_gratuity_liability - previous_accrued_amount)
         return round(current_period_accrual, 2)
     except Exception as e:
@@ -1938,10 +1956,103 @@ async def prepare_bank_export(run_id: str, data: dict = Depends(security.get_cur
         raise
 
 
+async def _get_mail_connection(company_id: ObjectId, company_email: str) -> dict:
+    connection = await company_mail_settings_collection.find_one(
+        {"company_id": company_id, "provider": "google"},
+        {"email": 1, "encrypted_refresh_token": 1},
+    )
+    if not connection:
+        raise HTTPException(
+            status_code=409,
+            detail="Connect Google Mail in Company Variables before sending payslips",
+        )
+    if str(connection.get("email") or "").lower() != company_email.lower():
+        raise HTTPException(
+            status_code=409,
+            detail="The company email changed. Reconnect Google Mail in Company Variables",
+        )
+    return connection
+
+
+async def _deliver_payslips(
+        company_id: ObjectId,
+        run_object_id: ObjectId,
+        company_name: str,
+        company_email: str,
+        run_label: str,
+        period_name: str,
+        messages: list[dict],
+        results: list[dict],
+) -> dict:
+    if messages:
+        connection = await _get_mail_connection(company_id, company_email)
+        safe_period_name = " ".join((period_name or run_label).splitlines()).strip()
+        for item in messages:
+            item["subject"] = f"Payslip - {safe_period_name}"
+            item["metadata"] = item["result"]
+        try:
+            refresh_token = google_mail.decrypt_refresh_token(
+                connection["encrypted_refresh_token"]
+            )
+            sent_messages = await mail_dispatch.dispatch_messages(
+                company_id,
+                company_email,
+                refresh_token,
+                messages,
+                partial(_payslip_raw_message, company_name, company_email, run_label, period_name),
+                reference={"type": "payroll_run", "id": run_object_id},
+                progress=report_job_progress,
+            )
+        except google_mail.GoogleMailError as error:
+            raise HTTPException(
+                status_code=error.status_code,
+                detail=error.message,
+            )
+        for item, sent_message in zip(messages, sent_messages):
+            if sent_message and sent_message["status"] == mail_dispatch.SENT:
+                results.append({**item["result"], "status": "sent"})
+            else:
+                results.append({
+                    **item["result"],
+                    "status": "failed",
+                    "reason": str((sent_message or {}).get("error") or "Not sent")[:180],
+                })
+
+    sent_employee_ids = [
+        ObjectId(item["employee_id"])
+        for item in results
+        if item["status"] == "sent"
+    ]
+    if sent_employee_ids:
+        await payroll_runs_employees_collection.update_many(
+            {
+                "company_id": company_id,
+                "run_id": run_object_id,
+                "employee_id": {"$in": sent_employee_ids},
+            },
+            {"$set": {
+                "payslip_emailed_at": security.now_utc(),
+                "updatedAt": security.now_utc(),
+            }},
+        )
+
+    sent = sum(item["status"] == "sent" for item in results)
+    skipped = sum(item["status"] == "skipped" for item in results)
+    failed = sum(item["status"] == "failed" for item in results)
+    return {
+        "message": "Payslip email merge completed",
+        "sent": sent,
+        "skipped": skipped,
+        "failed": failed,
+        "results": results,
+    }
+
+
 @router.post("/email_payslips/{run_id}")
 async def email_payslips(
         run_id: str,
         payslips: list[UploadFile] = File(...),
+        background: bool = False,
         data: dict = Depends(security.get_current_user),
 ):
     try:
@@ -2096,73 +2207,85 @@ async def email_payslips(
             "result": result,
         })
 
-    if messages:
-        connection = await company_mail_settings_collection.find_one(
-            {"company_id": company_id, "provider": "google"},
-            {"email": 1, "encrypted_refresh_token": 1},
+    if background and messages:
+        # checked before queuing so a missing Google Mail connection still fails the request
+        await _get_mail_connection(company_id, company_email)
+        job = await submit_job(
+            "email_payslips",
+            data,
+            payload={
+                "run_id": run_id,
+                "company_name": company_name,
+                "company_email": company_email,
+                "run_label": run_label,
+                "period_name": period_name,
+                "messages": [
+                    {**{key: value for key, value in item.items() if key != "pdf"},
+                     "file": f"{item['result']['employee_id']}.pdf"}
+                    for item in messages
+                ],
+                "results": results,
+            },
+            files={f"{item['result']['employee_id']}.pdf": item["pdf"] for item in messages},
+            description=f"Email payslips - {run_label}",
         )
-        if not connection:
-            raise HTTPException(
-                status_code=409,
-                detail="Connect Google Mail in Company Variables before sending payslips",
-            )
-        if str(connection.get("email") or "").lower() != company_email.lower():
-            raise HTTPException(
-                status_code=409,
-                detail="The company email changed. Reconnect Google Mail in Company Variables",
-            )
+        return {"job": job}
 
-        try:
-            refresh_token = google_mail.decrypt_refresh_token(
-                connection["encrypted_refresh_token"]
-            )
-            access_token = await asyncio.to_thread(
-                google_mail.refresh_access_token,
-                refresh_token,
-            )
-            results.extend(await asyncio.to_thread(
-                _send_payslip_messages,
-                access_token,
-                company_name,
-                company_email,
-                run_label,
-                period_name,
-                messages,
-            ))
-        except google_mail.GoogleMailError as error:
-            raise HTTPException(
-                status_code=error.status_code,
-                detail=error.message,
-            )
+    return await _deliver_payslips(company_id, run_object_id, company_name, company_email, run_label,
+                                   period_name, messages, results)
 
-    sent_employee_ids = [
-        ObjectId(item["employee_id"])
-        for item in results
-        if item["status"] == "sent"
+
+async def run_email_payslips_job(job: JobContext):
+    payload = job.payload
+    messages = [
+        {**item, "pdf": await job.read_file(item["file"])}
+        for item in payload["messages"]
     ]
-    if sent_employee_ids:
-        await payroll_runs_employees_collection.update_many(
-            {
-                "company_id": company_id,
-                "run_id": run_object_id,
-                "employee_id": {"$in": sent_employee_ids},
-            },
-            {"$set": {
-                "payslip_emailed_at": security.now_utc(),
-                "updatedAt": security.now_utc(),
-            }},
-        )
+    return await _deliver_payslips(
+        ObjectId(job.user_data["company_id"]),
+        ObjectId(payload["run_id"]),
+        payload["company_name"],
+        payload["company_email"],
+        payload["run_label"],
+        payload["period_name"],
+        messages,
+        payload["results"],
+    )
 
-    sent = sum(item["status"] == "sent" for item in results)
-    skipped = sum(item["status"] == "skipped" for item in results)
-    failed = sum(item["status"] == "failed" for item in results)
-    return {
-        "message": "Payslip email merge completed",
-        "sent": sent,
-        "skipped": skipped,
-        "failed": failed,
-        "results": results,
-    }
+
+register_job_type("email_payslips", run_email_payslips_job, concurrency=PAYSLIP_EMAIL_JOB_CONCURRENCY)
+
+
+@router.get("/email_payslips_status/{run_id}")
+async def email_payslips_status(run_id: str, data: dict = Depends(security.get_current_user)):
+    try:
+        company_id = ObjectId(data.get("company_id"))
+        run_object_id = ObjectId(run_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid payroll run or company id")
+
+    cursor = await mail_dispatch.mail_messages_collection.aggregate([
+        {"$match": {"company_id": company_id, "reference.type": "payroll_run", "reference.id": run_object_id}},
+        {"$sort": {"createdAt": -1}},
+        {"$project": {
+            "_id": {"$toString": "$_id"},
+            "dispatch_id": {"$toString": "$dispatch_id"},
+            "employee_id": "$metadata.employee_id",
+            "employee_name": "$metadata.employee_name",
+            "to": 1,
+            "status": 1,
+            "attempts": 1,
+            "error": 1,
+            "sent_at": 1,
+            "createdAt": 1,
+            "updatedAt": 1,
+        }},
+    ])
+    messages = await cursor.to_list(None)
+    counts = {}
+    for message in messages:
+        counts[message.get("status")] = counts.get(message.get("status"), 0) + 1
+    return {"counts": counts, "messages": messages}
 
 
 ##### ============= FUNCTIONS TO GET LOVs ============= #####
@@ -0,0 +1,176 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.core.working_days_calendar import WorkingDaysCalendar, preload_working_days_calendars, \
+    working_days_between
+from app.database import get_collection
+from app.routes.employees import employees_leaves_collection, leave_types_collection
+from app.routes.payroll_runs_widgets.helpers_functions import balances_collection, get_current_leave_used_days
+
+balances_based_elements_collection = get_collection("balances_based_elements")
+payroll_runs_employees_elements_collection = get_collection("payroll_runs_employees_elements")
+
+class PayrollEvaluationContext:
+    """
+    Everything the payroll fast formulas read from the database, loaded once per run.
+    The working days / used leave days / gratuity helpers follow calculate_number_of_days_batch,
+    get_used_leave_days and get_previous_gratuity_accrual without touching the database.
+    """
+
+    def __init__(self, company_id: ObjectId, employees: list[dict], legislations_by_id: dict,
+                 leave_types_by_id: dict, calendars: dict[tuple, dict[int, WorkingDaysCalendar]],
+                 leaves_by_code: dict[str, list[dict]],
+                 gratuity_accruals: dict[ObjectId, float]):
+        self.company_id = company_id
+        self.employees_by_id = {employee["_id"]: employee for employee in employees}
+        self.legislations_by_id = legislations_by_id
+        self.leave_types_by_id = leave_types_by_id
+        self.calendars = calendars
+        self.leaves_by_code = leaves_by_code
+        self.gratuity_accruals = gratuity_accruals
+
+    def working_days(self, employee_id: ObjectId, leave_type_id: Optional[ObjectId], start_date: datetime,
+                     end_date: datetime) -> int:
+        if leave_type_id:
+            leave_type_doc = self.leave_types_by_id.get(ObjectId(leave_type_id))
+            if leave_type_doc and str(leave_type_doc.get("type") or "").lower() == "calendar days":
+                return (end_date - start_date).days + 1
+
+        employee_doc = self.employees_by_id.get(ObjectId(employee_id))
+        if not employee_doc or employee_doc.get("company_id") != self.company_id:
+            raise HTTPException(status_code=404, detail="Employee not found")
+
+        legislation = employee_doc.get("legislation")
+        if legislation and legislation not in self.legislations_by_id:
+            raise HTTPException(status_code=404, detail="Legislation not found")
+
+        if start_date > end_date:
+            raise HTTPException(status_code=400, detail="Invalid date range")
+
+        calendars = self.calendars.get((employee_doc.get("company_id"), legislation))
+        if calendars is None:
+            raise HTTPException(status_code=404, detail="Working days calendar not loaded")
+        return working_days_between(calendars, start_date, end_date)
+
+    def used_leave_days(self, leave_code: str, employee_id: ObjectId, leave_start_date: datetime,
+                        period_start_date: datetime) -> float:
+        year_start = datetime(leave_start_date.year, 1, 1)
+        year_end = datetime(leave_start_date.year, 12, 31)
+        total_days = 0
+        for leave in self.leaves_by_code.get(leave_code, []):
+            if leave["employee_id"] != employee_id:
+                continue
+            if not (leave["start_date"] < leave_start_date and leave["end_date"] >= year_start):
+                continue
+            date1 = max(year_start, leave["start_date"])
+            date2 = min(year_end, leave["end_date"])
+            total_days += max((date2 - date1).days + 1, 0)
+
+        return total_days + get_current_leave_used_days(period_start_date, leave_start_date)
+
+    def previous_gratuity_accrual(self, employee_id: ObjectId) -> float:
+        return self.gratuity_accruals.get(employee_id, 0)
+
+
+async def _load_prior_leaves(leave_code: str, employee_ids: list[ObjectId], earliest_leave_start: datetime,
+                             period_end_date: datetime) -> list[dict]:
+    # get_used_leave_days looks the leave type up by code only, keep the same rule
+    leave_type = await leave_types_collection.find_one({"code": leave_code}, {"_id": 1})
+    if not leave_type:
+        return []
+    # covers every leave of the run: starts before the period ends, ends in or after the earliest leave's year
+    return await employees_leaves_collection.find(
+        {
+            "employee_id": {"$in": employee_ids},
+            "leave_type": leave_type["_id"],
+            "status": "Posted",
+            "start_date": {"$lt": period_end_date},
+            "end_date": {"$gte": datetime(earliest_leave_start.year, 1, 1)},
+        },
+        {"employee_id": 1, "start_date": 1, "end_date": 1},
+    ).to_list(None)
+
+
+async def _load_gratuity_accruals(employee_ids: list[ObjectId]) -> dict[ObjectId, float]:
+    balance_ids = [
+        balance["_id"]
+        for balance in await balances_collection.find({"name": "Gratuity Balance"}, {"_id": 1}).to_list(None)
+    ]
+    if not balance_ids or not employee_ids:
+        return {}
+    based_elements = await balances_based_elements_collection.find(
+        {"balance_id": {"$in": balance_ids}},
+        {"name": 1, "type": 1},
+    ).to_list(None)
+    if not based_elements:
+        return {}
+
+    cursor = await payroll_runs_employees_elements_collection.aggregate([
+        {
+            "$match": {
+                "employee_id": {"$in": employee_ids},
+                "payroll_element_id": {"$in": list({element.get("name") for element in based_elements})},
+            }
+        },
+        {
+            "$group": {
+                "_id": {"employee_id": "$employee_id", "payroll_element_id": "$payroll_element_id"},
+                "total": {"$sum": {"$ifNull": ["$value", 0]}},
+            }
+        },
+    ])
+    totals = {
+        (row["_id"]["employee_id"], row["_id"]["payroll_element_id"]): row["total"]
+        for row in await cursor.to_list(None)
+    }
+
+    accruals: dict[ObjectId, float] = {}
+    for employee_id in employee_ids:
+        total = 0
+        for element in based_elements:
+            value = totals.get((employee_id, element.get("name")), 0)
+            if element.get("type") == "Add":
+                total += value
+            elif element.get("type") == "Subtract":
+                total -= value
+        accruals[employee_id] = total
+    return accruals
+
+
+async def load_payroll_evaluation_context(company_id: ObjectId, employees: list[dict], leaves: list[dict],
+                                          legislations_by_id: dict, leave_types_by_id: dict,
+                                          period_start_date: datetime,
+                                          period_end_date: datetime) -> PayrollEvaluationContext:
+    employee_ids = [employee["_id"] for employee in employees]
+    employees_with_leaves = {leave.get("employee_id") for leave in leaves}
+    calendar_keys = [
+        (employee.get("company_id"), employee.get("legislation"))
+        for employee in employees
+        if employee["_id"] in employees_with_leaves
+        and (not employee.get("legislation") or employee.get("legislation") in legislations_by_id)
+    ]
+    earliest_leave_start = min(
+        [leave["start_date"] for leave in leaves if isinstance(leave.get("start_date"), datetime)],
+        default=period_start_date,
+    )
+
+    # leaves are clipped to the period, so only the period's years are needed
+    calendars, sick_leaves, gratuity_accruals = await asyncio.gather(
+        preload_working_days_calendars(calendar_keys, range(period_start_date.year, period_end_date.year + 1)),
+        _load_prior_leaves("SL", employee_ids, earliest_leave_start, period_end_date),
+        _load_gratuity_accruals(employee_ids),
+    )
+
+    return PayrollEvaluationContext(
+        company_id=company_id,
+        employees=employees,
+        legislations_by_id=legislations_by_id,
+        leave_types_by_id=leave_types_by_id,
+        calendars=calendars,
+        leaves_by_code={"SL": sick_leaves},
+        gratuity_accruals=gratuity_accruals,
+    )
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from app.core import security
+from app.core.working_days_calendar import invalidate_working_days_calendars
 from app.database import get_collection
 from datetime import datetime
 
@@ -87,6 +88,7 @@ async def add_new_holiday(holiday: PublicHolidaysModel, data: dict = Depends(sec
         holiday['createdAt'] = security.now_utc()
         holiday['updatedAt'] = security.now_utc()
         new_element = await public_holidays_collection.insert_one(holiday)
+        await invalidate_working_days_calendars(company_id)
         holiday['_id'] = str(new_element.inserted_id)
         added_element = jsonable_encoder(encode_object_ids(holiday))
 
@@ -100,7 +102,7 @@ async def add_new_holiday(holiday: PublicHolidaysModel, data: dict = Depends(sec
 
 @router.patch("/update_holiday/{holiday_id}")
 async def update_holiday(holiday_id: str, holiday: PublicHolidaysModel,
-                         _: dict = Depends(security.get_current_user)):
+                         data: dict = Depends(security.get_current_user)):
     try:
         holiday = holiday.model_dump(exclude_unset=True)
         legislation = optional_object_id(holiday.get("legislation"), "legislation")
@@ -112,6 +114,7 @@ async def update_holiday(holiday_id: str, holiday: PublicHolidaysModel,
         updated_element = await public_holidays_collection.update_one({"_id": ObjectId(holiday_id)}, {"$set": holiday})
         if updated_element.matched_count == 0:
             raise HTTPException(status_code=500, detail=f"Holiday ID not found")
+        await invalidate_working_days_calendars(data.get("company_id"))
         holiday['_id'] = str(holiday_id)
         updated_holiday = jsonable_encoder(encode_object_ids(holiday))
 
@@ -124,11 +127,12 @@ async def update_holiday(holiday_id: str, holiday: PublicHolidaysModel,
 
 
 @router.delete("/delete_holiday/{holiday_id}")
-async def add_new_holiday(holiday_id: str, _: dict = Depends(security.get_current_user)):
+async def add_new_holiday(holiday_id: str, data: dict = Depends(security.get_current_user)):
     try:
         deleted_element = await public_holidays_collection.delete_one({"_id": ObjectId(holiday_id)})
         if deleted_element.deleted_count == 0:
             raise HTTPException(status_code=404, detail="holiday doc not found")
+        await invalidate_working_days_calendars(data.get("company_id"))
 
         return {"deleted_holiday_id": holiday_id}
 
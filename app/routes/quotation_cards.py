@@ -7,11 +7,15 @@ from starlette.responses import JSONResponse
 
 from app import database
 from app.core import security
+from app.core.dashboard_rollups import refresh_job_daily_stats
+from app.core.outstanding_ledger import refresh_job_balances
+from app.core.search_index import set_search_keys
 from app.database import get_collection
 from datetime import datetime, timezone
 
 from app.routes.car_trading import PyObjectId
 from app.routes.counters import create_custom_counter
+from app.widgets.job_card_dates import set_job_card_date_field_to_filter
 from app.widgets.upload_files import upload_file, delete_file_from_server
 from app.widgets.upload_images import upload_image
 
@@ -2090,6 +2094,8 @@ async def create_job_card_for_current_quotation(quotation_id: str, data: dict =
             original_quotation["job_number"] = new_job_counter["final_counter"] if new_job_counter[
                 "success"] else None
 
+            set_job_card_date_field_to_filter(original_quotation)
+            set_search_keys("job_cards", original_quotation)
             new_job = await job_cards_collection.insert_one(original_quotation, session=session)
             new_job_id = new_job.inserted_id
             related_items = await quotation_cards_invoice_items_collection.find(
@@ -2098,6 +2104,8 @@ async def create_job_card_for_current_quotation(quotation_id: str, data: dict =
                 item.pop("_id", None)
                 item["job_card_id"] = new_job_id
                 await job_cards_invoice_items_collection.insert_one(item, session=session)
+            await refresh_job_balances([new_job_id], session=session)
+            await refresh_job_daily_stats([new_job_id], session=session)
             await quotation_cards_collection.update_one({"_id": quotation_id}, {"$set": {
                 "job_card_id": new_job_id,
             }}, session=session)
@@ -5,6 +5,8 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from app import database
 from app.core import security
+from app.core.search_index import SEARCH_KEYS, search_keys_update, search_match, set_search_keys
+from app.core.stock_ledger import refresh_receiving_stock
 from app.database import get_collection
 from datetime import datetime
 from app.routes.car_trading import PyObjectId
@@ -492,7 +494,8 @@ receiving_details_pipeline: list[dict[str, Any]] = [
             'employees_details': 0,
             'branch_details': 0,
             'vendor_details': 0,
-            'currency_details': 0
+            'currency_details': 0,
+            SEARCH_KEYS: 0
         }
     }
 ]
@@ -1112,6 +1115,7 @@ async def add_new_receiving(receive: ReceivingModel, data: dict = Depends(securi
             receive["company_id"] = company_id
             receive["receiving_number"] = new_receiving_counter['final_counter'] if new_receiving_counter[
                 'success'] else None
+            set_search_keys("receiving", receive)
             result = await receiving_collection.insert_one(receive, session=session)
             if not result.inserted_id:
                 raise HTTPException(status_code=500, detail="Failed to insert receiving")
@@ -1137,6 +1141,7 @@ async def add_new_receiving(receive: ReceivingModel, data: dict = Depends(securi
                 if not new_invoices.inserted_ids:
                     raise HTTPException(status_code=500, detail="Failed to insert receiving items")
 
+            await refresh_receiving_stock([result.inserted_id], session=session)
             await session.commit_transaction()
             new_receiving = await get_receiving_details(result.inserted_id)
             serialized = serializer(new_receiving)
@@ -1160,10 +1165,12 @@ async def update_receiving(receiving_id: str, receiving: ReceivingModel, _: dict
 
         receiving.update({
             "updatedAt": security.now_utc(),
+            **search_keys_update("receiving", receiving),
         })
         result = await receiving_collection.update_one({"_id": receiving_id}, {"$set": receiving})
         if result.modified_count == 0:
             raise HTTPException(status_code=404)
+        await refresh_receiving_stock([receiving_id])
 
         updated_receiving = await get_receiving_details(receiving_id)
         serialized = serializer(updated_receiving)
@@ -1247,6 +1254,7 @@ async def update_receiving_items(
                         session=s
                     )
 
+                await refresh_receiving_stock([receiving_id], session=s)
                 await s.commit_transaction()
             except Exception as e:
                 await s.abort_transaction()
@@ -1348,13 +1356,9 @@ async def search_engine_for_receiving(
         if filter_receiving.vendor:
             match_stage["vendor"] = filter_receiving.vendor
         if filter_receiving.receiving_number:
-            match_stage["receiving_number"] = {
-                "$regex": filter_receiving.receiving_number, "$options": "i"
-            }
+            match_stage.update(search_match("receiving", "receiving_number", filter_receiving.receiving_number))
         if filter_receiving.reference_number:
-            match_stage["reference_number"] = {
-                "$regex": filter_receiving.reference_number, "$options": "i"
-            }
+            match_stage.update(search_match("receiving", "reference_number", filter_receiving.reference_number))
         if filter_receiving.status:
             match_stage["status"] = filter_receiving.status
 
@@ -0,0 +1,31 @@
+import os
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Depends
+from app.core import security
+from app.core.jobs import JOB_MAX_ATTEMPTS, JobContext, register_job_type, submit_job
+from app.core.search_index import rebuild_search_keys
+
+router = APIRouter()
+
+SEARCH_INDEX_JOB_CONCURRENCY = int(os.getenv("SEARCH_INDEX_JOB_CONCURRENCY", "1"))
+
+
+async def run_rebuild_job(job: JobContext):
+    return await rebuild_search_keys(ObjectId(job.user_data.get("company_id")), progress=job.report_progress)
+
+
+register_job_type("search_keys_rebuild", run_rebuild_job, concurrency=SEARCH_INDEX_JOB_CONCURRENCY,
+                  max_attempts=JOB_MAX_ATTEMPTS)
+
+
+@router.post("/rebuild")
+async def rebuild(data: dict = Depends(security.get_current_user)):
+    try:
+        job = await submit_job("search_keys_rebuild", data, description="Rebuild search keys")
+        return {"job": job}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
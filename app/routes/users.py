@@ -4,6 +4,7 @@ from pydantic import BaseModel, EmailStr
 from pymongo import ReturnDocument
 
 from app.core import security
+from app.core.passwords import password_hasher
 from app.database import get_collection
 from datetime import datetime, timezone
 from app.websocket_config import manager
@@ -102,7 +103,7 @@ async def add_new_user(user: UserCreate, data: dict = Depends(security.get_curre
         branches_list = [ObjectId(branch) for branch in user.branches] if user.branches else []
 
         # Hash password
-        password_hash = security.pwd_ctx.hash(user.password) if user.password else None
+        password_hash = await password_hasher.hash(user.password) if user.password else None
 
         new_user = {
             "company_id": company_id,
@@ -164,7 +165,7 @@ async def update_user(
 
         # Hash password if provided
         if "password" in user_data:
-            hashed = security.pwd_ctx.hash(user_data.pop("password"))
+            hashed = await password_hasher.hash(user_data.pop("password"))
             user_data["password_hash"] = hashed
 
         # Convert roles to ObjectId
@@ -199,6 +200,7 @@ async def update_user(
 
         if not result:
             raise HTTPException(status_code=404, detail="User not found")
+        await security.invalidate_session_state(user_obj_id)
 
         updated_user = serializer(result)
 
@@ -223,6 +225,7 @@ async def remove_user(user_id: str, data: dict = Depends(security.get_current_us
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Role not found")
         await refresh_tokens_collection.delete_many({"user_id": ObjectId(user_id)})
+        await security.invalidate_session_state(user_id)
 
         await manager.send_to_company(company_id, {
             "type": "user_deleted",
@@ -244,6 +247,7 @@ async def change_user_status(user_id: str, status: bool = Body(None), data: dict
         )
         if not result:
             raise HTTPException(status_code=404, detail="User not found")
+        await security.invalidate_session_state(user_id)
         await manager.send_to_company(company_id, {
             "type": "user_status_updated",
             "data": {"status": status, "_id": user_id}
@@ -341,16 +345,16 @@ async def change_user_password(
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        if not security.verify_password(pass_model['old_pass'], user["password_hash"]):
+        if not await password_hasher.verify(pass_model['old_pass'], user.get("password_hash")):
             raise HTTPException(status_code=401, detail="Invalid password")
 
         if pass_model['new_pass'] != pass_model['confirm_pass']:
             raise HTTPException(status_code=400, detail="Passwords do not match")
 
-        if security.verify_password(pass_model['new_pass'], user["password_hash"]):
+        if await password_hasher.verify(pass_model['new_pass'], user.get("password_hash")):
             raise HTTPException(status_code=400, detail="New password cannot be the same as old password")
 
-        hashed = security.pwd_ctx.hash(pass_model['new_pass'])
+        hashed = await password_hasher.hash(pass_model['new_pass'])
 
         await users_collection.update_one(
             {"_id": user_id},
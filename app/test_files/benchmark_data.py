@@ -0,0 +1,340 @@
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+# always a scratch database, seed() drops it first
+os.environ["MONGO_URI"] = os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017/?replicaSet=rs0")
+os.environ["DATABASE_NAME"] = os.getenv("BENCH_DATABASE_NAME", "endpoint_benchmark")
+
+from bson import ObjectId
+
+from app.core.dashboard_rollups import rebuild_dashboard_rollups
+from app.core.index_registry import ensure_indexes
+from app.core.outstanding_ledger import reconcile_outstanding_ledger
+from app.core.search_index import SEARCH_FIELDS, set_search_keys
+from app.core.security import pwd_ctx
+from app.core.stock_ledger import rebuild_stock_ledger
+from app.database import client, db
+from app.routes.data_migration import build_entity_doc
+from app.widgets.job_card_dates import set_job_card_date_field_to_filter
+
+BENCH_SEED = int(os.getenv("BENCH_SEED", "42"))
+BENCH_COMPANIES = int(os.getenv("BENCH_COMPANIES", "3"))
+# sizes of the largest company, company n gets 1/n of them so tenants are skewed like in production
+BENCH_JOB_CARDS = int(os.getenv("BENCH_JOB_CARDS", "20000"))
+BENCH_EMPLOYEES = int(os.getenv("BENCH_EMPLOYEES", "300"))
+BENCH_TRADES = int(os.getenv("BENCH_TRADES", "1000"))
+BENCH_PAYROLL_PERIODS = int(os.getenv("BENCH_PAYROLL_PERIODS", "24"))
+BENCH_HISTORY_DAYS = int(os.getenv("BENCH_HISTORY_DAYS", "730"))
+BENCH_PASSWORD = "benchmark-password"
+INSERT_BATCH_SIZE = 5000
+
+BRANDS = {
+    "TOYOTA": ["LAND CRUISER", "CAMRY", "COROLLA", "HILUX", "PRADO"],
+    "NISSAN": ["PATROL", "SUNNY", "ALTIMA", "X-TRAIL"],
+    "MITSUBISHI": ["PAJERO", "LANCER", "OUTLANDER"],
+    "LEXUS": ["LX 570", "ES 350", "RX 350"],
+    "FORD": ["F-150", "EXPLORER", "MUSTANG"],
+    "HYUNDAI": ["ELANTRA", "SONATA", "TUCSON"],
+}
+CUSTOMER_WORDS = ["AL", "FUTTAIM", "EMIRATES", "GULF", "STAR", "CITY", "MOTORS", "TRADING", "TRANSPORT", "GENERAL",
+                  "CONTRACTING", "DESERT", "PEARL", "NATIONAL", "UNITED", "ROYAL", "FALCON", "OASIS"]
+EMPLOYEE_NAMES = ["AHMED", "MOHAMMED", "ALI", "OMAR", "FATIMA", "SARA", "JOHN", "RAJESH", "MARIA", "HASSAN", "LAYLA",
+                  "YOUSEF", "KHALID", "ANIL", "GRACE", "NOOR"]
+INVOICE_ITEMS = ["OIL CHANGE", "BRAKE PADS", "WHEEL ALIGNMENT", "AC SERVICE", "BATTERY", "TYRE", "LABOUR",
+                 "GEARBOX SERVICE", "ENGINE DIAGNOSIS", "SPARK PLUGS", "AIR FILTER", "PAINT WORK"]
+TRADE_ITEMS = ["BUY", "SELL", "SERVICE", "TRANSPORT", "REGISTRATION", "COMMISSION"]
+
+
+def _scaled(value: int, index: int) -> int:
+    return max(value // (index + 1), 1)
+
+
+def _recent_date(rng: random.Random, now: datetime) -> datetime:
+    # business grows: recent days get more documents than old ones
+    return now - timedelta(days=rng.triangular(0, BENCH_HISTORY_DAYS, 0), seconds=rng.randrange(86400))
+
+
+async def insert(collection_name: str, documents: list[dict]):
+    if collection_name in SEARCH_FIELDS:
+        for document in documents:
+            set_search_keys(collection_name, document)
+    for start in range(0, len(documents), INSERT_BATCH_SIZE):
+        await db[collection_name].insert_many(documents[start:start + INSERT_BATCH_SIZE], ordered=False)
+
+
+async def seed_reference_data(now: datetime) -> dict:
+    """Global lists the data migration screens look up by code or name."""
+    country_id, colors_list_id, trade_items_list_id = ObjectId(), ObjectId(), ObjectId()
+    await insert("all_countries", [{"_id": country_id, "name": "United Arab Emirates", "code": "UAE",
+                                    "status": True, "createdAt": now, "updatedAt": now}])
+    await insert("all_lists", [
+        {"_id": colors_list_id, "name": "COLORS", "code": "COLORS", "status": True},
+        {"_id": trade_items_list_id, "name": "TRADE ITEMS", "code": "ITEMS", "status": True},
+    ])
+    await insert("all_lists_values", [{"name": name, "status": True} for name in ("1st", "2nd", "WWW")])
+    return {"country_id": country_id, "colors_list_id": colors_list_id, "trade_items_list_id": trade_items_list_id}
+
+
+async def seed_company(index: int, reference: dict, password_hash: str, now: datetime) -> dict:
+    rng = random.Random(f"{BENCH_SEED}-{index}")
+    company_id = ObjectId()
+    stamp = {"company_id": company_id, "createdAt": now, "updatedAt": now}
+
+    await insert("companies", [{"_id": company_id, "company_name": f"BENCHMARK COMPANY {index + 1}", "status": True,
+                                "createdAt": now, "updatedAt": now}])
+    await insert("currencies", [{"country_id": reference["country_id"], "rate": 1, "status": True, **stamp}])
+
+    branches = [{"_id": ObjectId(), "name": f"BRANCH {number + 1}", "code": f"B{number + 1}", "status": True,
+                 "country_id": reference["country_id"], **stamp} for number in range(rng.randint(2, 5))]
+    await insert("branches", branches)
+    branch_ids = [branch["_id"] for branch in branches]
+
+    user_id = ObjectId()
+    email = f"benchmark{index + 1}@example.com"
+    await insert("sys-users", [{
+        "_id": user_id, "email": email, "user_name": f"Benchmark {index + 1}", "password_hash": password_hash,
+        "status": True, "expiry_date": now + timedelta(days=365), "branches": branch_ids, "roles": [],
+        "is_admin": True, "session_version": 0, **stamp,
+    }])
+
+    salesmen = [{"_id": ObjectId(), "name": f"SALESMAN {number + 1}", "target": 0, **stamp} for number in range(8)]
+    await insert("sales_man", salesmen)
+
+    brands, models = [], []
+    for brand_name, model_names in BRANDS.items():
+        brand = {"_id": ObjectId(), "name": brand_name, "logo": None, "status": True, **stamp}
+        brands.append(brand)
+        models += [{"_id": ObjectId(), "name": model_name, "brand_id": brand["_id"], "status": True, **stamp}
+                   for model_name in model_names]
+    await insert("all_brands", brands)
+    await insert("all_brand_models", models)
+
+    colors = [{"_id": ObjectId(), "list_id": reference["colors_list_id"], "name": name, "status": True, **stamp}
+              for name in ("WHITE", "BLACK", "SILVER", "RED", "BLUE")]
+    trade_items = {name: {"_id": ObjectId(), "list_id": reference["trade_items_list_id"], "name": name,
+                          "status": True, **stamp} for name in TRADE_ITEMS}
+    await insert("all_lists_values", colors + list(trade_items.values()))
+
+    accounts = [{"_id": ObjectId(), "account_name": name, "account_number": str(rng.randrange(10 ** 9, 10 ** 10)),
+                 "currency_id": None, "account_type_id": None, **stamp} for name in ("CASH", "BANK", "CARD")]
+    await insert("all_banks", accounts)
+
+    job_cards_count = _scaled(BENCH_JOB_CARDS, index)
+    customers = [
+        build_entity_doc(entity_name=" ".join(rng.sample(CUSTOMER_WORDS, 3)) + f" {number + 1}",
+                         entity_code="Customer", credit_limit=rng.choice([0, 5000, 20000]),
+                         warranty_days=rng.choice([0, 30, 90]), salesman_id=rng.choice(salesmen)["_id"],
+                         entity_status="Active", group_name="", industry_id=None, trn="", entity_type_id=None,
+                         entity_address=[], entity_phone=[], entity_social=[], company_id=company_id,
+                         lpo_required="")
+        for number in range(max(job_cards_count // 10, 1))
+    ]
+    await insert("entity_information", customers)
+
+    invoice_items = [{"_id": ObjectId(), "name": name, "price": rng.randrange(50, 2000), "description": name, **stamp}
+                     for name in INVOICE_ITEMS]
+    await insert("invoice_items", invoice_items)
+    inventory_items = [{"_id": ObjectId(), "code": f"P{number:05d}", "name": f"{rng.choice(INVOICE_ITEMS)} {number}",
+                        "min_quantity": 0, **stamp} for number in range(200)]
+    await insert("inventory_items", inventory_items)
+
+    # job cards, their invoice items and the receipts paying them
+    job_cards, job_items, receipts, receipts_invoices = [], [], [], []
+    for number in range(job_cards_count):
+        status = rng.choices(["Posted", "New", "Cancelled"], weights=[6, 3, 1])[0]
+        job_date = _recent_date(rng, now)
+        model = rng.choice(models)
+        job = {
+            "_id": ObjectId(), "job_id": number + 1, "job_number": f"JC-{number + 1:06d}",
+            "invoice_number": f"INV-{number + 1:06d}" if status == "Posted" else "",
+            "job_date": job_date,
+            "invoice_date": job_date + timedelta(days=rng.randint(0, 5)) if status == "Posted" else None,
+            "job_cancellation_date": job_date + timedelta(days=1) if status == "Cancelled" else None,
+            "job_status_1": status,
+            "job_status_2": {"Posted": "Closed", "Cancelled": "Cancelled"}.get(status, rng.choice(["New", "Approved"])),
+            "type": rng.choices(["JOB", "SALES"], weights=[9, 1])[0], "label": "Not Returned",
+            "branch": rng.choice(branch_ids), "salesman": rng.choice(salesmen)["_id"],
+            "customer": rng.choice(customers)["_id"], "car_brand": model["brand_id"], "car_model": model["_id"],
+            "color": rng.choice(colors)["_id"], "year": str(rng.randint(2008, 2025)),
+            "plate_number": str(rng.randrange(10000, 99999)), "plate_code": rng.choice("ABCDEFGHIJ"),
+            "vehicle_identification_number": "".join(rng.choices("ABCDEFGHJKLMNPRSTUVWXYZ0123456789", k=17)),
+            "lpo_number": f"LPO-{rng.randrange(100000)}" if rng.random() < 0.3 else "",
+            "mileage_in": rng.randrange(1000, 300000), "payment_method": rng.choice(["Cash", "Credit"]),
+            "rate": 1, **stamp,
+        }
+        set_job_card_date_field_to_filter(job)
+        job_cards.append(job)
+
+        job_total = 0.0
+        for line_number in range(rng.randint(1, 6)):
+            item = rng.choice(invoice_items)
+            quantity = rng.randint(1, 4)
+            price = float(rng.randrange(50, 2000))
+            discount = rng.choice([0, 0, 0, 10, 50])
+            total = quantity * price - discount
+            job_total += total * 1.05
+            job_items.append({
+                "job_card_id": job["_id"], "line_number": line_number + 1, "name": item["_id"],
+                "description": item["description"], "quantity": quantity, "price": price,
+                "amount": quantity * price, "discount": discount, "total": total, "vat": round(total * 0.05, 2),
+                "net": round(total * 1.05, 2), **stamp,
+            })
+
+        if status == "Posted" and rng.random() < 0.7:
+            receipt = {
+                "_id": ObjectId(), "receipt_number": f"RC-{len(receipts) + 1:06d}", "customer": job["customer"],
+                "receipt_date": job["invoice_date"] + timedelta(days=rng.randint(0, 30)),
+                "account": rng.choice(accounts)["_id"], "status": "Posted", "rate": 1, **stamp,
+            }
+            receipts.append(receipt)
+            receipts_invoices.append({"receipt_id": receipt["_id"], "job_id": job["_id"],
+                                      "amount": round(job_total * rng.choice([0.5, 1, 1, 1]), 2), **stamp})
+    await insert("job_cards", job_cards)
+    await insert("job_cards_invoice_items", job_items)
+    await insert("all_receipts", receipts)
+    await insert("all_receipts_invoices", receipts_invoices)
+
+    # stock in and out
+    receivings, receiving_items, issuings, issuing_items = [], [], [], []
+    for number in range(max(job_cards_count // 20, 1)):
+        receiving = {"_id": ObjectId(), "receiving_number": f"RE-{number + 1:06d}",
+                     "reference_number": str(rng.randrange(10 ** 6)), "date": _recent_date(rng, now),
+                     "branch": rng.choice(branch_ids), "status": rng.choices(["Posted", "New"], weights=[9, 1])[0],
+                     "rate": 1, "shipping": rng.choice([0, 100]), "handling": 0, "other": 0, "amount": 0, **stamp}
+        receivings.append(receiving)
+        for item in rng.sample(inventory_items, rng.randint(1, 5)):
+            receiving_items.append({"receiving_id": receiving["_id"], "inventory_item_id": item["_id"],
+                                    "quantity": rng.randint(5, 50), "original_price": float(rng.randrange(10, 500)),
+                                    "discount": 0, "vat": 0, **stamp})
+
+        issuing = {"_id": ObjectId(), "issuing_number": f"IS-{number + 1:06d}", "date": _recent_date(rng, now),
+                   "branch": rng.choice(branch_ids), "job_card_id": rng.choice(job_cards)["_id"],
+                   "status": rng.choices(["Posted", "New"], weights=[9, 1])[0], **stamp}
+        issuings.append(issuing)
+        for item in rng.sample(inventory_items, rng.randint(1, 3)):
+            issuing_items.append({"issue_id": issuing["_id"], "inventory_item_id": item["_id"],
+                                  "quantity": rng.randint(1, 5), "price": float(rng.randrange(10, 500)), **stamp})
+    await insert("receiving", receivings)
+    await insert("receiving_items", receiving_items)
+    await insert("issuing", issuings)
+    await insert("issuing_items_details", issuing_items)
+
+    payroll = await seed_payroll(rng, index, stamp, now)
+
+    # car trades, a bought car has a BUY item, a sold one a SELL item too
+    trades, trades_items = [], []
+    for _ in range(_scaled(BENCH_TRADES, index)):
+        model = rng.choice(models)
+        trade = {"_id": ObjectId(), "date": _recent_date(rng, now), "car_brand": model["brand_id"],
+                 "car_model": model["_id"], "year": str(rng.randint(2012, 2025)), "mileage": rng.randrange(300000),
+                 "status": rng.choices(["New", "Sold"], weights=[1, 2])[0], "note": "", **stamp}
+        trades.append(trade)
+        buy_price = float(rng.randrange(20000, 300000, 500))
+        items = [("BUY", trade["date"], buy_price, 0)]
+        for _ in range(rng.randint(0, 3)):
+            items.append((rng.choice(TRADE_ITEMS[2:]), trade["date"] + timedelta(days=rng.randint(0, 20)),
+                          float(rng.randrange(100, 5000)), 0))
+        if trade["status"] == "Sold":
+            items.append(("SELL", trade["date"] + timedelta(days=rng.randint(5, 120)), 0,
+                          round(buy_price * rng.uniform(0.9, 1.25), -2)))
+        trades_items += [{"trade_id": trade["_id"], "item": trade_items[name]["_id"],
+                          "account_name": rng.choice(accounts)["_id"], "date": date, "pay": pay, "receive": receive,
+                          **stamp} for name, date, pay, receive in items]
+    await insert("all_trades", trades)
+    await insert("all_trades_items", trades_items)
+
+    # the app keeps these derived collections up to date on every write; seeded documents are bulk inserted
+    await rebuild_dashboard_rollups(company_id)
+    await reconcile_outstanding_ledger(company_id)
+    await rebuild_stock_ledger(company_id)
+
+    return {
+        "company_id": company_id,
+        "email": email,
+        "branch_ids": branch_ids,
+        "customer_ids": [customer["_id"] for customer in customers],
+        "customer_names": [customer["entity_name"] for customer in customers],
+        "brand_ids": [brand["_id"] for brand in brands],
+        "job_cards": len(job_cards),
+        **payroll,
+    }
+
+
+async def seed_payroll(rng: random.Random, index: int, stamp: dict, now: datetime) -> dict:
+    """One monthly payroll with fixed input elements and unpaid leaves that are paid against the basic salary."""
+    payroll_id = ObjectId()
+    await insert("payroll", [{"_id": payroll_id, "name": "MONTHLY PAYROLL", "status": True, **stamp}])
+
+    periods = []
+    month_start = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+    for _ in range(BENCH_PAYROLL_PERIODS):
+        month_end = month_start - timedelta(days=1)
+        month_start = month_end.replace(day=1)
+        periods.append({"_id": ObjectId(), "payroll_id": payroll_id, "period_name": month_start.strftime("%b %Y"),
+                        "start_date": month_start, "end_date": month_end, "status": "Open", **stamp})
+    await insert("payroll_period_details", periods)
+
+    elements = {name: {"_id": ObjectId(), "name": name, "function": function, "type": "Earning", **stamp}
+                for name, function in (("BASIC SALARY", "PY_INPUT_VALUE_FF"), ("HOUSING", "PY_INPUT_VALUE_FF"),
+                                       ("TRANSPORT", "PY_INPUT_VALUE_FF"), ("UNPAID LEAVE", "PY_UNPAID_LEAVE_FF"))}
+    await insert("payroll_elements", list(elements.values()))
+    await insert("payroll_elements_based_elements", [{
+        "payroll_element_id": elements["UNPAID LEAVE"]["_id"], "name": elements["BASIC SALARY"]["_id"],
+        "type": "Add", **stamp,
+    }])
+    leave_type_id = ObjectId()
+    await insert("leave_types", [{"_id": leave_type_id, "name": "UNPAID LEAVE", "code": "UL", "type": "Unpaid",
+                                  "based_element": elements["UNPAID LEAVE"]["_id"], **stamp}])
+
+    oldest_period = periods[-1]["start_date"]
+    employees, employees_payrolls, leaves = [], [], []
+    for number in range(_scaled(BENCH_EMPLOYEES, index)):
+        hire_date = oldest_period - timedelta(days=rng.randrange(0, 2000)) if rng.random() < 0.8 \
+            else _recent_date(rng, now)
+        employee = {"_id": ObjectId(), "full_name": " ".join(rng.sample(EMPLOYEE_NAMES, 2)) + f" {number + 1}",
+                    "payroll": payroll_id, "hire_date": hire_date,
+                    "end_date": max(_recent_date(rng, now), hire_date) if rng.random() < 0.05 else None,
+                    "legislation": None,
+                    **stamp}
+        employees.append(employee)
+        basic = float(rng.randrange(3000, 30000, 500))
+        for name, value in (("BASIC SALARY", basic), ("HOUSING", round(basic * 0.25)), ("TRANSPORT", 500.0)):
+            employees_payrolls.append({"employee_id": employee["_id"], "name": elements[name]["_id"], "value": value,
+                                       "start_date": hire_date, "end_date": None, **stamp})
+        for _ in range(rng.choice([0, 0, 0, 1, 2])):
+            start_date = max(_recent_date(rng, now), hire_date)
+            days = rng.randint(1, 10)
+            leaves.append({"employee_id": employee["_id"], "leave_type": leave_type_id, "status": "Posted",
+                           "start_date": start_date, "end_date": start_date + timedelta(days=days - 1),
+                           "number_of_days": days, "pay_in_advance": False, **stamp})
+    await insert("employees", employees)
+    await insert("employees_payrolls", employees_payrolls)
+    if leaves:
+        await insert("employees_leaves", leaves)
+
+    return {"payroll_id": payroll_id, "period_ids": [period["_id"] for period in periods],
+            "employees": len(employees)}
+
+
+async def seed() -> list[dict]:
+    """Drops the scratch database and fills it with BENCH_COMPANIES tenants. Returns one summary per company."""
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    await client.drop_database(db.name)
+    await ensure_indexes()
+    reference = await seed_reference_data(now)
+    # one argon2 hash for every benchmark user, hashing is not what is measured here
+    password_hash = pwd_ctx.hash(BENCH_PASSWORD)
+    companies = [await seed_company(index, reference, password_hash, now) for index in range(BENCH_COMPANIES)]
+    for company in companies:
+        print(f"{company['email']}: {company['job_cards']} job cards, {len(company['customer_ids'])} customers, "
+              f"{company['employees']} employees")
+    print(f"seeded {db.name} in {time.perf_counter() - started:.1f}s")
+    return companies
+
+
+if __name__ == "__main__":
+    asyncio.run(seed())
@@ -0,0 +1,44 @@
+import asyncio
+import random
+import time
+
+from bson import ObjectId
+
+from app.core.index_registry import INDEXES, ensure_indexes
+from app.routes.counters import counters_collection, reserve_counter_block
+
+# throwaway company / code, the counter is removed at the end
+company_id = ObjectId()
+code = "STRESS"
+workers = 200
+calls_per_worker = 25
+
+
+async def worker(numbers: list[str]):
+    for _ in range(calls_per_worker):
+        count = random.choice([1, 1, 1, 5, 20])
+        numbers.extend(await reserve_counter_block(company_id, code, count, prefix="ST",
+                                                   description="Stress Test Number"))
+
+
+async def stress():
+    # the app creates it at startup; without the unique index concurrent first use can duplicate the counter
+    await ensure_indexes({"counters": INDEXES["counters"]})
+    numbers: list[str] = []
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(numbers) for _ in range(workers)])
+    elapsed = time.perf_counter() - started
+
+    counter = await counters_collection.find_one({"company_id": company_id, "code": code})
+    duplicates = len(numbers) - len(set(numbers))
+    print(f"calls: {workers * calls_per_worker}, numbers: {len(numbers)}, elapsed: {elapsed:.2f}s "
+          f"({workers * calls_per_worker / elapsed:.0f} calls/s)")
+    print(f"counter value: {counter['value']}, duplicates: {duplicates}")
+    assert duplicates == 0, "duplicate numbers allocated"
+    assert counter["value"] == len(numbers), "counter value does not match allocated numbers"
+
+    await counters_collection.delete_one({"_id": counter["_id"]})
+
+
+if __name__ == "__main__":
+    asyncio.run(stress())
@@ -0,0 +1,358 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from urllib.parse import urlencode
+
+os.environ.setdefault("ACCESS_SECRET_KEY", "benchmark-access-secret")
+os.environ.setdefault("REFRESH_SECRET_KEY", "benchmark-refresh-secret")
+
+# sets MONGO_URI / DATABASE_NAME to the scratch database before the app opens its client
+from app.test_files.benchmark_data import BENCH_PASSWORD, BENCH_SEED, BRANDS, seed
+
+from openpyxl import Workbook
+
+from app.core.db_metrics import BACKGROUND_ROUTE, db_metrics
+from app.database import client, db
+from app.main import app
+from app.routes.data_migration_widgets.import_schemas import JOB_CARDS_SCHEMA
+
+BENCH_REQUESTS = int(os.getenv("BENCH_REQUESTS", "200"))
+BENCH_WARMUP = int(os.getenv("BENCH_WARMUP", "5"))
+BENCH_CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "8"))
+BENCH_IMPORT_ROWS = int(os.getenv("BENCH_IMPORT_ROWS", "2000"))
+BENCH_IMPORT_RUNS = int(os.getenv("BENCH_IMPORT_RUNS", "3"))
+# json written with the results of this run, and a previous one to compare against
+BENCH_REPORT = os.getenv("BENCH_REPORT", "")
+BENCH_BASELINE = os.getenv("BENCH_BASELINE", "")
+# a case regresses when its p95 or its db commands per request grow by more than this ratio
+BENCH_MAX_REGRESSION = float(os.getenv("BENCH_MAX_REGRESSION", "0.2"))
+BENCH_KEEP_DATA = os.getenv("BENCH_KEEP_DATA", "0") == "1"
+JOB_POLL_SECONDS = 0.1
+
+
+class Response:
+    def __init__(self, status_code: int, body: bytes):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+async def call(method: str, path: str, token: str = "", json_body=None, form: dict = None,
+               files: dict = None) -> Response:
+    """One request through the whole ASGI stack (middleware, routing, dependencies), without a socket."""
+    path, _, query = path.partition("?")
+    headers = [(b"host", b"benchmark"), (b"user-agent", b"endpoint-benchmark")]
+    body = b""
+    if json_body is not None:
+        body = json.dumps(json_body, default=str).encode()
+        headers.append((b"content-type", b"application/json"))
+    elif files:
+        boundary = uuid.uuid4().hex
+        parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+                 for name, value in (form or {}).items()]
+        for name, (filename, contents) in files.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                         f'Content-Type: application/octet-stream\r\n\r\n'.encode() + contents + b"\r\n")
+        body = b"".join(parts) + f"--{boundary}--\r\n".encode()
+        headers.append((b"content-type", f"multipart/form-data; boundary={boundary}".encode()))
+    elif form is not None:
+        body = urlencode(form).encode()
+        headers.append((b"content-type", b"application/x-www-form-urlencoded"))
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    headers.append((b"content-length", str(len(body)).encode()))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": headers, "client": ("127.0.0.1", 50000), "server": ("benchmark", 80),
+    }
+    request_sent = False
+    response_done = asyncio.Event()
+    status_code = 500
+    chunks = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    response_done.set()
+    return Response(status_code, b"".join(chunks))
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def db_totals(route: str) -> tuple[int, float]:
+    """Commands sent and seconds waited on MongoDB so far for one route label."""
+    commands, seconds = 0, 0.0
+    for (command_route, _, _), totals in list(db_metrics.commands.items()):
+        if command_route == route:
+            commands += totals[0]
+            seconds += totals[1]
+    return commands, seconds
+
+
+async def login(company: dict) -> str:
+    response = await call("POST", "/auth/login", form={"email": company["email"], "password": BENCH_PASSWORD})
+    assert response.status_code == 200, f"login failed for {company['email']}: {response.body[:200]}"
+    return response.json()["access_token"]
+
+
+def job_card_search_body(company: dict, rng: random.Random, now: datetime) -> dict:
+    # the filters users actually combine on the job cards screen
+    variant = rng.choice(["recent", "recent", "status", "customer", "brand", "all"])
+    if variant == "recent":
+        return {"from_date": now - timedelta(days=rng.choice([7, 30, 90])), "to_date": now}
+    if variant == "status":
+        return {"status": rng.choice(["New", "Posted"]), "from_date": now - timedelta(days=365), "to_date": now}
+    if variant == "customer":
+        return {"customer_name": str(rng.choice(company["customer_ids"])), "all": True}
+    if variant == "brand":
+        return {"car_brand": str(rng.choice(company["brand_ids"])), "from_date": now - timedelta(days=180),
+                "to_date": now}
+    return {"all": True}
+
+
+def dashboard_range(rng: random.Random, now: datetime) -> dict:
+    days = rng.choice([1, 7, 30, 365])
+    return {"from_date": now - timedelta(days=days), "to_date": now, "type": "month" if days == 30 else "day"}
+
+
+# (name, route, body of one sample): the routes are POSTed and their metrics are labelled with the route
+CASES = [
+    ("job cards search", "/job_cards/search_engine_for_job_cards_3", job_card_search_body),
+    ("job cards dashboard", "/job_cards_dashboard/get_job_cards_daily_summary",
+     lambda company, rng, now: dashboard_range(rng, now)),
+    ("cashflow dashboard", "/job_cards_dashboard/get_cashflow_summary",
+     lambda company, rng, now: dashboard_range(rng, now)),
+    ("car trading dashboard", "/car_trading/get_dashboard_summary",
+     lambda company, rng, now: {"range": rng.choice(["month", "month", "year"]), "compare_previous": True}),
+]
+
+
+def report_line(name: str, latencies: list[float], errors: int, elapsed: float, commands: int, db_seconds: float,
+                samples: int) -> dict:
+    result = {
+        "requests": samples,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+        "p99_ms": round(percentile(latencies, 0.99), 1),
+        "max_ms": round(max(latencies, default=0), 1),
+        "per_second": round(samples / elapsed, 1) if elapsed else 0,
+        "db_commands": round(commands / samples, 1) if samples else 0,
+        "db_ms": round(db_seconds * 1000 / samples, 1) if samples else 0,
+    }
+    print(f"{name:<24} {samples:>5} {errors:>4} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} "
+          f"{result['max_ms']:>9} {result['per_second']:>8} {result['db_commands']:>8} {result['db_ms']:>8}")
+    return result
+
+
+async def run_case(name: str, route: str, make_body, companies: list[dict], tokens: list[str], samples: int,
+                   concurrency: int) -> dict:
+    rng = random.Random(f"{BENCH_SEED}-{name}")
+    now = datetime.now(timezone.utc)
+    requests = []
+    for index in range(BENCH_WARMUP + samples):
+        # tenants take turns, like the requests of several companies sharing one deployment
+        company_index = index % len(companies)
+        requests.append((company_index, make_body(companies[company_index], rng, now)))
+    warmup, measured = requests[:BENCH_WARMUP], requests[BENCH_WARMUP:]
+    for company_index, body in warmup:
+        await call("POST", route, tokens[company_index], json_body=body)
+
+    latencies: list[float] = []
+    errors = 0
+    queue = iter(measured)
+
+    async def worker():
+        nonlocal errors
+        for company_index, body in queue:
+            started = time.perf_counter()
+            response = await call("POST", route, tokens[company_index], json_body=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+                if errors == 1:
+                    print(f"    {name}: {response.status_code} {response.body[:300]}")
+
+    commands_before, seconds_before = db_totals(route)
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(concurrency, 1))])
+    elapsed = time.perf_counter() - started
+    commands_after, seconds_after = db_totals(route)
+    return report_line(name, latencies, errors, elapsed, commands_after - commands_before,
+                       seconds_after - seconds_before, len(measured))
+
+
+async def run_payroll(companies: list[dict], tokens: list[str]) -> dict:
+    # every sample runs a period nobody ran yet; payroll runs of one company are serialized by its run counter
+    runs = [(company_index, company["period_ids"][period_index])
+            for period_index in range(max(len(company["period_ids"]) for company in companies))
+            for company_index, company in enumerate(companies) if period_index < len(company["period_ids"])]
+    runs = runs[:BENCH_REQUESTS]
+    route = "/payroll_runs/payroll_run"
+    latencies: list[float] = []
+    errors = 0
+    commands_before, seconds_before = db_totals(route)
+    started = time.perf_counter()
+    for company_index, period_id in runs:
+        body = {"payroll_id": str(companies[company_index]["payroll_id"]), "period_id": str(period_id)}
+        request_started = time.perf_counter()
+        response = await call("POST", route, tokens[company_index], json_body=body)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+            if errors == 1:
+                print(f"    payroll run: {response.status_code} {response.body[:300]}")
+    elapsed = time.perf_counter() - started
+    commands_after, seconds_after = db_totals(route)
+    return report_line("payroll run", latencies, errors, elapsed, commands_after - commands_before,
+                       seconds_after - seconds_before, len(runs))
+
+
+def job_cards_workbook(company: dict, rng: random.Random, first_job_id: int) -> bytes:
+    """A job cards migration sheet: existing lookups mostly, some new customers the import has to create."""
+    brand_models = [(brand, model) for brand, models in BRANDS.items() for model in models]
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    header = [None] * JOB_CARDS_SCHEMA.width
+    for column in JOB_CARDS_SCHEMA.columns:
+        header[column.position] = column.name
+    sheet.append(header)
+    now = datetime.now()
+    for number in range(BENCH_IMPORT_ROWS):
+        row = [None] * JOB_CARDS_SCHEMA.width
+        brand, model = rng.choice(brand_models)
+        job_date = now - timedelta(days=rng.randrange(365))
+        posted = rng.random() < 0.7
+        customer = rng.choice(company["customer_names"]) if rng.random() < 0.9 \
+            else f"IMPORTED CUSTOMER {first_job_id + number}"
+        values = {
+            "job_id": first_job_id + number, "brand": brand, "model": model, "year": rng.randint(2010, 2025),
+            "color": rng.choice(["WHITE", "BLACK", "SILVER"]), "plate_number": rng.randrange(10000, 99999),
+            "plate_code": rng.choice("ABCDE"), "city": "DUBAI", "type": "JOB",
+            "mileage_in": rng.randrange(1000, 200000), "mileage_out": 0, "salesman": "SALESMAN 1",
+            "branch": "BRANCH 1", "payment_type": rng.choice(["CASH", "CREDIT"]), "returned": "NOT RETURNED",
+            "job_number": f"IMP-{first_job_id + number}", "job_date": job_date,
+            "invoice_number": f"IMPINV-{first_job_id + number}" if posted else "",
+            "invoice_date": job_date if posted else None, "job_warranty_days": 0,
+            "job_status_1": "POSTED" if posted else "NEW", "job_status_2": "NEW", "customer": customer,
+            "entity_status": "ACTIVE", "customer_credit_limit": 0, "customer_warranty_days": 0,
+            "lpo_required": "NO",
+        }
+        for column in JOB_CARDS_SCHEMA.columns:
+            row[column.position] = values.get(column.name)
+        sheet.append(row)
+    output = BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+async def run_import(companies: list[dict], tokens: list[str]) -> dict:
+    """Upload to finished job: the request only queues the import, the job runner does the work."""
+    rng = random.Random(f"{BENCH_SEED}-import")
+    latencies: list[float] = []
+    errors = 0
+    commands, db_seconds = 0, 0.0
+    started = time.perf_counter()
+    for run in range(BENCH_IMPORT_RUNS):
+        company_index = run % len(companies)
+        contents = job_cards_workbook(companies[company_index], rng, 1_000_000 + run * BENCH_IMPORT_ROWS)
+        background_before = db_totals(BACKGROUND_ROUTE)
+        request_started = time.perf_counter()
+        response = await call("POST", "/data_migration/get_file", tokens[company_index],
+                              form={"screen_name": "job cards", "delete_every_thing": "false"},
+                              files={"file": ("job_cards.xlsx", contents)})
+        status = "failed"
+        if response.status_code == 200:
+            job_id = response.json()["job"]["_id"]
+            while True:
+                job = (await call("GET", f"/jobs/get_job/{job_id}", tokens[company_index])).json()["job"]
+                if job["status"] not in ("queued", "running"):
+                    status = job["status"]
+                    break
+                await asyncio.sleep(JOB_POLL_SECONDS)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        # import commands run in the job runner; its idle polling is counted too but is negligible next to them
+        background_after = db_totals(BACKGROUND_ROUTE)
+        commands += background_after[0] - background_before[0]
+        db_seconds += background_after[1] - background_before[1]
+        if status != "succeeded":
+            errors += 1
+            print(f"    data import: {response.status_code} {status} {response.body[:300]}")
+    elapsed = time.perf_counter() - started
+    print(f"    data import: {BENCH_IMPORT_ROWS} rows per file, "
+          f"{BENCH_IMPORT_ROWS * BENCH_IMPORT_RUNS / elapsed:.0f} rows/s")
+    return report_line("data import", latencies, errors, elapsed, commands, db_seconds, BENCH_IMPORT_RUNS)
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for field in ("p95_ms", "db_commands"):
+            if previous[field] and result[field] > previous[field] * (1 + BENCH_MAX_REGRESSION):
+                regressions.append(f"{name} {field}: {previous[field]} -> {result[field]}")
+    return regressions
+
+
+async def benchmark() -> int:
+    companies = await seed()
+    async with app.router.lifespan_context(app):
+        tokens = [await login(company) for company in companies]
+        print(f"\n{BENCH_REQUESTS} requests per case, {BENCH_CONCURRENCY} concurrent, "
+              f"{len(companies)} tenants (latency and db time in ms, db commands and time per request)")
+        print(f"{'case':<24} {'n':>5} {'err':>4} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'req/s':>8} "
+              f"{'db cmds':>8} {'db ms':>8}")
+        results = {}
+        for name, route, make_body in CASES:
+            results[name] = await run_case(name, route, make_body, companies, tokens, BENCH_REQUESTS,
+                                           BENCH_CONCURRENCY)
+        results["payroll run"] = await run_payroll(companies, tokens)
+        results["data import"] = await run_import(companies, tokens)
+
+    if not BENCH_KEEP_DATA:
+        await client.drop_database(db.name)
+    if BENCH_REPORT:
+        with open(BENCH_REPORT, "w") as file:
+            json.dump(results, file, indent=2)
+    failed = sum(result["errors"] for result in results.values())
+    if BENCH_BASELINE:
+        with open(BENCH_BASELINE) as file:
+            regressions = compare(results, json.load(file))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        failed += len(regressions)
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(benchmark()) else 0)
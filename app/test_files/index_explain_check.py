@@ -0,0 +1,124 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+# always a scratch database on a local mongod, it is dropped at the start and at the end
+os.environ["MONGO_URI"] = os.getenv("EXPLAIN_MONGO_URI", "mongodb://localhost:27017")
+os.environ["DATABASE_NAME"] = os.getenv("EXPLAIN_DATABASE_NAME", "index_explain_check")
+
+from bson import ObjectId
+
+from app.core.index_registry import ensure_indexes
+from app.database import client, db
+from app.routes import (employees, inspection_reports, issue_items, job_cards, payroll_runs, receiving, time_sheets,
+                        to_do_list, ar_receipts)
+from app.routes.car_trading import car_trading, dashboard_summary
+
+company_id = ObjectId()
+document_id = ObjectId()
+user_id = ObjectId()
+customer_id = ObjectId()
+
+# one document shaped enough for every base collection, so each $lookup below runs at least once
+seed_document = {
+    "_id": document_id,
+    "company_id": company_id,
+    "customer": customer_id,
+    "job_status_1": "Posted",
+    "created_by": user_id,
+    "assigned_to": user_id,
+    "date": datetime.now(timezone.utc),
+}
+
+# (name, collection, pipeline): the primary pipeline of a screen with the $match its route puts in front
+cases = [
+    ("job card details", "job_cards", [{"$match": {"_id": document_id}}] + job_cards.pipeline),
+    ("job cards search", "job_cards",
+     [{"$match": {"company_id": company_id}}, {"$sort": {"job_number": -1}}, {"$limit": 100}] + job_cards.pipeline),
+    ("inspection report", "job_cards",
+     [{"$match": {"_id": document_id}}] + inspection_reports.inspection_reports_pipeline),
+    ("customer invoices", "job_cards",
+     [{"$match": {"company_id": company_id, "customer": customer_id, "job_status_1": "Posted"}}]
+     + ar_receipts.all_customer_invoices_pipeline),
+    ("receiving details", "receiving", [{"$match": {"_id": document_id}}] + receiving.receiving_details_pipeline),
+    ("receiving search", "receiving",
+     [{"$match": {"company_id": company_id}}, {"$sort": {"date": -1}}, {"$limit": 200}]
+     + receiving.receiving_details_pipeline),
+    ("issuing details", "issuing", [{"$match": {"_id": document_id}}] + issue_items.issuing_pipeline),
+    ("time sheet details", "time_sheets", [{"$match": {"_id": document_id}}] + time_sheets.time_sheets_pipeline),
+    ("employee details", "employees", [{"$match": {"_id": document_id}}] + employees.details_pipeline),
+    ("payroll run details", "payroll_runs",
+     [{"$match": {"company_id": company_id, "_id": document_id}}] + payroll_runs.payroll_runs_details_pipeline),
+    ("trade item details", "all_trades_items",
+     [{"$match": {"_id": document_id}}] + car_trading.trade_item_details_pipeline),
+    ("vehicle dashboard", "all_trades", dashboard_summary._vehicle_base_pipeline(company_id, None)),
+    ("task details", "to_do_list",
+     [{"$match": {"_id": document_id}}] + to_do_list.task_details_pipeline(user_id)),
+    ("task description", "to_do_list", to_do_list.task_description_pipeline(document_id, user_id)),
+]
+
+
+def lookup_collections(value) -> set[str]:
+    """Every collection joined by a pipeline, nested $lookup and $facet stages included."""
+    found = set()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in ("$lookup", "$graphLookup") and isinstance(item.get("from"), str):
+                found.add(item["from"])
+            found |= lookup_collections(item)
+    elif isinstance(value, list):
+        for item in value:
+            found |= lookup_collections(item)
+    return found
+
+
+def collection_scans(explain, path: str = "") -> list[str]:
+    """Where the plan reads a whole collection: COLLSCAN stages and $lookup stages that report collection scans."""
+    scans = []
+    if isinstance(explain, dict):
+        if explain.get("stage") == "COLLSCAN":
+            scans.append(f"{path} COLLSCAN {explain.get('filter') or ''}".strip())
+        if explain.get("collectionScans"):
+            lookup = explain.get("$lookup") or {}
+            scans.append(f"{path} $lookup from {lookup.get('from')} ({explain['collectionScans']} scans)")
+        for key, item in explain.items():
+            scans += collection_scans(item, f"{path}.{key}" if path else key)
+    elif isinstance(explain, list):
+        for index, item in enumerate(explain):
+            scans += collection_scans(item, f"{path}[{index}]")
+    return scans
+
+
+async def explain(collection: str, pipeline: list[dict]) -> dict:
+    return await db.command({
+        "explain": {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+        "verbosity": "executionStats",
+    })
+
+
+async def check() -> int:
+    await client.drop_database(db.name)
+    await ensure_indexes()
+    for name in {collection for _, collection, pipeline in cases} | set().union(
+            *(lookup_collections(pipeline) for _, _, pipeline in cases)):
+        # a $lookup into a missing collection is never scanned, so every joined collection gets a document
+        await db[name].insert_one({"company_id": company_id})
+    for _, collection, _ in cases:
+        await db[collection].replace_one({"_id": document_id}, seed_document, upsert=True)
+
+    failures = 0
+    for name, collection, pipeline in cases:
+        scans = collection_scans(await explain(collection, pipeline))
+        failures += 1 if scans else 0
+        print(f"{'FAIL' if scans else 'ok  '} {name} ({collection})")
+        for scan in scans:
+            print(f"     {scan}")
+
+    await client.drop_database(db.name)
+    print(f"{len(cases) - failures}/{len(cases)} pipelines use indexes only")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(check()) else 0)
@@ -0,0 +1,82 @@
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import Decimal128, ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.bson_json import BsonJSONResponse
+from app.routes.job_cards import job_cards_search_projection, serializer
+
+rows_count = 5000
+rounds = 7
+id_fields = {"_id", "company_id", "quotation_id", "car_brand", "car_model", "country", "city", "color",
+             "engine_type", "customer", "salesman", "branch", "currency", "technician"}
+number_fields = {"mileage_in", "mileage_out", "mileage_in_out_diff", "fuel_amount", "credit_limit", "outstanding",
+                 "rate", "job_warranty_days", "job_warranty_km", "job_min_test_km"}
+
+
+def job_card(rng: random.Random, now: datetime) -> dict:
+    """A search result row as _enrich_job_cards returns it: projected job card plus its invoice items and names."""
+    job = {}
+    for field in job_cards_search_projection:
+        if field in id_fields:
+            job[field] = ObjectId()
+        elif field in number_fields:
+            job[field] = rng.randrange(100000) / 10
+        elif "date" in field or field.endswith("At"):
+            job[field] = now - timedelta(minutes=rng.randrange(10 ** 6))
+        else:
+            job[field] = f"{field.upper()} {rng.randrange(10 ** 6)}"
+    job["invoice_items_details"] = [{
+        "_id": ObjectId(), "job_card_id": job["_id"], "company_id": job["company_id"], "name": ObjectId(),
+        "name_text": "OIL CHANGE", "line_number": line, "quantity": 2, "price": 120.5, "amount": 241.0,
+        "discount": 0, "total": 241.0, "vat": 12.05, "net": 253.05, "createdAt": now, "updatedAt": now,
+    } for line in range(rng.randint(1, 6))]
+    job.update({"total_amount": 1200.0, "total_vat": 60.0, "total_net": 1260.0, "paid": 500.0,
+                "final_outstanding": 760.0, "car_brand_name": "TOYOTA", "car_brand_logo": None,
+                "car_model_name": "LAND CRUISER", "customer_name": "AL FUTTAIM MOTORS", "branch_name": "BRANCH 1",
+                "currency_code": "AED", "discount_rate": Decimal128("2.5")})
+    return job
+
+
+def current_path(rows: list[dict]) -> bytes:
+    # before: a serializer copy per row, then fastapi's jsonable_encoder, then JSONResponse.render
+    content = {"job_cards": [serializer(row) for row in rows], "next_cursor": None, "grand_totals": None}
+    return JSONResponse(jsonable_encoder(content, custom_encoder={Decimal128: lambda value: float(str(value))})).body
+
+
+def bson_path(rows: list[dict]) -> bytes:
+    return BsonJSONResponse({"job_cards": rows, "next_cursor": None, "grand_totals": None}).body
+
+
+def measure(name: str, encode, rows: list[dict]) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        encode(rows)
+        timings.append((time.perf_counter() - started) * 1000)
+    median = statistics.median(timings)
+    print(f"{name}: median {median:.1f} ms, best {min(timings):.1f} ms over {rounds} rounds")
+    return median
+
+
+def benchmark():
+    rng = random.Random(42)
+    now = datetime.now()
+    rows = [job_card(rng, now) for _ in range(rows_count)]
+
+    before, after = current_path(rows), bson_path(rows)
+    assert json.loads(before) == json.loads(after), "the two encoders disagree"
+    print(f"{rows_count} job cards, {len(after) / 1024 / 1024:.1f} MB of JSON")
+
+    current_ms = measure("serializer + jsonable_encoder", current_path, rows)
+    bson_ms = measure("BsonJSONResponse", bson_path, rows)
+    print(f"speedup: {current_ms / bson_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from passlib.context import CryptContext
+
+from app.core.passwords import password_hasher
+from app.core.security import pwd_ctx
+
+logins_count = 100
+probe_interval = 0.005
+password = "correct horse battery staple"
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+async def probe_endpoint(stop: asyncio.Event, latencies: list[float]):
+    # stands in for an unrelated request on the same worker: it only needs the loop for a moment
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(probe_interval)
+        latencies.append((time.perf_counter() - started - probe_interval) * 1000)
+
+
+async def inline_login(hashed: str) -> bool:
+    # what auth.login did before: argon2 straight on the event loop
+    return pwd_ctx.verify(password, hashed)
+
+
+async def pooled_login(hashed: str) -> bool:
+    valid, _ = await password_hasher.verify_and_update(password, hashed)
+    return valid
+
+
+async def storm(name: str, login, hashed: str):
+    stop = asyncio.Event()
+    latencies: list[float] = []
+    probe = asyncio.create_task(probe_endpoint(stop, latencies))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[login(hashed) for _ in range(logins_count)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    assert all(results)
+    print(f"{name}: {logins_count} logins in {elapsed:.2f}s ({logins_count / elapsed:.1f}/s), "
+          f"other requests p50 {percentile(latencies, 0.5):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms, "
+          f"max {max(latencies):.1f} ms over {len(latencies)} probes")
+
+
+async def check_rehash():
+    # a hash made with weaker parameters is accepted once and replaced with the current ones
+    old_hash = CryptContext(schemes=["argon2"], argon2__rounds=1, argon2__memory_cost=8192).hash(password)
+    valid, new_hash = await password_hasher.verify_and_update(password, old_hash)
+    assert valid and new_hash and new_hash != old_hash
+    valid, newer_hash = await password_hasher.verify_and_update(password, new_hash)
+    assert valid and newer_hash is None
+    assert not (await password_hasher.verify_and_update("wrong", new_hash))[0]
+    print("rehash on login: ok")
+
+
+async def benchmark():
+    hashed = await password_hasher.hash(password)
+    await storm("inline", inline_login, hashed)
+    await storm(f"pool ({password_hasher.max_workers} workers)", pooled_login, hashed)
+    await check_rehash()
+    print(password_hasher.get_stats())
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
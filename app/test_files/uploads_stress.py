@@ -0,0 +1,54 @@
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import time
+
+# offline: uploads go to a temporary folder through the local backend
+os.environ["UPLOAD_BACKEND"] = "local"
+os.environ.setdefault("UPLOAD_LOCAL_DIR", tempfile.mkdtemp(prefix="uploads_stress_"))
+
+from fastapi import UploadFile
+
+from app.core.uploads import UPLOAD_LOCAL_DIR, upload_service
+
+files_count = 200
+file_size = 2 * 1024 * 1024
+
+
+async def watch_loop_lag(stop: asyncio.Event, lags: list[float]):
+    # a blocked event loop shows up as ticks arriving late
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - started - 0.01) * 1000)
+
+
+async def stress():
+    payload = os.urandom(file_size)
+    files = [UploadFile(io.BytesIO(payload), filename=f"file_{i}.bin") for i in range(files_count)]
+    stop = asyncio.Event()
+    lags: list[float] = []
+    watcher = asyncio.create_task(watch_loop_lag(stop, lags))
+
+    started = time.perf_counter()
+    results = await upload_service.upload_many(
+        (file, {"folder": "stress", "resource_type": "auto", "public_id": file.filename}) for file in files)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+
+    print(f"uploads: {len(results)} x {file_size // 1024} KiB in {elapsed:.2f}s "
+          f"({len(results) * file_size / elapsed / 1024 / 1024:.0f} MiB/s)")
+    print(f"event loop lag: max {max(lags):.1f} ms over {len(lags)} ticks")
+    print(upload_service.metrics.snapshot())
+    assert len({result["public_id"] for result in results}) == files_count
+
+    await asyncio.gather(*[upload_service.destroy(result["public_id"]) for result in results])
+    upload_service.shutdown()
+    shutil.rmtree(UPLOAD_LOCAL_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(stress())
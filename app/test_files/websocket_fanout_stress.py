@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from app.websocket_config import ConnectionManager
+
+fast_clients = 200
+slow_clients = 3
+messages_count = 500
+
+
+class FakeWebSocket:
+    """Stands in for a client socket; a slow one takes `delay` seconds per message, a dead one hangs."""
+
+    def __init__(self, delay: float = 0.0, hang: bool = False):
+        self.delay = delay
+        self.hang = hang
+        self.received = 0
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        if self.hang:
+            await asyncio.Event().wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = (code, reason)
+
+
+async def stress():
+    manager = ConnectionManager()
+    fast = [FakeWebSocket() for _ in range(fast_clients)]
+    slow = [FakeWebSocket(delay=0.05) for _ in range(slow_clients)] + [FakeWebSocket(hang=True)]
+    for websocket in fast + slow:
+        await manager.connect(websocket, user_id="user", company_id="company")
+
+    started = time.perf_counter()
+    route_time = 0.0
+    for index in range(messages_count):
+        sent_at = time.perf_counter()
+        await manager.send_to_company("company", {"type": "counter", "value": index})
+        route_time += time.perf_counter() - sent_at
+        # the routes that send these updates await their database writes in between
+        await asyncio.sleep(0.001)
+
+    # let the writers drain what the fast clients were sent
+    while any(manager.channels[websocket].queue.qsize() for websocket in fast):
+        await asyncio.sleep(0.01)
+    delivered = time.perf_counter() - started
+
+    print(f"{messages_count} messages to {len(fast) + len(slow)} clients: routes waited {route_time * 1000:.1f} ms, "
+          f"fast clients had everything after {delivered * 1000:.0f} ms")
+    print(f"fast clients received at least {min(websocket.received for websocket in fast)}, "
+          f"slow clients received {[websocket.received for websocket in slow]}")
+    print(manager.get_stats())
+    assert route_time < 1, "sending must not wait for the clients"
+
+
+if __name__ == "__main__":
+    asyncio.run(stress())
@@ -1,20 +1,161 @@
 # app/websocket_manager.py
 from fastapi import WebSocket
-from typing import Any, Dict, List, Set
+from typing import Any, Callable, Dict, List, Optional, Set
+from collections import deque
 from datetime import datetime, timezone
+import asyncio
 import json
+import os
+import time
+
+from app.core.pubsub import create_pubsub
+
+# pending messages per connection; a client that falls this far behind hits the overflow policy
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+# "drop_oldest" keeps the client and drops its oldest pending message, "disconnect" closes the client
+WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "drop_oldest")
+WS_METRICS_WINDOW = 1000
+
+_CLOSE = object()
 
 
 async def send_personal_message(message: str, websocket: WebSocket):
     await websocket.send_text(message)
 
 
+class FanoutMetrics:
+    """Counters and send latency (queued -> written) over the last WS_METRICS_WINDOW messages."""
+
+    def __init__(self, window: int = WS_METRICS_WINDOW):
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.send_errors = 0
+        self.slow_disconnects = 0
+        self.max_latency_ms = 0.0
+        self.recent_latency_ms = deque(maxlen=window)
+        self.recent_write_ms = deque(maxlen=window)
+
+    def record_sent(self, latency: float, write: float):
+        self.sent += 1
+        self.max_latency_ms = max(self.max_latency_ms, latency * 1000)
+        self.recent_latency_ms.append(latency * 1000)
+        self.recent_write_ms.append(write * 1000)
+
+    def snapshot(self) -> dict:
+        def percentile(values: deque, p: float) -> Optional[float]:
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1) if ordered else None
+
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "send_errors": self.send_errors,
+            "slow_disconnects": self.slow_disconnects,
+            "latency_p50_ms": percentile(self.recent_latency_ms, 0.5),
+            "latency_p95_ms": percentile(self.recent_latency_ms, 0.95),
+            "latency_max_ms": round(self.max_latency_ms, 1),
+            "write_p95_ms": percentile(self.recent_write_ms, 0.95),
+        }
+
+
+class OutboundChannel:
+    """
+    Outbound queue of one connection with its own writer task, so a slow client only delays
+    itself. The queue is bounded by WS_SEND_QUEUE_SIZE through `offer`; close requests skip the bound.
+    """
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.closing = False
+        self.dropped = 0
+        self.task = asyncio.create_task(self._writer())
+
+    def offer(self, data: str) -> bool:
+        if self.closing:
+            return False
+        if self.queue.qsize() >= WS_SEND_QUEUE_SIZE:
+            if WS_OVERFLOW_POLICY == "disconnect":
+                self.manager.drop_slow_connection(self.websocket)
+                return False
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.manager.metrics.dropped += 1
+        self.queue.put_nowait((data, time.perf_counter()))
+        self.manager.metrics.queued += 1
+        return True
+
+    def close(self, code: int, reason: str, message: Optional[str] = None):
+        """Discards pending messages, then sends `message` (if any) and closes the socket."""
+        if self.closing:
+            return
+        self.closing = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if message is not None:
+            self.queue.put_nowait((message, time.perf_counter()))
+        self.queue.put_nowait((_CLOSE, (code, reason)))
+
+    def stop(self):
+        if not self.closing and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+    async def _writer(self):
+        while True:
+            data, queued_at = await self.queue.get()
+            if data is _CLOSE:
+                code, reason = queued_at
+                try:
+                    await asyncio.wait_for(self.websocket.close(code=code, reason=reason), WS_SEND_TIMEOUT_SECONDS)
+                except Exception:
+                    pass
+                return
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(data), WS_SEND_TIMEOUT_SECONDS)
+            except Exception:
+                self.manager.metrics.send_errors += 1
+                self.manager.disconnect(self.websocket)
+                return
+            finished = time.perf_counter()
+            self.manager.metrics.record_sent(finished - queued_at, finished - started)
+
+
 class ConnectionManager:
-    def __init__(self):
+    """
+    Sockets connected to this process. Every send goes through the pub/sub `bus`, so with the
+    mongo backend a message published by any worker reaches the matching sockets on all of them.
+    """
+
+    def __init__(self, bus=None):
         self.active_connections: List[WebSocket] = []
         self.user_connections: Dict[str, Set[WebSocket]] = {}
         self.company_connections: Dict[str, Set[WebSocket]] = {}
         self.connection_metadata: Dict[WebSocket, Dict[str, Any]] = {}
+        self.channels: Dict[WebSocket, OutboundChannel] = {}
+        self.metrics = FanoutMetrics()
+        # writers still flushing a close after their connection was removed
+        self._closing_tasks: Set[asyncio.Task] = set()
+        # other event kinds (cache invalidations), applied on every worker like the socket events
+        self.event_handlers: Dict[str, Callable[[dict], None]] = {}
+        self.bus = bus or create_pubsub()
+        self.bus.subscribe(self._deliver)
+
+    async def start(self):
+        await self.bus.start()
+
+    async def stop(self):
+        await self.bus.stop()
+
+    def on_event(self, kind: str, handler: Callable[[dict], None]):
+        self.event_handlers[kind] = handler
+
+    async def publish_event(self, kind: str, **fields):
+        await self.bus.publish({"kind": kind, **fields})
 
     async def connect(
             self,
@@ -28,6 +169,7 @@ class ConnectionManager:
         await websocket.accept()
         connected_at = datetime.now(timezone.utc)
         self.active_connections.append(websocket)
+        self.channels[websocket] = OutboundChannel(websocket, self)
         self.connection_metadata[websocket] = {
             "user_id": user_id or "",
             "company_id": company_id or "",
@@ -46,6 +188,12 @@ class ConnectionManager:
         metadata = self.connection_metadata.pop(websocket, {})
         user_id = user_id or metadata.get("user_id")
         company_id = company_id or metadata.get("company_id")
+        channel = self.channels.pop(websocket, None)
+        if channel is not None:
+            channel.stop()
+            if channel.closing and not channel.task.done():
+                self._closing_tasks.add(channel.task)
+                channel.task.add_done_callback(self._closing_tasks.discard)
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
         if user_id is not None and user_id in self.user_connections:
@@ -57,6 +205,15 @@ class ConnectionManager:
             if not self.company_connections[company_id]:
                 del self.company_connections[company_id]
 
+    def drop_slow_connection(self, websocket: WebSocket):
+        channel = self.channels.get(websocket)
+        if channel is None:
+            return
+        self.metrics.slow_disconnects += 1
+        # 1013 "try again later": the client reconnects and reloads instead of missing updates silently
+        channel.close(1013, "Client is not keeping up with updates")
+        self.disconnect(websocket)
+
     def touch(self, websocket: WebSocket):
         metadata = self.connection_metadata.get(websocket)
         if metadata is not None:
@@ -90,77 +247,106 @@ class ConnectionManager:
                 current["session_ids"].add(metadata["session_id"])
         return presence
 
+    def get_stats(self) -> Dict[str, Any]:
+        depths = [channel.queue.qsize() for channel in self.channels.values()]
+        return {
+            "connections": len(self.channels),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_limit": WS_SEND_QUEUE_SIZE,
+            "overflow_policy": WS_OVERFLOW_POLICY,
+            **self.metrics.snapshot(),
+            "pubsub": {"backend": self.bus.name, **self.bus.stats()},
+        }
+
+    def _close_connections(self, connections: List[WebSocket], message: str, reason: str, user_id: str) -> int:
+        for websocket in connections:
+            channel = self.channels.get(websocket)
+            if channel is not None:
+                channel.close(4001, reason, message)
+            self.disconnect(websocket, user_id=user_id)
+        return len(connections)
+
+    def _fan_out(self, connections, data: str) -> int:
+        delivered = 0
+        for websocket in list(connections):
+            channel = self.channels.get(websocket)
+            if channel is not None and channel.offer(data):
+                delivered += 1
+        return delivered
+
+    def _deliver(self, event: dict) -> int:
+        """Applies an event (published here or on another worker) to the sockets of this process."""
+        kind = event.get("kind")
+        target = event.get("target")
+        if kind == "all":
+            return self._fan_out(self.active_connections, event["data"])
+        if kind == "user":
+            return self._fan_out(self.user_connections.get(target, []), event["data"])
+        if kind == "company":
+            return self._fan_out(self.company_connections.get(target, []), event["data"])
+        if kind == "logout":
+            session_id = event.get("session_id")
+            connections = [
+                websocket
+                for websocket in self.user_connections.get(target, set())
+                if session_id is None or self.connection_metadata.get(websocket, {}).get("session_id") == session_id
+            ]
+            return self._close_connections(connections, event["data"], event.get("reason") or "", target)
+        handler = self.event_handlers.get(kind)
+        if handler is not None:
+            handler(event)
+        return 0
+
+    # the returned counts are the sockets of this process, other workers apply the event on their own
     async def disconnect_session(
             self,
             user_id: str,
             session_id: str,
             reason: str = "This device was signed out by the administrator",
     ) -> int:
-        connections = [
-            websocket
-            for websocket in self.user_connections.get(user_id, set())
+        local = sum(
+            1 for websocket in self.user_connections.get(user_id, set())
             if self.connection_metadata.get(websocket, {}).get("session_id") == session_id
-        ]
-        message = json.dumps({
-            "type": "force_logout",
-            "data": {"reason": reason, "session_id": session_id},
+        )
+        await self.bus.publish({
+            "kind": "logout",
+            "target": user_id,
+            "session_id": session_id,
+            "reason": reason,
+            "data": json.dumps({
+                "type": "force_logout",
+                "data": {"reason": reason, "session_id": session_id},
+            }),
         })
-        for websocket in connections:
-            try:
-                await websocket.send_text(message)
-            except Exception:
-                pass
-            try:
-                await websocket.close(code=4001, reason=reason)
-            except Exception:
-                pass
-            self.disconnect(websocket, user_id=user_id)
-        return len(connections)
+        return local
 
     async def disconnect_user(self, user_id: str, reason: str = "Signed out by administrator") -> int:
-        connections = list(self.user_connections.get(user_id, set()))
-        message = json.dumps({
-            "type": "force_logout",
-            "data": {"reason": reason},
+        local = len(self.user_connections.get(user_id, set()))
+        await self.bus.publish({
+            "kind": "logout",
+            "target": user_id,
+            "session_id": None,
+            "reason": reason,
+            "data": json.dumps({
+                "type": "force_logout",
+                "data": {"reason": reason},
+            }),
         })
-        for websocket in connections:
-            try:
-                await websocket.send_text(message)
-            except Exception:
-                pass
-            try:
-                await websocket.close(code=4001, reason=reason)
-            except Exception:
-                pass
-            self.disconnect(websocket, user_id=user_id)
-        return len(connections)
+        return local
 
+    # the send methods only queue the message, each connection's writer task delivers it
     async def broadcast(self, message: dict):
         # تحويل الرسالة إلى JSON
         message_json = json.dumps(message)
         # إرسال الرسالة لجميع المتصلين
-        for connection in list(self.active_connections):
-            try:
-                await connection.send_text(message_json)
-            except Exception:
-                self.disconnect(connection)
+        await self.bus.publish({"kind": "all", "data": message_json})
 
     async def send_to_user(self, user_id: str, message: dict):
-        data = json.dumps(message)
-        for ws in list(self.user_connections.get(user_id, [])):
-            try:
-                await ws.send_text(data)
-            except Exception:
-                self.disconnect(ws, user_id=user_id)
+        await self.bus.publish({"kind": "user", "target": user_id, "data": json.dumps(message)})
 
     async def send_to_company(self, company_id: str, message: dict):
-        data = json.dumps(message)
-
-        for ws in list(self.company_connections.get(company_id, [])):
-            try:
-                await ws.send_text(data)
-            except Exception:
-                self.disconnect(ws, company_id=company_id)
+        await self.bus.publish({"kind": "company", "target": company_id, "data": json.dumps(message)})
 
     async def send_progress(self, percent: int):
         await self.broadcast({
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+# the date a job card is filtered / sorted by in the search screens:
+# New -> job_date, Cancelled -> job_cancellation_date, Posted -> invoice_date
+DATE_FIELD_TO_FILTER = "date_field_to_filter"
+
+JOB_CARD_DATE_SOURCE_FIELDS = ("job_status_1", "job_date", "invoice_date", "job_cancellation_date")
+
+_date_field_switch = {
+    "$switch": {
+        "branches": [
+            {
+                "case": {"$eq": [{"$toLower": "$job_status_1"}, "new"]},
+                "then": "$job_date"
+            },
+            {
+                "case": {"$eq": [{"$toLower": "$job_status_1"}, "cancelled"]},
+                "then": "$job_cancellation_date"
+            },
+            {
+                "case": {"$eq": [{"$toLower": "$job_status_1"}, "posted"]},
+                "then": "$invoice_date"
+            }
+        ],
+        "default": "$job_date"
+    }
+}
+
+# same rule as job_card_date_field_to_filter, for pipeline updates (non-date values become null)
+date_field_to_filter_expression = {
+    "$let": {
+        "vars": {"value": _date_field_switch},
+        "in": {"$cond": [{"$eq": [{"$type": "$$value"}, "date"]}, "$$value", None]}
+    }
+}
+
+
+def job_card_date_field_to_filter(job: dict) -> datetime | None:
+    status = str(job.get("job_status_1") or "").lower()
+    if status == "cancelled":
+        value = job.get("job_cancellation_date")
+    elif status == "posted":
+        value = job.get("invoice_date")
+    else:
+        value = job.get("job_date")
+    return value if isinstance(value, datetime) else None
+
+
+def set_job_card_date_field_to_filter(job: dict) -> dict:
+    job[DATE_FIELD_TO_FILTER] = job_card_date_field_to_filter(job)
+    return job
@@ -1,34 +1,46 @@
-import asyncio
-
 from fastapi import File, UploadFile, HTTPException
-import cloudinary.uploader
-from app.cloudinary_config import cloudinary
 from app.core import security
+from app.core.uploads import upload_service
+
+
+def _upload_options(file: UploadFile, folder: str) -> dict:
+    return {
+        "resource_type": "auto",
+        "folder": folder,
+        "public_id": f"{security.now_utc()}{file.filename}",
+    }
+
+
+def _upload_response(file: UploadFile, upload_result: dict) -> dict:
+    return {
+        "message": "File uploaded successfully",
+        "file_name": file.filename,
+        "url": upload_result.get("secure_url"),
+        "public_id": upload_result.get("public_id"),
+        "resource_type": upload_result.get("resource_type"),
+        "format": upload_result.get("format")
+    }
 
 
 async def upload_file(file: UploadFile = File(...), folder: str = "general"):
     try:
         # Upload to Cloudinary
-        upload_result = cloudinary.uploader.upload(
-            file.file,
-            resource_type="auto",
-            folder=folder,
-            public_id=f"{security.now_utc()}{file.filename}",
-        )
-
-        return {
-            "message": "File uploaded successfully",
-            "file_name": file.filename,
-            "url": upload_result.get("secure_url"),
-            "public_id": upload_result.get("public_id"),
-            "resource_type": upload_result.get("resource_type"),
-            "format": upload_result.get("format")
-        }
+        upload_result = await upload_service.upload(file, **_upload_options(file, folder))
+        return _upload_response(file, upload_result)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+async def upload_files(files: list[UploadFile], folder: str = "general") -> list[dict]:
+    """Uploads all files in parallel; nothing stays uploaded if one of them fails."""
+    try:
+        upload_results = await upload_service.upload_many((file, _upload_options(file, folder)) for file in files)
+        return [_upload_response(file, result) for file, result in zip(files, upload_results)]
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
 
 async def delete_file_from_server(public_id: str) -> bool:
     if not public_id:
@@ -37,9 +49,7 @@ async def delete_file_from_server(public_id: str) -> bool:
     try:
         saw_not_found = False
         for resource_type in ["image", "video", "raw"]:
-            result = await asyncio.to_thread(
-                lambda rt=resource_type: cloudinary.uploader.destroy(public_id, resource_type=rt)
-            )
+            result = await upload_service.destroy(public_id, resource_type=resource_type)
             if result.get("result") == "ok":
                 return True
             if result.get("result") == "not_found":
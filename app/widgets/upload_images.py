@@ -1,6 +1,6 @@
-from fastapi import File, UploadFile, APIRouter, HTTPException
-import cloudinary.uploader
-from app.cloudinary_config import cloudinary
+from fastapi import File, UploadFile, APIRouter, HTTPException, Depends
+from app.core import security
+from app.core.uploads import upload_service
 
 images = APIRouter()
 
@@ -8,7 +8,7 @@ images = APIRouter()
 @images.post("/upload_image")
 async def upload_image(file: UploadFile = File(...), folder: str = "general"):
     try:
-        result = cloudinary.uploader.upload(file.file, folder=folder)
+        result = await upload_service.upload(file, folder=folder)
         return {"url": result["secure_url"], "public_id": result["public_id"],"file_name":file.filename, "created_at": result["created_at"]}
     except Exception as e:
         return {"error": str(e)}
@@ -17,7 +17,7 @@ async def upload_image(file: UploadFile = File(...), folder: str = "general"):
 @images.post("/delete_image")
 async def delete_image_from_server(public_id: str) -> bool:
     try:
-        result = cloudinary.uploader.destroy(public_id)
+        result = await upload_service.destroy(public_id)
         if result.get("result") != "ok":
             return False
         else:
@@ -27,3 +27,8 @@ async def delete_image_from_server(public_id: str) -> bool:
         print(f"Error deleting images from Cloudinary: {e}")
         return False
 
+
+@images.get("/metrics")
+async def get_upload_metrics(_: dict = Depends(security.get_current_user)):
+    return {"backend": upload_service.backend.name, "max_workers": upload_service.max_workers,
+            "operations": upload_service.metrics.snapshot()}